@@ -0,0 +1,145 @@
+"""
+Benchmark the overhead of tests/conftest.py using simulated tentacles.
+
+Example:
+
+  python -m testbed_showcase.cli_bench_harness \
+    --tentacles 10 100 --tests 20 100 \
+    --json results_bench_harness.json \
+    --max-fixture-ms 50
+
+Exits with 1 if a limit is exceeded: Usable as regression gate.
+
+'--simulate' runs pytest on simulated tentacles, for example as shard worker:
+
+  python -m testbed_showcase.cli_bench_harness --simulate --tentacles 10 \
+    -- --firmware=MOCK tests/test_simple.py
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import pathlib
+import sys
+import tempfile
+
+from testbed_showcase.constants import DIRECTORY_REPO
+from testbed_showcase.util_bench_harness import (
+    BenchLimits,
+    BenchResult,
+    DEFAULT_RUN_LIMIT,
+    run_scales,
+    run_simulated,
+    run_single,
+)
+
+FILENAME_CONFTEST = DIRECTORY_REPO / "tests" / "conftest.py"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument(
+        "--tentacles",
+        type=int,
+        nargs="+",
+        default=[10, 100],
+        help="Sizes of the synthetic inventory.",
+    )
+    parser.add_argument(
+        "--tests",
+        type=int,
+        nargs="+",
+        default=[20, 100],
+        help="Numbers of generated test functions.",
+    )
+    parser.add_argument(
+        "--run-limit",
+        type=int,
+        default=DEFAULT_RUN_LIMIT,
+        help="All tests are collected, but only this many are run to measure the fixtures.",
+    )
+    parser.add_argument(
+        "--json",
+        type=pathlib.Path,
+        default=None,
+        help="Write the results to this json file. May be used as '--baseline' later.",
+    )
+    parser.add_argument(
+        "--baseline",
+        type=pathlib.Path,
+        default=None,
+        help="Fail if a scale is slower than this json file times '--tolerance'.",
+    )
+    parser.add_argument("--tolerance", type=float, default=1.5)
+    parser.add_argument("--max-collect-us-per-item", type=float, default=None)
+    parser.add_argument("--max-fixture-ms", type=float, default=None)
+    parser.add_argument("--max-rss-mb", type=float, default=None)
+    parser.add_argument(
+        "--directory",
+        type=pathlib.Path,
+        default=None,
+        help="Working directory. Default: A temporary directory.",
+    )
+    parser.add_argument(
+        "--simulate",
+        action="store_true",
+        help="Run pytest with 'pytest_args' on '--tentacles' simulated tentacles.",
+    )
+    parser.add_argument("--single", type=pathlib.Path, help=argparse.SUPPRESS)
+    parser.add_argument("pytest_args", nargs="*")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    if args.simulate:
+        with tempfile.TemporaryDirectory(prefix="simulate_") as tmp:
+            directory = pathlib.Path(tmp) if args.directory is None else args.directory
+            sys.exit(
+                run_simulated(
+                    directory=directory,
+                    tentacles=args.tentacles[0],
+                    pytest_args=args.pytest_args,
+                )
+            )
+
+    if args.single is not None:
+        # Called by 'run_scales()': One scale in this process
+        result = run_single(
+            directory=args.directory,
+            filename_conftest=FILENAME_CONFTEST,
+            tentacles=args.tentacles[0],
+            test_functions=args.tests[0],
+            run_limit=args.run_limit,
+        )
+        BenchResult.write(args.single, [result])
+        return
+
+    scales = [(t, f) for t in args.tentacles for f in args.tests]
+    with tempfile.TemporaryDirectory(prefix="bench_harness_") as tmp:
+        directory = pathlib.Path(tmp) if args.directory is None else args.directory
+        results = run_scales(
+            directory=directory, scales=scales, run_limit=args.run_limit
+        )
+
+    print(BenchResult.header())
+    for result in results:
+        print(result.text)
+    if args.json is not None:
+        BenchResult.write(args.json, results)
+
+    limits = BenchLimits(
+        collect_us_per_item=args.max_collect_us_per_item,
+        fixture_ms=args.max_fixture_ms,
+        maxrss_mb=args.max_rss_mb,
+        baseline=[] if args.baseline is None else BenchResult.read(args.baseline),
+        tolerance=args.tolerance,
+    )
+    violations = limits.violations(results)
+    for violation in violations:
+        print(f"REGRESSION: {violation}")
+    sys.exit(1 if len(violations) > 0 else 0)
+
+
+if __name__ == "__main__":
+    main()
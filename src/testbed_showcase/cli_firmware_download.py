@@ -0,0 +1,50 @@
+"""
+Fetch the firmware of download specs into the download cache.
+
+Example, before going offline:
+
+  python -m testbed_showcase.cli_firmware_download pytest_args_firmware_*.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import pathlib
+
+from testbed_showcase.constants import DIRECTORY_FIRMWARE_DOWNLOADS
+from testbed_showcase.util_download_cache import (
+    DEFAULT_WORKERS,
+    DownloadCache,
+    fetch_firmwares,
+)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument(
+        "--directory",
+        type=pathlib.Path,
+        default=DIRECTORY_FIRMWARE_DOWNLOADS,
+        help="The download cache.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=DEFAULT_WORKERS,
+        help="Number of firmwares downloaded in parallel.",
+    )
+    parser.add_argument("filenames", type=pathlib.Path, nargs="+")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    cache = DownloadCache(directory=args.directory, max_workers=args.workers)
+    downloads = fetch_firmwares(cache=cache, filenames=args.filenames)
+    for variant, download in sorted(downloads.items()):
+        print(f"{variant}: {download.entry.filename} ({download.entry.size} bytes)")
+    print(f"downloaded: {cache.downloads}, resumed: {cache.resumed}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Shard one test run across several testbed instances.
+
+Example:
+
+  python -m testbed_showcase.cli_shard \
+    --worker "ch_hans_1=.venv/bin/python -m pytest" \
+    --worker "ch_hans_2=ssh pi@hans2 cd testbed_showcase && .venv/bin/pytest" \
+    -- --firmware=pytest_args_firmware_RPI_PICO2_v1.24.0.json tests/test_simple.py
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import pathlib
+import shlex
+import sys
+
+from testbed_showcase.constants import DIRECTORY_REPO
+from testbed_showcase.util_shard import (
+    FILENAME_JUNIT,
+    ShardWorker,
+    durations_from_junit,
+    run_sharded,
+)
+
+DIRECTORY_RESULTS_SHARDED = DIRECTORY_REPO / "results_sharded"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument(
+        "--worker",
+        action="append",
+        required=True,
+        help="TESTBED_INSTANCE=COMMAND: The command runs pytest on this testbed instance.",
+    )
+    parser.add_argument(
+        "--results",
+        type=pathlib.Path,
+        default=DIRECTORY_RESULTS_SHARDED,
+        help="The results of all shards are merged into this directory.",
+    )
+    parser.add_argument(
+        "--durations",
+        type=pathlib.Path,
+        default=DIRECTORY_RESULTS_SHARDED / FILENAME_JUNIT,
+        help="junit.xml of a previous run to balance the shards.",
+    )
+    parser.add_argument("pytest_args", nargs="*")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    workers: list[ShardWorker] = []
+    for worker in args.worker:
+        testbed_instance, sep, command = worker.partition("=")
+        if sep == "":
+            parser.error(
+                f"--worker: Expected TESTBED_INSTANCE=COMMAND but got '{worker}'"
+            )
+        workers.append(
+            ShardWorker(testbed_instance=testbed_instance, command=shlex.split(command))
+        )
+
+    durations: dict[str, float] = {}
+    if args.durations.is_file():
+        durations = durations_from_junit(args.durations)
+
+    sys.exit(
+        run_sharded(
+            workers=workers,
+            directory_results=args.results,
+            pytest_args=args.pytest_args,
+            durations=durations,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
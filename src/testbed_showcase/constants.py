@@ -25,9 +25,16 @@ DIRECTORY_REPO = DIRECTORY_OF_THIS_FILE.parent.parent
 print(DIRECTORY_REPO / "pyproject.toml")
 assert (DIRECTORY_REPO / "pyproject.toml").is_file()
 DIRECTORY_DOWNLOADS = DIRECTORY_REPO / "downloads"
+DIRECTORY_FIRMWARE_CACHE = DIRECTORY_DOWNLOADS / "firmware_cache"
+DIRECTORY_MPY_CACHE = DIRECTORY_DOWNLOADS / "mpy_cache"
+DIRECTORY_MIP_MIRROR = DIRECTORY_DOWNLOADS / "mip_mirror"
+DIRECTORY_FIRMWARE_DOWNLOADS = DIRECTORY_DOWNLOADS / "firmware_downloads"
+FIRMWARE_CACHE_MAX_BYTES = 500_000_000
 DIRECTORY_TESTRESULTS_DEFAULT = DIRECTORY_REPO / "results"
 DIRECTORY_GIT_CACHE = DIRECTORY_OCTOPROBE_GIT_CACHE
+DIRECTORY_GIT_WORKTREES = DIRECTORY_GIT_CACHE / "testbed_showcase"
 FILENAME_TESTBED_LOCK = DIRECTORY_REPO / "testbed.lock"
+FILENAME_USB_TOPOLOGY = DIRECTORY_REPO / "testbed_usb_topology.json"
 
 
 class EnumTentacleType(enum.StrEnum):
@@ -6,8 +6,9 @@ import typing
 from octoprobe.lib_tentacle import TentacleBase
 from octoprobe.util_baseclasses import TentacleSpecBase
 from octoprobe.util_constants import TAG_MCU
+from octoprobe.util_firmware_spec import FirmwareSpecBase
 
-from .constants import TAG_BOARD, TAG_BUILD_VARIANTS
+from .constants import EnumTentacleType, TAG_BOARD, TAG_BUILD_VARIANTS
 
 if typing.TYPE_CHECKING:
     from .tentacle_specs import McuConfig
@@ -73,3 +74,46 @@ class TentacleShowcase(TentacleBase):
         tentacle_spec_base = self.tentacle_spec_base
         assert isinstance(tentacle_spec_base, TentacleSpecShowcase)
         return tentacle_spec_base
+
+
+@dataclasses.dataclass
+class TentacleStateOffline:
+    firmware_spec: FirmwareSpecBase | None = None
+
+
+class TentacleOffline(TentacleShowcase):
+    """
+    A tentacle of the inventory, not connected:
+    Selects the tests and the firmware to build, but can not run a test.
+    'super().__init__()' is not called as it would access the hardware.
+    """
+
+    # Shadow the attributes of 'TentacleBase'
+    tentacle_serial_number: str = ""  # type: ignore[assignment]
+    tentacle_state: TentacleStateOffline = None  # type: ignore[assignment]
+
+    def __init__(  # pylint: disable=super-init-not-called
+        self,
+        tentacle_serial_number: str,
+        tentacle_spec: TentacleSpecShowcase,
+    ) -> None:
+        assert isinstance(tentacle_serial_number, str)
+        assert isinstance(tentacle_spec, TentacleSpecShowcase)
+        self.tentacle_serial_number = tentacle_serial_number
+        self._tentacle_spec = tentacle_spec
+        self.tentacle_state = TentacleStateOffline()
+
+    @property
+    @typing.override
+    def tentacle_spec_base(self) -> TentacleSpecBase:
+        return self._tentacle_spec
+
+    @property
+    @typing.override
+    def is_mcu(self) -> bool:
+        return self._tentacle_spec.tentacle_type == EnumTentacleType.TENTACLE_MCU
+
+    @property
+    @typing.override
+    def label_short(self) -> str:
+        return f"{self.tentacle_serial_number[-4:]}-{self._tentacle_spec.tentacle_tag.lower()}"
@@ -9,10 +9,11 @@ from testbed_showcase.constants import EnumFut, EnumTentacleType
 from .tentacle_spec import TentacleSpecShowcase
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(frozen=True)
 class McuConfig:
     """
-    These variables will be replaced in micropython code
+    These variables will be replaced in micropython code.
+    Frozen: Used as key of the rendered programs cache, see 'util_mp_remote'.
     """
 
     # Used in jinja2 templates to generate micropython code
@@ -24,7 +25,7 @@ class McuConfig:
     onewire: str
 
     # Used elsewere
-    micropython_perftest_args: list[str] | None = None
+    micropython_perftest_args: tuple[str, ...] | None = None
 
     def __post_init__(self) -> None:
         assert isinstance(self.trig1, str)
@@ -33,7 +34,7 @@ class McuConfig:
         assert isinstance(self.data2, str)
         assert isinstance(self.i2c, str)
         assert isinstance(self.onewire, str)
-        assert isinstance(self.micropython_perftest_args, list | None)
+        assert isinstance(self.micropython_perftest_args, tuple | None)
 
 
 DOC_TENTACLE_PYBV11 = """
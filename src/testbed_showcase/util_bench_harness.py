@@ -0,0 +1,395 @@
+"""
+Benchmark of the test harness without hardware.
+
+tests/conftest.py is copied into a temporary directory next to generated
+test functions. pytest then runs the real hooks and fixtures against a
+synthetic inventory of simulated tentacles, see 'util_simulation'.
+
+Measured per scale (tentacles x test functions):
+* sessionstart_s: 'pytest_sessionstart' till collection starts
+* collect_s: collection including parametrization and reordering
+* fixture_ms: setup plus teardown of one test, median
+* maxrss_mb: peak memory of the process
+
+Every scale runs in a subprocess: conftest.py keeps its state in globals.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import json
+import logging
+import pathlib
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+import types
+import typing
+
+import pytest
+
+logger = logging.getLogger(__file__)
+
+FILENAME_TESTS = "test_generated.py"
+DEFAULT_I2C_EVERY = 5
+DEFAULT_RUN_LIMIT = 200
+
+_PYTEST_INI = """\
+[pytest]
+markers =
+    required_futs: The FUTs required by the test
+"""
+
+_TEMPLATE_HEADER = """\
+import pytest
+
+from testbed_showcase.constants import EnumFut
+"""
+
+_TEMPLATE_MCU = """
+
+@pytest.mark.required_futs(EnumFut.FUT_MCU_ONLY)
+def test_mcu_{i}(mcu) -> None:
+    mcu.dut.mp_remote.exec_raw("print('hello')")
+"""
+
+_TEMPLATE_I2C = """
+
+@pytest.mark.required_futs(EnumFut.FUT_I2C)
+def test_i2c_{i}(mcu, device_potpourry, daq_saleae) -> None:
+    mcu.dut.mp_remote.exec_render("i2c.scan()")
+    mcu.dut.mp_remote.read_list("result")
+"""
+
+
+def generate_tests(test_functions: int, i2c_every: int = DEFAULT_I2C_EVERY) -> str:
+    """
+    Returns the source of 'test_functions' tests.
+    Every 'i2c_every' test requires a DEVICE_POTPOURRY and a DAQ_SALEAE,
+    the others only a MCU.
+    """
+    assert test_functions >= 1
+    assert i2c_every >= 1
+    parts = [_TEMPLATE_HEADER]
+    for i in range(test_functions):
+        template = _TEMPLATE_I2C if i % i2c_every == i2c_every - 1 else _TEMPLATE_MCU
+        parts.append(template.format(i=i))
+    return "".join(parts)
+
+
+def write_test_directory(
+    directory: pathlib.Path,
+    filename_conftest: pathlib.Path,
+    test_functions: int,
+    i2c_every: int = DEFAULT_I2C_EVERY,
+) -> None:
+    directory.mkdir(parents=True, exist_ok=True)
+    shutil.copyfile(filename_conftest, directory / "conftest.py")
+    (directory / "pytest.ini").write_text(_PYTEST_INI)
+    (directory / FILENAME_TESTS).write_text(
+        generate_tests(test_functions, i2c_every=i2c_every)
+    )
+
+
+def maxrss_mb() -> float:
+    """
+    Peak memory of this process. Linux reports kBytes.
+    """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+@dataclasses.dataclass(frozen=True)
+class BenchResult:
+    tentacles: int
+    test_functions: int
+    items: int
+    """
+    The collected tests
+    """
+    items_run: int
+    sessionstart_s: float
+    collect_s: float
+    fixture_ms: float
+    """
+    Setup plus teardown of one test, median
+    """
+    maxrss_mb: float
+
+    @property
+    def collect_us_per_item(self) -> float:
+        return 1e6 * self.collect_s / max(1, self.items)
+
+    @staticmethod
+    def header() -> str:
+        return (
+            f"{'tentacles':>9} {'tests':>6} {'items':>7} {'start':>7} {'collect':>8}"
+            f" {'us/item':>8} {'fixture':>8} {'rss':>7}"
+        )
+
+    @property
+    def text(self) -> str:
+        return (
+            f"{self.tentacles:>9} {self.test_functions:>6} {self.items:>7}"
+            f" {self.sessionstart_s:>6.2f}s {self.collect_s:>7.2f}s"
+            f" {self.collect_us_per_item:>8.0f} {self.fixture_ms:>6.1f}ms"
+            f" {self.maxrss_mb:>5.0f}MB"
+        )
+
+    @staticmethod
+    def write(filename: pathlib.Path, results: list[BenchResult]) -> None:
+        filename.write_text(
+            json.dumps([dataclasses.asdict(r) for r in results], indent=2)
+        )
+
+    @staticmethod
+    def read(filename: pathlib.Path) -> list[BenchResult]:
+        return [BenchResult(**r) for r in json.loads(filename.read_text())]
+
+
+@dataclasses.dataclass(frozen=True)
+class BenchLimits:
+    """
+    The regression gate. None: Not checked.
+    """
+
+    collect_us_per_item: float | None = None
+    fixture_ms: float | None = None
+    maxrss_mb: float | None = None
+    baseline: list[BenchResult] = dataclasses.field(default_factory=list)
+    tolerance: float = 1.5
+    """
+    A result may be 'tolerance' times slower than the baseline of the same scale.
+    """
+
+    def violations(self, results: list[BenchResult]) -> list[str]:
+        violations: list[str] = []
+
+        def check(result: BenchResult, name: str, limit: float | None) -> None:
+            value = getattr(result, name)
+            if (limit is not None) and (value > limit):
+                violations.append(
+                    f"tentacles={result.tentacles} tests={result.test_functions}:"
+                    f" {name}={value:0.2f} exceeds {limit:0.2f}"
+                )
+
+        baselines = {(b.tentacles, b.test_functions): b for b in self.baseline}
+        for result in results:
+            check(result, "collect_us_per_item", self.collect_us_per_item)
+            check(result, "fixture_ms", self.fixture_ms)
+            check(result, "maxrss_mb", self.maxrss_mb)
+            baseline = baselines.get((result.tentacles, result.test_functions))
+            if baseline is not None:
+                check(result, "collect_s", self.tolerance * baseline.collect_s)
+                check(result, "fixture_ms", self.tolerance * baseline.fixture_ms)
+        return violations
+
+
+class HarnessBenchPlugin:
+    """
+    A pytest plugin: Swaps in the simulation as soon as
+    conftest.py is registered and takes the measurements.
+    """
+
+    def __init__(self, directory: pathlib.Path, tentacles: int, run_limit: int) -> None:
+        assert isinstance(directory, pathlib.Path)
+        assert run_limit >= 1
+        self.directory = directory
+        self.tentacles = tentacles
+        self.run_limit = run_limit
+        self.monkeypatch = pytest.MonkeyPatch()
+        self.begin_sessionstart_s = 0.0
+        self.begin_collect_s = 0.0
+        self.end_collect_s = 0.0
+        self.items = 0
+        self.items_run = 0
+        self.durations_s: dict[str, float] = {}
+        """
+        nodeid -> setup plus teardown
+        """
+
+    def pytest_plugin_registered(self, plugin: object) -> None:
+        if isinstance(plugin, types.ModuleType) and hasattr(
+            plugin, "CtxTestrunShowcase"
+        ):
+            self.simulate(conftest=plugin)
+
+    def simulate(self, conftest: types.ModuleType) -> None:
+        # pylint: disable=import-outside-toplevel
+        from octoprobe.octoprobe import CtxTestRun
+        from octoprobe.util_pytest import util_logging
+
+        from testbed_showcase import util_simulation
+        from testbed_showcase.util_firmware_mpbuild import FirmwareBuilder
+        from testbed_showcase.util_testbed import Testbed
+
+        directory_results = self.directory / "results"
+        tentacles = util_simulation.simulated_tentacles(count=self.tentacles)
+
+        def get_testbed(
+            directory_testresults: pathlib.Path = directory_results,
+            **kwargs: typing.Any,
+        ) -> Testbed:
+            directory_testresults.mkdir(parents=True, exist_ok=True)
+            return Testbed(
+                workspace="simulated",
+                tentacles=list(tentacles),
+                logs=util_logging.Logs(directory_testresults),
+            )
+
+        mp = self.monkeypatch
+        mp.setattr(conftest, "get_testbed", get_testbed)
+        # Not the usb topology snapshot of a real testbed
+        mp.setattr(conftest, "tentacles_offline", list)
+        mp.setattr(conftest, "UdevPoller", util_simulation.SimulatedUdevPoller)
+        mp.setattr(conftest, "DIRECTORY_TESTRESULTS_DEFAULT", directory_results)
+        mp.setattr(conftest, "FILENAME_TESTBED_LOCK", self.directory / "testbed.lock")
+        for name in ("setup", "prebuild", "build_firmware", "shutdown"):
+            mp.setattr(FirmwareBuilder, name, util_simulation.noop)
+        for name, method in util_simulation.CTXTESTRUN_SIMULATED.items():
+            mp.setattr(CtxTestRun, name, method)
+
+    @pytest.hookimpl(tryfirst=True)
+    def pytest_sessionstart(self) -> None:
+        self.begin_sessionstart_s = time.monotonic()
+
+    @pytest.hookimpl(tryfirst=True)
+    def pytest_collection(self) -> None:
+        self.begin_collect_s = time.monotonic()
+
+    @pytest.hookimpl(trylast=True)
+    def pytest_collection_modifyitems(
+        self, config: pytest.Config, items: list[pytest.Item]
+    ) -> None:
+        """
+        Collection covers all items, the fixtures are measured on the first 'run_limit'.
+        """
+        self.items = len(items)
+        deselected = items[self.run_limit :]
+        if len(deselected) > 0:
+            config.hook.pytest_deselected(items=deselected)
+            del items[self.run_limit :]
+        self.items_run = len(items)
+
+    def pytest_collection_finish(self) -> None:
+        self.end_collect_s = time.monotonic()
+
+    def pytest_runtest_logreport(self, report: pytest.TestReport) -> None:
+        if report.when in ("setup", "teardown"):
+            self.durations_s[report.nodeid] = (
+                self.durations_s.get(report.nodeid, 0.0) + report.duration
+            )
+
+    def pytest_unconfigure(self) -> None:
+        self.monkeypatch.undo()
+
+    def result(self, test_functions: int) -> BenchResult:
+        durations_s = list(self.durations_s.values())
+        # The first test includes the session scoped fixtures
+        durations_s = durations_s[1:] or durations_s
+        return BenchResult(
+            tentacles=self.tentacles,
+            test_functions=test_functions,
+            items=self.items,
+            items_run=self.items_run,
+            sessionstart_s=self.begin_collect_s - self.begin_sessionstart_s,
+            collect_s=self.end_collect_s - self.begin_collect_s,
+            fixture_ms=1000 * statistics.median(durations_s) if durations_s else 0.0,
+            maxrss_mb=maxrss_mb(),
+        )
+
+
+def run_single(
+    directory: pathlib.Path,
+    filename_conftest: pathlib.Path,
+    tentacles: int,
+    test_functions: int,
+    run_limit: int = DEFAULT_RUN_LIMIT,
+) -> BenchResult:
+    """
+    Runs pytest in this process.
+    """
+    write_test_directory(
+        directory=directory,
+        filename_conftest=filename_conftest,
+        test_functions=test_functions,
+    )
+    plugin = HarnessBenchPlugin(
+        directory=directory, tentacles=tentacles, run_limit=run_limit
+    )
+    exit_code = pytest.main(
+        [
+            str(directory),
+            "-q",
+            "-p",
+            "no:cacheprovider",
+            f"--rootdir={directory}",
+            "-c",
+            str(directory / "pytest.ini"),
+            "--firmware=MOCK",
+        ],
+        plugins=[plugin],
+    )
+    if exit_code != pytest.ExitCode.OK:
+        raise ValueError(f"pytest failed with exit code {exit_code!r}")
+    return plugin.result(test_functions=test_functions)
+
+
+def run_simulated(
+    directory: pathlib.Path, tentacles: int, pytest_args: list[str]
+) -> int:
+    """
+    Runs pytest with 'pytest_args' on 'tentacles' simulated tentacles.
+    For example a shard worker, see 'util_shard'. Returns the exit code.
+    """
+    plugin = HarnessBenchPlugin(
+        directory=directory, tentacles=tentacles, run_limit=sys.maxsize
+    )
+    return int(pytest.main(pytest_args, plugins=[plugin]))
+
+
+def run_scales(
+    directory: pathlib.Path,
+    scales: list[tuple[int, int]],
+    run_limit: int = DEFAULT_RUN_LIMIT,
+) -> list[BenchResult]:
+    """
+    Runs every (tentacles, test_functions) in a subprocess.
+    """
+    results: list[BenchResult] = []
+    for tentacles, test_functions in scales:
+        directory_scale = directory / f"tentacles_{tentacles}_tests_{test_functions}"
+        directory_scale.mkdir(parents=True, exist_ok=True)
+        filename_result = directory_scale / "result.json"
+        args = [
+            sys.executable,
+            "-m",
+            "testbed_showcase.cli_bench_harness",
+            "--single",
+            str(filename_result),
+            "--directory",
+            str(directory_scale),
+            "--tentacles",
+            str(tentacles),
+            "--tests",
+            str(test_functions),
+            "--run-limit",
+            str(run_limit),
+        ]
+        proc = subprocess.run(
+            args,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            check=False,
+        )
+        if proc.returncode != 0:
+            raise ValueError(
+                f"tentacles={tentacles} tests={test_functions}: Failed with returncode {proc.returncode}:\n{proc.stdout}"
+            )
+        (result,) = BenchResult.read(filename_result)
+        logger.info(result.text)
+        results.append(result)
+    return results
@@ -0,0 +1,74 @@
+"""
+Run the per-tentacle setup steps concurrently.
+
+The steps of one tentacle (load base code, build, prepare dut, setup infra, flash)
+still run in sequence. But the tentacles do not wait for each other.
+"""
+
+from __future__ import annotations
+
+import concurrent.futures
+import dataclasses
+import logging
+from collections.abc import Callable, Sequence
+
+logger = logging.getLogger(__file__)
+
+
+@dataclasses.dataclass(frozen=True)
+class TentacleSetupError:
+    label: str
+    exception: BaseException
+
+
+class SetupTentaclesException(Exception):
+    """
+    Raised if the setup of one or more tentacles failed.
+    All failures are collected: A failing tentacle does not hide
+    the failure of another tentacle.
+    """
+
+    def __init__(self, errors: list[TentacleSetupError]) -> None:
+        assert len(errors) > 0
+        self.errors = errors
+        lines = [f"Setup failed for {len(errors)} tentacle(s):"]
+        lines.extend(f"  {e.label}: {e.exception!r}" for e in errors)
+        super().__init__("\n".join(lines))
+
+
+def setup_concurrent[T](
+    tentacles: Sequence[T],
+    setup_tentacle: Callable[[T], None],
+    label: Callable[[T], str],
+    max_workers: int | None = None,
+) -> None:
+    """
+    Calls 'setup_tentacle(tentacle)' for every tentacle on a thread pool
+    and waits till all of them are done.
+
+    Raises SetupTentaclesException listing every tentacle which failed.
+    """
+    if len(tentacles) == 0:
+        return
+    if max_workers is None:
+        max_workers = len(tentacles)
+    assert max_workers > 0
+
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=max_workers,
+        thread_name_prefix="setup_tentacle",
+    ) as executor:
+        futures = {executor.submit(setup_tentacle, t): t for t in tentacles}
+        # Report in the order of 'tentacles', not in the order of completion
+        concurrent.futures.wait(futures)
+
+    errors: list[TentacleSetupError] = []
+    for future, tentacle in futures.items():
+        exception = future.exception()
+        if exception is None:
+            continue
+        logger.error(f"Setup of {label(tentacle)} failed: {exception!r}")
+        errors.append(TentacleSetupError(label=label(tentacle), exception=exception))
+
+    if len(errors) > 0:
+        raise SetupTentaclesException(errors=errors)
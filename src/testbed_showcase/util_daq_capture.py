@@ -0,0 +1,571 @@
+"""
+Capture the logic analyser of the DAQ tentacle.
+
+The samples are streamed into a ring buffer: A file mapped into memory.
+One byte per sample, bit n is channel Dn. This is the format of
+'sigrok-cli --output-format binary'.
+
+The capture is armed on an edge of 'trig1': The ring keeps the
+samples before the edge, the capture stops 'post_samples' after the
+edge. Only this window is written to the test results.
+
+Multi-second captures at 24 MHz are hundreds of MBytes: They are never
+copied into python lists, only into the mapped file.
+
+Sources:
+* 'SigrokSource': The logic analyser using sigrok-cli.
+* 'ReplaySource': A recorded sample file, for tests without hardware.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import dataclasses
+import functools
+import io
+import logging
+import mmap
+import pathlib
+import shutil
+import subprocess
+import threading
+import typing
+from collections.abc import Iterator
+
+logger = logging.getLogger(__file__)
+
+DAQ_SAMPLERATE_HZ = 24_000_000
+"""
+Noname Saleae Logic clone, see tentacle_specs.DAQ_SALEAE
+"""
+
+# The McuConfig pins as wired to the logic analyser
+DAQ_CHANNEL_TRIG1 = 0
+DAQ_CHANNEL_TRIG2 = 1
+DAQ_CHANNEL_DATA1 = 2
+DAQ_CHANNEL_DATA2 = 3
+DAQ_CHANNELS = 8
+
+CHUNK_SIZE = 1 << 16
+RING_CAPACITY_DEFAULT = 1 << 27
+"""
+128 MBytes: 5.6s at 24 MHz
+"""
+
+FILENAME_RING = "daq_ring.bin"
+ARM_TIMEOUT_S = 5.0
+"""
+sigrok-cli takes a while to open the analyser
+"""
+STOP_TIMEOUT_S = 2.0
+
+
+class SampleSource(typing.Protocol):
+    samplerate_hz: int
+
+    def read(self, size: int) -> bytes:
+        """
+        Returns up to 'size' samples. b'' at the end of the capture.
+        """
+        ...
+
+    def abort(self) -> None:
+        """
+        Called by another thread: A blocked 'read()' returns.
+        """
+        ...
+
+    def close(self) -> None: ...
+
+
+class ReplaySource:
+    """
+    Replays a recorded sample file, for example captured by
+    'sigrok-cli --driver fx2lafw --output-format binary'.
+    """
+
+    def __init__(
+        self, filename: pathlib.Path, samplerate_hz: int = DAQ_SAMPLERATE_HZ
+    ) -> None:
+        assert isinstance(filename, pathlib.Path)
+        self.samplerate_hz = samplerate_hz
+        self._f: typing.BinaryIO | None = filename.open("rb")
+
+    def read(self, size: int) -> bytes:
+        if self._f is None:
+            return b""
+        return self._f.read(size)
+
+    def abort(self) -> None:
+        """
+        A file read never blocks.
+        """
+
+    def close(self) -> None:
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+
+
+class SigrokSource:
+    """
+    Streams from the logic analyser using sigrok-cli.
+    """
+
+    def __init__(
+        self,
+        driver: str = "fx2lafw",
+        samplerate_hz: int = DAQ_SAMPLERATE_HZ,
+        sigrok_cli: str = "sigrok-cli",
+    ) -> None:
+        """
+        'driver': For example 'fx2lafw:conn=1.24' to select one of several analysers.
+        """
+        filename = shutil.which(sigrok_cli)
+        if filename is None:
+            raise ValueError(f"'{sigrok_cli}' not found: apt install sigrok-cli")
+        self.samplerate_hz = samplerate_hz
+        args = [
+            filename,
+            "--driver",
+            driver,
+            "--config",
+            f"samplerate={samplerate_hz}",
+            "--continuous",
+            "--output-format",
+            "binary",
+        ]
+        logger.info(f"DAQ: {' '.join(args)}")
+        self._proc = subprocess.Popen(
+            args, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+        )
+        self._stdout = typing.cast(io.BufferedReader, self._proc.stdout)
+
+    def read(self, size: int) -> bytes:
+        return self._stdout.read1(size)
+
+    def abort(self) -> None:
+        """
+        A silent sigrok-cli is terminated: 'read()' returns b''.
+        """
+        if self._proc.poll() is None:
+            self._proc.terminate()
+
+    def close(self) -> None:
+        if self._proc.poll() is None:
+            self._proc.terminate()
+        try:
+            self._proc.wait(timeout=5.0)
+        except subprocess.TimeoutExpired:
+            self._proc.kill()
+            self._proc.wait()
+        self._stdout.close()
+
+
+class SampleRing:
+    """
+    Ring buffer of samples in a file mapped into memory.
+    The samples are addressed by their absolute index since the start.
+    """
+
+    def __init__(self, filename: pathlib.Path, capacity: int) -> None:
+        assert isinstance(filename, pathlib.Path)
+        assert capacity > 0
+        self.filename = filename
+        self.capacity = capacity
+        self.written = 0
+        """
+        Number of samples written since the start
+        """
+        filename.parent.mkdir(parents=True, exist_ok=True)
+        with filename.open("wb") as f:
+            f.truncate(capacity)
+        self._f = filename.open("r+b")
+        self._mmap = mmap.mmap(self._f.fileno(), capacity)
+
+    @property
+    def oldest(self) -> int:
+        """
+        Index of the oldest sample still in the ring.
+        """
+        return max(0, self.written - self.capacity)
+
+    def write(self, data: bytes) -> None:
+        view = memoryview(data)
+        if len(view) > self.capacity:
+            # Only the last samples fit
+            self.written += len(view) - self.capacity
+            view = view[-self.capacity :]
+        position = self.written % self.capacity
+        first = min(len(view), self.capacity - position)
+        self._mmap[position : position + first] = view[:first]
+        self._mmap[0 : len(view) - first] = view[first:]
+        self.written += len(view)
+
+    def read(self, start: int, stop: int) -> bytes:
+        """
+        Returns the samples [start, stop).
+        """
+        if not (self.oldest <= start <= stop <= self.written):
+            raise ValueError(
+                f"Samples [{start}, {stop}) not in ring [{self.oldest}, {self.written})"
+            )
+        begin = start % self.capacity
+        end = begin + (stop - start)
+        if end <= self.capacity:
+            return self._mmap[begin:end]
+        return self._mmap[begin:] + self._mmap[: end - self.capacity]
+
+    def write_to(
+        self,
+        filename: pathlib.Path,
+        start: int,
+        stop: int,
+        chunk_size: int = CHUNK_SIZE,
+    ) -> None:
+        """
+        Writes the samples [start, stop) to 'filename', chunk by chunk.
+        """
+        with filename.open("wb") as f:
+            for chunk in self.chunks(start=start, stop=stop, chunk_size=chunk_size):
+                f.write(chunk)
+
+    def chunks(
+        self, start: int, stop: int, chunk_size: int = CHUNK_SIZE
+    ) -> Iterator[bytes]:
+        """
+        The samples [start, stop), chunk by chunk.
+        """
+        for position in range(start, stop, chunk_size):
+            yield self.read(position, min(stop, position + chunk_size))
+
+    def close(self, unlink: bool = True) -> None:
+        self._mmap.close()
+        self._f.close()
+        if unlink:
+            self.filename.unlink(missing_ok=True)
+
+
+@functools.cache
+def _levels_table(channel: int) -> bytes:
+    assert 0 <= channel < DAQ_CHANNELS
+    return bytes((sample >> channel) & 1 for sample in range(256))
+
+
+def find_edge(
+    data: bytes, channel: int, rising: bool = True, previous: int | None = None
+) -> int | None:
+    """
+    Returns the index of the first sample after the edge on 'channel'.
+    'previous': The sample before 'data' to find an edge at the chunk boundary.
+    """
+    levels = data.translate(_levels_table(channel))
+    pattern = b"\x00\x01" if rising else b"\x01\x00"
+    if (previous is not None) and (len(levels) > 0):
+        if bytes([(previous >> channel) & 1, levels[0]]) == pattern:
+            return 0
+    index = levels.find(pattern)
+    if index < 0:
+        return None
+    return index + 1
+
+
+@dataclasses.dataclass(frozen=True)
+class Trigger:
+    channel: int = DAQ_CHANNEL_TRIG1
+    rising: bool = True
+    pre_samples: int = DAQ_SAMPLERATE_HZ // 100
+    """
+    Samples kept before the edge: 10ms
+    """
+    post_samples: int = DAQ_SAMPLERATE_HZ // 10
+    """
+    Samples captured after the edge: 100ms
+    """
+
+
+@dataclasses.dataclass(frozen=True)
+class CaptureResult:
+    samplerate_hz: int
+    trigger_sample: int | None
+    """
+    None: The trigger edge has not been seen
+    """
+    start: int
+    stop: int
+    """
+    The window [start, stop) in samples since the start of the capture
+    """
+    filename: pathlib.Path | None = None
+
+    @property
+    def samples(self) -> int:
+        return self.stop - self.start
+
+    @property
+    def text(self) -> str:
+        duration_ms = 1000.0 * self.samples / self.samplerate_hz
+        if self.trigger_sample is None:
+            return f"DAQ: not triggered, {duration_ms:0.1f}ms captured"
+        return f"DAQ: triggered at sample {self.trigger_sample}, {duration_ms:0.1f}ms captured"
+
+
+class Capture:
+    """
+    Streams 'source' into 'ring' until 'trigger.post_samples' after the trigger edge.
+    """
+
+    def __init__(
+        self,
+        source: SampleSource,
+        ring: SampleRing,
+        trigger: Trigger,
+        chunk_size: int = CHUNK_SIZE,
+    ) -> None:
+        if trigger.pre_samples + trigger.post_samples > ring.capacity:
+            raise ValueError(
+                f"The ring holds {ring.capacity} samples, but the trigger window is {trigger.pre_samples + trigger.post_samples}"
+            )
+        self.source = source
+        self.ring = ring
+        self.trigger = trigger
+        self.chunk_size = chunk_size
+        self.trigger_sample: int | None = None
+        self._stop = threading.Event()
+        self._armed = threading.Event()
+        """
+        Set after the first chunk is in the ring
+        """
+        self._thread: threading.Thread | None = None
+        self._exception: BaseException | None = None
+
+    def _done(self) -> bool:
+        if self.trigger_sample is None:
+            return False
+        return self.ring.written >= self.trigger_sample + self.trigger.post_samples
+
+    def run(self) -> CaptureResult:
+        """
+        Captures until the window after the trigger is complete,
+        the source ends or 'stop()' is called.
+        """
+        previous: int | None = None
+        try:
+            while not self._stop.is_set() and not self._done():
+                size = self.chunk_size
+                if self.trigger_sample is not None:
+                    size = min(
+                        size,
+                        self.trigger_sample
+                        + self.trigger.post_samples
+                        - self.ring.written,
+                    )
+                data = self.source.read(size)
+                if len(data) == 0:
+                    break
+                if self.trigger_sample is None:
+                    index = find_edge(
+                        data,
+                        channel=self.trigger.channel,
+                        rising=self.trigger.rising,
+                        previous=previous,
+                    )
+                    if index is not None:
+                        self.trigger_sample = self.ring.written + index
+                        # Do not overwrite the samples before the trigger
+                        data = data[: index + self.trigger.post_samples]
+                    previous = data[-1]
+                self.ring.write(data)
+                self._armed.set()
+        finally:
+            # Only this thread reads the source: Closing it here never
+            # races with a blocked 'read()'
+            self.source.close()
+            self._armed.set()
+        return self.result()
+
+    def result(self) -> CaptureResult:
+        if self.trigger_sample is None:
+            start, stop = self.ring.oldest, self.ring.written
+        else:
+            start = max(
+                self.ring.oldest, self.trigger_sample - self.trigger.pre_samples
+            )
+            stop = min(
+                self.ring.written, self.trigger_sample + self.trigger.post_samples
+            )
+        return CaptureResult(
+            samplerate_hz=self.source.samplerate_hz,
+            trigger_sample=self.trigger_sample,
+            start=start,
+            stop=stop,
+        )
+
+    def start(self, timeout_s: float = ARM_TIMEOUT_S) -> None:
+        """
+        Captures in a background thread.
+        Returns when the first samples are captured: The test may now drive 'trig1'.
+        """
+        assert self._thread is None
+
+        def run() -> None:
+            try:
+                self.run()
+            except BaseException as e:
+                self._exception = e
+
+        self._thread = threading.Thread(target=run, name="daq_capture", daemon=True)
+        self._thread.start()
+        if not self._armed.wait(timeout=timeout_s):
+            # Unblock the capture thread: It closes the source
+            self._stop.set()
+            self.source.abort()
+            self._thread.join(timeout=STOP_TIMEOUT_S)
+            raise TimeoutError(f"DAQ: No samples within {timeout_s:0.1f}s")
+        if self._exception is not None:
+            raise self._exception
+
+    @property
+    def running(self) -> bool:
+        """
+        The capture thread may still write to the ring.
+        """
+        return (self._thread is not None) and self._thread.is_alive()
+
+    def stop(self, timeout_s: float = STOP_TIMEOUT_S) -> CaptureResult:
+        """
+        Waits until the window after the trigger is captured, at most 'timeout_s'.
+        Then the source is aborted: The capture thread stops and closes the source.
+        """
+        assert self._thread is not None
+        self._thread.join(timeout=timeout_s)
+        self._stop.set()
+        self.source.abort()
+        self._thread.join(timeout=timeout_s)
+        if self._thread.is_alive():
+            raise TimeoutError(
+                f"DAQ: The capture did not stop within {timeout_s:0.1f}s"
+            )
+        if self._exception is not None:
+            raise self._exception
+        return self.result()
+
+
+class DaqCapture:
+    """
+    Used by the tests via the fixture 'daq_capture'.
+    'source_factory' None: No capture, 'capture()' yields None.
+    'edges': Write the window as 'util_daq_edges.EdgeList', not as dense samples.
+    'retain_samples': Only with 'edges'. Keeps the edges within 'retain_samples'
+      around the edges of trig1 and trig2, see 'util_daq_edges.trigger_windows()'.
+      None: Keeps all edges.
+    """
+
+    def __init__(
+        self,
+        source_factory: typing.Callable[[], SampleSource] | None,
+        directory: pathlib.Path,
+        capacity: int = RING_CAPACITY_DEFAULT,
+        edges: bool = False,
+        retain_samples: int | None = None,
+        arm_timeout_s: float = ARM_TIMEOUT_S,
+    ) -> None:
+        assert isinstance(directory, pathlib.Path)
+        assert isinstance(edges, bool)
+        assert (retain_samples is None) or (edges and retain_samples > 0)
+        self.source_factory = source_factory
+        self.directory = directory
+        self.capacity = capacity
+        self.edges = edges
+        self.retain_samples = retain_samples
+        self.arm_timeout_s = arm_timeout_s
+        self.results: list[CaptureResult] = []
+
+    @contextlib.contextmanager
+    def capture(
+        self, name: str, trigger: Trigger | None = None
+    ) -> Iterator[Capture | None]:
+        """
+        Usage:
+          with daq_capture.capture("i2c") as capture:
+              ... drive trig1 ...
+          The window is written to '<directory>/daq_i2c.bin' ('.npz' for edges)
+        """
+        if self.source_factory is None:
+            yield None
+            return
+        trigger = Trigger() if trigger is None else trigger
+        ring = SampleRing(
+            filename=self.directory / FILENAME_RING,
+            capacity=max(self.capacity, trigger.pre_samples + trigger.post_samples),
+        )
+        capture = Capture(source=self.source_factory(), ring=ring, trigger=trigger)
+        try:
+            capture.start(timeout_s=self.arm_timeout_s)
+        except BaseException:
+            # Nothing captured: No window to write
+            if not capture.running:
+                ring.close()
+            raise
+        try:
+            yield capture
+        finally:
+            try:
+                result = capture.stop()
+                if self.edges and (result.samples > 0):
+                    # numpy is optional: pip install testbed_showcase[daq]
+                    from testbed_showcase.util_daq_edges import (  # pylint: disable=import-outside-toplevel
+                        EdgeList,
+                        SUFFIX_EDGES,
+                        trigger_windows,
+                    )
+
+                    filename = self.directory / f"daq_{name}{SUFFIX_EDGES}"
+                    edge_list = EdgeList.from_chunks(
+                        ring.chunks(start=result.start, stop=result.stop),
+                        samplerate_hz=result.samplerate_hz,
+                        start=result.start,
+                    )
+                    if self.retain_samples is not None:
+                        windows = trigger_windows(
+                            edge_list,
+                            pre_samples=self.retain_samples,
+                            post_samples=self.retain_samples,
+                        )
+                        if len(windows) > 0:
+                            edge_list = edge_list.retain(windows)
+                        else:
+                            logger.warning(f"{name}: No trigger edges, all retained")
+                    edge_list.write(filename)
+                else:
+                    filename = self.directory / f"daq_{name}.bin"
+                    ring.write_to(filename, start=result.start, stop=result.stop)
+            finally:
+                # A capture thread which did not stop may still write
+                if not capture.running:
+                    ring.close()
+            result = dataclasses.replace(result, filename=filename)
+            logger.info(f"{result.text}: {filename}")
+            self.results.append(result)
+
+
+def daq_source_factory(
+    spec: str | None,
+) -> typing.Callable[[], SampleSource] | None:
+    """
+    None: No capture
+    'sigrok': The first logic analyser found by sigrok-cli
+    'sigrok:fx2lafw:conn=1.24': A sigrok driver specification
+    Else: A sample file to replay
+    """
+    if spec is None:
+        return None
+    if spec == "sigrok":
+        return SigrokSource
+    if spec.startswith("sigrok:"):
+        driver = spec.removeprefix("sigrok:")
+        return lambda: SigrokSource(driver=driver)
+    filename = pathlib.Path(spec).expanduser().resolve()
+    if not filename.is_file():
+        raise ValueError(f"'{spec}': Expected 'sigrok' or a sample file to replay")
+    return lambda: ReplaySource(filename=filename)
@@ -0,0 +1,334 @@
+"""
+Protocol decoders for the captures of the DAQ tentacle, see 'util_daq_capture'.
+
+The samples are a numpy array, one byte per sample, bit n is channel Dn.
+The decoders never loop over samples in python: They find the edges
+vectorized and then work on the edges, which are orders of magnitude
+fewer. See 'util_daq_synth' for a plain python reference decoder.
+
+Requires numpy: pip install testbed_showcase[daq]
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import logging
+import pathlib
+import typing
+
+try:
+    import numpy as np
+    import numpy.typing as npt
+except ImportError as e:
+    raise ImportError(
+        "The DAQ decoders require 'numpy': pip install testbed_showcase[daq]"
+    ) from e
+
+from testbed_showcase.util_daq_capture import (
+    CaptureResult,
+    DAQ_CHANNEL_DATA1,
+    DAQ_CHANNEL_DATA2,
+    DAQ_CHANNEL_TRIG1,
+    DAQ_CHANNEL_TRIG2,
+)
+from testbed_showcase.util_daq_edges import EdgeList, SUFFIX_EDGES
+
+if typing.TYPE_CHECKING:
+    from testbed_showcase.tentacle_specs import McuConfig
+
+logger = logging.getLogger(__file__)
+
+Samples = npt.NDArray[np.uint8]
+Levels = npt.NDArray[np.bool_]
+Indices = npt.NDArray[np.intp]
+
+ONEWIRE_RESET_MIN_US = 400.0
+ONEWIRE_SLOT_MAX_US = 120.0
+ONEWIRE_ONE_MAX_US = 15.0
+ONEWIRE_PRESENCE_WAIT_MAX_US = 80.0
+
+
+def load_samples(filename: pathlib.Path) -> Samples:
+    """
+    Maps the sample file into memory: No copy.
+    """
+    if filename.stat().st_size == 0:
+        return np.zeros(0, dtype=np.uint8)
+    return np.memmap(filename, dtype=np.uint8, mode="r")
+
+
+def levels(samples: Samples, channel: int) -> Levels:
+    return ((samples >> channel) & 1).astype(np.bool_)
+
+
+def edges(_levels: Levels) -> tuple[Indices, Indices]:
+    """
+    Returns (rising, falling): The index of the first sample after the edge.
+    """
+    diff = np.diff(_levels.view(np.int8))
+    return np.flatnonzero(diff == 1) + 1, np.flatnonzero(diff == -1) + 1
+
+
+def daq_channel(mcu_config: McuConfig, pin: str) -> int:
+    """
+    The DAQ channel connected to 'pin' of the DUT.
+    """
+    for channel, _pin in (
+        (DAQ_CHANNEL_TRIG1, mcu_config.trig1),
+        (DAQ_CHANNEL_TRIG2, mcu_config.trig2),
+        (DAQ_CHANNEL_DATA1, mcu_config.data1),
+        (DAQ_CHANNEL_DATA2, mcu_config.data2),
+    ):
+        if _pin == pin:
+            return channel
+    raise ValueError(f"Pin '{pin}' is not connected to the DAQ")
+
+
+def i2c_channels(mcu_config: McuConfig) -> tuple[int, int]:
+    """
+    (scl, sda): data1 and data2, see 'McuConfig.i2c'.
+    """
+    return (
+        daq_channel(mcu_config, mcu_config.data1),
+        daq_channel(mcu_config, mcu_config.data2),
+    )
+
+
+def onewire_channel(mcu_config: McuConfig) -> int:
+    """
+    The relays route the 1-Wire bus to data1 if the DUT uses another pin.
+    """
+    try:
+        return daq_channel(mcu_config, mcu_config.onewire)
+    except ValueError:
+        return daq_channel(mcu_config, mcu_config.data1)
+
+
+@dataclasses.dataclass(frozen=True)
+class I2cTransfer:
+    start_sample: int
+    address: int
+    read: bool
+    data: bytes
+    acks: tuple[bool, ...]
+    """
+    For the address and every data byte: True if acknowledged
+    """
+
+    @property
+    def text(self) -> str:
+        direction = "read" if self.read else "write"
+        return f"I2C 0x{self.address:02x} {direction} {self.data!r}"
+
+
+def decode_i2c(samples: Samples, scl: int, sda: int) -> list[I2cTransfer]:
+    """
+    A transfer starts with a START or repeated START condition.
+    Incomplete bytes at the end of a transfer are dropped.
+    """
+    scl_levels = levels(samples, scl)
+    sda_levels = levels(samples, sda)
+    sda_rising, sda_falling = edges(sda_levels)
+    # START: SDA falls while SCL is high. STOP: SDA rises while SCL is high.
+    starts = sda_falling[scl_levels[sda_falling]]
+    stops = sda_rising[scl_levels[sda_rising]]
+    scl_rising, _ = edges(scl_levels)
+    bits = sda_levels[scl_rising]
+
+    conditions = np.sort(np.concatenate([starts, stops, [len(samples)]]))
+    ends = conditions[np.searchsorted(conditions, starts, side="right")]
+    first = np.searchsorted(scl_rising, starts)
+    last = np.searchsorted(scl_rising, ends)
+
+    transfers: list[I2cTransfer] = []
+    for start, a, b in zip(starts.tolist(), first.tolist(), last.tolist(), strict=True):
+        count = (b - a) // 9
+        if count == 0:
+            continue
+        frames = bits[a : a + 9 * count].reshape(count, 9)
+        values = np.packbits(frames[:, :8], axis=1)[:, 0]
+        transfers.append(
+            I2cTransfer(
+                start_sample=start,
+                address=int(values[0]) >> 1,
+                read=bool(values[0] & 1),
+                data=values[1:].tobytes(),
+                acks=tuple((~frames[:, 8]).tolist()),
+            )
+        )
+    return transfers
+
+
+def scl_frequency_hz(samples: Samples, scl: int, samplerate_hz: int) -> float | None:
+    """
+    The median of the SCL periods: The pauses between the bytes are ignored.
+    """
+    scl_rising, _ = edges(levels(samples, scl))
+    if len(scl_rising) < 2:
+        return None
+    return samplerate_hz / float(np.median(np.diff(scl_rising)))
+
+
+@dataclasses.dataclass(frozen=True)
+class UartByte:
+    sample: int
+    value: int
+    framing_error: bool
+
+
+def decode_uart(
+    samples: Samples, channel: int, baudrate: int, samplerate_hz: int
+) -> list[UartByte]:
+    """
+    8N1, idle high. All frames starting at a falling edge are sampled
+    vectorized, then the overlapping frames are skipped.
+    """
+    _levels = levels(samples, channel)
+    _, falling = edges(_levels)
+    samples_per_bit = samplerate_hz / baudrate
+    # The centers of the start, 8 data and the stop bit
+    offsets = ((np.arange(10) + 0.5) * samples_per_bit).astype(np.intp)
+    candidates = falling[falling + offsets[-1] < len(_levels)]
+    if len(candidates) == 0:
+        return []
+    bits = _levels[candidates[:, None] + offsets[None, :]]
+
+    selected: list[int] = []
+    i = 0
+    while i < len(candidates):
+        selected.append(i)
+        # The next frame starts after the center of the stop bit
+        i = int(np.searchsorted(candidates, candidates[i] + offsets[-1], side="right"))
+    frames = bits[selected]
+    values = np.packbits(frames[:, 1:9], axis=1, bitorder="little")[:, 0]
+    framing_errors = frames[:, 0] | ~frames[:, 9]
+    return [
+        UartByte(sample=s, value=v, framing_error=e)
+        for s, v, e in zip(
+            candidates[selected].tolist(),
+            values.tolist(),
+            framing_errors.tolist(),
+            strict=True,
+        )
+    ]
+
+
+@dataclasses.dataclass(frozen=True)
+class OneWireTransfer:
+    reset_sample: int
+    presence: bool
+    data: bytes
+    """
+    The bits written and read after the reset, LSB first.
+    Incomplete bytes at the end are dropped.
+    """
+
+
+def _low_pulses(_levels: Levels) -> tuple[Indices, Indices]:
+    """
+    Returns (falling, durations) of all complete low pulses.
+    """
+    rising, falling = edges(_levels)
+    index = np.searchsorted(rising, falling)
+    complete = index < len(rising)
+    falling = falling[complete]
+    return falling, rising[index[complete]] - falling
+
+
+def decode_onewire(
+    samples: Samples, channel: int, samplerate_hz: int
+) -> list[OneWireTransfer]:
+    falling, durations = _low_pulses(levels(samples, channel))
+    low_us = durations * (1e6 / samplerate_hz)
+    resets = np.flatnonzero(low_us >= ONEWIRE_RESET_MIN_US)
+
+    transfers: list[OneWireTransfer] = []
+    bounds = np.append(resets, len(falling))
+    for reset, end in zip(resets.tolist(), bounds[1:].tolist(), strict=True):
+        first = reset + 1
+        presence = False
+        if first < end:
+            released = falling[reset] + durations[reset]
+            wait_us = (falling[first] - released) * (1e6 / samplerate_hz)
+            if wait_us <= ONEWIRE_PRESENCE_WAIT_MAX_US:
+                presence = True
+                first += 1
+        slots = low_us[first:end]
+        slots = slots[slots < ONEWIRE_SLOT_MAX_US]
+        bits = slots < ONEWIRE_ONE_MAX_US
+        count = len(bits) // 8
+        transfers.append(
+            OneWireTransfer(
+                reset_sample=int(falling[reset]),
+                presence=presence,
+                data=np.packbits(bits[: 8 * count], bitorder="little").tobytes(),
+            )
+        )
+    return transfers
+
+
+@dataclasses.dataclass(frozen=True)
+class PwmMeasurement:
+    frequency_hz: float
+    duty: float
+    """
+    0.0 .. 1.0
+    """
+    periods: int
+
+
+def measure_pwm(
+    samples: Samples, channel: int, samplerate_hz: int
+) -> PwmMeasurement | None:
+    """
+    None if less than one complete period was captured.
+    """
+    rising, falling = edges(levels(samples, channel))
+    if len(rising) < 2:
+        return None
+    periods = np.diff(rising)
+    index = np.searchsorted(falling, rising[:-1])
+    complete = index < len(falling)
+    high = falling[index[complete]] - rising[:-1][complete]
+    return PwmMeasurement(
+        frequency_hz=samplerate_hz / float(np.mean(periods)),
+        duty=float(np.mean(high)) / float(np.mean(periods)),
+        periods=len(periods),
+    )
+
+
+def capture_samples(result: CaptureResult) -> Samples:
+    """
+    The samples of the window, also if written as edges.
+    """
+    assert result.filename is not None
+    if result.filename.suffix == SUFFIX_EDGES:
+        return EdgeList.read(result.filename).to_dense()
+    return load_samples(result.filename)
+
+
+def decode_i2c_capture(
+    result: CaptureResult, mcu_config: McuConfig
+) -> list[I2cTransfer]:
+    scl, sda = i2c_channels(mcu_config)
+    return decode_i2c(capture_samples(result), scl=scl, sda=sda)
+
+
+def decode_onewire_capture(
+    result: CaptureResult, mcu_config: McuConfig
+) -> list[OneWireTransfer]:
+    return decode_onewire(
+        capture_samples(result),
+        channel=onewire_channel(mcu_config),
+        samplerate_hz=result.samplerate_hz,
+    )
+
+
+def measure_pwm_capture(
+    result: CaptureResult, mcu_config: McuConfig, pin: str
+) -> PwmMeasurement | None:
+    return measure_pwm(
+        capture_samples(result),
+        channel=daq_channel(mcu_config, pin),
+        samplerate_hz=result.samplerate_hz,
+    )
@@ -0,0 +1,240 @@
+"""
+Compact representation of the captures of the DAQ tentacle: The edges.
+
+At 24 MHz nearly every sample equals its predecessor: A 100 Hz PWM
+changes 200 times per second but takes 24 MBytes per second as
+dense samples. 'EdgeList' stores only the transitions as records
+(timestamp, state): 'state' is the packed sample (bit n is channel Dn)
+from 'timestamp' up to the next record.
+
+'retain()' drops the edges outside of windows, for example around the
+edges of trig1 and trig2, see 'trigger_windows()'. Outside the
+windows, the signals are flat.
+
+Requires numpy: pip install testbed_showcase[daq]
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import logging
+import pathlib
+from collections.abc import Iterable, Sequence
+
+try:
+    import numpy as np
+    import numpy.typing as npt
+except ImportError as e:
+    raise ImportError(
+        "The DAQ edge lists require 'numpy': pip install testbed_showcase[daq]"
+    ) from e
+
+from testbed_showcase.util_daq_capture import DAQ_CHANNEL_TRIG1, DAQ_CHANNEL_TRIG2
+
+logger = logging.getLogger(__file__)
+
+Samples = npt.NDArray[np.uint8]
+Timestamps = npt.NDArray[np.int64]
+
+SUFFIX_EDGES = ".npz"
+
+
+@dataclasses.dataclass(frozen=True, eq=False)
+class EdgeList:
+    samplerate_hz: int
+    start: int
+    stop: int
+    """
+    The samples [start, stop)
+    """
+    timestamps: Timestamps
+    """
+    Strictly increasing, the first one is 'start'
+    """
+    states: Samples
+    windows: tuple[tuple[int, int], ...] = ()
+    """
+    The retained windows [start, stop). Empty: Everything retained.
+    """
+
+    def __post_init__(self) -> None:
+        assert self.start < self.stop
+        assert len(self.timestamps) == len(self.states) > 0
+        assert self.timestamps[0] == self.start
+
+    @staticmethod
+    def from_dense(samples: Samples, samplerate_hz: int, start: int = 0) -> EdgeList:
+        return EdgeList.from_chunks([samples], samplerate_hz=samplerate_hz, start=start)
+
+    @staticmethod
+    def from_chunks(
+        chunks: Iterable[bytes | Samples], samplerate_hz: int, start: int = 0
+    ) -> EdgeList:
+        """
+        Only one chunk is held in memory at a time.
+        """
+        timestamps: list[Timestamps] = []
+        states: list[Samples] = []
+        position = start
+        previous: int | None = None
+        for chunk in chunks:
+            samples = np.frombuffer(chunk, dtype=np.uint8)
+            if len(samples) == 0:
+                continue
+            changed = np.flatnonzero(samples[1:] != samples[:-1]) + 1
+            if (previous is None) or (samples[0] != previous):
+                changed = np.concatenate([[0], changed])
+            timestamps.append(changed.astype(np.int64) + position)
+            states.append(samples[changed])
+            position += len(samples)
+            previous = int(samples[-1])
+        if position == start:
+            raise ValueError("No samples")
+        return EdgeList(
+            samplerate_hz=samplerate_hz,
+            start=start,
+            stop=position,
+            timestamps=np.concatenate(timestamps),
+            states=np.concatenate(states),
+        )
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, EdgeList):
+            return NotImplemented
+        return (
+            (self.samplerate_hz, self.start, self.stop, self.windows)
+            == (other.samplerate_hz, other.start, other.stop, other.windows)
+            and np.array_equal(self.timestamps, other.timestamps)
+            and np.array_equal(self.states, other.states)
+        )
+
+    @property
+    def nbytes(self) -> int:
+        return self.timestamps.nbytes + self.states.nbytes
+
+    def _index(self, timestamp: int) -> int:
+        """
+        The record valid at 'timestamp'.
+        """
+        return int(np.searchsorted(self.timestamps, timestamp, side="right")) - 1
+
+    def state_at(self, timestamp: int) -> int:
+        assert self.start <= timestamp < self.stop
+        return int(self.states[self._index(timestamp)])
+
+    def to_dense(self, start: int | None = None, stop: int | None = None) -> Samples:
+        """
+        The samples [start, stop).
+        """
+        start = self.start if start is None else start
+        stop = self.stop if stop is None else stop
+        if not (self.start <= start < stop <= self.stop):
+            raise ValueError(
+                f"Samples [{start}, {stop}) not in [{self.start}, {self.stop})"
+            )
+        first = self._index(start)
+        last = self._index(stop - 1)
+        boundaries = np.concatenate(
+            [[start], self.timestamps[first + 1 : last + 1], [stop]]
+        )
+        return np.repeat(self.states[first : last + 1], np.diff(boundaries))
+
+    def edges(self, channel: int, rising: bool = True) -> Timestamps:
+        """
+        The timestamps of the edges on 'channel'.
+        """
+        levels = (self.states >> channel) & 1
+        diff = np.diff(levels.view(np.int8))
+        return self.timestamps[1:][diff == (1 if rising else -1)]
+
+    def retain(self, windows: Sequence[tuple[int, int]]) -> EdgeList:
+        """
+        Drops the edges outside of 'windows': There, the signals stay flat.
+        Every window starts with a record of the state at its start.
+        """
+        windows = _merge(windows, start=self.start, stop=self.stop)
+        if len(windows) == 0:
+            raise ValueError("No window within the capture")
+        timestamps: list[Timestamps] = [np.array([self.start], dtype=np.int64)]
+        states: list[Samples] = [self.states[:1]]
+        for start, stop in windows:
+            first = self._index(start)
+            last = self._index(stop - 1)
+            timestamps.append(
+                np.concatenate([[start], self.timestamps[first + 1 : last + 1]])
+            )
+            states.append(self.states[first : last + 1])
+        _timestamps = np.concatenate(timestamps)
+        _states = np.concatenate(states)
+        # Drop the records which do not change the state
+        keep = np.concatenate([[True], _states[1:] != _states[:-1]])
+        return EdgeList(
+            samplerate_hz=self.samplerate_hz,
+            start=self.start,
+            stop=self.stop,
+            timestamps=_timestamps[keep],
+            states=_states[keep],
+            windows=tuple(windows),
+        )
+
+    def write(self, filename: pathlib.Path) -> None:
+        np.savez_compressed(
+            filename,
+            meta=np.array([self.samplerate_hz, self.start, self.stop], dtype=np.int64),
+            timestamps=self.timestamps,
+            states=self.states,
+            windows=np.array(self.windows, dtype=np.int64).reshape(-1, 2),
+        )
+
+    @staticmethod
+    def read(filename: pathlib.Path) -> EdgeList:
+        with np.load(filename) as data:
+            samplerate_hz, start, stop = data["meta"].tolist()
+            return EdgeList(
+                samplerate_hz=samplerate_hz,
+                start=start,
+                stop=stop,
+                timestamps=data["timestamps"],
+                states=data["states"],
+                windows=tuple((a, b) for a, b in data["windows"].tolist()),
+            )
+
+
+def _merge(
+    windows: Iterable[tuple[int, int]], start: int, stop: int
+) -> list[tuple[int, int]]:
+    """
+    Clips the windows to [start, stop) and merges overlapping windows.
+    """
+    merged: list[tuple[int, int]] = []
+    for a, b in sorted((max(a, start), min(b, stop)) for a, b in windows):
+        if a >= b:
+            continue
+        if merged and (a <= merged[-1][1]):
+            merged[-1] = (merged[-1][0], max(merged[-1][1], b))
+            continue
+        merged.append((a, b))
+    return merged
+
+
+def trigger_windows(
+    edge_list: EdgeList,
+    pre_samples: int,
+    post_samples: int,
+    channels: Sequence[int] = (DAQ_CHANNEL_TRIG1, DAQ_CHANNEL_TRIG2),
+) -> list[tuple[int, int]]:
+    """
+    The windows around every rising and falling edge of 'channels'.
+    """
+    timestamps = np.concatenate(
+        [
+            edge_list.edges(channel, rising=rising)
+            for channel in channels
+            for rising in (True, False)
+        ]
+    )
+    return _merge(
+        ((t - pre_samples, t + post_samples) for t in timestamps.tolist()),
+        start=edge_list.start,
+        stop=edge_list.stop,
+    )
@@ -0,0 +1,181 @@
+"""
+Synthetic waveforms for the DAQ decoders, see 'util_daq_decode'.
+
+Used to test the decoders without hardware and to benchmark them
+against 'decode_i2c_reference()': A plain python loop over every sample.
+
+Requires numpy: pip install testbed_showcase[daq]
+"""
+
+from __future__ import annotations
+
+import logging
+from collections.abc import Sequence
+
+import numpy as np
+
+from testbed_showcase.util_daq_decode import I2cTransfer, Samples
+
+logger = logging.getLogger(__file__)
+
+
+def _waveform(states: Sequence[int], durations: Sequence[int]) -> Samples:
+    """
+    Every packed sample 'states[i]' is repeated 'durations[i]' times.
+    """
+    return np.repeat(
+        np.asarray(states, dtype=np.uint8), np.asarray(durations, dtype=np.intp)
+    )
+
+
+def synth_i2c(
+    transfers: Sequence[tuple[int, bool, bytes]],
+    scl: int,
+    sda: int,
+    samplerate_hz: int,
+    frequency_hz: int = 100_000,
+) -> Samples:
+    """
+    'transfers': (address, read, data). Every byte is acknowledged,
+    but the last byte of a read.
+    """
+    quarter = max(1, samplerate_hz // frequency_hz // 4)
+    mask_scl, mask_sda = 1 << scl, 1 << sda
+    states: list[int] = []
+    durations: list[int] = []
+
+    def state(scl_high: bool, sda_high: bool, duration: int) -> None:
+        states.append((mask_scl if scl_high else 0) | (mask_sda if sda_high else 0))
+        durations.append(duration)
+
+    def bit(value: bool) -> None:
+        state(False, value, quarter)
+        state(True, value, 2 * quarter)
+        state(False, value, quarter)
+
+    state(True, True, 8 * quarter)
+    for address, read, data in transfers:
+        # START
+        state(True, False, 2 * quarter)
+        state(False, False, quarter)
+        frames = [(address << 1) | int(read), *data]
+        for i, value in enumerate(frames):
+            for n in range(7, -1, -1):
+                bit(bool((value >> n) & 1))
+            nack = read and (i == len(frames) - 1) and (i > 0)
+            bit(nack)
+        # STOP
+        state(False, False, quarter)
+        state(True, False, 2 * quarter)
+        state(True, True, 8 * quarter)
+    return _waveform(states, durations)
+
+
+def synth_uart(
+    data: bytes, channel: int, baudrate: int, samplerate_hz: int, gap_bits: int = 2
+) -> Samples:
+    """
+    8N1, idle high.
+    """
+    levels: list[int] = [1] * (2 * gap_bits)
+    for value in data:
+        levels.append(0)
+        levels.extend((value >> n) & 1 for n in range(8))
+        levels.append(1)
+        levels.extend([1] * gap_bits)
+    # Round the bit boundaries, not the bit durations: No drift
+    boundaries = np.round(
+        np.arange(len(levels) + 1) * (samplerate_hz / baudrate)
+    ).astype(np.intp)
+    return _waveform([v << channel for v in levels], np.diff(boundaries).tolist())
+
+
+def synth_onewire(
+    transfers: Sequence[bytes], channel: int, samplerate_hz: int
+) -> Samples:
+    """
+    Every transfer: reset, presence pulse and the bytes, LSB first.
+    """
+    per_us = samplerate_hz / 1e6
+    high = 1 << channel
+    states: list[int] = []
+    durations: list[int] = []
+
+    def pulse(low_us: float, high_us: float) -> None:
+        states.extend([0, high])
+        durations.extend([round(low_us * per_us), round(high_us * per_us)])
+
+    states.append(high)
+    durations.append(round(100 * per_us))
+    for data in transfers:
+        pulse(480, 70)  # reset
+        pulse(120, 290)  # presence
+        for value in data:
+            for n in range(8):
+                if (value >> n) & 1:
+                    pulse(6, 64)
+                else:
+                    pulse(60, 10)
+    return _waveform(states, durations)
+
+
+def synth_pwm(
+    channel: int, frequency_hz: float, duty: float, periods: int, samplerate_hz: int
+) -> Samples:
+    period = round(samplerate_hz / frequency_hz)
+    high = round(period * duty)
+    one = np.zeros(period, dtype=np.uint8)
+    one[:high] = 1 << channel
+    return np.concatenate(
+        [np.zeros(period // 3, dtype=np.uint8), np.tile(one, periods)]
+    )
+
+
+def decode_i2c_reference(samples: bytes, scl: int, sda: int) -> list[I2cTransfer]:
+    """
+    The same as 'decode_i2c()', as a loop over every sample.
+    """
+    transfers: list[I2cTransfer] = []
+    mask_scl, mask_sda = 1 << scl, 1 << sda
+    bits: list[bool] = []
+    start: int | None = None
+
+    def end_transfer() -> None:
+        if start is None:
+            return
+        count = len(bits) // 9
+        if count == 0:
+            return
+        values: list[int] = []
+        acks: list[bool] = []
+        for f in range(count):
+            value = 0
+            for b in bits[9 * f : 9 * f + 8]:
+                value = (value << 1) | int(b)
+            values.append(value)
+            acks.append(not bits[9 * f + 8])
+        transfers.append(
+            I2cTransfer(
+                start_sample=start,
+                address=values[0] >> 1,
+                read=bool(values[0] & 1),
+                data=bytes(values[1:]),
+                acks=tuple(acks),
+            )
+        )
+
+    previous_scl = previous_sda = True
+    for i, sample in enumerate(samples):
+        scl_high = bool(sample & mask_scl)
+        sda_high = bool(sample & mask_sda)
+        if scl_high and previous_scl and (sda_high != previous_sda):
+            end_transfer()
+            start = None
+            bits = []
+            if not sda_high:
+                start = i
+        elif scl_high and not previous_scl:
+            bits.append(sda_high)
+        previous_scl, previous_sda = scl_high, sda_high
+    end_transfer()
+    return transfers
@@ -0,0 +1,312 @@
+"""
+Content addressed download cache for the firmware files.
+
+Layout on disk:
+
+  <directory>/objects/<sha256[:2]>/<sha256><suffix>
+  <directory>/urls/<sha256 of the url>.json
+  <directory>/partial/<sha256 of the url><suffix>.part
+
+* Downloads run concurrently, see 'fetch_all()'.
+* An interrupted download is resumed using a http 'Range' request.
+* A file is verified before it is moved into 'objects': The sha256 if
+  known, the block structure of '.uf2' and the suffix crc of '.dfu'.
+  A file which fails is never handed to flashing.
+"""
+
+from __future__ import annotations
+
+import concurrent.futures
+import dataclasses
+import hashlib
+import http.client
+import json
+import logging
+import pathlib
+import struct
+import typing
+import urllib.error
+import urllib.parse
+import urllib.request
+import zlib
+from collections.abc import Sequence
+
+logger = logging.getLogger(__file__)
+
+DOWNLOAD_TIMEOUT_S = 60.0
+DOWNLOAD_RETRIES = 3
+DEFAULT_WORKERS = 4
+CHUNK_SIZE = 1 << 16
+SUFFIX_PART = ".part"
+
+UF2_BLOCK_SIZE = 512
+UF2_MAGIC_START0 = 0x0A324655
+UF2_MAGIC_START1 = 0x9E5D5157
+UF2_MAGIC_END = 0x0AB16F30
+DFU_SUFFIX_LENGTH = 16
+DFU_SIGNATURE = b"UFD"
+
+
+def verify_uf2(data: bytes) -> None:
+    """
+    https://github.com/microsoft/uf2: Blocks of 512 bytes with magic numbers.
+    """
+    if (len(data) == 0) or (len(data) % UF2_BLOCK_SIZE != 0):
+        raise ValueError(f"uf2: {len(data)} bytes is not a multiple of 512")
+    for offset in range(0, len(data), UF2_BLOCK_SIZE):
+        start0, start1, _, _, _, block_no, num_blocks = struct.unpack_from(
+            "<7I", data, offset
+        )
+        (end,) = struct.unpack_from("<I", data, offset + UF2_BLOCK_SIZE - 4)
+        if (start0, start1, end) != (UF2_MAGIC_START0, UF2_MAGIC_START1, UF2_MAGIC_END):
+            raise ValueError(f"uf2: Block at offset {offset}: Invalid magic")
+        if block_no >= num_blocks:
+            raise ValueError(
+                f"uf2: Block at offset {offset}: {block_no=} {num_blocks=}"
+            )
+
+
+def verify_dfu(data: bytes) -> None:
+    """
+    DFU 1.1 suffix: ..., 'UFD', bLength=16, dwCRC.
+    The crc covers everything but itself and is not inverted at the end.
+    """
+    if len(data) < DFU_SUFFIX_LENGTH:
+        raise ValueError(f"dfu: {len(data)} bytes is too short")
+    if data[-8:-5] != DFU_SIGNATURE or data[-5] != DFU_SUFFIX_LENGTH:
+        raise ValueError("dfu: No DFU suffix")
+    (crc,) = struct.unpack("<I", data[-4:])
+    expected = zlib.crc32(data[:-4]) ^ 0xFFFFFFFF
+    if crc != expected:
+        raise ValueError(f"dfu: crc 0x{crc:08x}, expected 0x{expected:08x}")
+
+
+VERIFIERS: dict[str, typing.Callable[[bytes], None]] = {
+    ".uf2": verify_uf2,
+    ".dfu": verify_dfu,
+}
+
+
+def url_suffix(url: str) -> str:
+    """
+    'https://.../RPI_PICO2-20241025-v1.24.0.uf2' -> '.uf2'
+    """
+    return pathlib.PurePosixPath(urllib.parse.urlparse(url).path).suffix
+
+
+def sha256_file(filename: pathlib.Path) -> str:
+    h = hashlib.sha256()
+    with filename.open("rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+@dataclasses.dataclass(frozen=True)
+class Download:
+    url: str
+    sha256: str | None = None
+    """
+    None: Only the file format is verified
+    """
+
+
+@dataclasses.dataclass(frozen=True)
+class CacheEntry:
+    url: str
+    sha256: str
+    size: int
+    filename: pathlib.Path
+
+
+class DownloadCache:
+    def __init__(
+        self,
+        directory: pathlib.Path,
+        max_workers: int = DEFAULT_WORKERS,
+        retries: int = DOWNLOAD_RETRIES,
+        timeout_s: float = DOWNLOAD_TIMEOUT_S,
+    ) -> None:
+        assert isinstance(directory, pathlib.Path)
+        assert max_workers > 0
+        assert retries > 0
+        self.directory = directory
+        self.max_workers = max_workers
+        self.retries = retries
+        self.timeout_s = timeout_s
+        self.downloads = 0
+        self.resumed = 0
+
+    @staticmethod
+    def _key(url: str) -> str:
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    def _filename_url(self, url: str) -> pathlib.Path:
+        return self.directory / "urls" / f"{self._key(url)}.json"
+
+    def _filename_part(self, url: str) -> pathlib.Path:
+        return (
+            self.directory
+            / "partial"
+            / f"{self._key(url)}{url_suffix(url)}{SUFFIX_PART}"
+        )
+
+    def _filename_object(self, sha256: str, suffix: str) -> pathlib.Path:
+        return self.directory / "objects" / sha256[:2] / f"{sha256}{suffix}"
+
+    def lookup(self, download: Download) -> CacheEntry | None:
+        filename_url = self._filename_url(download.url)
+        if not filename_url.is_file():
+            return None
+        data = json.loads(filename_url.read_text())
+        if (download.sha256 is not None) and (data["sha256"] != download.sha256):
+            return None
+        filename = self._filename_object(data["sha256"], url_suffix(download.url))
+        if not filename.is_file():
+            return None
+        return CacheEntry(
+            url=download.url,
+            sha256=data["sha256"],
+            size=data["size"],
+            filename=filename,
+        )
+
+    def fetch(self, download: Download) -> CacheEntry:
+        """
+        Returns the cached file. Downloads it if missing.
+        """
+        entry = self.lookup(download)
+        if entry is not None:
+            return entry
+        for attempt in range(1, self.retries + 1):
+            try:
+                return self._download(download)
+            except (OSError, http.client.HTTPException) as e:
+                if attempt == self.retries:
+                    raise
+                logger.warning(f"{download.url}: attempt {attempt} failed: {e!r}")
+        raise AssertionError("unreachable")
+
+    def _download(self, download: Download) -> CacheEntry:
+        filename_part = self._filename_part(download.url)
+        filename_part.parent.mkdir(parents=True, exist_ok=True)
+        offset = filename_part.stat().st_size if filename_part.is_file() else 0
+        request = urllib.request.Request(download.url)
+        if offset > 0:
+            request.add_header("Range", f"bytes={offset}-")
+        try:
+            response = urllib.request.urlopen(request, timeout=self.timeout_s)
+        except urllib.error.HTTPError as e:
+            if e.code == http.HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE:
+                # The part file is corrupt: Start over
+                filename_part.unlink()
+            raise
+        with response:
+            if (offset > 0) and (response.status != http.HTTPStatus.PARTIAL_CONTENT):
+                logger.info(f"{download.url}: Range not supported, start over")
+                offset = 0
+            if offset > 0:
+                logger.info(f"{download.url}: resume at {offset} bytes")
+                self.resumed += 1
+            else:
+                logger.info(f"{download.url}: download")
+            expected = response.length
+            received = 0
+            with filename_part.open("ab" if offset > 0 else "wb") as f:
+                for chunk in iter(lambda: response.read(CHUNK_SIZE), b""):
+                    f.write(chunk)
+                    received += len(chunk)
+            if (expected is not None) and (received < expected):
+                # Keep the part file: The next attempt resumes
+                raise http.client.IncompleteRead(b"", expected - received)
+        self.downloads += 1
+        return self._store(download=download, filename_part=filename_part)
+
+    def _store(self, download: Download, filename_part: pathlib.Path) -> CacheEntry:
+        """
+        Verifies the downloaded file and moves it into 'objects'.
+        """
+        sha256 = sha256_file(filename_part)
+        suffix = url_suffix(download.url)
+        try:
+            if (download.sha256 is not None) and (sha256 != download.sha256):
+                raise ValueError(f"Expected sha256 {download.sha256} but got {sha256}")
+            verifier = VERIFIERS.get(suffix)
+            if verifier is not None:
+                verifier(filename_part.read_bytes())
+        except ValueError as e:
+            filename_part.unlink()
+            raise ValueError(f"{download.url}: {e}") from e
+
+        filename = self._filename_object(sha256, suffix)
+        filename.parent.mkdir(parents=True, exist_ok=True)
+        size = filename_part.stat().st_size
+        filename_part.replace(filename)
+        filename_url = self._filename_url(download.url)
+        filename_url.parent.mkdir(parents=True, exist_ok=True)
+        # Atomic: Another session may read the cache
+        filename_tmp = filename_url.with_suffix(".tmp")
+        filename_tmp.write_text(
+            json.dumps({"url": download.url, "sha256": sha256, "size": size}, indent=4)
+        )
+        filename_tmp.replace(filename_url)
+        return CacheEntry(url=download.url, sha256=sha256, size=size, filename=filename)
+
+    def fetch_all(self, downloads: Sequence[Download]) -> list[CacheEntry]:
+        """
+        Fetches all 'downloads' concurrently. Returns the entries in the same order.
+        """
+        unique = list(dict.fromkeys(downloads))
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="download"
+        ) as executor:
+            futures = {d: executor.submit(self.fetch, d) for d in unique}
+            concurrent.futures.wait(futures.values())
+        return [futures[d].result() for d in downloads]
+
+
+@dataclasses.dataclass(frozen=True)
+class FirmwareDownloadJson:
+    """
+    For example 'pytest_args_firmware_RPI_PICO2_v1.24.0.json'.
+    """
+
+    board_variant: str
+    url: str
+    micropython_full_version_text: str | None = None
+    sha256: str | None = None
+
+    @staticmethod
+    def read(filename: pathlib.Path) -> FirmwareDownloadJson:
+        data = json.loads(filename.read_text())
+        return FirmwareDownloadJson(
+            board_variant=data["board_variant"],
+            url=data["url"],
+            micropython_full_version_text=data.get("micropython_full_version_text"),
+            sha256=data.get("sha256"),
+        )
+
+    @property
+    def download(self) -> Download:
+        return Download(url=self.url, sha256=self.sha256)
+
+
+@dataclasses.dataclass(frozen=True)
+class FirmwareDownload:
+    spec: FirmwareDownloadJson
+    entry: CacheEntry
+
+
+def fetch_firmwares(
+    cache: DownloadCache, filenames: Sequence[pathlib.Path]
+) -> dict[str, FirmwareDownload]:
+    """
+    Fetches the firmwares of all json files concurrently.
+    Returns board variant -> firmware.
+    """
+    specs = [FirmwareDownloadJson.read(f) for f in filenames]
+    entries = cache.fetch_all([s.download for s in specs])
+    return {
+        spec.board_variant: FirmwareDownload(spec=spec, entry=entry)
+        for spec, entry in zip(specs, entries, strict=True)
+    }
@@ -0,0 +1,218 @@
+"""
+Persistent firmware cache.
+
+A firmware is identified by the git commit of the micropython repo
+and the board variant: mpbuild is always called with the same options.
+If both are the same, the firmware will be the same:
+There is no need to call mpbuild again.
+
+Layout on disk:
+
+  <directory>/<digest>/firmware.uf2
+  <directory>/<digest>/firmware_cache.json
+
+The mtime of 'firmware_cache.json' is updated on every hit
+and is used for LRU eviction.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import hashlib
+import json
+import logging
+import os
+import pathlib
+import re
+import shutil
+import subprocess
+
+logger = logging.getLogger(__file__)
+
+FILENAME_CACHE_JSON = "firmware_cache.json"
+FILENAME_FIRMWARE_STEM = "firmware"
+_RE_GIT_COMMIT = re.compile(r"^[0-9a-f]{40}$")
+
+
+@dataclasses.dataclass(frozen=True, order=True)
+class FirmwareCacheKey:
+    git_commit: str
+    board_variant: str
+    """
+    BoardVariant.name_normalized, for example 'RPI_PICO2-RISCV'
+    """
+
+    def __post_init__(self) -> None:
+        assert _RE_GIT_COMMIT.match(self.git_commit), self.git_commit
+        assert isinstance(self.board_variant, str)
+
+    @property
+    def digest(self) -> str:
+        text = json.dumps(dataclasses.asdict(self), sort_keys=True)
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()[:24]
+
+    @property
+    def text(self) -> str:
+        return f"{self.board_variant}@{self.git_commit[:10]}"
+
+
+@dataclasses.dataclass(frozen=True)
+class FirmwareCacheEntry:
+    key: FirmwareCacheKey
+    filename: pathlib.Path
+    micropython_full_version_text: str
+
+
+class FirmwareCache:
+    def __init__(self, directory: pathlib.Path, max_bytes: int) -> None:
+        assert isinstance(directory, pathlib.Path)
+        assert max_bytes > 0
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _directory_entry(self, key: FirmwareCacheKey) -> pathlib.Path:
+        return self.directory / key.digest
+
+    def lookup(self, key: FirmwareCacheKey) -> FirmwareCacheEntry | None:
+        filename_json = self._directory_entry(key) / FILENAME_CACHE_JSON
+        try:
+            json_data = json.loads(filename_json.read_text())
+            entry = FirmwareCacheEntry(
+                key=key,
+                filename=filename_json.parent / json_data["filename"],
+                micropython_full_version_text=json_data[
+                    "micropython_full_version_text"
+                ],
+            )
+        except (OSError, ValueError, KeyError):
+            logger.info(f"Firmware cache miss: {key.text}")
+            return None
+
+        if not entry.filename.is_file():
+            logger.warning(f"Firmware cache corrupt, file missing: {entry.filename}")
+            return None
+
+        # Mark as recently used
+        os.utime(filename_json)
+        logger.info(f"Firmware cache hit: {key.text}: {entry.filename}")
+        return entry
+
+    def store(
+        self,
+        key: FirmwareCacheKey,
+        filename: pathlib.Path,
+        micropython_full_version_text: str,
+    ) -> FirmwareCacheEntry:
+        assert isinstance(filename, pathlib.Path)
+        assert isinstance(micropython_full_version_text, str)
+
+        directory_entry = self._directory_entry(key)
+        # Write into a temporary directory and rename: A concurrent session
+        # will never see a half written entry.
+        directory_tmp = directory_entry.with_name(
+            f"{directory_entry.name}.tmp-{os.getpid()}"
+        )
+        shutil.rmtree(directory_tmp, ignore_errors=True)
+        directory_tmp.mkdir(parents=True)
+        filename_firmware = FILENAME_FIRMWARE_STEM + filename.suffix
+        shutil.copyfile(filename, directory_tmp / filename_firmware)
+        json_data = {
+            "key": dataclasses.asdict(key),
+            "filename": filename_firmware,
+            "micropython_full_version_text": micropython_full_version_text,
+        }
+        (directory_tmp / FILENAME_CACHE_JSON).write_text(
+            json.dumps(json_data, indent=4)
+        )
+        shutil.rmtree(directory_entry, ignore_errors=True)
+        directory_tmp.rename(directory_entry)
+        logger.info(f"Firmware cache store: {key.text}: {filename}")
+
+        self.evict()
+
+        return FirmwareCacheEntry(
+            key=key,
+            filename=directory_entry / filename_firmware,
+            micropython_full_version_text=micropython_full_version_text,
+        )
+
+    def evict(self) -> None:
+        """
+        Removes the least recently used entries till the
+        cache size is below 'max_bytes'.
+        """
+        entries: list[tuple[float, int, pathlib.Path]] = []
+        for filename_json in self.directory.glob(f"*/{FILENAME_CACHE_JSON}"):
+            directory_entry = filename_json.parent
+            size = sum(f.stat().st_size for f in directory_entry.iterdir())
+            entries.append((filename_json.stat().st_mtime, size, directory_entry))
+
+        total_bytes = sum(size for _, size, _ in entries)
+        # The most recent entry is never evicted: It was just stored or used.
+        for _mtime, size, directory_entry in sorted(entries)[:-1]:
+            if total_bytes <= self.max_bytes:
+                break
+            logger.info(f"Firmware cache evict: {directory_entry.name}")
+            shutil.rmtree(directory_entry, ignore_errors=True)
+            total_bytes -= size
+
+
+def split_git_ref(firmware_build: str) -> tuple[str, str | None]:
+    """
+    'https://github.com/micropython/micropython.git@master'
+    -> ('https://github.com/micropython/micropython.git', 'master')
+    """
+    directory, _, last = firmware_build.rpartition("/")
+    if "@" not in last:
+        return firmware_build, None
+    name, _, ref = last.partition("@")
+    return f"{directory}/{name}", ref
+
+
+def resolve_git_commit(firmware_build: str) -> str | None:
+    """
+    Returns the git commit which will be built
+    or None if it may not be determined reliably.
+
+    'firmware_build' is either a local directory or a 'url@ref'.
+    """
+
+    def git(*args: str) -> str:
+        return subprocess.run(
+            ["git", *args],
+            check=True,
+            capture_output=True,
+            text=True,
+            timeout=60,
+        ).stdout.strip()
+
+    try:
+        directory = pathlib.Path(firmware_build).expanduser()
+        if directory.is_dir():
+            if git("-C", str(directory), "status", "--porcelain") != "":
+                logger.info(f"{directory}: Uncommitted changes: No firmware cache")
+                return None
+            return git("-C", str(directory), "rev-parse", "HEAD")
+
+        url, ref = split_git_ref(firmware_build)
+        if ref is None:
+            ref = "HEAD"
+        if _RE_GIT_COMMIT.match(ref):
+            return ref
+        # An annotated tag is listed twice: 'refs/tags/v1.24.0' is the tag
+        # object, 'refs/tags/v1.24.0^{}' the commit it points to
+        refs = [
+            line.split()
+            for line in git("ls-remote", url, ref, f"{ref}^{{}}").splitlines()
+        ]
+        refs.sort(key=lambda fields: not fields[-1].endswith("^{}"))
+        for fields in refs:
+            if _RE_GIT_COMMIT.match(fields[0]):
+                return fields[0]
+    except (OSError, subprocess.SubprocessError) as e:
+        logger.warning(f"Failed to resolve git commit for '{firmware_build}': {e!r}")
+        return None
+
+    logger.warning(f"Failed to resolve git commit for '{firmware_build}'")
+    return None
@@ -1,10 +1,32 @@
+import concurrent.futures
+import copy
+import functools
 import logging
+import pathlib
+import threading
 
 from octoprobe.util_constants import TAG_BOARDS
-from octoprobe.util_firmware_spec import FirmwareBuildSpec, FirmwareSpecBase
+from octoprobe.util_firmware_spec import (
+    FirmwareBuildSpec,
+    FirmwareDownloadSpec,
+    FirmwareSpecBase,
+)
 from octoprobe.util_micropython_boards import BoardVariant, board_variants
+from testbed_micropython.util_firmware_mpbuild_interface import ArgsFirmware
 
 from testbed_showcase.tentacle_spec import TentacleShowcase
+from testbed_showcase.util_download_cache import (
+    DownloadCache,
+    FirmwareDownload,
+    fetch_firmwares,
+)
+from testbed_showcase.util_firmware_cache import (
+    FirmwareCache,
+    FirmwareCacheKey,
+    resolve_git_commit,
+)
+from testbed_showcase.util_firmware_prebuild import FirmwarePrebuild
+from testbed_showcase.util_git_worktrees import GitWorktrees, is_git_url
 
 logger = logging.getLogger(__file__)
 
@@ -28,3 +50,211 @@ def collect_firmware_specs(tentacles: list[TentacleShowcase]) -> list[FirmwareSp
     list_variants = sorted(set_variants, key=lambda v: v.name_normalized)
 
     return [FirmwareBuildSpec(board_variant=variant) for variant in list_variants]
+
+
+class FirmwareBuilder:
+    """
+    Builds the firmware for the tentacles.
+
+    * If the same commit/board variant was built before,
+      the firmware is taken from the firmware cache.
+    * 'prebuild()' starts all builds at session start, before the
+      tentacles are powercycled. A test then only waits for the
+      firmware variant it needs.
+      The builds themselves run one after the other: They share
+      the source tree. Cache lookups and downloads run in parallel.
+    * A downloaded firmware ('--firmware=xy.json') is taken from
+      the download cache: Fetched once and verified before flashing.
+    * A git url is fetched into 'git_worktrees' and the firmware
+      is built in the worktree of the commit.
+    """
+
+    def __init__(
+        self,
+        args_firmware: ArgsFirmware,
+        mpbuild_artifacts: pathlib.Path,
+        firmware_cache: FirmwareCache | None,
+        prebuild_workers: int,
+        download_cache: DownloadCache | None = None,
+        git_worktrees: GitWorktrees | None = None,
+    ) -> None:
+        assert isinstance(args_firmware, ArgsFirmware)
+        assert isinstance(mpbuild_artifacts, pathlib.Path)
+        assert isinstance(firmware_cache, FirmwareCache | None)
+        assert isinstance(download_cache, DownloadCache | None)
+        assert isinstance(git_worktrees, GitWorktrees | None)
+        assert prebuild_workers >= 0
+        self.args_firmware = args_firmware
+        self.mpbuild_artifacts = mpbuild_artifacts
+        self.firmware_cache = firmware_cache
+        self.download_cache = download_cache
+        self.git_worktrees = git_worktrees
+        self.firmware_downloads: dict[str, FirmwareDownload] = {}
+        """
+        board variant (normalized) -> downloaded firmware
+        """
+        self.firmware_git_commit: str | None = None
+        self.prebuild_workers = prebuild_workers
+        self._prebuild: FirmwarePrebuild[FirmwareSpecBase] | None = None
+        # All builds share one source tree: Build one after the other,
+        # also the builds started by 'prebuild()'
+        self._lock_build_firmware = threading.Lock()
+
+    def setup(self) -> None:
+        """
+        Clones/fetches the micropython repo.
+        May run in a thread while the tentacles are powercycled.
+        """
+        firmware_build = self.args_firmware.firmware_build
+        if (
+            (self.git_worktrees is not None)
+            and (firmware_build is not None)
+            and is_git_url(firmware_build)
+        ):
+            # Build in the worktree: 'args_firmware' sees a local directory
+            directory = self.git_worktrees.checkout(firmware_build)
+            self.args_firmware.firmware_build = str(directory)
+        self.args_firmware.setup()
+        firmware_build = self.args_firmware.firmware_build
+        if firmware_build is None:
+            return
+        if FirmwareDownloadSpec.is_download(firmware_build):
+            if self.download_cache is not None:
+                downloads = fetch_firmwares(
+                    cache=self.download_cache,
+                    filenames=[pathlib.Path(firmware_build)],
+                )
+                self.firmware_downloads = {
+                    BoardVariant.factory(variant).name_normalized: download
+                    for variant, download in downloads.items()
+                }
+            return
+        if self.firmware_cache is not None:
+            self.firmware_git_commit = resolve_git_commit(firmware_build=firmware_build)
+
+    def build(
+        self,
+        tentacle: TentacleShowcase,
+        firmware_spec: FirmwareSpecBase,
+    ) -> FirmwareSpecBase:
+        """
+        Builds 'firmware_spec' for 'tentacle' and returns the built firmware spec.
+        'tentacle' is not modified.
+        """
+        # The build will update 'tentacle_state.firmware_spec': Use a copy.
+        _tentacle = copy.copy(tentacle)
+        _tentacle.tentacle_state = copy.copy(tentacle.tentacle_state)
+        _tentacle.tentacle_state.firmware_spec = firmware_spec
+
+        def build() -> FirmwareSpecBase:
+            self.mpbuild_artifacts.mkdir(parents=True, exist_ok=True)
+            with self._lock_build_firmware:
+                self.args_firmware.build_firmware(
+                    tentacle=_tentacle,
+                    mpbuild_artifacts=self.mpbuild_artifacts,
+                )
+            firmware_spec_built = _tentacle.tentacle_state.firmware_spec
+            assert firmware_spec_built is not None
+            return firmware_spec_built
+
+        download = self.firmware_downloads.get(
+            firmware_spec.board_variant.name_normalized
+        )
+        if download is not None:
+            return FirmwareBuildSpec(
+                board_variant=firmware_spec.board_variant,
+                micropython_full_version_text=download.spec.micropython_full_version_text,
+                _filename=download.entry.filename,
+            )
+
+        if (
+            (self.firmware_cache is None)
+            or (self.firmware_git_commit is None)
+            or (not isinstance(firmware_spec, FirmwareBuildSpec))
+        ):
+            return build()
+
+        key = FirmwareCacheKey(
+            git_commit=self.firmware_git_commit,
+            board_variant=firmware_spec.board_variant.name_normalized,
+        )
+        entry = self.firmware_cache.lookup(key=key)
+        if entry is not None:
+            return FirmwareBuildSpec(
+                board_variant=firmware_spec.board_variant,
+                micropython_full_version_text=entry.micropython_full_version_text,
+                _filename=entry.filename,
+            )
+
+        firmware_spec_built = build()
+        assert isinstance(firmware_spec_built, FirmwareBuildSpec)
+        if firmware_spec_built.micropython_full_version_text is None:
+            logger.warning(f"{key.text}: No version text: Not added to firmware cache")
+            return firmware_spec_built
+        self.firmware_cache.store(
+            key=key,
+            filename=firmware_spec_built.filename,
+            micropython_full_version_text=firmware_spec_built.micropython_full_version_text,
+        )
+        return firmware_spec_built
+
+    def prebuild(
+        self,
+        tentacles: list[TentacleShowcase],
+        firmware_specs: list[FirmwareSpecBase],
+    ) -> None:
+        """
+        Starts building all 'firmware_specs' in the background.
+        'tentacles' may be offline, for example of the usb topology snapshot:
+        The builds then run while the tentacles are powercycled.
+        May be called again: Variants already submitted are skipped.
+        """
+        if self.prebuild_workers == 0:
+            return
+        if self.args_firmware.firmware_build is None:
+            return
+        if self._prebuild is None:
+            self._prebuild = FirmwarePrebuild(
+                executor=concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.prebuild_workers,
+                    thread_name_prefix="firmware_prebuild",
+                )
+            )
+        for firmware_spec in firmware_specs:
+            if not isinstance(firmware_spec, FirmwareBuildSpec):
+                continue
+            for tentacle in tentacles:
+                if tentacle.is_mcu and firmware_spec.match_board(tentacle):
+                    self._prebuild.submit(
+                        variant=firmware_spec.board_variant.name_normalized,
+                        build=functools.partial(
+                            self.build,
+                            tentacle=tentacle,
+                            firmware_spec=firmware_spec,
+                        ),
+                    )
+                    break
+
+    def build_firmware(self, tentacle: TentacleShowcase) -> None:
+        """
+        Updates 'tentacle_state.firmware_spec' with the built firmware.
+        Waits for the prebuild if it has been started.
+        """
+        firmware_spec = tentacle.tentacle_state.firmware_spec
+        if (firmware_spec is None) or not tentacle.is_mcu:
+            return
+        variant = firmware_spec.board_variant.name_normalized
+        if (self._prebuild is not None) and (variant in self._prebuild):
+            tentacle.tentacle_state.firmware_spec = self._prebuild.wait(variant)
+            return
+
+        tentacle.tentacle_state.firmware_spec = self.build(
+            tentacle=tentacle,
+            firmware_spec=firmware_spec,
+        )
+
+    def shutdown(self) -> None:
+        if self._prebuild is not None:
+            self._prebuild.shutdown()
+        if self.git_worktrees is not None:
+            self.git_worktrees.close()
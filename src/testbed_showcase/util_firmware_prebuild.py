@@ -0,0 +1,62 @@
+"""
+Build all firmware variants in the background.
+
+The builds are started at session start.
+A test only waits for the firmware variant it needs.
+"""
+
+from __future__ import annotations
+
+import concurrent.futures
+import logging
+import time
+from collections.abc import Callable
+
+logger = logging.getLogger(__file__)
+
+
+class FirmwarePrebuild[R]:
+    def __init__(self, executor: concurrent.futures.Executor) -> None:
+        assert isinstance(executor, concurrent.futures.Executor)
+        self._executor = executor
+        self._futures: dict[str, concurrent.futures.Future[R]] = {}
+
+    def submit(self, variant: str, build: Callable[[], R]) -> None:
+        """
+        Starts building 'variant'.
+        A variant which has already been submitted is ignored.
+        """
+        assert isinstance(variant, str)
+        if variant in self._futures:
+            return
+        logger.info(f"Prebuild {variant}: submitted")
+        self._futures[variant] = self._executor.submit(build)
+
+    def __contains__(self, variant: str) -> bool:
+        return variant in self._futures
+
+    @property
+    def variants(self) -> list[str]:
+        return sorted(self._futures)
+
+    def wait(self, variant: str) -> R:
+        """
+        Blocks till 'variant' has been built and returns the result.
+        Raises the exception of the build if it failed.
+        """
+        future = self._futures[variant]
+        if not future.done():
+            begin_s = time.monotonic()
+            logger.info(f"Prebuild {variant}: waiting")
+            concurrent.futures.wait([future])
+            logger.info(
+                f"Prebuild {variant}: waited {time.monotonic() - begin_s:0.1f}s"
+            )
+        return future.result()
+
+    def shutdown(self) -> None:
+        """
+        Cancels all builds which did not start yet
+        and waits for the running builds.
+        """
+        self._executor.shutdown(wait=True, cancel_futures=True)
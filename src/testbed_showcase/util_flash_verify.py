@@ -0,0 +1,134 @@
+"""
+Verify before flash: Skip flashing if the DUT already runs the requested firmware.
+
+The DUT reports
+* the running version: 'sys.version' and 'sys.implementation._machine'
+* the sha256 of the firmware file which was flashed.
+  This hash is written to the DUT filesystem after every flash by the
+  testbed, or the file is deleted if the hash is unknown.
+  The file is relative to the cwd of the DUT: '/flash' on PYBV11, '/' on RP2.
+  Note: A firmware flashed without the testbed leaves this file untouched.
+  The version text, which includes the build date, still has to match.
+
+Flashing is only skipped if both match exactly.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import hashlib
+import logging
+import pathlib
+import re
+
+logger = logging.getLogger(__file__)
+
+FILENAME_DUT_FIRMWARE_SHA256 = "octoprobe_firmware_sha256.txt"
+
+_RE_SHA256 = re.compile(r"^[0-9a-f]{64}$")
+
+MP_PROGRAM_READ_IDENTITY = f"""
+import sys
+try:
+    with open('{FILENAME_DUT_FIRMWARE_SHA256}') as f:
+        firmware_sha256 = f.read().strip()
+except OSError:
+    firmware_sha256 = ''
+firmware_identity = [sys.version + ';' + sys.implementation._machine, firmware_sha256]
+"""
+
+
+def mp_program_write_sha256(sha256: str) -> str:
+    assert _RE_SHA256.match(sha256), sha256
+    return f"""
+with open('{FILENAME_DUT_FIRMWARE_SHA256}', 'w') as f:
+    f.write('{sha256}')
+"""
+
+
+MP_PROGRAM_DELETE_SHA256 = f"""
+import os
+try:
+    os.remove('{FILENAME_DUT_FIRMWARE_SHA256}')
+except OSError:
+    pass
+"""
+
+
+def firmware_sha256(filename: pathlib.Path) -> str:
+    assert isinstance(filename, pathlib.Path)
+    h = hashlib.sha256()
+    with filename.open("rb") as f:
+        while chunk := f.read(1 << 16):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+@dataclasses.dataclass(frozen=True)
+class FirmwareIdentity:
+    micropython_full_version_text: str
+    """
+    Example: 3.4.0; MicroPython v1.24.0 on 2024-10-25;Raspberry Pi Pico2 with RP2350
+    """
+    sha256: str
+    """
+    sha256 of the firmware file. Empty if not known.
+    """
+
+    @staticmethod
+    def factory(values: list[str]) -> FirmwareIdentity:
+        """
+        'values' as returned by 'MP_PROGRAM_READ_IDENTITY'.
+        """
+        assert isinstance(values, list)
+        version_text, sha256 = values
+        assert isinstance(version_text, str)
+        assert isinstance(sha256, str)
+        return FirmwareIdentity(
+            micropython_full_version_text=version_text.strip(),
+            sha256=sha256.strip(),
+        )
+
+
+@dataclasses.dataclass(frozen=True)
+class FlashDecision:
+    flash: bool
+    reason: str
+
+    @property
+    def text(self) -> str:
+        action = "flash" if self.flash else "skip flashing"
+        return f"{action}: {self.reason}"
+
+
+def decide_flash(
+    expected: FirmwareIdentity,
+    running: FirmwareIdentity | None,
+) -> FlashDecision:
+    """
+    Returns if the DUT has to be flashed.
+    Flashing is only skipped on an exact match.
+    """
+    assert isinstance(expected, FirmwareIdentity)
+    assert isinstance(running, FirmwareIdentity | None)
+
+    if running is None:
+        return FlashDecision(flash=True, reason="running firmware unknown")
+    if expected.micropython_full_version_text == "":
+        return FlashDecision(flash=True, reason="expected version unknown")
+    if running.micropython_full_version_text != expected.micropython_full_version_text:
+        return FlashDecision(
+            flash=True,
+            reason=f"version differs: running '{running.micropython_full_version_text}'",
+        )
+    if running.sha256 == "":
+        return FlashDecision(flash=True, reason="firmware hash unknown")
+    if running.sha256 != expected.sha256:
+        return FlashDecision(
+            flash=True,
+            reason=f"firmware hash differs: running {running.sha256[:12]}, expected {expected.sha256[:12]}",
+        )
+    return FlashDecision(
+        flash=False,
+        reason=f"firmware {expected.sha256[:12]} '{expected.micropython_full_version_text}' already running",
+    )
@@ -0,0 +1,255 @@
+"""
+Git cache: One bare object store, a light worktree per commit.
+
+Layout on disk:
+
+  <directory>/objects.git                   The bare repo, shared by all urls
+  <directory>/lock                          flock: fetch, add and evict
+  <directory>/worktrees/<commit>            'git worktree add --detach'
+  <directory>/worktrees/<commit>.last_used  mtime is used for LRU eviction,
+                                            flock (shared) while in use
+
+* Every url is a remote of the object store. Forks of the same repo
+  share their objects.
+* The fetch is partial ('--filter=blob:none'): The commits and trees,
+  but only the blobs a worktree checks out. The tags 'v*' are fetched
+  as well: micropython derives its version from 'git describe'.
+* A ref is fetched into 'refs/fetch/<remote>/...', never read from
+  'FETCH_HEAD': Another process may fetch at the same time.
+* A commit which is already in the store is not fetched again.
+* Switching to a commit which has a worktree costs nothing.
+  Otherwise, 'git worktree add' checks out the files, which takes
+  seconds: No clone, no full clean.
+* The build output in a worktree is kept: The next build is incremental.
+* Only 'max_worktrees' worktrees are kept, the least recently used are
+  removed. A worktree in use by a session (this or another process)
+  is never removed.
+
+Several sessions (for example the shard workers) may share the cache:
+Fetch, add and evict are serialized by a file lock.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import fcntl
+import hashlib
+import logging
+import os
+import pathlib
+import re
+import subprocess
+import threading
+from collections.abc import Iterator
+
+from testbed_showcase.util_firmware_cache import split_git_ref
+
+logger = logging.getLogger(__file__)
+
+GIT_TIMEOUT_S = 600.0
+DEFAULT_MAX_WORKTREES = 4
+FILTER_DEFAULT = "blob:none"
+SUFFIX_LAST_USED = ".last_used"
+FILENAME_LOCK = "lock"
+_REF_PREFIX = "refs/worktrees"
+_REF_PREFIX_FETCH = "refs/fetch"
+_REFSPEC_TAGS = "+refs/tags/v*:refs/tags/v*"
+_RE_GIT_COMMIT = re.compile(r"^[0-9a-f]{40}$")
+_RE_GIT_SCP = re.compile(r"^[\w.-]+@[\w.-]+:")
+
+
+def is_git_url(firmware_build: str) -> bool:
+    """
+    'https://github.com/micropython/micropython.git@master' -> True
+    A local directory or a json file -> False
+    """
+    url, _ = split_git_ref(firmware_build)
+    return ("://" in url) or (_RE_GIT_SCP.match(url) is not None)
+
+
+def _short_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:12]
+
+
+class GitWorktrees:
+    def __init__(
+        self,
+        directory: pathlib.Path,
+        max_worktrees: int = DEFAULT_MAX_WORKTREES,
+        filter_spec: str | None = FILTER_DEFAULT,
+    ) -> None:
+        """
+        filter_spec: None fetches all blobs.
+        """
+        assert isinstance(directory, pathlib.Path)
+        assert max_worktrees > 0
+        self.directory = directory
+        self.max_worktrees = max_worktrees
+        self.filter_spec = filter_spec
+        self.directory_objects = directory / "objects.git"
+        self.directory_worktrees = directory / "worktrees"
+        self.fetches = 0
+        self._lock = threading.Lock()
+        self._in_use: dict[str, int] = {}
+        """
+        commit -> file descriptor holding the shared flock
+        """
+
+    def _git(self, *args: str, cwd: pathlib.Path | None = None) -> str:
+        return subprocess.run(
+            ["git", "-C", str(cwd or self.directory_objects), *args],
+            check=True,
+            capture_output=True,
+            text=True,
+            timeout=GIT_TIMEOUT_S,
+        ).stdout.strip()
+
+    @contextlib.contextmanager
+    def _locked(self) -> Iterator[None]:
+        """
+        Serializes the threads of this process and the other processes.
+        """
+        with self._lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            fd = os.open(self.directory / FILENAME_LOCK, os.O_RDWR | os.O_CREAT)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                self._init()
+                yield
+            finally:
+                os.close(fd)
+
+    def _init(self) -> None:
+        if self.directory_objects.is_dir():
+            return
+        self.directory_objects.mkdir(parents=True)
+        self._git("init", "--quiet", "--bare")
+
+    def _has_commit(self, commit: str) -> bool:
+        """
+        Not 'git cat-file -e': In a partial clone, it would fetch a missing
+        commit from the promisor remote, followed by its trees one by one.
+        """
+        return commit in self._git("rev-list", "--all").split()
+
+    def _remote(self, url: str) -> str:
+        """
+        Returns the name of the remote for 'url'. Adds it if missing.
+        """
+        remote = f"r{_short_hash(url)}"
+        if remote in self._git("remote").split():
+            return remote
+        self._git("remote", "add", remote, url)
+        if self.filter_spec is not None:
+            # The blobs missing in a worktree are fetched from this remote
+            self._git("config", f"remote.{remote}.promisor", "true")
+            self._git("config", f"remote.{remote}.partialclonefilter", self.filter_spec)
+        return remote
+
+    def _fetch(self, url: str, ref: str | None) -> str:
+        if (ref is not None) and _RE_GIT_COMMIT.match(ref) and self._has_commit(ref):
+            return ref
+        remote = self._remote(url)
+        ref = ref or "HEAD"
+        ref_fetch = f"{_REF_PREFIX_FETCH}/{remote}/{_short_hash(ref)}"
+        args = ["fetch", "--quiet", "--no-tags"]
+        if self.filter_spec is not None:
+            args.append(f"--filter={self.filter_spec}")
+        logger.info(f"git fetch {url} {ref}")
+        self._git(*args, remote, f"+{ref}:{ref_fetch}", _REFSPEC_TAGS)
+        self.fetches += 1
+        return self._git("rev-parse", f"{ref_fetch}^{{commit}}")
+
+    def fetch(self, url: str, ref: str | None) -> str:
+        """
+        Returns the commit of 'ref'. None: The HEAD of 'url'.
+        """
+        with self._locked():
+            return self._fetch(url=url, ref=ref)
+
+    def _filename_last_used(self, commit: str) -> pathlib.Path:
+        return self.directory_worktrees / (commit + SUFFIX_LAST_USED)
+
+    def _worktree(self, commit: str) -> pathlib.Path:
+        assert _RE_GIT_COMMIT.match(commit), commit
+        directory = self.directory_worktrees / commit
+        if not directory.is_dir():
+            logger.info(f"git worktree add {directory}")
+            self.directory_worktrees.mkdir(parents=True, exist_ok=True)
+            # The worktree might have been deleted without git knowing
+            self._git("worktree", "prune")
+            # Keeps the commit reachable for 'git prune'
+            self._git("update-ref", f"{_REF_PREFIX}/{commit}", commit)
+            self._git("worktree", "add", "--quiet", "--detach", str(directory), commit)
+        filename_last_used = self._filename_last_used(commit)
+        filename_last_used.touch()
+        if commit not in self._in_use:
+            fd = os.open(filename_last_used, os.O_RDWR)
+            fcntl.flock(fd, fcntl.LOCK_SH)
+            self._in_use[commit] = fd
+        self._evict()
+        return directory
+
+    def worktree(self, commit: str) -> pathlib.Path:
+        """
+        Returns the worktree of 'commit'. Creates it if missing.
+        The commit has to be fetched before.
+        The worktree is in use till 'close()'.
+        """
+        with self._locked():
+            return self._worktree(commit)
+
+    def checkout(self, firmware_build: str) -> pathlib.Path:
+        """
+        'https://github.com/micropython/micropython.git@master'
+        -> <directory>/worktrees/<commit of master>
+        """
+        url, ref = split_git_ref(firmware_build)
+        with self._locked():
+            return self._worktree(self._fetch(url=url, ref=ref))
+
+    def close(self) -> None:
+        """
+        The worktrees of this session are not in use anymore: They may be evicted.
+        """
+        with self._lock:
+            for fd in self._in_use.values():
+                os.close(fd)
+            self._in_use.clear()
+
+    @property
+    def commits(self) -> list[str]:
+        """
+        The commits with a worktree, the most recently used first.
+        """
+        if not self.directory_worktrees.is_dir():
+            return []
+        filenames = sorted(
+            self.directory_worktrees.glob(f"*{SUFFIX_LAST_USED}"),
+            key=lambda f: f.stat().st_mtime_ns,
+            reverse=True,
+        )
+        return [f.name.removesuffix(SUFFIX_LAST_USED) for f in filenames]
+
+    def _evict(self) -> None:
+        evicted = False
+        for commit in self.commits[self.max_worktrees :]:
+            filename_last_used = self._filename_last_used(commit)
+            fd = os.open(filename_last_used, os.O_RDWR)
+            try:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    logger.info(f"{commit}: worktree in use, not evicted")
+                    continue
+                directory = self.directory_worktrees / commit
+                logger.info(f"git worktree remove {directory}")
+                if directory.is_dir():
+                    self._git("worktree", "remove", "--force", str(directory))
+                self._git("update-ref", "-d", f"{_REF_PREFIX}/{commit}")
+                filename_last_used.unlink()
+                evicted = True
+            finally:
+                os.close(fd)
+        if evicted:
+            self._git("worktree", "prune")
@@ -0,0 +1,189 @@
+"""
+Per-test logs written by a background thread.
+
+'util_logging.Logs' writes the log files on the thread which logs.
+With verbose serial traffic, the test waits for the disk.
+
+Here, the records are put into a bounded queue and written by a
+'QueueListener' thread, optionally compressed by gzip or zstd.
+The logging thread never blocks: If the queue is full, records are
+dropped and counted. Also leaving the context does not wait: The
+remaining records are written and the files closed in the background.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import gzip
+import logging
+import logging.handlers
+import pathlib
+import queue
+import threading
+import typing
+
+logger = logging.getLogger(__file__)
+
+COMPRESSION_NONE = "none"
+COMPRESSION_GZIP = "gzip"
+COMPRESSION_ZSTD = "zstd"
+COMPRESSIONS = (COMPRESSION_NONE, COMPRESSION_GZIP, COMPRESSION_ZSTD)
+
+FILENAMES = {
+    logging.DEBUG: "logger_10_debug.log",
+    logging.INFO: "logger_20_info.log",
+}
+FORMAT = "%(asctime)s %(levelname)-8s %(name)s: %(message)s"
+_FORMATTER_EXCEPTION = logging.Formatter()
+
+DEFAULT_MAX_RECORDS = 100_000
+"""
+Bounds the memory: About 500 bytes per record
+"""
+
+
+def open_log(filename: pathlib.Path, compression: str) -> typing.TextIO:
+    """
+    Opens 'filename' for writing.
+    The suffix '.gz' or '.zst' is appended for a compressed file.
+    """
+    if compression == COMPRESSION_NONE:
+        return filename.open("w", encoding="utf-8")
+    if compression == COMPRESSION_GZIP:
+        return typing.cast(
+            typing.TextIO,
+            gzip.open(
+                filename.with_name(filename.name + ".gz"),
+                "wt",
+                encoding="utf-8",
+                compresslevel=6,
+            ),
+        )
+    if compression == COMPRESSION_ZSTD:
+        try:
+            import zstandard  # pylint: disable=import-outside-toplevel
+        except ImportError as e:
+            raise ValueError(
+                "zstd compression requires 'zstandard': pip install testbed_showcase[zstd]"
+            ) from e
+        return typing.cast(
+            typing.TextIO,
+            zstandard.open(
+                filename.with_name(filename.name + ".zst"),
+                "wt",
+                encoding="utf-8",
+            ),
+        )
+    raise ValueError(f"Unknown compression '{compression}', expected {COMPRESSIONS}")
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Never blocks: Drops the record if the queue is full.
+    """
+
+    def __init__(self, records: queue.Queue[typing.Any]) -> None:
+        super().__init__(records)
+        self.dropped = 0
+
+    @typing.override
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        Cheaper than the default which formats and copies the record:
+        Only what can not be done by the writer thread.
+        """
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = _FORMATTER_EXCEPTION.formatException(record.exc_info)
+        return record
+
+    @typing.override
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _QueueListener(logging.handlers.QueueListener):
+    @typing.override
+    def enqueue_sentinel(self) -> None:
+        # Wait for room in a full queue: Every record before the sentinel is written
+        self.queue.put(self._sentinel)  # type: ignore[attr-defined]
+
+
+class AsyncLogs(contextlib.AbstractContextManager["AsyncLogs"]):
+    """
+    Same purpose as 'util_logging.Logs': Collects the logs into 'directory'
+    while the context is active.
+    """
+
+    def __init__(
+        self,
+        directory: pathlib.Path,
+        compression: str = COMPRESSION_NONE,
+        max_records: int = DEFAULT_MAX_RECORDS,
+        logger_root: logging.Logger | None = None,
+    ) -> None:
+        assert isinstance(directory, pathlib.Path)
+        assert compression in COMPRESSIONS, compression
+        assert max_records > 0
+        self.directory = directory
+        self.compression = compression
+        self.max_records = max_records
+        self.logger_root = logging.getLogger() if logger_root is None else logger_root
+        self._streams: list[typing.TextIO] = []
+        self._handler: _DroppingQueueHandler | None = None
+        self._listener: _QueueListener | None = None
+        self._closer: threading.Thread | None = None
+
+    @property
+    def dropped(self) -> int:
+        return 0 if self._handler is None else self._handler.dropped
+
+    def __enter__(self) -> AsyncLogs:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        formatter = logging.Formatter(FORMAT)
+        handlers: list[logging.Handler] = []
+        for level, filename in FILENAMES.items():
+            stream = open_log(self.directory / filename, self.compression)
+            self._streams.append(stream)
+            handler = logging.StreamHandler(stream)
+            handler.setLevel(level)
+            handler.setFormatter(formatter)
+            handlers.append(handler)
+
+        records: queue.Queue[typing.Any] = queue.Queue(maxsize=self.max_records)
+        self._handler = _DroppingQueueHandler(records)
+        self._listener = _QueueListener(records, *handlers, respect_handler_level=True)
+        self._listener.start()
+        self.logger_root.addHandler(self._handler)
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        assert self._handler is not None
+        self.logger_root.removeHandler(self._handler)
+        # Not a daemon: The interpreter waits for the logs to be written
+        self._closer = threading.Thread(target=self._close, name="log_sink_close")
+        self._closer.start()
+
+    def _close(self) -> None:
+        assert self._listener is not None
+        self._listener.stop()
+        for handler in self._listener.handlers:
+            handler.close()
+        for stream in self._streams:
+            stream.close()
+        if self.dropped > 0:
+            logger.warning(
+                f"{self.directory}: {self.dropped} log records dropped, the queue was full"
+            )
+
+    def join(self, timeout: float | None = None) -> None:
+        """
+        Waits till all records are written and the files are closed.
+        """
+        if self._closer is not None:
+            self._closer.join(timeout=timeout)
@@ -0,0 +1,203 @@
+"""
+Local mirror of the mip package index.
+
+'mp_remote.mip_install_package()' downloads from micropython.org
+every time. Here, the index, the package json and the package files
+are downloaded once into a directory with the layout of the index:
+
+  <directory>/index.json
+  <directory>/package/<mpy_version>/<name>/<version>.json
+  <directory>/file/<short_hash[:2]>/<short_hash>
+
+The files are content addressed: The short hash is the start of the
+sha256 of the content and is verified on download.
+From then on, 'mip_install()' copies the files from the mirror to
+the DUT: Offline, fast and reproducible.
+
+See https://docs.micropython.org/en/latest/reference/packages.html
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import hashlib
+import json
+import logging
+import pathlib
+import typing
+import urllib.request
+
+from testbed_showcase.util_mp_remote import ExecRaw
+
+logger = logging.getLogger(__file__)
+
+MIP_INDEX_URL = "https://micropython.org/pi/v2"
+MPY_VERSION_SOURCE = "py"
+VERSION_LATEST = "latest"
+DEFAULT_TARGET = "lib"
+DOWNLOAD_TIMEOUT_S = 30.0
+
+
+@dataclasses.dataclass(frozen=True)
+class MipFile:
+    path: str
+    """
+    Relative to the target, for example 'aiohttp/__init__.py'
+    """
+    short_hash: str
+
+
+@dataclasses.dataclass(frozen=True)
+class MipPackage:
+    name: str
+    version: str
+    files: tuple[MipFile, ...]
+    deps: tuple[tuple[str, str], ...]
+    """
+    (name, version)
+    """
+
+    @staticmethod
+    def parse_spec(package: str) -> tuple[str, str]:
+        """
+        'aiohttp@0.0.3' -> ('aiohttp', '0.0.3')
+        'aiohttp' -> ('aiohttp', 'latest')
+        """
+        name, _, version = package.partition("@")
+        if (name == "") or (":" in name) or ("/" in name):
+            raise ValueError(
+                f"'{package}': Only packages of the index are mirrored, not urls"
+            )
+        return name, version or VERSION_LATEST
+
+
+def short_hash(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()[:8]
+
+
+class MipMirror:
+    def __init__(
+        self,
+        directory: pathlib.Path,
+        index_url: str = MIP_INDEX_URL,
+        offline: bool = False,
+    ) -> None:
+        """
+        'offline': Never download, fail if a package is not mirrored.
+        """
+        assert isinstance(directory, pathlib.Path)
+        self.directory = directory
+        self.index_url = index_url.rstrip("/")
+        self.offline = offline
+        self.downloads = 0
+
+    def _get(self, relative: str) -> bytes:
+        """
+        Returns the file from the mirror. Downloads it if missing.
+        """
+        filename = self.directory / relative
+        if filename.is_file():
+            return filename.read_bytes()
+        url = f"{self.index_url}/{relative}"
+        if self.offline:
+            raise ValueError(f"Offline: '{relative}' is not mirrored, url: {url}")
+        logger.info(f"mip mirror: download {url}")
+        with urllib.request.urlopen(url, timeout=DOWNLOAD_TIMEOUT_S) as response:
+            content = typing.cast(bytes, response.read())
+        self.downloads += 1
+        return self._store(filename=filename, content=content)
+
+    def _store(self, filename: pathlib.Path, content: bytes) -> bytes:
+        filename.parent.mkdir(parents=True, exist_ok=True)
+        # Atomic: Another session may read the mirror
+        filename_tmp = filename.with_name(filename.name + ".tmp")
+        filename_tmp.write_bytes(content)
+        filename_tmp.replace(filename)
+        return content
+
+    def index(self) -> dict[str, typing.Any]:
+        return typing.cast(dict[str, typing.Any], json.loads(self._get("index.json")))
+
+    def package(
+        self,
+        name: str,
+        version: str = VERSION_LATEST,
+        mpy_version: str = MPY_VERSION_SOURCE,
+    ) -> MipPackage:
+        data = json.loads(self._get(f"package/{mpy_version}/{name}/{version}.json"))
+        return MipPackage(
+            name=name,
+            version=data.get("version", version),
+            files=tuple(MipFile(path=p, short_hash=h) for p, h in data["hashes"]),
+            deps=tuple(
+                (d[0], d[1] if len(d) > 1 else VERSION_LATEST)
+                for d in data.get("deps", [])
+            ),
+        )
+
+    def file(self, mip_file: MipFile) -> bytes:
+        h = mip_file.short_hash
+        relative = f"file/{h[:2]}/{h}"
+        content = self._get(relative)
+        if short_hash(content) != h:
+            (self.directory / relative).unlink()
+            raise ValueError(
+                f"{mip_file.path}: Expected hash {h} but got {short_hash(content)}"
+            )
+        return content
+
+    def resolve(
+        self, package: str, mpy_version: str = MPY_VERSION_SOURCE
+    ) -> list[tuple[MipFile, bytes]]:
+        """
+        Returns the files of the package and all its dependencies.
+        """
+        name, version = MipPackage.parse_spec(package)
+        files: dict[str, tuple[MipFile, bytes]] = {}
+        pending = [(name, version)]
+        visited: set[str] = set()
+        while pending:
+            _name, _version = pending.pop(0)
+            if _name in visited:
+                continue
+            visited.add(_name)
+            mip_package = self.package(
+                name=_name, version=_version, mpy_version=mpy_version
+            )
+            for mip_file in mip_package.files:
+                files[mip_file.path] = (mip_file, self.file(mip_file))
+            pending.extend(mip_package.deps)
+        return list(files.values())
+
+
+def mp_program_write_file(path: str, content: bytes) -> str:
+    """
+    Writes 'content' to 'path' on the DUT, creates the parent directories.
+    """
+    lines = ["import os"]
+    parts = path.split("/")
+    for i in range(1, len(parts)):
+        directory = "/".join(parts[:i])
+        lines.append(f"try:\n    os.mkdir({directory!r})\nexcept OSError:\n    pass")
+    lines.append(f"with open({path!r}, 'wb') as _f:\n    _f.write({content!r})")
+    return "\n".join(lines) + "\n"
+
+
+def mip_install(
+    mp_remote: ExecRaw,
+    mirror: MipMirror,
+    package: str,
+    target: str = DEFAULT_TARGET,
+    mpy_version: str = MPY_VERSION_SOURCE,
+) -> list[str]:
+    """
+    Same as 'mip.install(package)' on the DUT, but the files are
+    taken from the mirror. Returns the paths written on the DUT.
+    """
+    paths: list[str] = []
+    for mip_file, content in mirror.resolve(package=package, mpy_version=mpy_version):
+        path = f"{target.rstrip('/')}/{mip_file.path}"
+        mp_remote.exec_raw(mp_program_write_file(path=path, content=content))
+        paths.append(path)
+    logger.info(f"mip install {package}: {len(paths)} files from {mirror.directory}")
+    return paths
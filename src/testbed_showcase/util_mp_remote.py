@@ -0,0 +1,185 @@
+"""
+Batched exec-and-fetch on the DUT.
+
+'mp_remote.exec_render()' followed by 'read_bytes()' or 'read_list()'
+costs one raw-REPL round trip over usb serial per call.
+
+'exec_fetch()' appends one line to the program which prints all
+requested variables: A single round trip runs the program and
+returns the values, decoded into python values.
+
+'render()' caches the compiled templates and the rendered programs:
+A parametrized test renders the same template with the same (frozen)
+'McuConfig' for every tentacle of a spec and every repetition.
+'prerender()' fills the cache at collection time.
+"""
+
+from __future__ import annotations
+
+import ast
+import functools
+import logging
+import types
+import typing
+from collections.abc import Iterable, Sequence
+
+import jinja2
+
+logger = logging.getLogger(__file__)
+
+FETCH_MARKER = "__octoprobe_fetch__"
+PREFIX_MP_PROGRAM = "MP_PROGRAM_"
+TEMPLATE_CACHE_SIZE = 64
+RENDER_CACHE_SIZE = 512
+
+
+class ExecRaw(typing.Protocol):
+    """
+    For example 'tentacle.dut.mp_remote'.
+    """
+
+    def exec_raw(self, cmd: str) -> str: ...
+
+
+@functools.lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def _template(micropython_code: str) -> jinja2.Template:
+    return jinja2.Template(micropython_code)
+
+
+@functools.lru_cache(maxsize=RENDER_CACHE_SIZE)
+def _render(
+    micropython_code: str, kwargs: tuple[tuple[str, typing.Hashable], ...]
+) -> str:
+    return _template(micropython_code).render(**dict(kwargs))
+
+
+def render(micropython_code: str, **kwargs: typing.Any) -> str:
+    """
+    Renders the jinja template like 'mp_remote.exec_render()'.
+    The result is cached by (template, kwargs), if all kwargs are hashable.
+    """
+    key = tuple(sorted(kwargs.items()))
+    try:
+        hash(key)
+    except TypeError:
+        return _template(micropython_code).render(**kwargs)
+    return _render(micropython_code, key)
+
+
+def render_cache_info() -> str:
+    info = _render.cache_info()
+    return f"Rendered programs: {info.hits} hits, {info.misses} misses, {info.currsize} cached"
+
+
+def mp_programs(module: types.ModuleType) -> list[str]:
+    """
+    The templates of a test module: All 'MP_PROGRAM_xy' string constants.
+    """
+    return [
+        value
+        for name, value in vars(module).items()
+        if name.startswith(PREFIX_MP_PROGRAM) and isinstance(value, str)
+    ]
+
+
+def prerender(templates: Iterable[str], mcu_configs: Iterable[typing.Hashable]) -> int:
+    """
+    Renders every template for every 'mcu_config' into the cache.
+    Returns the number of rendered programs.
+    """
+    count = 0
+    _mcu_configs = list(mcu_configs)
+    for template in templates:
+        for mcu_config in _mcu_configs:
+            render(template, mcu_config=mcu_config)
+            count += 1
+    if count > RENDER_CACHE_SIZE:
+        logger.warning(
+            f"{count} programs prerendered, but only {RENDER_CACHE_SIZE} are cached"
+        )
+    return count
+
+
+def exec_render(
+    mp_remote: ExecRaw,
+    micropython_code: str,
+    **kwargs: typing.Any,
+) -> str:
+    """
+    Same as 'mp_remote.exec_render()', but the rendered program is cached.
+    """
+    return mp_remote.exec_raw(render(micropython_code, **kwargs))
+
+
+def mp_program_fetch(names: Sequence[str]) -> str:
+    """
+    Prints the values of 'names' in one line, prefixed by FETCH_MARKER.
+    """
+    assert len(names) > 0
+    for name in names:
+        assert name.isidentifier(), name
+    return f"\nprint({FETCH_MARKER!r}, repr([{', '.join(names)}]))\n"
+
+
+class _BytearrayToBytes(ast.NodeTransformer):
+    """
+    MicroPython returns bytearrays, for example 'ds.scan()'.
+    'bytearray(b"...")' is replaced by the bytes literal.
+    """
+
+    @typing.override
+    def visit_Call(self, node: ast.Call) -> ast.AST:
+        if (
+            isinstance(node.func, ast.Name)
+            and (node.func.id == "bytearray")
+            and (len(node.args) == 1)
+            and (len(node.keywords) == 0)
+            and isinstance(node.args[0], ast.Constant)
+            and isinstance(node.args[0].value, bytes)
+        ):
+            return node.args[0]
+        return node
+
+
+def _literal_eval(text: str) -> typing.Any:
+    tree = _BytearrayToBytes().visit(ast.parse(text, mode="eval"))
+    return ast.literal_eval(tree)
+
+
+def decode_fetch(output: str, names: Sequence[str]) -> dict[str, typing.Any]:
+    """
+    Decodes the output of 'mp_program_fetch()'.
+    Lines printed by the program itself are skipped.
+    """
+    for line in reversed(output.splitlines()):
+        marker, _, values_text = line.strip().partition(" ")
+        if marker != FETCH_MARKER:
+            continue
+        try:
+            values = _literal_eval(values_text)
+        except (ValueError, SyntaxError) as e:
+            raise ValueError(
+                f"Values {list(names)} are not python literals: {values_text!r}"
+            ) from e
+        if (not isinstance(values, list)) or (len(values) != len(names)):
+            raise ValueError(f"Expected {len(names)} values but got {values_text!r}")
+        return dict(zip(names, values, strict=True))
+    raise ValueError(f"No values returned for {list(names)}: {output!r}")
+
+
+def exec_fetch(
+    mp_remote: ExecRaw,
+    micropython_code: str,
+    names: Sequence[str],
+    **kwargs: typing.Any,
+) -> dict[str, typing.Any]:
+    """
+    Renders and runs 'micropython_code' and returns the variables 'names':
+    One round trip instead of one 'read_xy()' per variable.
+
+    The values must have a python literal repr: bytes, str, numbers,
+    lists, tuples, dicts and None. A bytearray is returned as bytes.
+    """
+    program = render(micropython_code, **kwargs) + mp_program_fetch(names)
+    output = mp_remote.exec_raw(program)
+    return decode_fetch(output, names)
@@ -0,0 +1,343 @@
+"""
+Precompiled test programs: Upload .mpy bytecode instead of source.
+
+Compiling a program on the DUT is slow on PYBV11 and RPI_PICO and
+needs heap. Here, the rendered program is compiled by mpy-cross on
+the host, once per bytecode version, and cached on disk:
+
+  <directory>/v<bytecode_version>/<sha256 of the source>.mpy
+
+The bytecode is uploaded once per DUT and content into the DUT's cwd,
+in chunks of 'UPLOAD_CHUNK_SIZE' bytes:
+
+  octoprobe_payload_<sha256 of the bytecode[:16]>.mpy
+
+From then on, a program run only imports the module and copies its
+globals into the REPL globals: 'exec_fetch()' returns the variables
+just like in source mode. Nothing is compiled on the DUT and the
+bytecode never passes through the heap as a literal.
+The uploads are forgotten by 'invalidate()': Flashing may erase the
+file system.
+
+Source mode is the fallback if
+* no mpy-cross is installed,
+* the DUT does not report a bytecode version,
+* mpy-cross fails or emits another bytecode version,
+* the DUT fails to import bytecode: Checked once per DUT by
+  importing 'MP_PROGRAM_PROBE',
+* the upload fails.
+An exception raised by the program itself is passed on, as in source
+mode: The program is not run a second time.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import importlib.util
+import logging
+import pathlib
+import shutil
+import subprocess
+import sys
+import tempfile
+import typing
+from collections.abc import Sequence
+
+from testbed_showcase.util_mp_remote import (
+    ExecRaw,
+    decode_fetch,
+    exec_fetch,
+    mp_program_fetch,
+    render,
+)
+
+logger = logging.getLogger(__file__)
+
+MPY_MAGIC = ord("M")
+PAYLOAD_MODULE = "octoprobe_payload"
+UPLOAD_CHUNK_SIZE = 512
+SUFFIX_UPLOAD_TMP = ".tmp"
+
+MP_PROGRAM_BYTECODE_VERSION = """
+import sys
+mpy_bytecode_version = getattr(sys.implementation, '_mpy', 0) & 0xff
+"""
+
+MP_PROGRAM_PROBE = """
+mpy_probe = 1
+"""
+
+_PAYLOAD_PRELUDE = """\
+# The payload runs as module: Import what the REPL defined before
+from __main__ import *
+"""
+
+
+def mpy_cross_command() -> list[str] | None:
+    """
+    The python package 'mpy-cross' (pip install testbed_showcase[mpy])
+    may emit older bytecode versions. Else 'mpy-cross' on the PATH.
+    """
+    if importlib.util.find_spec("mpy_cross") is not None:
+        return [sys.executable, "-m", "mpy_cross"]
+    filename = shutil.which("mpy-cross")
+    if filename is None:
+        return None
+    return [filename]
+
+
+def mpy_bytecode_version(mpy: bytes) -> int | None:
+    """
+    The bytecode version from the .mpy header: b'M', version, flags, small int bits
+    """
+    if (len(mpy) < 4) or (mpy[0] != MPY_MAGIC):
+        return None
+    return mpy[1]
+
+
+def mpy_module(mpy: bytes) -> str:
+    """
+    The module name on the DUT: Content addressed.
+    """
+    return f"{PAYLOAD_MODULE}_{hashlib.sha256(mpy).hexdigest()[:16]}"
+
+
+def mp_programs_upload_mpy(mpy: bytes, module: str) -> list[str]:
+    """
+    Writes the bytecode to '<module>.mpy' on the DUT, one program per chunk.
+    The file is renamed at the end: An interrupted upload is never imported.
+    """
+    filename = f"{module}.mpy"
+    filename_tmp = filename + SUFFIX_UPLOAD_TMP
+    programs = []
+    for offset in range(0, len(mpy), UPLOAD_CHUNK_SIZE):
+        chunk = mpy[offset : offset + UPLOAD_CHUNK_SIZE]
+        mode = "ab" if offset > 0 else "wb"
+        programs.append(
+            f"""
+_f = open('{filename_tmp}', '{mode}')
+_f.write({chunk!r})
+_f.close()
+del _f
+"""
+        )
+    programs.append(
+        f"""
+import os
+os.rename('{filename_tmp}', '{filename}')
+"""
+    )
+    return programs
+
+
+def mp_program_run_mpy(module: str) -> str:
+    """
+    Imports the uploaded bytecode and copies the module globals
+    into the REPL globals. The module is removed from 'sys.modules':
+    The next import runs it again.
+    """
+    return f"""
+import sys
+sys.modules.pop('{module}', None)
+import {module}
+for _k, _v in {module}.__dict__.items():
+    if not _k.startswith('__'):
+        globals()[_k] = _v
+del {module}
+sys.modules.pop('{module}', None)
+"""
+
+
+class MpyCompiler:
+    def __init__(
+        self,
+        directory: pathlib.Path,
+        command: Sequence[str] | None,
+    ) -> None:
+        """
+        'command': See 'mpy_cross_command()'. None: Always source mode.
+        """
+        assert isinstance(directory, pathlib.Path)
+        self.directory = directory
+        self.command = None if command is None else list(command)
+        self._select_bytecode = (self.command is not None) and (
+            self.command[-2:] == ["-m", "mpy_cross"]
+        )
+        self._cache: dict[tuple[int, str], bytes | None] = {}
+        """
+        (bytecode version, sha256 of the source) -> bytecode. None: Failed to compile
+        """
+
+    def filename(self, bytecode_version: int, source: str) -> pathlib.Path:
+        digest = hashlib.sha256(source.encode("utf-8")).hexdigest()
+        return self.directory / f"v{bytecode_version}" / f"{digest}.mpy"
+
+    def compile(self, source: str, bytecode_version: int) -> bytes | None:
+        """
+        Returns the bytecode or None if it could not be compiled
+        for this bytecode version.
+        """
+        filename = self.filename(bytecode_version=bytecode_version, source=source)
+        key = (bytecode_version, filename.stem)
+        if key in self._cache:
+            return self._cache[key]
+        mpy = self._compile(
+            source=source, bytecode_version=bytecode_version, filename=filename
+        )
+        self._cache[key] = mpy
+        return mpy
+
+    def _compile(
+        self, source: str, bytecode_version: int, filename: pathlib.Path
+    ) -> bytes | None:
+        if filename.is_file():
+            return filename.read_bytes()
+        if self.command is None:
+            return None
+
+        filename.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.TemporaryDirectory(dir=filename.parent) as tmp:
+            filename_py = pathlib.Path(tmp) / f"{PAYLOAD_MODULE}.py"
+            filename_py.write_text(_PAYLOAD_PRELUDE + source)
+            filename_mpy = pathlib.Path(tmp) / f"{PAYLOAD_MODULE}.mpy"
+            args = [*self.command]
+            if self._select_bytecode:
+                args.extend(["-b", str(bytecode_version)])
+            args.extend(["-o", str(filename_mpy), str(filename_py)])
+            proc = subprocess.run(
+                args, capture_output=True, text=True, check=False, timeout=60.0
+            )
+            if proc.returncode != 0:
+                logger.warning(
+                    f"mpy-cross failed, use source mode: {proc.stderr.strip()}"
+                )
+                return None
+            mpy = filename_mpy.read_bytes()
+
+        emitted = mpy_bytecode_version(mpy)
+        if emitted != bytecode_version:
+            logger.warning(
+                f"mpy-cross emitted bytecode v{emitted}, the DUT requires v{bytecode_version}: use source mode"
+            )
+            return None
+        # Atomic: Another session may read the cache
+        filename_tmp = filename.with_suffix(".tmp")
+        filename_tmp.write_bytes(mpy)
+        filename_tmp.replace(filename)
+        return mpy
+
+
+class MpyPayloads:
+    """
+    Runs the test programs as .mpy, see 'exec_fetch()'.
+    The bytecode version of every DUT is read once and
+    has to be invalidated after flashing.
+    """
+
+    def __init__(self, compiler: MpyCompiler | None) -> None:
+        """
+        'compiler': None: Source mode.
+        """
+        self.compiler = compiler
+        self._bytecode_versions: dict[str, int | None] = {}
+        """
+        serial -> bytecode version. None: Source mode for this DUT.
+        """
+        self._uploaded: set[tuple[str, str]] = set()
+        """
+        (serial, module): The bytecode is on the DUT.
+        """
+        self.uploads = 0
+
+    def invalidate(self, serial: str) -> None:
+        self._bytecode_versions.pop(serial, None)
+        self._uploaded = {u for u in self._uploaded if u[0] != serial}
+
+    def _upload(self, mp_remote: ExecRaw, serial: str, mpy: bytes) -> str:
+        """
+        Returns the module name. Uploads the bytecode if not on the DUT.
+        """
+        module = mpy_module(mpy)
+        if (serial, module) not in self._uploaded:
+            for program in mp_programs_upload_mpy(mpy=mpy, module=module):
+                mp_remote.exec_raw(program)
+            self._uploaded.add((serial, module))
+            self.uploads += 1
+        return module
+
+    def bytecode_version(self, mp_remote: ExecRaw, serial: str) -> int | None:
+        """
+        None: Source mode for this DUT.
+        """
+        if serial not in self._bytecode_versions:
+            values = exec_fetch(
+                mp_remote, MP_PROGRAM_BYTECODE_VERSION, names=["mpy_bytecode_version"]
+            )
+            version = values["mpy_bytecode_version"]
+            if (version != 0) and not self._probe(
+                mp_remote=mp_remote, serial=serial, bytecode_version=version
+            ):
+                version = 0
+            self._bytecode_versions[serial] = None if version == 0 else version
+        return self._bytecode_versions[serial]
+
+    def _probe(self, mp_remote: ExecRaw, serial: str, bytecode_version: int) -> bool:
+        """
+        Returns True if the DUT imports bytecode: Uploads and runs 'MP_PROGRAM_PROBE'.
+        """
+        if self.compiler is None:
+            return False
+        mpy = self.compiler.compile(
+            source=render(MP_PROGRAM_PROBE), bytecode_version=bytecode_version
+        )
+        if mpy is None:
+            return False
+        try:
+            module = self._upload(mp_remote=mp_remote, serial=serial, mpy=mpy)
+            output = mp_remote.exec_raw(
+                mp_program_run_mpy(module) + mp_program_fetch(["mpy_probe"])
+            )
+            decode_fetch(output, ["mpy_probe"])
+        except Exception as e:
+            logger.warning(
+                f"{serial}: Failed to import bytecode, use source mode: {e!r}"
+            )
+            return False
+        return True
+
+    def exec_fetch(
+        self,
+        mp_remote: ExecRaw,
+        micropython_code: str,
+        names: Sequence[str],
+        serial: str,
+        **kwargs: typing.Any,
+    ) -> dict[str, typing.Any]:
+        """
+        Same as 'util_mp_remote.exec_fetch()' but runs the program as bytecode.
+        'serial' identifies the DUT.
+        """
+        mpy: bytes | None = None
+        if self.compiler is not None:
+            bytecode_version = self.bytecode_version(mp_remote=mp_remote, serial=serial)
+            if bytecode_version is not None:
+                mpy = self.compiler.compile(
+                    source=render(micropython_code, **kwargs),
+                    bytecode_version=bytecode_version,
+                )
+        if mpy is None:
+            return exec_fetch(mp_remote, micropython_code, names=names, **kwargs)
+
+        try:
+            module = self._upload(mp_remote=mp_remote, serial=serial, mpy=mpy)
+        except Exception as e:
+            logger.warning(
+                f"{serial}: Failed to upload bytecode, use source mode: {e!r}"
+            )
+            self._bytecode_versions[serial] = None
+            return exec_fetch(mp_remote, micropython_code, names=names, **kwargs)
+        # The program has not run yet: An exception is passed on
+        output = mp_remote.exec_raw(
+            mp_program_run_mpy(module) + mp_program_fetch(names)
+        )
+        return decode_fetch(output, names)
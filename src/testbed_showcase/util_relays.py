@@ -0,0 +1,114 @@
+"""
+Track the relays of the tentacles and only switch the difference.
+
+Consecutive tests with the same FUTs on the same tentacles
+do not switch any relay.
+
+The infra setup and the teardown open all relays: These calls are
+skipped, the relays stay as they are. Any other relay call, for example
+while flashing, invalidates the tentacle: All its relays are set again.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import logging
+from collections.abc import Iterable, Mapping
+
+logger = logging.getLogger(__file__)
+
+RELAY_NUMBERS = tuple(range(1, 8))
+"""
+The relays on a tentacle: See TentacleInfra.LIST_ALL_RELAYS
+"""
+
+
+def relays_for_futs(
+    relays_closed: Mapping[str, list[int]],
+    futs: Iterable[str],
+) -> list[int]:
+    """
+    'relays_closed': see TentacleSpecBase.relays_closed
+    Returns the relays to be closed for all 'futs'.
+    """
+    relays: set[int] = set()
+    for fut in futs:
+        relays.update(relays_closed.get(fut, []))
+    return sorted(relays)
+
+
+@dataclasses.dataclass(frozen=True)
+class RelaysChange:
+    close: tuple[int, ...] = ()
+    open: tuple[int, ...] = ()
+
+    @property
+    def toggled(self) -> int:
+        return len(self.close) + len(self.open)
+
+    @property
+    def is_empty(self) -> bool:
+        return self.toggled == 0
+
+
+class RelaysState:
+    def __init__(self) -> None:
+        self._closed: dict[str, frozenset[int]] = {}
+        """
+        serial -> closed relays.
+        If a serial is missing, the state of the relays is unknown.
+        """
+        self.toggled = 0
+        """
+        Counts the relays toggled since 'reset_counter()'.
+        """
+
+    def closed(self, serial: str) -> frozenset[int] | None:
+        """
+        Returns the closed relays, None if unknown.
+        """
+        return self._closed.get(serial)
+
+    def change(self, serial: str, relays_closed: Iterable[int]) -> RelaysChange:
+        """
+        Returns the relays to switch to get to 'relays_closed'.
+        """
+        closed = frozenset(relays_closed)
+        assert closed.issubset(RELAY_NUMBERS), closed
+        current = self._closed.get(serial)
+        if current is None:
+            # Unknown state: Set all relays
+            return RelaysChange(
+                close=tuple(sorted(closed)),
+                open=tuple(sorted(frozenset(RELAY_NUMBERS) - closed)),
+            )
+        return RelaysChange(
+            close=tuple(sorted(closed - current)),
+            open=tuple(sorted(current - closed)),
+        )
+
+    def applied(self, serial: str, change: RelaysChange) -> None:
+        """
+        To be called after 'change' has been applied to the tentacle.
+        """
+        current = self._closed.get(serial, frozenset())
+        self._closed[serial] = (current | frozenset(change.close)) - frozenset(
+            change.open
+        )
+        self.toggled += change.toggled
+
+    def invalidate(self, serial: str | None = None) -> None:
+        """
+        The state of the relays is unknown, for example after a powercycle.
+        """
+        if serial is None:
+            self._closed.clear()
+            return
+        self._closed.pop(serial, None)
+
+    def reset_counter(self) -> int:
+        """
+        Returns the relays toggled since the last call.
+        """
+        toggled, self.toggled = self.toggled, 0
+        return toggled
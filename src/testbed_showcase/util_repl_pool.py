@@ -0,0 +1,140 @@
+"""
+Keep the REPL connection to the DUT open across tests.
+
+Every test prepares the DUT and flashes it, which closes and reopens
+the serial port and re-enters the raw REPL: Even if the DUT already
+runs the same firmware and has not been reset.
+
+Opt-in using '--repl-keep'.
+
+The connection itself stays at 'tentacle.dut.mp_remote'.
+This pool remembers for every tentacle which firmware the DUT runs
+and which tty device the connection uses. The next test may reuse the
+connection if
+* the firmware is the same and
+* the tty device node has not been recreated: The DUT has not been
+  reset, power cycled or re-enumerated. This check is a 'stat()' and
+* the 'probe' succeeds: A soft reset and a round trip through the
+  raw REPL, see 'conftest.CtxTestrunShowcase.dut_probe()'.
+
+After flashing or power cycling, the entry is replaced or invalidated.
+A failed test invalidates the entries of its tentacles.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import logging
+import os
+import threading
+from collections.abc import Callable
+
+logger = logging.getLogger(__file__)
+
+
+@dataclasses.dataclass(frozen=True)
+class DeviceIdentity:
+    """
+    A device node is recreated when the usb device re-enumerates.
+    """
+
+    st_rdev: int
+    st_ino: int
+    st_ctime_ns: int
+
+    @staticmethod
+    def factory(tty: str) -> DeviceIdentity | None:
+        """
+        None if the device node does not exist.
+        """
+        try:
+            st = os.stat(tty)
+        except OSError:
+            return None
+        return DeviceIdentity(
+            st_rdev=st.st_rdev, st_ino=st.st_ino, st_ctime_ns=st.st_ctime_ns
+        )
+
+
+@dataclasses.dataclass
+class PoolEntry:
+    tty: str
+    identity: DeviceIdentity
+    firmware: str
+    """
+    Identifies the firmware the DUT runs, for example 'FirmwareBuildSpec:RPI_PICO2'
+    """
+    reuses: int = 0
+
+
+class ReplPool:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._entries: dict[str, PoolEntry] = {}
+        """
+        tentacle serial -> entry
+        """
+        self.connects = 0
+        self.reuses = 0
+
+    def reuse(
+        self,
+        serial: str,
+        firmware: str,
+        probe: Callable[[], bool] | None = None,
+    ) -> bool:
+        """
+        Returns True if the connection of the previous test
+        may be used: No need to prepare, flash and reconnect.
+        'probe': Returns False if the DUT does not respond.
+        """
+        with self._lock:
+            entry = self._entries.get(serial)
+            if entry is None:
+                return False
+            if entry.firmware != firmware:
+                del self._entries[serial]
+                return False
+            if DeviceIdentity.factory(entry.tty) != entry.identity:
+                logger.info(f"{serial}: {entry.tty} changed, reconnect")
+                del self._entries[serial]
+                return False
+            if (probe is not None) and not probe():
+                logger.info(f"{serial}: {entry.tty} does not respond, reconnect")
+                del self._entries[serial]
+                return False
+            entry.reuses += 1
+            self.reuses += 1
+            return True
+
+    def checkin(self, serial: str, tty: str | None, firmware: str) -> None:
+        """
+        Called after the DUT has been prepared, flashed and connected to 'tty'.
+        'tty' None: The connection can not be reused.
+        """
+        with self._lock:
+            self.connects += 1
+            self._entries.pop(serial, None)
+            if tty is None:
+                return
+            identity = DeviceIdentity.factory(tty)
+            if identity is None:
+                return
+            self._entries[serial] = PoolEntry(
+                tty=tty, identity=identity, firmware=firmware
+            )
+
+    def invalidate(self, serial: str | None = None) -> None:
+        """
+        After a power cycle or an error: The next test reconnects.
+        'serial' None: All tentacles.
+        """
+        with self._lock:
+            if serial is None:
+                self._entries.clear()
+                return
+            self._entries.pop(serial, None)
+
+    @property
+    def text(self) -> str:
+        return f"REPL connections: {self.connects} connected, {self.reuses} reused"
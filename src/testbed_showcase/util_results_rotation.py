@@ -0,0 +1,136 @@
+"""
+Rotate the results directory without blocking the session start.
+
+Deleting the results of a large run may take a long time.
+Instead, the results directory is renamed to a timestamped sibling,
+which is atomic and immediate:
+
+  results -> results_2025-03-07_14-05-33
+
+The old runs are pruned in a background thread.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import datetime
+import logging
+import os
+import pathlib
+import re
+import shutil
+import threading
+
+logger = logging.getLogger(__file__)
+
+TIMESTAMP_FORMAT = "%Y-%m-%d_%H-%M-%S"
+_RE_TIMESTAMP = re.compile(r"^\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2}(-\d+)?$")
+
+
+@dataclasses.dataclass(frozen=True)
+class ResultsRetention:
+    keep_runs: int = 3
+    """
+    Number of old runs to keep
+    """
+    keep_bytes: int = 10_000_000_000
+    """
+    Total size of the old runs to keep
+    """
+
+    def __post_init__(self) -> None:
+        assert self.keep_runs >= 0
+        assert self.keep_bytes >= 0
+
+
+def rotated_directories(directory: pathlib.Path) -> list[pathlib.Path]:
+    """
+    Returns the rotated siblings of 'directory', the newest first.
+    Other siblings like 'results_sharded' are ignored.
+    """
+    prefix = directory.name + "_"
+    if not directory.parent.is_dir():
+        return []
+    return sorted(
+        (
+            d
+            for d in directory.parent.iterdir()
+            if d.name.startswith(prefix)
+            and _RE_TIMESTAMP.match(d.name[len(prefix) :])
+            and d.is_dir()
+        ),
+        reverse=True,
+    )
+
+
+def rotate(
+    directory: pathlib.Path,
+    now: datetime.datetime | None = None,
+) -> pathlib.Path | None:
+    """
+    Renames 'directory' to a timestamped sibling and returns it.
+    Returns None if 'directory' does not exist.
+    """
+    if not directory.exists():
+        return None
+    if now is None:
+        now = datetime.datetime.now()
+    name = f"{directory.name}_{now.strftime(TIMESTAMP_FORMAT)}"
+    for i in range(100):
+        rotated = directory.with_name(name if i == 0 else f"{name}-{i}")
+        if rotated.exists():
+            continue
+        os.rename(directory, rotated)
+        return rotated
+    raise ValueError(f"Failed to rotate '{directory}': Too many runs at {now}")
+
+
+def directory_size(directory: pathlib.Path) -> int:
+    size = 0
+    for dirpath, _dirnames, filenames in os.walk(directory):
+        for filename in filenames:
+            try:
+                size += os.lstat(os.path.join(dirpath, filename)).st_size
+            except OSError:
+                pass
+    return size
+
+
+def prune(directory: pathlib.Path, retention: ResultsRetention) -> list[pathlib.Path]:
+    """
+    Deletes the rotated runs of 'directory' exceeding 'retention'.
+    Returns the deleted directories.
+    """
+    deleted: list[pathlib.Path] = []
+    total_bytes = 0
+    for i, rotated in enumerate(rotated_directories(directory)):
+        size = directory_size(rotated)
+        if (i < retention.keep_runs) and (total_bytes + size <= retention.keep_bytes):
+            total_bytes += size
+            continue
+        logger.debug(f"Prune {rotated} ({size / 1e6:0.1f}MB)")
+        shutil.rmtree(rotated, ignore_errors=True)
+        deleted.append(rotated)
+    return deleted
+
+
+def rotate_and_prune(
+    directory: pathlib.Path,
+    retention: ResultsRetention,
+) -> threading.Thread:
+    """
+    Rotates 'directory' and starts pruning in the background.
+    'directory' is free to be recreated when this function returns.
+    """
+    rotated = rotate(directory)
+    if rotated is not None:
+        logger.debug(f"Rotated {directory} to {rotated.name}")
+
+    thread = threading.Thread(
+        target=prune,
+        kwargs={"directory": directory, "retention": retention},
+        name="results_prune",
+        daemon=True,
+    )
+    thread.start()
+    return thread
@@ -0,0 +1,258 @@
+"""
+Shard one test run across several testbed instances.
+
+A shard key identifies a test independent of the serial numbers of
+the tentacles, for example
+
+  tests/test_simple.py::test_i2c|daq_saleae=DAQ_SALEAE,device_potpourry=DEVICE_POTPOURRY,mcu=MCU_RPI_PICO2(RPI_PICO2)
+
+The same shard key may be collected on several testbed instances.
+It is then run on only one of them.
+
+* Collect: Every worker runs 'pytest --collect-only --shard-collect=<file>'.
+* Assign: Every shard key is assigned to one worker, balanced by expected duration.
+* Run: Every worker runs 'pytest --shard-select=<file> --junitxml=<file>'.
+* Merge: The junit files are merged into one.
+
+The results tree:
+
+  <results>/junit.xml                           merged
+  <results>/<testbed instance>/stdout.txt       pytest output of the worker
+  <results>/<testbed instance>/testresults/     logs written by the worker ('--testresults')
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import json
+import logging
+import pathlib
+import subprocess
+import xml.etree.ElementTree as ET
+
+logger = logging.getLogger(__file__)
+
+SHARD_KEY_PROPERTY = "shard_key"
+DEFAULT_DURATION_S = 60.0
+
+FILENAME_COLLECT = "shard_collect.json"
+FILENAME_SELECT = "shard_select.json"
+FILENAME_JUNIT = "junit.xml"
+FILENAME_STDOUT = "stdout.txt"
+SUBDIR_TESTRESULTS = "testresults"
+SUBDIR_TESTRESULTS_COLLECT = "testresults_collect"
+
+# pytest: 'No tests were collected' is not an error for a shard
+_PYTEST_EXIT_OK = (0, 5)
+
+
+def shard_key(nodeid: str, tentacles: dict[str, str]) -> str:
+    """
+    'nodeid' without the parameters, 'tentacles': param name -> tentacle description
+    """
+    function_nodeid = nodeid.split("[", 1)[0]
+    if len(tentacles) == 0:
+        return function_nodeid
+    params = ",".join(f"{k}={v}" for k, v in sorted(tentacles.items()))
+    return f"{function_nodeid}|{params}"
+
+
+def write_keys(filename: pathlib.Path, keys: list[str]) -> None:
+    filename.parent.mkdir(parents=True, exist_ok=True)
+    filename.write_text(json.dumps(sorted(set(keys)), indent=4))
+
+
+def read_keys(filename: pathlib.Path) -> list[str]:
+    keys = json.loads(filename.read_text())
+    assert isinstance(keys, list)
+    return keys
+
+
+def assign_shards(
+    candidates: dict[str, list[str]],
+    durations: dict[str, float],
+) -> dict[str, list[str]]:
+    """
+    'candidates': testbed instance -> shard keys collected on this instance.
+    'durations': shard key -> expected duration.
+
+    Every shard key is assigned to exactly one testbed instance.
+    Longest first: The key goes to the instance with the least total duration.
+    """
+    instances_by_key: dict[str, list[str]] = {}
+    for instance, keys in sorted(candidates.items()):
+        for key in keys:
+            instances_by_key.setdefault(key, []).append(instance)
+
+    def duration(key: str) -> float:
+        return durations.get(key, DEFAULT_DURATION_S)
+
+    load = dict.fromkeys(candidates, 0.0)
+    shards: dict[str, list[str]] = {instance: [] for instance in candidates}
+    for key in sorted(instances_by_key, key=lambda k: (-duration(k), k)):
+        instance = min(instances_by_key[key], key=lambda i: (load[i], i))
+        load[instance] += duration(key)
+        shards[instance].append(key)
+
+    for instance in sorted(shards):
+        logger.info(
+            f"Shard {instance}: {len(shards[instance])} tests, expected {load[instance]:0.0f}s"
+        )
+    return shards
+
+
+def durations_from_junit(filename: pathlib.Path) -> dict[str, float]:
+    """
+    Reads the durations of a previous run.
+    The shard key is stored as testcase property, see SHARD_KEY_PROPERTY.
+    """
+    durations: dict[str, float] = {}
+    for testcase in ET.parse(filename).getroot().iter("testcase"):
+        for prop in testcase.iter("property"):
+            if prop.get("name") == SHARD_KEY_PROPERTY:
+                durations[prop.get("value", "")] = float(testcase.get("time", "0"))
+    return durations
+
+
+def merge_junit(
+    filenames: dict[str, pathlib.Path], filename_merged: pathlib.Path
+) -> None:
+    """
+    'filenames': testbed instance -> junit file of this instance.
+    Every instance becomes a testsuite named after the instance.
+    """
+    merged = ET.Element("testsuites")
+    totals = dict.fromkeys(("tests", "errors", "failures", "skipped"), 0)
+    total_time = 0.0
+    for instance, filename in sorted(filenames.items()):
+        if not filename.is_file():
+            logger.warning(f"Shard {instance}: Missing {filename}")
+            continue
+        root = ET.parse(filename).getroot()
+        testsuites = [root] if root.tag == "testsuite" else root.iter("testsuite")
+        for testsuite in testsuites:
+            testsuite.set("name", instance)
+            for attribute in totals:
+                totals[attribute] += int(testsuite.get(attribute, "0"))
+            total_time += float(testsuite.get("time", "0"))
+            merged.append(testsuite)
+    for attribute, value in totals.items():
+        merged.set(attribute, str(value))
+    merged.set("time", f"{total_time:0.3f}")
+    filename_merged.parent.mkdir(parents=True, exist_ok=True)
+    ET.ElementTree(merged).write(
+        filename_merged, encoding="utf-8", xml_declaration=True
+    )
+
+
+@dataclasses.dataclass(frozen=True)
+class ShardWorker:
+    testbed_instance: str
+    command: list[str]
+    """
+    Runs pytest on the testbed instance, the pytest arguments are appended.
+    Example: ['ssh', 'pi@testbed2', 'cd testbed_showcase && .venv/bin/pytest']
+    Example: ['.venv/bin/python', '-m', 'pytest']
+
+    The results directory has to be reachable by the worker, for example by nfs.
+    """
+
+    def directory(self, directory_results: pathlib.Path) -> pathlib.Path:
+        return directory_results / self.testbed_instance
+
+
+def _run_workers(
+    workers: list[ShardWorker],
+    directory_results: pathlib.Path,
+    args: dict[str, list[str]],
+) -> dict[str, int]:
+    """
+    Starts all workers in parallel and waits for them.
+    Returns the exit codes.
+    """
+    processes: dict[str, subprocess.Popen[bytes]] = {}
+    for worker in workers:
+        directory = worker.directory(directory_results)
+        directory.mkdir(parents=True, exist_ok=True)
+        command = [*worker.command, *args[worker.testbed_instance]]
+        logger.info(f"Shard {worker.testbed_instance}: {' '.join(command)}")
+        with (directory / FILENAME_STDOUT).open("ab") as f:
+            processes[worker.testbed_instance] = subprocess.Popen(
+                command, stdout=f, stderr=subprocess.STDOUT
+            )
+    return {instance: p.wait() for instance, p in processes.items()}
+
+
+def run_sharded(
+    workers: list[ShardWorker],
+    directory_results: pathlib.Path,
+    pytest_args: list[str],
+    durations: dict[str, float],
+) -> int:
+    """
+    Collects on all workers, assigns the tests and runs them.
+    Returns 0 if all shards succeeded.
+    """
+    assert len({w.testbed_instance for w in workers}) == len(workers)
+
+    returncodes = _run_workers(
+        workers=workers,
+        directory_results=directory_results,
+        args={
+            w.testbed_instance: [
+                *pytest_args,
+                "--collect-only",
+                "-q",
+                f"--shard-collect={w.directory(directory_results) / FILENAME_COLLECT}",
+                f"--testresults={w.directory(directory_results) / SUBDIR_TESTRESULTS_COLLECT}",
+            ]
+            for w in workers
+        },
+    )
+    candidates: dict[str, list[str]] = {}
+    for worker in workers:
+        filename_collect = worker.directory(directory_results) / FILENAME_COLLECT
+        if (returncodes[worker.testbed_instance] not in _PYTEST_EXIT_OK) or (
+            not filename_collect.is_file()
+        ):
+            logger.error(f"Shard {worker.testbed_instance}: Collection failed")
+            continue
+        candidates[worker.testbed_instance] = read_keys(filename_collect)
+
+    shards = assign_shards(candidates=candidates, durations=durations)
+    workers_active = [w for w in workers if len(shards.get(w.testbed_instance, [])) > 0]
+    for worker in workers_active:
+        write_keys(
+            worker.directory(directory_results) / FILENAME_SELECT,
+            shards[worker.testbed_instance],
+        )
+
+    returncodes.update(
+        _run_workers(
+            workers=workers_active,
+            directory_results=directory_results,
+            args={
+                w.testbed_instance: [
+                    *pytest_args,
+                    f"--shard-select={w.directory(directory_results) / FILENAME_SELECT}",
+                    f"--junitxml={w.directory(directory_results) / FILENAME_JUNIT}",
+                    f"--testresults={w.directory(directory_results) / SUBDIR_TESTRESULTS}",
+                ]
+                for w in workers_active
+            },
+        )
+    )
+
+    merge_junit(
+        filenames={
+            w.testbed_instance: w.directory(directory_results) / FILENAME_JUNIT
+            for w in workers_active
+        },
+        filename_merged=directory_results / FILENAME_JUNIT,
+    )
+
+    failed = sorted(i for i, rc in returncodes.items() if rc not in _PYTEST_EXIT_OK)
+    if len(failed) > 0:
+        logger.error(f"Shards failed: {', '.join(failed)}")
+        return 1
+    return 0
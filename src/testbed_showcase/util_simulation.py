@@ -0,0 +1,277 @@
+"""
+Simulated tentacles: No usb, no relays and no micropython.
+
+Used by 'util_bench_harness' to measure what tests/conftest.py
+costs apart from the hardware: The real hooks and fixtures run,
+but every call which would reach a tentacle returns immediately.
+
+The stand-ins are not subclasses of the octoprobe classes.
+'api_mismatches()' compares them with the octoprobe classes at runtime.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import inspect
+import logging
+import typing
+
+from octoprobe.lib_tentacle import TentacleBase
+from octoprobe.octoprobe import CtxTestRun
+
+from testbed_showcase.tentacle_spec import (
+    TentacleOffline,
+    TentacleShowcase,
+    TentacleSpecShowcase,
+    TentacleStateOffline,
+)
+from testbed_showcase.util_relays import RELAY_NUMBERS
+
+from . import tentacle_specs
+
+logger = logging.getLogger(__file__)
+
+TENTACLE_SPECS_MCU = (
+    tentacle_specs.MCU_PYBV11,
+    tentacle_specs.MCU_RPI_PICO,
+    tentacle_specs.MCU_RPI_PICO_W,
+    tentacle_specs.MCU_RPI_PICO2,
+)
+
+
+class SimulatedMpRemote:
+    """
+    Stands in for 'tentacle.dut.mp_remote'.
+    """
+
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def exec_raw(self, cmd: str, timeout: int | None = None) -> str:
+        self.calls += 1
+        return ""
+
+    def exec_render(self, micropython_code: str, **kwargs: typing.Any) -> str:
+        self.calls += 1
+        return ""
+
+    def read_str(self, cmd: str) -> str:
+        self.calls += 1
+        return ""
+
+    def read_list(self, cmd: str) -> list[typing.Any]:
+        self.calls += 1
+        return []
+
+    def read_bytes(self, cmd: str) -> bytes:
+        self.calls += 1
+        return b""
+
+    def mip_install_package(self, package: str, **kwargs: typing.Any) -> None:
+        self.calls += 1
+
+
+class SimulatedMcuInfra:
+    """
+    Stands in for 'tentacle.infra.mcu_infra'.
+    """
+
+    def __init__(self) -> None:
+        self.relays_closed: set[int] = set()
+
+    def relays(
+        self,
+        relays_close: list[int] | None = None,
+        relays_open: list[int] | None = None,
+    ) -> None:
+        self.relays_closed.difference_update(relays_open or [])
+        self.relays_closed.update(relays_close or [])
+
+    def active_led(self, on: bool) -> None:
+        pass
+
+
+class SimulatedInfra:
+    def __init__(self) -> None:
+        self.mcu_infra = SimulatedMcuInfra()
+
+    def load_base_code_if_needed(self) -> None:
+        pass
+
+
+class SimulatedDut:
+    def __init__(self) -> None:
+        self.mp_remote = SimulatedMpRemote()
+
+
+class SimulatedTentacle(TentacleOffline):
+    """
+    A 'TentacleOffline' which runs the tests: No usb, no relays and no micropython.
+    """
+
+    # Shadow the attributes of 'TentacleBase': See 'api_mismatches()'
+    infra: SimulatedInfra = None  # type: ignore[assignment]
+    dut: SimulatedDut = None  # type: ignore[assignment]
+
+    def __init__(
+        self,
+        tentacle_serial_number: str,
+        tentacle_spec: TentacleSpecShowcase,
+    ) -> None:
+        super().__init__(
+            tentacle_serial_number=tentacle_serial_number,
+            tentacle_spec=tentacle_spec,
+        )
+        self.infra = SimulatedInfra()
+        self.dut = SimulatedDut()
+
+
+def simulated_tentacles(count: int) -> list[SimulatedTentacle]:
+    """
+    A synthetic inventory of 'count' tentacles:
+    One DEVICE_POTPOURRY and one DAQ_SALEAE for every 20 tentacles,
+    the other tentacles are MCUs of all kinds.
+    """
+    assert count >= 3
+    count_devices = max(1, count // 20)
+    specs: list[TentacleSpecShowcase] = []
+    specs.extend([tentacle_specs.DEVICE_POTPOURRY] * count_devices)
+    specs.extend([tentacle_specs.DAQ_SALEAE] * count_devices)
+    count_mcus = count - len(specs)
+    specs.extend(
+        TENTACLE_SPECS_MCU[i % len(TENTACLE_SPECS_MCU)] for i in range(count_mcus)
+    )
+    return [
+        SimulatedTentacle(
+            tentacle_serial_number=f"{i // 0x10000:012x}-{i % 0x10000:04x}",
+            tentacle_spec=spec,
+        )
+        for i, spec in enumerate(specs)
+    ]
+
+
+class SimulatedUdevPoller:
+    def close(self) -> None:
+        pass
+
+
+def _ctxtestrun_init(
+    self: CtxTestRun,
+    connected_tentacles: typing.Sequence[TentacleShowcase],
+) -> None:
+    self.connected_tentacles = connected_tentacles  # type: ignore[misc]
+
+
+def noop(*args: typing.Any, **kwargs: typing.Any) -> None:
+    pass
+
+
+def _function_setup_infra(
+    self: CtxTestRun, udev_poller: typing.Any, tentacle: TentacleShowcase
+) -> None:
+    # Like octoprobe: The infra setup opens all relays
+    tentacle.infra.mcu_infra.relays(relays_open=list(RELAY_NUMBERS))
+
+
+def _function_teardown(
+    self: CtxTestRun, active_tentacles: typing.Sequence[TentacleShowcase]
+) -> None:
+    # Like octoprobe: The teardown opens all relays
+    for tentacle in active_tentacles:
+        tentacle.infra.mcu_infra.relays(relays_open=list(RELAY_NUMBERS))
+
+
+CTXTESTRUN_SIMULATED: dict[str, typing.Callable[..., None]] = {
+    "__init__": _ctxtestrun_init,
+    "function_prepare_dut": noop,
+    "function_setup_infra": _function_setup_infra,
+    "function_setup_dut_flash": noop,
+    "setup_relays": noop,
+    "function_teardown": _function_teardown,
+}
+"""
+The methods of 'CtxTestRun' which would access the hardware.
+"""
+
+
+def _type_hints(owner: type) -> dict[str, typing.Any]:
+    try:
+        return typing.get_type_hints(owner)
+    except NameError:
+        # A forward reference which is only imported for type checking
+        return {}
+
+
+def _annotated_class(owner: type, attribute: str) -> type | None:
+    """
+    The class of 'owner.attribute' as annotated by octoprobe.
+    None: Not annotated or not resolvable.
+    """
+    hint = _type_hints(owner).get(attribute)
+    return hint if isinstance(hint, type) else None
+
+
+def _signature_mismatches(simulated: type, real: type) -> list[str]:
+    mismatches: list[str] = []
+    for name, member in vars(simulated).items():
+        if name.startswith("_") or not callable(member):
+            continue
+        label = f"{simulated.__name__}.{name}"
+        real_member = getattr(real, name, None)
+        if real_member is None:
+            mismatches.append(f"{label}: Not in {real.__qualname__}")
+            continue
+        if not callable(real_member):
+            continue
+        params = inspect.signature(member).parameters
+        real_params = inspect.signature(real_member).parameters
+        variadic = any(
+            p.kind in (p.VAR_POSITIONAL, p.VAR_KEYWORD) for p in params.values()
+        )
+        for param in params.values():
+            if param.kind in (param.VAR_POSITIONAL, param.VAR_KEYWORD):
+                continue
+            if param.name not in real_params:
+                mismatches.append(f"{label}: Unknown parameter '{param.name}'")
+        for param in real_params.values():
+            required = (param.default is param.empty) and param.kind not in (
+                param.VAR_POSITIONAL,
+                param.VAR_KEYWORD,
+            )
+            if required and (param.name not in params) and not variadic:
+                mismatches.append(f"{label}: Missing parameter '{param.name}'")
+    return mismatches
+
+
+def api_mismatches() -> list[str]:
+    """
+    Compares the stand-ins with the octoprobe classes they replace.
+    The octoprobe classes are taken from the annotations of 'TentacleBase':
+    A stand-in is skipped if its attribute is not annotated.
+    """
+    mismatches: list[str] = []
+    pairs: list[tuple[type, type | None]] = [
+        (SimulatedInfra, _annotated_class(TentacleBase, "infra")),
+        (SimulatedDut, _annotated_class(TentacleBase, "dut")),
+        (TentacleStateOffline, _annotated_class(TentacleBase, "tentacle_state")),
+    ]
+    real_infra, real_dut = pairs[0][1], pairs[1][1]
+    if real_infra is not None:
+        pairs.append((SimulatedMcuInfra, _annotated_class(real_infra, "mcu_infra")))
+    if real_dut is not None:
+        pairs.append((SimulatedMpRemote, _annotated_class(real_dut, "mp_remote")))
+
+    for simulated, real in pairs:
+        if real is None:
+            logger.debug(f"{simulated.__name__}: octoprobe class not annotated")
+            continue
+        mismatches.extend(_signature_mismatches(simulated=simulated, real=real))
+        if dataclasses.is_dataclass(simulated):
+            for field in dataclasses.fields(simulated):
+                if not hasattr(real, field.name) and (
+                    field.name not in _type_hints(real)
+                ):
+                    mismatches.append(
+                        f"{simulated.__name__}.{field.name}: Not in {real.__qualname__}"
+                    )
+    return mismatches
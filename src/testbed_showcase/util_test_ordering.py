@@ -0,0 +1,182 @@
+"""
+Order the tests to minimize the setup cost.
+
+Between two tests
+* a tentacle has to be flashed if the firmware variant changes
+* the relays have to be switched if the FUTs change
+
+The tests are grouped by SetupKey. The groups are then ordered greedily:
+The next group is the one with the cheapest transition from the current state.
+Within a group, the collection order is preserved.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import logging
+from collections.abc import Callable
+
+logger = logging.getLogger(__file__)
+
+COST_FLASH = 30
+COST_RELAYS = 1
+
+
+@dataclasses.dataclass(frozen=True, order=True)
+class SetupKey:
+    firmwares: tuple[tuple[str, str], ...] = ()
+    """
+    (tentacle serial, board variant) for every mcu tentacle
+    """
+    tentacles: tuple[str, ...] = ()
+    """
+    Serials of all tentacles involved
+    """
+    futs: tuple[str, ...] = ()
+
+    @staticmethod
+    def factory(
+        firmwares: dict[str, str],
+        tentacles: list[str],
+        futs: list[str],
+    ) -> SetupKey:
+        return SetupKey(
+            firmwares=tuple(sorted(firmwares.items())),
+            tentacles=tuple(sorted(tentacles)),
+            futs=tuple(sorted(futs)),
+        )
+
+
+@dataclasses.dataclass
+class SetupState:
+    """
+    The state of the testbed after running some tests.
+    """
+
+    firmwares: dict[str, str] = dataclasses.field(default_factory=dict)
+    futs: dict[str, tuple[str, ...]] = dataclasses.field(default_factory=dict)
+    flashes: int = 0
+    relay_changes: int = 0
+
+    def transition(self, key: SetupKey) -> tuple[int, int]:
+        """
+        Returns (flashes, relay_changes) required to run a test with 'key'.
+        """
+        flashes = sum(
+            1
+            for serial, variant in key.firmwares
+            if self.firmwares.get(serial) != variant
+        )
+        relay_changes = sum(
+            1 for serial in key.tentacles if self.futs.get(serial) != key.futs
+        )
+        return flashes, relay_changes
+
+    def cost(self, key: SetupKey) -> int:
+        flashes, relay_changes = self.transition(key)
+        return flashes * COST_FLASH + relay_changes * COST_RELAYS
+
+    def apply(self, key: SetupKey) -> None:
+        flashes, relay_changes = self.transition(key)
+        self.flashes += flashes
+        self.relay_changes += relay_changes
+        self.firmwares.update(key.firmwares)
+        for serial in key.tentacles:
+            self.futs[serial] = key.futs
+
+    @property
+    def text(self) -> str:
+        return f"{self.flashes} flashes, {self.relay_changes} relay changes"
+
+
+def count_transitions(keys: list[SetupKey]) -> SetupState:
+    state = SetupState()
+    for key in keys:
+        state.apply(key)
+    return state
+
+
+@dataclasses.dataclass(frozen=True)
+class OrderingReport:
+    before: SetupState
+    after: SetupState
+    flashes_skipped: bool = False
+    """
+    A flash is skipped if the DUT runs the firmware already
+    (--flash-verify or --repl-keep). Else every test flashes.
+    """
+    relays_kept: bool = True
+    """
+    The relays are kept between tests (no --relays-reset).
+    Else every test switches the relays.
+    """
+
+    @property
+    def text(self) -> str:
+        def saved(name: str, before: int, after: int, active: bool, hint: str) -> str:
+            if after > before:
+                text = f"{after - before} additional {name}"
+            else:
+                text = f"saved {before - after} {name}"
+            if active:
+                return text
+            return f"potentially {text} {hint}"
+
+        flashes = saved(
+            "flashes",
+            self.before.flashes,
+            self.after.flashes,
+            active=self.flashes_skipped,
+            hint="with --flash-verify or --repl-keep",
+        )
+        relay_changes = saved(
+            "relay changes",
+            self.before.relay_changes,
+            self.after.relay_changes,
+            active=self.relays_kept,
+            hint="without --relays-reset",
+        )
+        return (
+            f"Test ordering: {self.before.text} -> {self.after.text}"
+            f" ({flashes}, {relay_changes})"
+        )
+
+
+def order_items[T](
+    items: list[T],
+    setup_key: Callable[[T], SetupKey],
+    flashes_skipped: bool = False,
+    relays_kept: bool = True,
+) -> tuple[list[T], OrderingReport]:
+    """
+    Returns the items in the order with minimal setup cost.
+    'flashes_skipped' and 'relays_kept': The options of this run, see OrderingReport.
+    """
+    groups: dict[SetupKey, list[T]] = {}
+    keys: list[SetupKey] = []
+    for item in items:
+        key = setup_key(item)
+        keys.append(key)
+        groups.setdefault(key, []).append(item)
+
+    # Dicts preserve the insertion order: On equal cost, the group
+    # which was collected first wins.
+    pending = list(groups)
+    state = SetupState()
+    ordered_keys: list[SetupKey] = []
+    while len(pending) > 0:
+        key = min(pending, key=state.cost)
+        pending.remove(key)
+        state.apply(key)
+        ordered_keys.append(key)
+
+    ordered_items = [item for key in ordered_keys for item in groups[key]]
+    assert len(ordered_items) == len(items)
+
+    report = OrderingReport(
+        before=count_transitions(keys),
+        after=count_transitions([setup_key(item) for item in ordered_items]),
+        flashes_skipped=flashes_skipped,
+        relays_kept=relays_kept,
+    )
+    return ordered_items, report
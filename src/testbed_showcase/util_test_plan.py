@@ -0,0 +1,158 @@
+"""
+The test plan of a session: Every test with its tentacles, firmware and FUTs.
+
+The plan is compiled once after collection.
+It may be written to a json file and reused with '--plan':
+The same tests are then run in the same order.
+
+The estimate counts the builds, flashes and relay changes
+without touching the hardware.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import json
+import logging
+import pathlib
+from collections.abc import Callable
+
+from .util_test_ordering import SetupKey, count_transitions
+
+logger = logging.getLogger(__file__)
+
+PLAN_VERSION = 1
+
+KIND_BUILD = "FirmwareBuildSpec"
+KIND_DOWNLOAD = "FirmwareDownloadSpec"
+KIND_NO_FLASHING = "FirmwareNoFlashingSpec"
+
+
+@dataclasses.dataclass(frozen=True)
+class PlanFirmware:
+    board_variant: str
+    """
+    Example: RPI_PICO2-RISCV
+    """
+    kind: str
+    """
+    The class name of the firmware spec, see KIND_BUILD...
+    """
+
+    @property
+    def flashes(self) -> bool:
+        return self.kind != KIND_NO_FLASHING
+
+
+@dataclasses.dataclass(frozen=True)
+class PlanTest:
+    nodeid: str
+    tentacles: dict[str, str]
+    """
+    Parameter name -> tentacle serial.
+    Example: {'mcu': 'e46340474b4c1331', 'daq_saleae': ...}
+    """
+    firmwares: dict[str, str]
+    """
+    Tentacle serial -> board variant
+    """
+    futs: list[str]
+
+    def setup_key(self, firmwares: dict[str, PlanFirmware]) -> SetupKey:
+        """
+        Only firmwares which are flashed are considered.
+        """
+        return SetupKey.factory(
+            firmwares={
+                serial: variant
+                for serial, variant in self.firmwares.items()
+                if firmwares[variant].flashes
+            },
+            tentacles=list(self.tentacles.values()),
+            futs=self.futs,
+        )
+
+
+@dataclasses.dataclass(frozen=True)
+class PlanEstimate:
+    tests: int
+    builds: int
+    flashes: int
+    relay_changes: int
+
+    @property
+    def text(self) -> str:
+        return (
+            f"Test plan: {self.tests} tests, {self.builds} firmware builds,"
+            f" {self.flashes} flashes, {self.relay_changes} relay changes"
+        )
+
+
+@dataclasses.dataclass
+class TestPlan:
+    __test__ = False  # Not a pytest test class
+
+    firmwares: list[PlanFirmware]
+    tests: list[PlanTest]
+
+    @property
+    def firmwares_by_variant(self) -> dict[str, PlanFirmware]:
+        return {f.board_variant: f for f in self.firmwares}
+
+    def estimate(self) -> PlanEstimate:
+        """
+        Upper bounds: Builds found in the firmware cache and
+        flashes skipped by '--flash-verify' are not considered.
+        """
+        firmwares = self.firmwares_by_variant
+        variants_used = {v for test in self.tests for v in test.firmwares.values()}
+        state = count_transitions([test.setup_key(firmwares) for test in self.tests])
+        return PlanEstimate(
+            tests=len(self.tests),
+            builds=sum(1 for v in variants_used if firmwares[v].kind == KIND_BUILD),
+            flashes=state.flashes,
+            relay_changes=state.relay_changes,
+        )
+
+    def write(self, filename: pathlib.Path) -> None:
+        filename.parent.mkdir(parents=True, exist_ok=True)
+        filename.write_text(
+            json.dumps(
+                {"version": PLAN_VERSION, **dataclasses.asdict(self)},
+                indent=4,
+            )
+        )
+
+    @staticmethod
+    def read(filename: pathlib.Path) -> TestPlan:
+        assert isinstance(filename, pathlib.Path)
+        plan = json.loads(filename.read_text())
+        if plan.get("version") != PLAN_VERSION:
+            raise ValueError(
+                f"{filename}: Expected version {PLAN_VERSION} but got {plan.get('version')}"
+            )
+        return TestPlan(
+            firmwares=[PlanFirmware(**f) for f in plan["firmwares"]],
+            tests=[PlanTest(**t) for t in plan["tests"]],
+        )
+
+    def order_items[T](
+        self,
+        items: list[T],
+        nodeid: Callable[[T], str],
+    ) -> tuple[list[T], list[T]]:
+        """
+        Returns (selected, deselected):
+        'selected' are the planned items in the order of the plan.
+        """
+        items_by_nodeid = {nodeid(item): item for item in items}
+        planned = [t.nodeid for t in self.tests]
+        missing = [n for n in planned if n not in items_by_nodeid]
+        if len(missing) > 0:
+            logger.warning(
+                f"Test plan: {len(missing)} planned tests were not collected: {', '.join(missing[:5])}"
+            )
+        selected = [items_by_nodeid[n] for n in planned if n in items_by_nodeid]
+        planned_set = set(planned)
+        deselected = [item for item in items if nodeid(item) not in planned_set]
+        return selected, deselected
@@ -3,17 +3,27 @@ from __future__ import annotations
 import dataclasses
 import logging
 import pathlib
-import shutil
 
 from octoprobe.octoprobe import CtxTestRun
-from octoprobe.usb_tentacle.usb_tentacle import is_serialdelimtied_valid
+from octoprobe.usb_tentacle.usb_tentacle import (
+    UsbTentacle,
+    UsbTentacles,
+    is_serialdelimtied_valid,
+)
 from octoprobe.util_pytest import util_logging
 from octoprobe.util_pytest.util_logging import Logs
 
-from testbed_showcase.constants import DIRECTORY_TESTRESULTS_DEFAULT, EnumTentacleType
+from testbed_showcase.constants import (
+    DIRECTORY_TESTRESULTS_DEFAULT,
+    EnumTentacleType,
+    FILENAME_USB_TOPOLOGY,
+)
 from testbed_showcase.tentacles_inventory import TENTACLES_INVENTORY
+from testbed_showcase.util_results_rotation import ResultsRetention, rotate_and_prune
+from testbed_showcase.util_testbed_index import TestbedIndex
+from testbed_showcase.util_usb_topology import TopologySnapshot
 
-from .tentacle_spec import TentacleShowcase
+from .tentacle_spec import TentacleOffline, TentacleShowcase, TentacleSpecShowcase
 
 logger = logging.getLogger(__file__)
 
@@ -29,16 +39,22 @@ class Testbed:
 
     workspace: str
     tentacles: list[TentacleShowcase]
-    logs: Logs
+    logs: Logs | None
+    """
+    None: No logs are written, see 'get_testbed_offline()'
+    """
+    index: TestbedIndex = dataclasses.field(init=False)
 
     def __post_init__(self) -> None:
         assert isinstance(self.tentacles, list)
-        assert isinstance(self.logs, Logs)
+        assert isinstance(self.logs, Logs | None)
         for tentacle in self.tentacles:
             assert isinstance(tentacle, TentacleShowcase)
+        self.index = TestbedIndex(tentacles=self.tentacles)
 
     def close(self) -> None:
-        self.logs.close()
+        if self.logs is not None:
+            self.logs.close()
 
     @property
     def description_short(self) -> str:
@@ -50,15 +66,10 @@ class Testbed:
         assert isinstance(tentacle_type, EnumTentacleType | None)
         assert isinstance(serial, str | None)
 
-        list_tentacles: list[TentacleShowcase] = []
-        for tentacle in self.tentacles:
-            if tentacle_type is not None:
-                if tentacle_type != tentacle.tentacle_spec_base.tentacle_type:
-                    continue
-            if serial is not None:
-                if serial != tentacle.tentacle_serial_number:
-                    continue
-            list_tentacles.append(tentacle)
+        list_tentacles = self.index.get_tentacles(
+            tentacle_type=tentacle_type,
+            serial=serial,
+        )
 
         line_criterial = f"Criteria tentacle_type='{tentacle_type}', serial='{serial}'."
 
@@ -83,15 +94,60 @@ class Testbed:
         return list_tentacles[0]
 
 
-def get_testbed() -> Testbed:
-    if DIRECTORY_TESTRESULTS_DEFAULT.exists():
-        shutil.rmtree(DIRECTORY_TESTRESULTS_DEFAULT, ignore_errors=False)
-    DIRECTORY_TESTRESULTS_DEFAULT.mkdir(parents=True, exist_ok=True)
+def query_usb_tentacles(skip_powercycle: bool) -> list[UsbTentacle]:
+    """
+    Powercycles the tentacles.
+    'skip_powercycle': Not if the usb topology is unchanged since the last session.
+    """
+    if skip_powercycle:
+        snapshot = TopologySnapshot.read(FILENAME_USB_TOPOLOGY)
+        if (snapshot is None) or (len(snapshot.entries) == 0):
+            logger.info("USB topology: No snapshot, powercycle the tentacles")
+        else:
+            differences = snapshot.differences(serials_inventory=TENTACLES_INVENTORY)
+            if len(differences) > 0:
+                logger.info(f"USB topology changed: {'; '.join(differences)}")
+            else:
+                serials = set(snapshot.serials_delimited)
+                usb_tentacles = [
+                    t
+                    for t in UsbTentacles.query(poweron=False)
+                    if t.serial_delimited in serials
+                ]
+                if len(usb_tentacles) == len(serials):
+                    logger.info("USB topology unchanged: Skip powercycle")
+                    return usb_tentacles
+                logger.info("USB topology: Tentacles not found, powercycle")
+
+    usb_tentacles = CtxTestRun.session_powercycle_tentacles()
+    TopologySnapshot.factory(
+        serials_delimited=[
+            t.serial_delimited for t in usb_tentacles if t.serial_delimited is not None
+        ]
+    ).write(FILENAME_USB_TOPOLOGY)
+    return usb_tentacles
+
+
+def get_testbed(
+    skip_powercycle: bool = False,
+    retention: ResultsRetention | None = None,
+    directory_testresults: pathlib.Path = DIRECTORY_TESTRESULTS_DEFAULT,
+) -> Testbed:
+    """
+    'skip_powercycle': Do not powercycle the tentacles if
+    the usb topology did not change.
+    'retention': The previous results are rotated and the old runs pruned in the background.
+    'directory_testresults': The logs are written here.
+    """
+    if retention is None:
+        retention = ResultsRetention()
+    rotate_and_prune(directory_testresults, retention=retention)
+    directory_testresults.mkdir(parents=True, exist_ok=True)
 
     util_logging.init_logging()
-    logs = util_logging.Logs(DIRECTORY_TESTRESULTS_DEFAULT)
+    logs = util_logging.Logs(directory_testresults)
 
-    usb_tentacles = CtxTestRun.session_powercycle_tentacles()
+    usb_tentacles = query_usb_tentacles(skip_powercycle=skip_powercycle)
     tentacles: list[TentacleShowcase] = []
     for usb_tentacle in usb_tentacles:
         serial_delimited = usb_tentacle.serial_delimited
@@ -118,3 +174,39 @@ def get_testbed() -> Testbed:
     return Testbed(
         workspace="based-on-connected-boards", tentacles=tentacles, logs=logs
     )
+
+
+def get_testbed_offline() -> Testbed:
+    """
+    The tentacles of the last usb topology snapshot, used by '--dry-run':
+    No usb access, no powercycle and no logs.
+    """
+    snapshot = TopologySnapshot.read(FILENAME_USB_TOPOLOGY)
+    if (snapshot is None) or (len(snapshot.entries) == 0):
+        raise ValueError(
+            f"No usb topology snapshot '{FILENAME_USB_TOPOLOGY}': Run the tests once or use '--plan'."
+        )
+    tentacles: list[TentacleShowcase] = []
+    for serial_delimited in snapshot.serials_delimited:
+        try:
+            tentacle_instance = TENTACLES_INVENTORY[serial_delimited]
+        except KeyError:
+            logger.warning(
+                f"Tentacle with serial {serial_delimited} is not specified in TENTACLES_INVENTORY."
+            )
+            continue
+        tentacle_spec = tentacle_instance.tentacle_spec
+        assert isinstance(tentacle_spec, TentacleSpecShowcase)
+        tentacles.append(
+            TentacleOffline(
+                tentacle_serial_number=serial_delimited,
+                tentacle_spec=tentacle_spec,
+            )
+        )
+
+    if len(tentacles) == 0:
+        raise ValueError("No tentacles in the usb topology snapshot!")
+
+    return Testbed(
+        workspace="based-on-usb-topology-snapshot", tentacles=tentacles, logs=None
+    )
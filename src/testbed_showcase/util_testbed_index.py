@@ -0,0 +1,156 @@
+"""
+Index the tentacles of a testbed.
+
+'EnumTentacleType.get_tentacles_for_type()', 'Testbed.get_tentacle()'
+and 'firmware_spec.match_board()' scan all tentacles.
+This is repeated for every test function and every firmware spec.
+
+The index
+* groups the tentacles by type and by serial
+* stores the FUTs of every tentacle as bitmask: Matching the required
+  FUTs is a single 'and'
+* memoizes the results: Every combination is only evaluated once
+
+The results are in the order of the tentacles in the testbed.
+"""
+
+from __future__ import annotations
+
+import logging
+import typing
+from collections.abc import Iterable
+
+if typing.TYPE_CHECKING:
+    from octoprobe.util_firmware_spec import FirmwareSpecBase
+
+    from .tentacle_spec import TentacleShowcase
+
+logger = logging.getLogger(__file__)
+
+
+def _firmware_spec_key(firmware_spec: FirmwareSpecBase) -> str:
+    """
+    Example: FirmwareBuildSpec:RPI_PICO2-RISCV
+    """
+    return (
+        f"{type(firmware_spec).__name__}:{firmware_spec.board_variant.name_normalized}"
+    )
+
+
+class TestbedIndex:
+    __test__ = False  # Not a pytest test class
+
+    def __init__(self, tentacles: list[TentacleShowcase]) -> None:
+        assert isinstance(tentacles, list)
+        self.tentacles = tentacles
+        self._fut_bits: dict[str, int] = {}
+        self._by_type: dict[str, list[TentacleShowcase]] = {}
+        self._by_serial: dict[str, TentacleShowcase] = {}
+        self._fut_masks: dict[str, int] = {}
+        """
+        serial -> bitmask of the FUTs of the tentacle
+        """
+        self._cache_futs: dict[tuple[str, int, str], list[TentacleShowcase]] = {}
+        """
+        (tentacle type, fut mask, firmware spec key) -> tentacles
+        """
+        self._cache_board: dict[tuple[str, str], bool] = {}
+        """
+        (firmware spec key, tentacle tag) -> firmware_spec.match_board()
+        """
+
+        for tentacle in tentacles:
+            spec = tentacle.tentacle_spec
+            serial = tentacle.tentacle_serial_number
+            self._by_type.setdefault(str(spec.tentacle_type), []).append(tentacle)
+            self._by_serial[serial] = tentacle
+            self._fut_masks[serial] = self.fut_mask(spec.futs, register=True)
+
+    def fut_mask(self, futs: Iterable[str], register: bool = False) -> int:
+        """
+        Returns the bitmask of 'futs'.
+        FUTs not provided by any tentacle do not set a bit.
+        """
+        mask = 0
+        for fut in futs:
+            bit = self._fut_bits.get(fut)
+            if bit is None:
+                if not register:
+                    continue
+                bit = 1 << len(self._fut_bits)
+                self._fut_bits[fut] = bit
+            mask |= bit
+        return mask
+
+    def get_tentacles_for_type(
+        self,
+        tentacle_type: str,
+        required_futs: Iterable[str],
+        firmware_spec: FirmwareSpecBase | None = None,
+    ) -> list[TentacleShowcase]:
+        """
+        Same as 'EnumTentacleType.get_tentacles_for_type()':
+        All tentacles of 'tentacle_type' providing at least one of 'required_futs'.
+
+        If 'firmware_spec' is given: Only the tentacles matching the board,
+        see 'match_board()'.
+        """
+        mask = self.fut_mask(required_futs)
+        spec_key = "" if firmware_spec is None else _firmware_spec_key(firmware_spec)
+        key = (str(tentacle_type), mask, spec_key)
+        tentacles = self._cache_futs.get(key)
+        if tentacles is None:
+            tentacles = [
+                t
+                for t in self._by_type.get(key[0], [])
+                if self._fut_masks[t.tentacle_serial_number] & mask
+            ]
+            if firmware_spec is not None:
+                tentacles = self.match_board(firmware_spec, tentacles)
+            self._cache_futs[key] = tentacles
+        return list(tentacles)
+
+    def get_tentacles(
+        self,
+        tentacle_type: str | None = None,
+        serial: str | None = None,
+    ) -> list[TentacleShowcase]:
+        """
+        All tentacles matching 'tentacle_type' and 'serial'.
+        See 'Testbed.get_tentacle()'.
+        """
+        if serial is not None:
+            tentacle = self._by_serial.get(serial)
+            if tentacle is None:
+                return []
+            if (tentacle_type is not None) and (
+                tentacle.tentacle_spec.tentacle_type != tentacle_type
+            ):
+                return []
+            return [tentacle]
+        if tentacle_type is not None:
+            return list(self._by_type.get(str(tentacle_type), []))
+        return list(self.tentacles)
+
+    def match_board(
+        self,
+        firmware_spec: FirmwareSpecBase,
+        tentacles: list[TentacleShowcase],
+    ) -> list[TentacleShowcase]:
+        """
+        Same as 'filter(firmware_spec.match_board, tentacles)'.
+
+        'match_board()' only depends on the tentacle spec:
+        It is called once per board variant and tentacle tag.
+        """
+        spec_key = _firmware_spec_key(firmware_spec)
+
+        def match(tentacle: TentacleShowcase) -> bool:
+            key = (spec_key, tentacle.tentacle_spec.tentacle_tag)
+            matches = self._cache_board.get(key)
+            if matches is None:
+                matches = bool(firmware_spec.match_board(tentacle))
+                self._cache_board[key] = matches
+            return matches
+
+        return [t for t in tentacles if match(t)]
@@ -0,0 +1,180 @@
+"""
+Timing spans of the test phases.
+
+Every phase, for example 'build' or 'flash' of a tentacle, is a span with
+monotonic begin and end time. Spans opened within a span are nested.
+
+At the end of the session the spans are written
+* as Chrome trace events: Open with https://ui.perfetto.dev or chrome://tracing
+* as summary table: Which phases took the most time
+"""
+
+from __future__ import annotations
+
+import contextlib
+import dataclasses
+import json
+import logging
+import pathlib
+import threading
+import time
+from collections.abc import Iterator
+
+logger = logging.getLogger(__file__)
+
+CATEGORY_TEST = "test"
+CATEGORY_PHASE = "phase"
+
+PHASE_BASE_CODE = "base_code"
+PHASE_BUILD = "build"
+PHASE_PREPARE_DUT = "prepare_dut"
+PHASE_SETUP_INFRA = "setup_infra"
+PHASE_FLASH = "flash"
+PHASE_RELAYS = "relays"
+PHASE_TEST_BODY = "test_body"
+PHASE_TEARDOWN = "teardown"
+
+
+@dataclasses.dataclass
+class Span:
+    name: str
+    category: str
+    begin_s: float
+    thread: int
+    attributes: dict[str, str]
+    end_s: float | None = None
+
+    @property
+    def duration_s(self) -> float:
+        assert self.end_s is not None
+        return self.end_s - self.begin_s
+
+
+@dataclasses.dataclass(frozen=True)
+class PhaseSummary:
+    name: str
+    count: int
+    total_s: float
+    max_s: float
+    max_attributes: dict[str, str]
+    """
+    The attributes of the slowest span
+    """
+
+
+class Tracer:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._begin_s = time.monotonic()
+        self._threads: dict[int, tuple[int, str]] = {}
+        """
+        thread ident -> (tid, thread name)
+        """
+        self.spans: list[Span] = []
+
+    def _thread(self) -> int:
+        ident = threading.get_ident()
+        with self._lock:
+            if ident not in self._threads:
+                tid = len(self._threads) + 1
+                self._threads[ident] = (tid, threading.current_thread().name)
+            return self._threads[ident][0]
+
+    @contextlib.contextmanager
+    def span(
+        self,
+        name: str,
+        category: str = CATEGORY_PHASE,
+        **attributes: str,
+    ) -> Iterator[Span]:
+        """
+        Usage: with tracer.span(PHASE_FLASH, tentacle=serial): ...
+        The span is recorded even if an exception is raised.
+        """
+        span = Span(
+            name=name,
+            category=category,
+            begin_s=time.monotonic(),
+            thread=self._thread(),
+            attributes=attributes,
+        )
+        try:
+            yield span
+        finally:
+            span.end_s = time.monotonic()
+            with self._lock:
+                self.spans.append(span)
+
+    def chrome_trace(self) -> dict[str, list[dict[str, object]]]:
+        """
+        See https://docs.google.com/document/d/1CvAClvFfyA5R-PhYUmn5OOQtYMH4h6I0nSsKchNAySU
+        """
+        events: list[dict[str, object]] = []
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s.begin_s)
+            threads = list(self._threads.values())
+        for tid, thread_name in threads:
+            events.append(
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": 1,
+                    "tid": tid,
+                    "args": {"name": thread_name},
+                }
+            )
+        for span in spans:
+            events.append(
+                {
+                    "name": span.name,
+                    "cat": span.category,
+                    "ph": "X",
+                    "ts": round((span.begin_s - self._begin_s) * 1e6),
+                    "dur": round(span.duration_s * 1e6),
+                    "pid": 1,
+                    "tid": span.thread,
+                    "args": span.attributes,
+                }
+            )
+        return {"traceEvents": events}
+
+    def summary(self) -> list[PhaseSummary]:
+        """
+        Returns the phases, the most total time first.
+        """
+        with self._lock:
+            spans = [s for s in self.spans if s.category == CATEGORY_PHASE]
+        by_name: dict[str, list[Span]] = {}
+        for span in spans:
+            by_name.setdefault(span.name, []).append(span)
+        summaries: list[PhaseSummary] = []
+        for name, _spans in by_name.items():
+            slowest = max(_spans, key=lambda s: s.duration_s)
+            summaries.append(
+                PhaseSummary(
+                    name=name,
+                    count=len(_spans),
+                    total_s=sum(s.duration_s for s in _spans),
+                    max_s=slowest.duration_s,
+                    max_attributes=slowest.attributes,
+                )
+            )
+        return sorted(summaries, key=lambda s: s.total_s, reverse=True)
+
+    def summary_text(self) -> str:
+        lines = [
+            f"{'phase':<14} {'count':>6} {'total':>9} {'mean':>8} {'max':>8}  slowest"
+        ]
+        for s in self.summary():
+            slowest = ", ".join(f"{k}={v}" for k, v in sorted(s.max_attributes.items()))
+            lines.append(
+                f"{s.name:<14} {s.count:>6} {s.total_s:>8.1f}s {s.total_s / s.count:>7.1f}s {s.max_s:>7.1f}s  {slowest}"
+            )
+        return "\n".join(lines)
+
+    def write(
+        self, filename_trace: pathlib.Path, filename_summary: pathlib.Path
+    ) -> None:
+        filename_trace.parent.mkdir(parents=True, exist_ok=True)
+        filename_trace.write_text(json.dumps(self.chrome_trace()))
+        filename_summary.write_text(self.summary_text() + "\n")
@@ -0,0 +1,189 @@
+"""
+Snapshot of the USB topology of the tentacles.
+
+A full powercycle of all tentacles takes tens of seconds.
+After the powercycle, the topology is written to a snapshot:
+For every tentacle the usb port of the infra RP2 and its tty.
+
+Using '--powercycle-skip', the snapshot is compared with sysfs on the
+next session start. This takes milliseconds. Only if it does not match
+anymore, for example as a tentacle was added, removed or plugged into
+another port, the tentacles are powercycled again.
+
+udev creates the tty devices from the same sysfs entries:
+Reading sysfs is sufficient.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import json
+import logging
+import pathlib
+from collections.abc import Iterable
+
+logger = logging.getLogger(__file__)
+
+SYSFS_USB_DEVICES = pathlib.Path("/sys/bus/usb/devices")
+DIRECTORY_DEV = pathlib.Path("/dev")
+USB_VENDOR_RP2 = "2e8a"
+"""
+idVendor of the RP2 on the tentacle infra
+"""
+
+SNAPSHOT_VERSION = 1
+
+
+def serial_from_delimited(serial_delimited: str) -> str:
+    """
+    Example: 'e46340474b17-4429' -> 'e46340474b174429'
+    """
+    return serial_delimited.replace("-", "")
+
+
+@dataclasses.dataclass(frozen=True, order=True)
+class TopologyEntry:
+    serial_delimited: str
+    """
+    Example: e46340474b17-4429
+    """
+    usb_port: str
+    """
+    The sysfs name of the usb device.
+    Example: 1-4.2.1
+    """
+    tty: str
+    """
+    Example: /dev/ttyACM3. Empty if the infra does not provide a tty.
+    """
+
+
+def _read_attribute(directory: pathlib.Path, name: str) -> str | None:
+    try:
+        return (directory / name).read_text().strip()
+    except OSError:
+        return None
+
+
+def _find_tty(directory: pathlib.Path, directory_dev: pathlib.Path) -> str:
+    for tty in sorted(directory.glob(f"{directory.name}:*/tty/tty*")):
+        return str(directory_dev / tty.name)
+    return ""
+
+
+def scan_sysfs(
+    sysfs: pathlib.Path = SYSFS_USB_DEVICES,
+    directory_dev: pathlib.Path = DIRECTORY_DEV,
+) -> dict[str, tuple[str, str]]:
+    """
+    Returns all RP2 usb devices: serial -> (usb port, tty)
+    Note: Also a RPI_PICO DUT is a RP2 device.
+    """
+    devices: dict[str, tuple[str, str]] = {}
+    if not sysfs.is_dir():
+        return devices
+    for directory in sysfs.iterdir():
+        if ":" in directory.name:
+            # An interface, not a device
+            continue
+        if _read_attribute(directory, "idVendor") != USB_VENDOR_RP2:
+            continue
+        serial = _read_attribute(directory, "serial")
+        if serial is None:
+            continue
+        devices[serial] = (directory.name, _find_tty(directory, directory_dev))
+    return devices
+
+
+@dataclasses.dataclass
+class TopologySnapshot:
+    entries: list[TopologyEntry]
+
+    @property
+    def serials_delimited(self) -> list[str]:
+        return [e.serial_delimited for e in self.entries]
+
+    @staticmethod
+    def factory(
+        serials_delimited: Iterable[str],
+        sysfs: pathlib.Path = SYSFS_USB_DEVICES,
+        directory_dev: pathlib.Path = DIRECTORY_DEV,
+    ) -> TopologySnapshot:
+        """
+        Takes the snapshot for the tentacles found by the powercycle.
+        """
+        devices = scan_sysfs(sysfs=sysfs, directory_dev=directory_dev)
+        entries: list[TopologyEntry] = []
+        for serial_delimited in serials_delimited:
+            device = devices.get(serial_from_delimited(serial_delimited))
+            if device is None:
+                logger.warning(f"Tentacle {serial_delimited}: Not found in {sysfs}")
+                continue
+            usb_port, tty = device
+            entries.append(TopologyEntry(serial_delimited, usb_port, tty))
+        return TopologySnapshot(entries=sorted(entries))
+
+    def differences(
+        self,
+        serials_inventory: Iterable[str],
+        sysfs: pathlib.Path = SYSFS_USB_DEVICES,
+        directory_dev: pathlib.Path = DIRECTORY_DEV,
+    ) -> list[str]:
+        """
+        Compares the snapshot with sysfs.
+        'serials_inventory': serials_delimited of all known tentacles: Used to
+        detect tentacles connected after the snapshot was taken.
+        Returns the differences, empty if the snapshot still matches.
+        """
+        devices = scan_sysfs(sysfs=sysfs, directory_dev=directory_dev)
+        differences: list[str] = []
+        for entry in self.entries:
+            device = devices.get(serial_from_delimited(entry.serial_delimited))
+            if device is None:
+                differences.append(f"{entry.serial_delimited}: disconnected")
+                continue
+            usb_port, tty = device
+            if usb_port != entry.usb_port:
+                differences.append(
+                    f"{entry.serial_delimited}: moved from port {entry.usb_port} to {usb_port}"
+                )
+            if tty != entry.tty:
+                differences.append(
+                    f"{entry.serial_delimited}: tty changed from '{entry.tty}' to '{tty}'"
+                )
+            elif (tty != "") and not pathlib.Path(tty).exists():
+                differences.append(f"{entry.serial_delimited}: {tty} does not exist")
+
+        known = set(self.serials_delimited)
+        for serial_delimited in serials_inventory:
+            if serial_delimited in known:
+                continue
+            if serial_from_delimited(serial_delimited) in devices:
+                differences.append(f"{serial_delimited}: connected")
+        return differences
+
+    def write(self, filename: pathlib.Path) -> None:
+        filename.write_text(
+            json.dumps(
+                {
+                    "version": SNAPSHOT_VERSION,
+                    "entries": [dataclasses.asdict(e) for e in self.entries],
+                },
+                indent=4,
+            )
+        )
+
+    @staticmethod
+    def read(filename: pathlib.Path) -> TopologySnapshot | None:
+        """
+        Returns None if there is no valid snapshot.
+        """
+        try:
+            snapshot = json.loads(filename.read_text())
+        except (OSError, ValueError):
+            return None
+        if snapshot.get("version") != SNAPSHOT_VERSION:
+            return None
+        return TopologySnapshot(
+            entries=[TopologyEntry(**e) for e in snapshot["entries"]]
+        )
@@ -1,3 +1,5 @@
+import concurrent.futures
+import contextlib
 import copy
 import logging
 import pathlib
@@ -7,7 +9,12 @@ from collections.abc import Iterator
 
 import pytest
 from octoprobe.octoprobe import CtxTestRun
-from octoprobe.util_firmware_spec import FirmwareNoFlashingSpec, FirmwareSpecBase
+from octoprobe.util_firmware_spec import (
+    FirmwareBuildSpec,
+    FirmwareDownloadSpec,
+    FirmwareNoFlashingSpec,
+    FirmwareSpecBase,
+)
 from octoprobe.util_pytest import util_logging
 from octoprobe.util_pytest.util_resultdir import ResultsDir
 from octoprobe.util_pytest.util_vscode import break_into_debugger_on_exception
@@ -19,25 +26,112 @@ from testbed_micropython.util_firmware_mpbuild_interface import ArgsFirmware
 
 import testbed_showcase.util_testbed
 from testbed_showcase.constants import (
+    DIRECTORY_FIRMWARE_CACHE,
+    DIRECTORY_FIRMWARE_DOWNLOADS,
     DIRECTORY_GIT_CACHE,
+    DIRECTORY_GIT_WORKTREES,
+    DIRECTORY_MIP_MIRROR,
+    DIRECTORY_MPY_CACHE,
     DIRECTORY_TESTRESULTS_DEFAULT,
     EnumFut,
     EnumTentacleType,
     FILENAME_TESTBED_LOCK,
+    FIRMWARE_CACHE_MAX_BYTES,
 )
 from testbed_showcase.tentacle_spec import TentacleShowcase
+from testbed_showcase.util_concurrent_setup import setup_concurrent
+from testbed_showcase.util_daq_capture import DaqCapture, daq_source_factory
+from testbed_showcase.util_download_cache import DownloadCache
+from testbed_showcase.util_firmware_cache import FirmwareCache
+from testbed_showcase.util_firmware_mpbuild import FirmwareBuilder
 from testbed_showcase.util_firmware_specs import (
     DEFAULT_PYTEST_OPT_FIRMWARE,
     PYTEST_OPT_FIRMWARE,
     get_firmware_specs,
 )
-from testbed_showcase.util_testbed import Testbed, get_testbed
+from testbed_showcase.util_flash_verify import (
+    FirmwareIdentity,
+    MP_PROGRAM_DELETE_SHA256,
+    MP_PROGRAM_READ_IDENTITY,
+    decide_flash,
+    firmware_sha256,
+    mp_program_write_sha256,
+)
+from testbed_showcase.util_git_worktrees import GitWorktrees
+from testbed_showcase.util_log_sink import AsyncLogs, COMPRESSIONS, COMPRESSION_NONE
+from testbed_showcase.util_mip_mirror import MipMirror
+from testbed_showcase.util_mp_remote import (
+    exec_fetch,
+    mp_programs,
+    prerender,
+    render_cache_info,
+)
+from testbed_showcase.util_mpy import MpyCompiler, MpyPayloads, mpy_cross_command
+from testbed_showcase.util_relays import RelaysChange, RelaysState, relays_for_futs
+from testbed_showcase.util_repl_pool import ReplPool
+from testbed_showcase.util_results_rotation import ResultsRetention
+from testbed_showcase.util_shard import (
+    SHARD_KEY_PROPERTY,
+    read_keys,
+    shard_key,
+    write_keys,
+)
+from testbed_showcase.util_test_ordering import OrderingReport, SetupKey, order_items
+from testbed_showcase.util_test_plan import PlanFirmware, PlanTest, TestPlan
+from testbed_showcase.util_testbed import Testbed, get_testbed, get_testbed_offline
+from testbed_showcase.util_trace import (
+    CATEGORY_TEST,
+    PHASE_BASE_CODE,
+    PHASE_BUILD,
+    PHASE_FLASH,
+    PHASE_PREPARE_DUT,
+    PHASE_RELAYS,
+    PHASE_SETUP_INFRA,
+    PHASE_TEARDOWN,
+    PHASE_TEST_BODY,
+    Tracer,
+)
 
 logger = logging.getLogger(__file__)
 
 TESTBED: Testbed | None = None
+FIRMWARE_BUILDER: FirmwareBuilder | None = None
+ORDERING_REPORT: OrderingReport | None = None
+FIRMWARE_SPECS: list[FirmwareSpecBase] | None = None
+TEST_PLAN: TestPlan | None = None
+TRACER = Tracer()
+FILENAME_TRACE = "trace.json"
+FILENAME_TRACE_SUMMARY = "trace_summary.txt"
 DIRECTORY_OF_THIS_FILE = pathlib.Path(__file__).parent
 
+PYTEST_OPT_SETUP_CONCURRENT = "--setup-concurrent"
+PYTEST_OPT_NO_FIRMWARE_CACHE = "--no-firmware-cache"
+PYTEST_OPT_FIRMWARE_PREBUILD_WORKERS = "--firmware-prebuild-workers"
+PYTEST_OPT_GIT_WORKTREES_KEEP = "--git-worktrees-keep"
+PYTEST_OPT_FLASH_VERIFY = "--flash-verify"
+PYTEST_OPT_KEEP_TEST_ORDER = "--keep-test-order"
+PYTEST_OPT_SHARD_COLLECT = "--shard-collect"
+PYTEST_OPT_SHARD_SELECT = "--shard-select"
+PYTEST_OPT_TESTRESULTS = "--testresults"
+PYTEST_OPT_RELAYS_RESET = "--relays-reset"
+PYTEST_OPT_PLAN = "--plan"
+PYTEST_OPT_PLAN_WRITE = "--plan-write"
+PYTEST_OPT_DRY_RUN = "--dry-run"
+PYTEST_OPT_POWERCYCLE_SKIP = "--powercycle-skip"
+PYTEST_OPT_RESULTS_KEEP_RUNS = "--results-keep-runs"
+PYTEST_OPT_RESULTS_KEEP_GB = "--results-keep-gb"
+PYTEST_OPT_LOG_ASYNC = "--log-async"
+PYTEST_OPT_LOG_COMPRESSION = "--log-compression"
+PYTEST_OPT_MPY = "--mpy"
+PYTEST_OPT_MIP_OFFLINE = "--mip-offline"
+PYTEST_OPT_REPL_KEEP = "--repl-keep"
+REPL_PROBE_TIMEOUT_S = 2
+PYTEST_OPT_DAQ = "--daq"
+PYTEST_OPT_DAQ_EDGES = "--daq-edges"
+PYTEST_OPT_DAQ_EDGES_RETAIN = "--daq-edges-retain"
+
+USER_PROPERTY_RELAYS_TOGGLED = "relays_toggled"
+
 DEFAULT_FIRMWARE_SPEC = (
     testbed_showcase.constants.DIRECTORY_REPO
     / "pytest_args_firmware_RPI_PICO2_v1.24.0.json"
@@ -67,6 +161,7 @@ def pytest_generate_tests(metafunc: pytest.Metafunc) -> None:
     #     print(f" {marker!r}")
 
     assert TESTBED is not None
+    assert FIRMWARE_SPECS is not None
 
     def get_marker(name: str) -> pytest.Mark:
         for marker in metafunc.definition.own_markers:
@@ -103,25 +198,24 @@ def pytest_generate_tests(metafunc: pytest.Metafunc) -> None:
 
         list_tentacles: list[TentacleShowcase] = []
         firmware_spec: FirmwareSpecBase = FirmwareNoFlashingSpec.factory()
-        for firmware_spec in get_firmware_specs(
-            config=metafunc.config,
-            tentacles=TESTBED.tentacles,
-        ):
+        for firmware_spec in FIRMWARE_SPECS:
             assert isinstance(firmware_spec, FirmwareSpecBase)
-            tentacles = EnumTentacleType.TENTACLE_MCU.get_tentacles_for_type(
-                tentacles=TESTBED.tentacles,
+            tentacles = TESTBED.index.get_tentacles_for_type(
+                tentacle_type=EnumTentacleType.TENTACLE_MCU,
                 required_futs=_required_futs,
+                firmware_spec=firmware_spec,
             )
-            tentacles = list(filter(firmware_spec.match_board, tentacles))
             if len(tentacles) == 0:
                 warning(firmware_spec=firmware_spec, futs=_required_futs)
             for tentacle in tentacles:
-                # TODO: This might be not required anymore!!!
                 # Need to create a copy to the tentacle as we
                 # modify it for the test.
+                # 'tentacle_state' has to be copied too, else all copies
+                # would end up with the last firmware_spec.
                 _tentacle = copy.copy(tentacle)
+                _tentacle.tentacle_state = copy.copy(tentacle.tentacle_state)
                 _tentacle.tentacle_state.firmware_spec = firmware_spec
-                list_tentacles.append(tentacle)
+                list_tentacles.append(_tentacle)
 
         if len(list_tentacles) == 0:
             warning(firmware_spec=firmware_spec, futs=[])
@@ -130,8 +224,8 @@ def pytest_generate_tests(metafunc: pytest.Metafunc) -> None:
         metafunc.parametrize("mcu", list_tentacles, ids=lambda t: t.pytest_id)
 
     if "device_potpourry" in metafunc.fixturenames:
-        tentacles = EnumTentacleType.TENTACLE_DEVICE_POTPOURRY.get_tentacles_for_type(
-            TESTBED.tentacles,
+        tentacles = TESTBED.index.get_tentacles_for_type(
+            tentacle_type=EnumTentacleType.TENTACLE_DEVICE_POTPOURRY,
             required_futs=_required_futs,
         )
         if len(tentacles) == 0:
@@ -144,8 +238,8 @@ def pytest_generate_tests(metafunc: pytest.Metafunc) -> None:
         )
 
     if "daq_saleae" in metafunc.fixturenames:
-        tentacles = EnumTentacleType.TENTACLE_DAQ_SALEAE.get_tentacles_for_type(
-            TESTBED.tentacles,
+        tentacles = TESTBED.index.get_tentacles_for_type(
+            tentacle_type=EnumTentacleType.TENTACLE_DAQ_SALEAE,
             required_futs=_required_futs,
         )
         # assert len(tentacles) > 0
@@ -160,6 +254,175 @@ def pytest_generate_tests(metafunc: pytest.Metafunc) -> None:
         )
 
 
+def setup_key(item: pytest.Item) -> SetupKey:
+    """
+    Tests with the same SetupKey may run one after
+    the other without flashing or switching relays.
+    """
+    tentacles: list[TentacleShowcase] = []
+    callspec = getattr(item, "callspec", None)
+    if callspec is not None:
+        tentacles = [
+            t for t in callspec.params.values() if isinstance(t, TentacleShowcase)
+        ]
+    marker = item.get_closest_marker("required_futs")
+    futs = [] if marker is None else [str(fut) for fut in marker.args]
+    return SetupKey.factory(
+        firmwares={
+            t.tentacle_serial_number: t.tentacle_state.firmware_spec.board_variant.name_normalized
+            for t in tentacles
+            if t.is_mcu and (t.tentacle_state.firmware_spec is not None)
+        },
+        tentacles=[t.tentacle_serial_number for t in tentacles],
+        futs=futs,
+    )
+
+
+def item_shard_key(item: pytest.Item) -> str:
+    """
+    Identifies the test independent of the tentacle serial numbers.
+    See util_shard.
+    """
+    tentacles: dict[str, str] = {}
+    callspec = getattr(item, "callspec", None)
+    if callspec is not None:
+        for name, tentacle in callspec.params.items():
+            if not isinstance(tentacle, TentacleShowcase):
+                continue
+            description = tentacle.tentacle_spec.tentacle_tag
+            firmware_spec = tentacle.tentacle_state.firmware_spec
+            if tentacle.is_mcu and (firmware_spec is not None):
+                description += f"({firmware_spec.board_variant.name_normalized})"
+            tentacles[name] = description
+    return shard_key(nodeid=item.nodeid, tentacles=tentacles)
+
+
+def plan_firmware(firmware_spec: FirmwareSpecBase) -> PlanFirmware:
+    return PlanFirmware(
+        board_variant=firmware_spec.board_variant.name_normalized,
+        kind=type(firmware_spec).__name__,
+    )
+
+
+def plan_test(item: pytest.Item) -> PlanTest:
+    tentacles: dict[str, TentacleShowcase] = {}
+    callspec = getattr(item, "callspec", None)
+    if callspec is not None:
+        tentacles = {
+            name: t
+            for name, t in callspec.params.items()
+            if isinstance(t, TentacleShowcase)
+        }
+    marker = item.get_closest_marker("required_futs")
+    return PlanTest(
+        nodeid=item.nodeid,
+        tentacles={name: t.tentacle_serial_number for name, t in tentacles.items()},
+        firmwares={
+            t.tentacle_serial_number: t.tentacle_state.firmware_spec.board_variant.name_normalized
+            for t in tentacles.values()
+            if t.is_mcu and (t.tentacle_state.firmware_spec is not None)
+        },
+        futs=[] if marker is None else [str(fut) for fut in marker.args],
+    )
+
+
+def compile_test_plan(items: list[pytest.Item]) -> TestPlan:
+    assert FIRMWARE_SPECS is not None
+    firmwares = {f.board_variant: f for f in map(plan_firmware, FIRMWARE_SPECS)}
+    return TestPlan(
+        firmwares=list(firmwares.values()),
+        tests=[plan_test(item) for item in items],
+    )
+
+
+def pytest_collection_modifyitems(
+    session: pytest.Session,
+    config: pytest.Config,
+    items: list[pytest.Item],
+) -> None:
+    """
+    Reorders the tests to minimize flashing and relay switching.
+    Using '--plan': Runs the planned tests in the planned order.
+    """
+    global ORDERING_REPORT  # pylint: disable=W0603:global-statement
+    global TEST_PLAN  # pylint: disable=W0603:global-statement
+
+    shard_keys = {item: item_shard_key(item) for item in items}
+    for item, key in shard_keys.items():
+        item.user_properties.append((SHARD_KEY_PROPERTY, key))
+
+    filename_shard_collect = config.getoption(PYTEST_OPT_SHARD_COLLECT)
+    if filename_shard_collect is not None:
+        write_keys(pathlib.Path(filename_shard_collect), list(shard_keys.values()))
+
+    filename_shard_select = config.getoption(PYTEST_OPT_SHARD_SELECT)
+    if filename_shard_select is not None:
+        selected = set(read_keys(pathlib.Path(filename_shard_select)))
+        deselected = [item for item in items if shard_keys[item] not in selected]
+        if len(deselected) > 0:
+            config.hook.pytest_deselected(items=deselected)
+            items[:] = [item for item in items if shard_keys[item] in selected]
+
+    filename_plan = config.getoption(PYTEST_OPT_PLAN)
+    if filename_plan is not None:
+        selected_items, deselected = TestPlan.read(
+            pathlib.Path(filename_plan)
+        ).order_items(items=items, nodeid=lambda item: item.nodeid)
+        if len(deselected) > 0:
+            config.hook.pytest_deselected(items=deselected)
+        items[:] = selected_items
+    elif not config.getoption(PYTEST_OPT_KEEP_TEST_ORDER):
+        items[:], ORDERING_REPORT = order_items(
+            items=items,
+            setup_key=setup_key,
+            flashes_skipped=config.getoption(PYTEST_OPT_FLASH_VERIFY)
+            or config.getoption(PYTEST_OPT_REPL_KEEP),
+            relays_kept=not config.getoption(PYTEST_OPT_RELAYS_RESET),
+        )
+        logger.info(ORDERING_REPORT.text)
+
+    TEST_PLAN = compile_test_plan(items=items)
+    logger.info(TEST_PLAN.estimate().text)
+    filename_plan_write = config.getoption(PYTEST_OPT_PLAN_WRITE)
+    if filename_plan_write is not None:
+        TEST_PLAN.write(pathlib.Path(filename_plan_write))
+
+    if config.getoption(PYTEST_OPT_DRY_RUN):
+        config.hook.pytest_deselected(items=list(items))
+        items[:] = []
+        return
+
+    prerender_mp_programs(items=items)
+
+
+def prerender_mp_programs(items: list[pytest.Item]) -> None:
+    """
+    Renders the 'MP_PROGRAM_xy' templates of the test modules
+    for every McuConfig: The tests only lookup the rendered programs.
+    """
+    assert TESTBED is not None
+    modules = {item.module for item in items if isinstance(item, pytest.Function)}
+    mcu_configs = {
+        t.tentacle_spec.mcu_config
+        for t in TESTBED.tentacles
+        if t.is_mcu and (t.tentacle_spec.mcu_config is not None)
+    }
+    count = prerender(
+        templates=[p for module in modules for p in mp_programs(module)],
+        mcu_configs=mcu_configs,
+    )
+    logger.info(f"Prerendered {count} micropython programs")
+
+
+def pytest_report_collectionfinish(config: pytest.Config) -> list[str]:
+    lines: list[str] = []
+    if ORDERING_REPORT is not None:
+        lines.append(ORDERING_REPORT.text)
+    if TEST_PLAN is not None:
+        lines.append(TEST_PLAN.estimate().text)
+    return lines
+
+
 @pytest.fixture
 def required_futs(request: pytest.FixtureRequest) -> list[EnumFut]:
     """
@@ -194,17 +457,390 @@ class CtxTestrunShowcase(CtxTestRun):
     def __init__(
         self,
         connected_tentacles: typing.Sequence[TentacleShowcase],
-        args_firmware: ArgsFirmware,
+        firmware_builder: FirmwareBuilder,
+        setup_concurrent: bool,
+        flash_verify: bool,
+        relays_reset: bool,
+        tracer: Tracer,
+        mpy_payloads: MpyPayloads,
+        repl_keep: bool,
     ) -> None:
-        assert isinstance(args_firmware, ArgsFirmware)
+        assert isinstance(firmware_builder, FirmwareBuilder)
+        assert isinstance(setup_concurrent, bool)
+        assert isinstance(flash_verify, bool)
+        assert isinstance(relays_reset, bool)
+        assert isinstance(tracer, Tracer)
+        assert isinstance(mpy_payloads, MpyPayloads)
+        assert isinstance(repl_keep, bool)
         super().__init__(connected_tentacles=connected_tentacles)
-        self.args_firmware = args_firmware
+        self.tentacles = list(connected_tentacles)
+        self.firmware_builder = firmware_builder
+        self.setup_concurrent = setup_concurrent
+        self.flash_verify = flash_verify
+        self.tracer = tracer
+        self.mpy_payloads = mpy_payloads
+        self.relays_state: RelaysState | None = None
+        """
+        None: The relays are set and reset for every test (--relays-reset).
+        Else: Only the difference to the previous test is switched.
+        """
+        if not relays_reset:
+            self.relays_state = RelaysState()
+        self.repl_pool: ReplPool | None = None
+        """
+        None: Every test prepares, flashes and reconnects the DUT.
+        Else (--repl-keep): The REPL connection is kept while the DUT
+        runs the same firmware and responds.
+        """
+        if repl_keep:
+            self.repl_pool = ReplPool()
         self.udev_poller = UdevPoller()
 
     @typing.override
     def session_teardown(self) -> None:
+        if self.relays_state is not None:
+            for tentacle in self.tentacles:
+                if self.relays_state.closed(tentacle.tentacle_serial_number):
+                    self.switch_relays(tentacle=tentacle, relays_closed=[])
+        if self.repl_pool is not None:
+            logger.info(self.repl_pool.text)
         self.udev_poller.close()
 
+    def switch_relays(
+        self,
+        tentacle: TentacleShowcase,
+        relays_closed: list[int],
+    ) -> RelaysChange:
+        """
+        Switches the relays which differ from 'relays_closed'
+        using one command for the tentacle.
+        """
+        assert self.relays_state is not None
+        serial = tentacle.tentacle_serial_number
+        change = self.relays_state.change(serial=serial, relays_closed=relays_closed)
+        if change.is_empty:
+            return change
+        try:
+            tentacle.infra.mcu_infra.relays(
+                relays_close=list(change.close),
+                relays_open=list(change.open),
+            )
+        except Exception:
+            self.relays_state.invalidate(serial=serial)
+            raise
+        self.relays_state.applied(serial=serial, change=change)
+        return change
+
+    @typing.override
+    def setup_relays(
+        self,
+        futs: typing.Sequence[EnumFut],
+        tentacles: typing.Sequence[TentacleShowcase],
+    ) -> None:
+        """
+        Only switches the relays which differ from the previous test.
+        The relays of the tentacles not involved in this test are opened.
+        """
+        if self.relays_state is None:
+            super().setup_relays(futs=futs, tentacles=tentacles)
+            return
+
+        serials = {t.tentacle_serial_number for t in tentacles}
+        for tentacle in self.tentacles:
+            if tentacle.tentacle_serial_number in serials:
+                continue
+            if self.relays_state.closed(tentacle.tentacle_serial_number):
+                self.switch_relays(tentacle=tentacle, relays_closed=[])
+        for tentacle in tentacles:
+            self.switch_relays(
+                tentacle=tentacle,
+                relays_closed=relays_for_futs(
+                    relays_closed=tentacle.tentacle_spec.relays_closed,
+                    futs=futs,
+                ),
+            )
+
+    @typing.override
+    def function_teardown(
+        self,
+        active_tentacles: typing.Sequence[TentacleShowcase],
+    ) -> None:
+        """
+        The relays are kept closed: The next test will switch the difference.
+        Everything else is torn down by the base class.
+        """
+        if self.relays_state is None:
+            super().function_teardown(active_tentacles=active_tentacles)
+            return
+
+        with contextlib.ExitStack() as stack:
+            for tentacle in active_tentacles:
+                stack.enter_context(
+                    self.watch_relays(tentacle=tentacle, skip_reset=True)
+                )
+            super().function_teardown(active_tentacles=active_tentacles)
+
+    @contextlib.contextmanager
+    def watch_relays(
+        self, tentacle: TentacleShowcase, skip_reset: bool = False
+    ) -> Iterator[None]:
+        """
+        Within this context, a relay call invalidates 'relays_state'.
+        'skip_reset': A call which only opens relays is skipped instead,
+        the relays stay as they are.
+        """
+        if self.relays_state is None:
+            yield
+            return
+        relays_state = self.relays_state
+        mcu_infra = tentacle.infra.mcu_infra
+        relays = mcu_infra.relays
+
+        def relays_watched(
+            relays_close: list[int] | None = None,
+            relays_open: list[int] | None = None,
+        ) -> None:
+            if skip_reset and not relays_close:
+                return
+            relays_state.invalidate(serial=tentacle.tentacle_serial_number)
+            relays(relays_close=relays_close, relays_open=relays_open)
+
+        mcu_infra.relays = relays_watched  # type: ignore[method-assign]
+        try:
+            yield
+        finally:
+            del mcu_infra.relays
+
+    def setup_tentacle(
+        self,
+        tentacle: TentacleShowcase,
+        udev_poller: UdevPoller,
+        mpbuild_artifacts: pathlib.Path,
+    ) -> None:
+        """
+        If the DUT still runs the same firmware and has not been reset,
+        preparing and flashing is skipped: The REPL connection of the
+        previous test is reused, see 'util_repl_pool'.
+        """
+        serial = tentacle.tentacle_serial_number
+        firmware = self.firmware_key(tentacle=tentacle)
+        reuse = False
+        if (self.repl_pool is not None) and (firmware is not None):
+            reuse = self.repl_pool.reuse(
+                serial=serial,
+                firmware=firmware,
+                probe=lambda: self.dut_probe(tentacle=tentacle),
+            )
+        with self.tracer.span(PHASE_BASE_CODE, tentacle=serial):
+            tentacle.infra.load_base_code_if_needed()
+        with self.tracer.span(PHASE_BUILD, tentacle=serial):
+            self.firmware_builder.build_firmware(tentacle=tentacle)
+        if reuse:
+            logger.info(f"{tentacle.label_short}: Reuse the REPL connection")
+        else:
+            with (
+                self.tracer.span(PHASE_PREPARE_DUT, tentacle=serial),
+                self.watch_relays(tentacle=tentacle),
+            ):
+                self.function_prepare_dut(tentacle=tentacle)
+        # The infra setup opens all relays: 'relays_state' keeps them
+        with (
+            self.tracer.span(PHASE_SETUP_INFRA, tentacle=serial),
+            self.watch_relays(tentacle=tentacle, skip_reset=True),
+        ):
+            self.function_setup_infra(
+                udev_poller=udev_poller,
+                tentacle=tentacle,
+            )
+        if reuse:
+            return
+        with (
+            self.tracer.span(PHASE_FLASH, tentacle=serial),
+            self.watch_relays(tentacle=tentacle),
+        ):
+            self.setup_dut_flash(
+                udev_poller=udev_poller,
+                tentacle=tentacle,
+                directory_logs=mpbuild_artifacts,
+            )
+        if (self.repl_pool is not None) and (firmware is not None):
+            self.repl_pool.checkin(
+                serial=serial, tty=self.dut_tty(tentacle=tentacle), firmware=firmware
+            )
+
+    @staticmethod
+    def firmware_key(tentacle: TentacleShowcase) -> str | None:
+        """
+        Identifies the firmware requested for the DUT.
+        None if the tentacle has no DUT or no firmware.
+        """
+        if not tentacle.is_mcu:
+            return None
+        firmware_spec = tentacle.tentacle_state.firmware_spec
+        if firmware_spec is None:
+            return None
+        return f"{type(firmware_spec).__name__}:{firmware_spec.board_variant.name_normalized}"
+
+    @staticmethod
+    def dut_probe(tentacle: TentacleShowcase) -> bool:
+        """
+        Soft resets the DUT and runs 'pass' in the raw REPL.
+        The soft reset clears the globals of the previous test and
+        deinitializes the peripherals, for example the PWM timers.
+        False if the DUT does not respond.
+        """
+        try:
+            mp_remote = tentacle.dut.mp_remote
+            mp_remote.state.transport.enter_raw_repl(soft_reset=True)
+            mp_remote.exec_raw("pass", timeout=REPL_PROBE_TIMEOUT_S)
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            logger.info(f"{tentacle.label_short}: Probe failed: {e!r}")
+            return False
+        return True
+
+    def invalidate_repl(self, tentacles: typing.Sequence[TentacleShowcase]) -> None:
+        """
+        The state of the DUTs is unknown: Reconnect in the next test.
+        """
+        if self.repl_pool is None:
+            return
+        for tentacle in tentacles:
+            self.repl_pool.invalidate(serial=tentacle.tentacle_serial_number)
+
+    @staticmethod
+    def dut_tty(tentacle: TentacleShowcase) -> str | None:
+        """
+        The serial port of the REPL connection: mpremote 'SerialTransport.device_name'.
+        None if not connected.
+        """
+        try:
+            transport = tentacle.dut.mp_remote.state.transport
+        except (AttributeError, AssertionError):
+            return None
+        return getattr(transport, "device_name", None)
+
+    def setup_dut_flash(
+        self,
+        udev_poller: UdevPoller,
+        tentacle: TentacleShowcase,
+        directory_logs: pathlib.Path,
+    ) -> None:
+        """
+        Flashes the DUT.
+        With 'flash_verify', flashing is skipped if the DUT
+        already runs exactly the requested firmware.
+        """
+        expected: FirmwareIdentity | None = None
+        if self.flash_verify:
+            expected = self.expected_firmware_identity(tentacle=tentacle)
+        if expected is not None:
+            decision = decide_flash(
+                expected=expected,
+                running=self.read_firmware_identity(tentacle=tentacle),
+            )
+            logger.info(f"{tentacle.label_short}: {decision.text}")
+            if not decision.flash:
+                return
+
+        self.function_setup_dut_flash(
+            udev_poller=udev_poller,
+            tentacle=tentacle,
+            directory_logs=directory_logs,
+        )
+        # The new firmware may expect another bytecode version
+        self.mpy_payloads.invalidate(serial=tentacle.tentacle_serial_number)
+        self.write_firmware_identity(tentacle=tentacle)
+
+    def write_firmware_identity(self, tentacle: TentacleShowcase) -> None:
+        """
+        After every flash, also without 'flash_verify':
+        Writes the hash of the flashed firmware to the DUT.
+        Deletes the hash of the previous firmware if the hash is unknown.
+        """
+        if not tentacle.is_mcu:
+            return
+        expected = self.expected_firmware_identity(tentacle=tentacle)
+        program = MP_PROGRAM_DELETE_SHA256
+        if expected is not None:
+            program = mp_program_write_sha256(sha256=expected.sha256)
+        try:
+            tentacle.dut.mp_remote.exec_raw(program)
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            logger.warning(
+                f"{tentacle.label_short}: Failed to write the firmware hash: {e!r}"
+            )
+
+    @staticmethod
+    def expected_firmware_identity(
+        tentacle: TentacleShowcase,
+    ) -> FirmwareIdentity | None:
+        if not tentacle.is_mcu:
+            return None
+        firmware_spec = tentacle.tentacle_state.firmware_spec
+        if not isinstance(firmware_spec, FirmwareBuildSpec | FirmwareDownloadSpec):
+            return None
+        if firmware_spec.micropython_full_version_text is None:
+            return None
+        return FirmwareIdentity(
+            micropython_full_version_text=firmware_spec.micropython_full_version_text,
+            sha256=firmware_sha256(filename=firmware_spec.filename),
+        )
+
+    @staticmethod
+    def read_firmware_identity(tentacle: TentacleShowcase) -> FirmwareIdentity | None:
+        """
+        Returns the identity of the firmware running on the DUT.
+        None if the DUT could not be queried, for example as it has never been flashed.
+        """
+        try:
+            values = exec_fetch(
+                tentacle.dut.mp_remote,
+                MP_PROGRAM_READ_IDENTITY,
+                names=["firmware_identity"],
+                mcu_config=tentacle.tentacle_spec.mcu_config,
+            )
+            return FirmwareIdentity.factory(values=values["firmware_identity"])
+        except Exception as e:
+            logger.info(f"{tentacle.label_short}: Failed to read firmware: {e!r}")
+            return None
+
+    def setup_tentacles(
+        self,
+        tentacles: list[TentacleShowcase],
+        mpbuild_artifacts: pathlib.Path,
+    ) -> None:
+        """
+        Prepares all tentacles for the test.
+        If 'setup_concurrent', the tentacles are prepared in parallel.
+        """
+        if not self.setup_concurrent:
+            for tentacle in tentacles:
+                self.setup_tentacle(
+                    tentacle=tentacle,
+                    udev_poller=self.udev_poller,
+                    mpbuild_artifacts=mpbuild_artifacts,
+                )
+            return
+
+        def setup_tentacle(tentacle: TentacleShowcase) -> None:
+            # Every thread needs its own poller: Otherwise the
+            # threads would steal each others udev events.
+            udev_poller = UdevPoller()
+            try:
+                self.setup_tentacle(
+                    tentacle=tentacle,
+                    udev_poller=udev_poller,
+                    mpbuild_artifacts=mpbuild_artifacts,
+                )
+            finally:
+                udev_poller.close()
+
+        setup_concurrent(
+            tentacles=tentacles,
+            setup_tentacle=setup_tentacle,
+            label=lambda t: t.label_short,
+        )
+
 
 @fixture(scope="session", autouse=True)
 def ctxtestrun(request: pytest.FixtureRequest) -> Iterator[CtxTestrunShowcase]:
@@ -215,26 +851,17 @@ def ctxtestrun(request: pytest.FixtureRequest) -> Iterator[CtxTestrunShowcase]:
     Using this structure, the test find there tentacles, git-repos etc.
     """
     assert TESTBED is not None
-
-    # TODO: See also: get_firmware_specs()
-    # Support: Noflash
-    # Support: xy.json
-    # Support: git://
-    # Support: local directory
-    firmware_git_url = request.config.getoption(PYTEST_OPT_FIRMWARE)
-
-    args_firmware = ArgsFirmware(
-        firmware_build=firmware_git_url,
-        flash_skip=False,
-        flash_force=False,
-        git_clean=False,
-        directory_git_cache=DIRECTORY_GIT_CACHE,
-    )
-    args_firmware.setup()
+    assert FIRMWARE_BUILDER is not None
 
     _testrun = CtxTestrunShowcase(
         connected_tentacles=TESTBED.tentacles,
-        args_firmware=args_firmware,
+        firmware_builder=FIRMWARE_BUILDER,
+        setup_concurrent=request.config.getoption(PYTEST_OPT_SETUP_CONCURRENT),
+        flash_verify=request.config.getoption(PYTEST_OPT_FLASH_VERIFY),
+        relays_reset=request.config.getoption(PYTEST_OPT_RELAYS_RESET),
+        tracer=TRACER,
+        mpy_payloads=mpy_payloads_factory(config=request.config),
+        repl_keep=request.config.getoption(PYTEST_OPT_REPL_KEEP),
     )
 
     # _testrun.session_powercycle_tentacles()
@@ -244,12 +871,63 @@ def ctxtestrun(request: pytest.FixtureRequest) -> Iterator[CtxTestrunShowcase]:
     _testrun.session_teardown()
 
 
+def mpy_payloads_factory(config: pytest.Config) -> MpyPayloads:
+    """
+    Using '--mpy', the test programs are precompiled by mpy-cross.
+    """
+    if not config.getoption(PYTEST_OPT_MPY):
+        return MpyPayloads(compiler=None)
+    command = mpy_cross_command()
+    if command is None:
+        logger.warning(f"{PYTEST_OPT_MPY}: mpy-cross not found, use source mode")
+    return MpyPayloads(
+        compiler=MpyCompiler(directory=DIRECTORY_MPY_CACHE, command=command)
+    )
+
+
+@fixture(scope="session")
+def mpy_payloads(
+    ctxtestrun: CtxTestrunShowcase,  # pylint: disable=W0621:redefined-outer-name
+) -> MpyPayloads:
+    """
+    Runs the test programs as bytecode, see 'util_mpy'.
+    """
+    return ctxtestrun.mpy_payloads
+
+
+@fixture(scope="session")
+def mip_mirror(request: pytest.FixtureRequest) -> MipMirror:
+    """
+    The mip packages are downloaded once into 'downloads/mip_mirror'
+    and then installed from there, see 'util_mip_mirror'.
+    """
+    return MipMirror(
+        directory=DIRECTORY_MIP_MIRROR,
+        offline=request.config.getoption(PYTEST_OPT_MIP_OFFLINE),
+    )
+
+
+def logs_for_test(
+    config: pytest.Config,
+    directory: pathlib.Path,
+) -> contextlib.AbstractContextManager[typing.Any]:
+    """
+    Collects the logs of a test.
+    Using '--log-async', the logs are written by a background thread.
+    """
+    compression = config.getoption(PYTEST_OPT_LOG_COMPRESSION)
+    if config.getoption(PYTEST_OPT_LOG_ASYNC) or (compression != COMPRESSION_NONE):
+        return AsyncLogs(directory=directory, compression=compression)
+    return util_logging.Logs(directory)
+
+
 @fixture(scope="function", autouse=True)
 def setup_tentacles(
     ctxtestrun: CtxTestrunShowcase,  # pylint: disable=W0621:redefined-outer-name
     required_futs: tuple[EnumFut],  # pylint: disable=W0621:redefined-outer-name
     active_tentacles: list[TentacleShowcase],  # pylint: disable=W0621:redefined-outer-name
     testresults_directory: ResultsDir,  # pylint: disable=W0621:redefined-outer-name
+    request: pytest.FixtureRequest,
 ) -> Iterator[None]:
     """
     Runs setup and teardown for every single test:
@@ -258,13 +936,18 @@ def setup_tentacles(
 
       * powercycle the tentacles
       * Turns on the 'active' LED on the tentacles involved
-      * Flash firmware
+      * Flash firmware (using `--flash-verify`: only if a different firmware is running)
+      * Using `--setup-concurrent`, above steps run in parallel for all tentacles
       * Set the relays according to `@pytest.mark.required_futs(EnumFut.FUT_I2C)`.
+        Only the relays which differ from the previous test are switched.
+        A tentacle whose relays have been switched while preparing or flashing sets all relays.
 
     * yields to the test function
     * Teardown
 
-      * Resets the relays.
+      * Using `--relays-reset`: Resets the relays.
+
+    Every phase is recorded as span, see 'util_trace'.
 
     :param testrun: The structure created by `testrun()`
     :type testrun: CtxTestRun
@@ -275,7 +958,22 @@ def setup_tentacles(
         yield
         return
 
-    with util_logging.Logs(testresults_directory.directory_test):
+    assert TESTBED is not None
+    tentacles_text = ",".join(t.tentacle_serial_number for t in active_tentacles)
+    span_attributes = {
+        "tentacles": tentacles_text,
+        "test": testresults_directory.test_nodeid,
+    }
+    with (
+        TRACER.span(
+            testresults_directory.test_nodeid,
+            category=CATEGORY_TEST,
+            tentacles=tentacles_text,
+        ),
+        logs_for_test(
+            config=request.config, directory=testresults_directory.directory_test
+        ),
+    ):
         begin_s = time.monotonic()
 
         def duration_text(duration_s: float | None = None) -> str:
@@ -289,31 +987,31 @@ def setup_tentacles(
             )
             mpbuild_artifacts = testresults_directory.directory_top / SUBDIR_MPBUILD
             mpbuild_artifacts.mkdir(parents=True, exist_ok=True)
-            for tentacle in active_tentacles:
-                tentacle.infra.load_base_code_if_needed()
-                ctxtestrun.args_firmware.build_firmware(
-                    tentacle=tentacle,
-                    mpbuild_artifacts=mpbuild_artifacts,
-                )
-                ctxtestrun.function_prepare_dut(tentacle=tentacle)
-                ctxtestrun.function_setup_infra(
-                    udev_poller=ctxtestrun.udev_poller,
-                    tentacle=tentacle,
-                )
-                ctxtestrun.function_setup_dut_flash(
-                    udev_poller=ctxtestrun.udev_poller,
-                    tentacle=tentacle,
-                    directory_logs=mpbuild_artifacts,
-                )
+            ctxtestrun.setup_tentacles(
+                tentacles=active_tentacles,
+                mpbuild_artifacts=mpbuild_artifacts,
+            )
 
-            ctxtestrun.setup_relays(futs=required_futs, tentacles=active_tentacles)
+            if ctxtestrun.relays_state is not None:
+                ctxtestrun.relays_state.reset_counter()
+            with TRACER.span(PHASE_RELAYS, **span_attributes):
+                ctxtestrun.setup_relays(futs=required_futs, tentacles=active_tentacles)
+            if ctxtestrun.relays_state is not None:
+                relays_toggled = ctxtestrun.relays_state.reset_counter()
+                request.node.user_properties.append(
+                    (USER_PROPERTY_RELAYS_TOGGLED, relays_toggled)
+                )
+                logger.info(f"Relays toggled: {relays_toggled}")
             logger.info(
                 f"TEST BEGIN {duration_text()} {testresults_directory.test_nodeid}"
             )
-            yield
+            with TRACER.span(PHASE_TEST_BODY, **span_attributes):
+                yield
 
         except Exception as e:
             logger.warning(f"Exception during test: {e!r}")
+            # A failure in the test body is handled by 'pytest_runtest_makereport()'
+            ctxtestrun.invalidate_repl(tentacles=active_tentacles)
             logger.exception(e)
             raise
         finally:
@@ -321,7 +1019,8 @@ def setup_tentacles(
                 f"TEST TEARDOWN {duration_text()} {testresults_directory.test_nodeid}"
             )
             try:
-                ctxtestrun.function_teardown(active_tentacles=active_tentacles)
+                with TRACER.span(PHASE_TEARDOWN, **span_attributes):
+                    ctxtestrun.function_teardown(active_tentacles=active_tentacles)
             except Exception as e:
                 logger.exception(e)
             logger.info(
@@ -329,32 +1028,222 @@ def setup_tentacles(
             )
 
 
+@pytest.fixture(scope="function")
+def daq_capture(
+    request: pytest.FixtureRequest,
+    testresults_directory: ResultsDir,  # pylint: disable=W0621:redefined-outer-name
+) -> DaqCapture:
+    """
+    Captures the logic analyser, armed on 'trig1', see 'util_daq_capture'.
+    Without '--daq', 'daq_capture.capture()' yields None.
+    """
+    retain_samples = request.config.getoption(PYTEST_OPT_DAQ_EDGES_RETAIN)
+    return DaqCapture(
+        source_factory=daq_source_factory(request.config.getoption(PYTEST_OPT_DAQ)),
+        directory=testresults_directory.directory_test,
+        edges=request.config.getoption(PYTEST_OPT_DAQ_EDGES)
+        or (retain_samples is not None),
+        retain_samples=retain_samples,
+    )
+
+
+def directory_testresults(config: pytest.Config) -> pathlib.Path:
+    """
+    '--testresults', for example set by cli_shard. Else 'results' in the repo.
+    """
+    directory = config.getoption(PYTEST_OPT_TESTRESULTS)
+    if directory is None:
+        return DIRECTORY_TESTRESULTS_DEFAULT
+    return pathlib.Path(directory).resolve()
+
+
 @pytest.fixture(scope="function")
 def testresults_directory(request: pytest.FixtureRequest) -> ResultsDir:
     """
     Returns the log directory for the test function referencing this fixture.
     """
     return ResultsDir(
-        directory_top=DIRECTORY_TESTRESULTS_DEFAULT,
+        directory_top=directory_testresults(request.config),
         test_name=request.node.name,
         test_nodeid=request.node.nodeid,
     )
 
 
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_makereport(
+    item: pytest.Item, call: pytest.CallInfo[None]
+) -> Iterator[None]:
+    """
+    A failed test may leave the DUT hung or in a bad state:
+    Do not reuse its REPL connection, see 'util_repl_pool'.
+    The fixture 'setup_tentacles()' does not see the exceptions of the test body.
+    """
+    outcome = yield
+    report: pytest.TestReport = outcome.get_result()
+    if not report.failed:
+        return
+    funcargs = getattr(item, "funcargs", {})
+    ctxtestrun = funcargs.get("ctxtestrun")  # pylint: disable=W0621:redefined-outer-name
+    if isinstance(ctxtestrun, CtxTestrunShowcase):
+        ctxtestrun.invalidate_repl(tentacles=funcargs.get("active_tentacles", []))
+
+
 def pytest_sessionstart(session: pytest.Session) -> None:
     """
     Called after the Session object has been created and
     before performing collection and entering the run test loop.
     """
-    _TESTBED_LOCK.acquire(FILENAME_TESTBED_LOCK)
-
     global TESTBED  # pylint: disable=W0603:global-statement
+    global FIRMWARE_BUILDER  # pylint: disable=W0603:global-statement
+    global FIRMWARE_SPECS  # pylint: disable=W0603:global-statement
     assert TESTBED is None
-    TESTBED = get_testbed()
+    assert FIRMWARE_BUILDER is None
+
+    dry_run = session.config.getoption(PYTEST_OPT_DRY_RUN)
+    # '--collect-only', for example by cli_shard: Only the tentacles are required
+    setup_firmware = not session.config.option.collectonly
+    directory_results = directory_testresults(session.config)
+    filename_plan = session.config.getoption(PYTEST_OPT_PLAN)
+    if dry_run and (filename_plan is not None):
+        # The plan is known: No need to touch the hardware
+        estimate = TestPlan.read(pathlib.Path(filename_plan)).estimate()
+        pytest.exit(estimate.text, returncode=pytest.ExitCode.OK)
+    if dry_run:
+        # No hardware: The tentacles of the last session are collected
+        TESTBED = get_testbed_offline()
+        FIRMWARE_SPECS = get_firmware_specs(
+            config=session.config,
+            tentacles=TESTBED.tentacles,
+        )
+        return
+
+    _TESTBED_LOCK.acquire(FILENAME_TESTBED_LOCK)
+
+    # TODO: See also: get_firmware_specs()
+    # Support: Noflash
+    # Support: xy.json
+    # Support: git://
+    # Support: local directory
+    firmware_git_url = session.config.getoption(PYTEST_OPT_FIRMWARE)
+    firmware_cache: FirmwareCache | None = None
+    download_cache: DownloadCache | None = None
+    if (firmware_git_url is not None) and not session.config.getoption(
+        PYTEST_OPT_NO_FIRMWARE_CACHE
+    ):
+        firmware_cache = FirmwareCache(
+            directory=DIRECTORY_FIRMWARE_CACHE,
+            max_bytes=FIRMWARE_CACHE_MAX_BYTES,
+        )
+        download_cache = DownloadCache(directory=DIRECTORY_FIRMWARE_DOWNLOADS)
+    git_worktrees: GitWorktrees | None = None
+    git_worktrees_keep = session.config.getoption(PYTEST_OPT_GIT_WORKTREES_KEEP)
+    if git_worktrees_keep > 0:
+        git_worktrees = GitWorktrees(
+            directory=DIRECTORY_GIT_WORKTREES,
+            max_worktrees=git_worktrees_keep,
+        )
+    FIRMWARE_BUILDER = FirmwareBuilder(
+        args_firmware=ArgsFirmware(
+            firmware_build=firmware_git_url,
+            flash_skip=False,
+            flash_force=False,
+            git_clean=False,
+            directory_git_cache=DIRECTORY_GIT_CACHE,
+        ),
+        mpbuild_artifacts=directory_results / SUBDIR_MPBUILD,
+        firmware_cache=firmware_cache,
+        prebuild_workers=session.config.getoption(PYTEST_OPT_FIRMWARE_PREBUILD_WORKERS),
+        download_cache=download_cache,
+        git_worktrees=git_worktrees,
+    )
+
+    skip_powercycle = session.config.getoption(PYTEST_OPT_POWERCYCLE_SKIP)
+    retention = ResultsRetention(
+        keep_runs=session.config.getoption(PYTEST_OPT_RESULTS_KEEP_RUNS),
+        keep_bytes=int(session.config.getoption(PYTEST_OPT_RESULTS_KEEP_GB) * 1e9),
+    )
+    if not setup_firmware:
+        TESTBED = get_testbed(
+            skip_powercycle=skip_powercycle,
+            retention=retention,
+            directory_testresults=directory_results,
+        )
+    else:
+        # Clone the micropython repo and start the builds while the
+        # tentacles are powercycled
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+            future_firmware_setup = executor.submit(
+                firmware_setup_prebuild,
+                config=session.config,
+                tentacles=tentacles_offline(),
+            )
+            TESTBED = get_testbed(
+                skip_powercycle=skip_powercycle,
+                retention=retention,
+                directory_testresults=directory_results,
+            )
+            future_firmware_setup.result()
+
+    # The firmware specs are resolved once for the session
+    FIRMWARE_SPECS = get_firmware_specs(
+        config=session.config,
+        tentacles=TESTBED.tentacles,
+    )
+    if setup_firmware:
+        # The variants missing in the usb topology snapshot
+        FIRMWARE_BUILDER.prebuild(
+            tentacles=TESTBED.tentacles,
+            firmware_specs=FIRMWARE_SPECS,
+        )
+
+
+def tentacles_offline() -> list[TentacleShowcase]:
+    """
+    The tentacles of the usb topology snapshot, read before the powercycle
+    rewrites it. Empty if there is no snapshot.
+    """
+    try:
+        return get_testbed_offline().tentacles
+    except ValueError as e:
+        logger.info(f"Prebuild after the powercycle: {e}")
+        return []
+
+
+def firmware_setup_prebuild(
+    config: pytest.Config, tentacles: list[TentacleShowcase]
+) -> None:
+    """
+    Clones the micropython repo and starts building the variants of
+    'tentacles': The tentacles are not powered yet.
+    """
+    assert FIRMWARE_BUILDER is not None
+    FIRMWARE_BUILDER.setup()
+    if len(tentacles) == 0:
+        return
+    FIRMWARE_BUILDER.prebuild(
+        tentacles=tentacles,
+        firmware_specs=get_firmware_specs(config=config, tentacles=tentacles),
+    )
 
 
 def pytest_sessionfinish(session: pytest.Session) -> None:
-    assert TESTBED is not None
+    if TESTBED is None:
+        # '--dry-run --plan': The testbed has not been setup
+        return
+    if FIRMWARE_BUILDER is None:
+        # '--dry-run': Neither the hardware nor the lock have been touched
+        TESTBED.close()
+        return
+    assert FIRMWARE_BUILDER is not None
+    FIRMWARE_BUILDER.shutdown()
+    if len(TRACER.spans) > 0:
+        directory_results = directory_testresults(session.config)
+        TRACER.write(
+            filename_trace=directory_results / FILENAME_TRACE,
+            filename_summary=directory_results / FILENAME_TRACE_SUMMARY,
+        )
+        logger.info(f"Slowest phases:\n{TRACER.summary_text()}")
+    logger.info(render_cache_info())
     TESTBED.close()
 
     _TESTBED_LOCK.unlink()
@@ -375,3 +1264,152 @@ def pytest_addoption(parser: pytest.Parser) -> None:
         default=None,
         help=f"The url to a git repo to be cloned and compiled, a path to a source directory. Or a json file with a download location. Syntax: {DEFAULT_PYTEST_OPT_FIRMWARE}.",
     )
+    parser.addoption(
+        PYTEST_OPT_SETUP_CONCURRENT,
+        action="store_true",
+        default=False,
+        help="Setup the tentacles of a test in parallel: Load base code, build, flash. The relays are still set after all tentacles are ready.",
+    )
+    parser.addoption(
+        PYTEST_OPT_NO_FIRMWARE_CACHE,
+        action="store_true",
+        default=False,
+        help="Always build/download the firmware: Do not use the caches in 'downloads/firmware_cache' and 'downloads/firmware_downloads'.",
+    )
+    parser.addoption(
+        PYTEST_OPT_FIRMWARE_PREBUILD_WORKERS,
+        action="store",
+        type=int,
+        default=1,
+        help="Number of threads preparing the firmware variants at session start. The builds share the source tree and run one after the other. 0: Build when the first test requires the firmware.",
+    )
+    parser.addoption(
+        PYTEST_OPT_FLASH_VERIFY,
+        action="store_true",
+        default=False,
+        help="Read version and firmware hash from the DUT and skip flashing if the requested firmware is already running.",
+    )
+    parser.addoption(
+        PYTEST_OPT_KEEP_TEST_ORDER,
+        action="store_true",
+        default=False,
+        help="Run the tests in collection order. By default, the tests are reordered to minimize flashing and relay switching.",
+    )
+    parser.addoption(
+        PYTEST_OPT_SHARD_COLLECT,
+        action="store",
+        default=None,
+        help="Write the shard keys of all collected tests to this json file. Used by cli_shard.",
+    )
+    parser.addoption(
+        PYTEST_OPT_SHARD_SELECT,
+        action="store",
+        default=None,
+        help="Only run the tests with a shard key listed in this json file. Used by cli_shard.",
+    )
+    parser.addoption(
+        PYTEST_OPT_RELAYS_RESET,
+        action="store_true",
+        default=False,
+        help="Reset the relays after every test. By default, the relays are kept and the next test only switches the difference.",
+    )
+    parser.addoption(
+        PYTEST_OPT_PLAN,
+        action="store",
+        default=None,
+        help="Run the tests of a plan written by '--plan-write' in the planned order.",
+    )
+    parser.addoption(
+        PYTEST_OPT_PLAN_WRITE,
+        action="store",
+        default=None,
+        help="Write the test plan to this json file: Every test with tentacles, firmware and FUTs.",
+    )
+    parser.addoption(
+        PYTEST_OPT_DRY_RUN,
+        action="store_true",
+        default=False,
+        help="Print the estimated builds, flashes and relay changes and do not run any test. The hardware is not touched: The tests are collected against the tentacles of the last usb topology snapshot. Combined with '--plan', the plan is estimated.",
+    )
+    parser.addoption(
+        PYTEST_OPT_POWERCYCLE_SKIP,
+        action="store_true",
+        default=False,
+        help="Skip the powercycle at session start if the usb topology did not change since the last session. Default: Powercycle all tentacles.",
+    )
+    parser.addoption(
+        PYTEST_OPT_RESULTS_KEEP_RUNS,
+        action="store",
+        type=int,
+        default=3,
+        help="The previous results are moved to 'results_<timestamp>'. Number of these runs to keep.",
+    )
+    parser.addoption(
+        PYTEST_OPT_RESULTS_KEEP_GB,
+        action="store",
+        type=float,
+        default=10.0,
+        help="Maximum total size in GB of the kept 'results_<timestamp>' runs.",
+    )
+    parser.addoption(
+        PYTEST_OPT_LOG_ASYNC,
+        action="store_true",
+        default=False,
+        help="Write the logs of every test in a background thread: The test never waits for the disk.",
+    )
+    parser.addoption(
+        PYTEST_OPT_LOG_COMPRESSION,
+        action="store",
+        choices=COMPRESSIONS,
+        default=COMPRESSION_NONE,
+        help="Compress the logs of every test. Implies '--log-async'. 'zstd' requires the 'zstandard' package.",
+    )
+    parser.addoption(
+        PYTEST_OPT_MPY,
+        action="store_true",
+        default=False,
+        help="Precompile the test programs by mpy-cross and upload the bytecode. Falls back to source if no mpy-cross is installed. Install: pip install testbed_showcase[mpy].",
+    )
+    parser.addoption(
+        PYTEST_OPT_MIP_OFFLINE,
+        action="store_true",
+        default=False,
+        help="Install mip packages only from 'downloads/mip_mirror': Fail instead of downloading a missing package.",
+    )
+    parser.addoption(
+        PYTEST_OPT_REPL_KEEP,
+        action="store_true",
+        default=False,
+        help="Keep the REPL connection while the DUT runs the same firmware and responds to a soft reset: Skip preparing, flashing and reconnecting. Default: Prepare, flash and reconnect the DUT for every test.",
+    )
+    parser.addoption(
+        PYTEST_OPT_DAQ,
+        default=None,
+        help="Capture the logic analyser of the DAQ tentacle, armed on 'trig1'. 'sigrok', 'sigrok:<driver>' or a sample file to replay.",
+    )
+    parser.addoption(
+        PYTEST_OPT_DAQ_EDGES,
+        action="store_true",
+        default=False,
+        help="Write the DAQ captures as edge lists (daq_<name>.npz) instead of dense samples. Requires numpy: pip install testbed_showcase[daq].",
+    )
+    parser.addoption(
+        PYTEST_OPT_GIT_WORKTREES_KEEP,
+        action="store",
+        type=int,
+        default=4,
+        help="A git url is fetched partially (commits, trees and the v* tags) into one object store and built in a worktree per commit. Number of worktrees kept (LRU). 0: Clone the repo as before.",
+    )
+    parser.addoption(
+        PYTEST_OPT_TESTRESULTS,
+        action="store",
+        default=None,
+        help="Write the logs and results to this directory instead of 'results'. Used by cli_shard.",
+    )
+    parser.addoption(
+        PYTEST_OPT_DAQ_EDGES_RETAIN,
+        action="store",
+        type=int,
+        default=None,
+        help="Implies --daq-edges. Keep only the edges within this many samples around the edges of trig1 and trig2. Default: Keep all edges.",
+    )
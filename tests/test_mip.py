@@ -2,10 +2,11 @@ import pytest
 
 from testbed_showcase.constants import EnumFut
 from testbed_showcase.tentacle_spec import TentacleShowcase
+from testbed_showcase.util_mip_mirror import MipMirror, mip_install
 
 
 @pytest.mark.required_futs(EnumFut.FUT_MCU_ONLY)
-def test_mip(mcu: TentacleShowcase) -> None:
+def test_mip(mcu: TentacleShowcase, mip_mirror: MipMirror) -> None:
     """
     https://micropython.org/pi/v2/index.json
     https://mim.oliverrobson.tech/
@@ -30,4 +31,5 @@ def test_mip(mcu: TentacleShowcase) -> None:
     url = "aiohttp"
     # https://micropython.org/pi/v2/index.json
     url = "aiohttp@0.0.3"
-    mcu.dut.mp_remote.mip_install_package(package=url)
+    # Installed from the local mirror, see 'util_mip_mirror'
+    mip_install(mcu.dut.mp_remote, mip_mirror, package=url)
@@ -3,28 +3,17 @@ from octoprobe.lib_mpremote import ExceptionCmdFailed
 
 from testbed_showcase.constants import EnumFut
 from testbed_showcase.tentacle_spec import TentacleShowcase
+from testbed_showcase.util_daq_capture import DaqCapture
+from testbed_showcase.util_mip_mirror import MipMirror, mip_install
+from testbed_showcase.util_mp_remote import exec_render
+from testbed_showcase.util_mpy import MpyPayloads
 
 # pylint: disable=W0613:unused-argument
 
+# The micropython programs are rendered once per McuConfig at collection time.
+# See 'util_mp_remote.prerender()'.
 
-@pytest.mark.required_futs(EnumFut.FUT_I2C)
-def test_i2c_pattern(
-    mcu: TentacleShowcase,
-    device_potpourry: TentacleShowcase,
-    daq_saleae: TentacleShowcase,
-) -> None:
-    """
-    This tests creates pulses:
-    trig1: 1ms
-    trig2: 2ms
-    data1: 3ms
-    data2: 4ms
-
-    Have a look at docs/schematics_kicad/schematics.pdf to find testpoints to measure with a scope.
-    """
-    assert mcu.is_mcu
-    mcu_config = mcu.tentacle_spec.mcu_config
-    mp_program = """
+MP_PROGRAM_I2C_PATTERN = """
 # For any generic python board
 from machine import Pin, I2C
 from machine import PWM
@@ -37,8 +26,7 @@ PWM(Pin('{{mcu_config.trig2}}'), freq=100, duty_u16=2*ticks_ms)
 PWM(Pin('{{mcu_config.trig1}}'), freq=100, duty_u16=1*ticks_ms)
 """
 
-    if "PYBV11" in mcu.get_tag_mandatory("boards"):
-        mp_program = """
+MP_PROGRAM_I2C_PATTERN_PYBOARD = """
 # Pyboard only
 from pyb import Pin, Timer
 
@@ -56,20 +44,8 @@ run_timer('{{mcu_config.data1}}', tim2, 3, 30)
 run_timer('{{mcu_config.trig2}}', tim4, 3, 20)
 run_timer('{{mcu_config.trig1}}', tim8, 2, 10)
 """
-    mcu.dut.mp_remote.exec_render(mp_program, mcu_config=mcu_config)
-    # mcu.dut.inspection_exit()
-
 
-@pytest.mark.required_futs(EnumFut.FUT_I2C)
-def test_i2c(
-    mcu: TentacleShowcase,
-    device_potpourry: TentacleShowcase,
-    daq_saleae: TentacleShowcase,
-) -> None:
-    assert mcu.is_mcu
-    mcu_config = mcu.tentacle_spec.mcu_config
-
-    mp_program = """
+MP_PROGRAM_I2C = """
 from machine import Pin, I2C
 
 {{mcu_config.i2c}}
@@ -80,33 +56,8 @@ pin_trigger_1.value(1)
 i2c_data = i2c.readfrom(0x50, 10, True)
 pin_trigger_1.value(0)
 """
-    mcu.dut.mp_remote.exec_render(mp_program, mcu_config=mcu_config)
-
-    i2c_data = mcu.dut.mp_remote.read_bytes("i2c_data")
-    print(f"i2c_data: {i2c_data!r}")
-    assert i2c_data == b"\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff"
-
 
-@pytest.mark.required_futs(EnumFut.FUT_ONEWIRE)
-def test_onewire(
-    mcu: TentacleShowcase,
-    device_potpourry: TentacleShowcase,
-    daq_saleae: TentacleShowcase,
-) -> None:
-    assert mcu.is_mcu
-
-    # Install mip if not already linked in firmware
-    try:
-        mcu.dut.mp_remote.exec_render(
-            "import ds18x20", mcu_config=mcu.tentacle_spec.mcu_config
-        )
-    except ExceptionCmdFailed:
-        mcu.dut.mp_remote.mip_install_package(package="ds18x20@0.1.0")
-        mcu.dut.mp_remote.exec_render(
-            "from mip import ds18x20", mcu_config=mcu.tentacle_spec.mcu_config
-        )
-
-    mp_program = """
+MP_PROGRAM_ONEWIRE = """
 from machine import Pin
 import onewire
 import time
@@ -124,14 +75,130 @@ ds.convert_temp()
 time.sleep_ms(750)
 temperatures_c = [ds.read_temp(rom) for rom in roms]
 """
-    mcu.dut.mp_remote.exec_render(mp_program, mcu_config=mcu.tentacle_spec.mcu_config)
 
-    roms = mcu.dut.mp_remote.read_list("roms")
+
+@pytest.mark.required_futs(EnumFut.FUT_I2C)
+def test_i2c_pattern(
+    mcu: TentacleShowcase,
+    device_potpourry: TentacleShowcase,
+    daq_saleae: TentacleShowcase,
+    daq_capture: DaqCapture,
+) -> None:
+    """
+    This tests creates pulses:
+    trig1: 1ms
+    trig2: 2ms
+    data1: 3ms
+    data2: 4ms
+
+    Have a look at docs/schematics_kicad/schematics.pdf to find testpoints to measure with a scope.
+    """
+    assert mcu.is_mcu
+    mcu_config = mcu.tentacle_spec.mcu_config
+    assert mcu_config is not None
+    mp_program = MP_PROGRAM_I2C_PATTERN
+    if "PYBV11" in mcu.get_tag_mandatory("boards"):
+        mp_program = MP_PROGRAM_I2C_PATTERN_PYBOARD
+    with daq_capture.capture("i2c_pattern") as capture:
+        exec_render(mcu.dut.mp_remote, mp_program, mcu_config=mcu_config)
+    if capture is not None:
+        from testbed_showcase.util_daq_decode import measure_pwm_capture
+
+        result = daq_capture.results[-1]
+        for pin, duty in (
+            (mcu_config.trig1, 0.1),
+            (mcu_config.trig2, 0.2),
+            (mcu_config.data1, 0.3),
+            (mcu_config.data2, 0.4),
+        ):
+            pwm = measure_pwm_capture(result, mcu_config, pin=pin)
+            print(f"{pin}: {pwm}")
+            assert pwm is not None
+            assert pwm.frequency_hz == pytest.approx(100.0, rel=0.05)
+            assert pwm.duty == pytest.approx(duty, abs=0.02)
+    # mcu.dut.inspection_exit()
+
+
+@pytest.mark.required_futs(EnumFut.FUT_I2C)
+def test_i2c(
+    mcu: TentacleShowcase,
+    device_potpourry: TentacleShowcase,
+    daq_saleae: TentacleShowcase,
+    mpy_payloads: MpyPayloads,
+    daq_capture: DaqCapture,
+) -> None:
+    assert mcu.is_mcu
+    mcu_config = mcu.tentacle_spec.mcu_config
+    assert mcu_config is not None
+
+    with daq_capture.capture("i2c") as capture:
+        values = mpy_payloads.exec_fetch(
+            mcu.dut.mp_remote,
+            MP_PROGRAM_I2C,
+            names=["i2c_data"],
+            serial=mcu.tentacle_serial_number,
+            mcu_config=mcu_config,
+        )
+
+    i2c_data = values["i2c_data"]
+    print(f"i2c_data: {i2c_data!r}")
+    assert i2c_data == b"\xff\xff\xff\xff\xff\xff\xff\xff\xff\xff"
+
+    if capture is not None:
+        # The bus as observed by the DAQ
+        from testbed_showcase.util_daq_decode import decode_i2c_capture
+
+        transfers = decode_i2c_capture(daq_capture.results[-1], mcu_config)
+        print("\n".join(t.text for t in transfers))
+        assert [(t.address, t.read, t.data) for t in transfers] == [
+            (0x50, True, i2c_data)
+        ]
+
+
+@pytest.mark.required_futs(EnumFut.FUT_ONEWIRE)
+def test_onewire(
+    mcu: TentacleShowcase,
+    device_potpourry: TentacleShowcase,
+    daq_saleae: TentacleShowcase,
+    mpy_payloads: MpyPayloads,
+    mip_mirror: MipMirror,
+    daq_capture: DaqCapture,
+) -> None:
+    assert mcu.is_mcu
+    mcu_config = mcu.tentacle_spec.mcu_config
+    assert mcu_config is not None
+
+    # Install mip if not already linked in firmware
+    try:
+        exec_render(mcu.dut.mp_remote, "import ds18x20")
+    except ExceptionCmdFailed:
+        mip_install(mcu.dut.mp_remote, mip_mirror, package="ds18x20@0.1.0")
+        exec_render(mcu.dut.mp_remote, "import ds18x20")
+
+    with daq_capture.capture("onewire") as capture:
+        values = mpy_payloads.exec_fetch(
+            mcu.dut.mp_remote,
+            MP_PROGRAM_ONEWIRE,
+            names=["roms", "temperatures_c"],
+            serial=mcu.tentacle_serial_number,
+            mcu_config=mcu_config,
+        )
+
+    roms = values["roms"]
     print(f"roms: {roms}")
 
     assert (
         len(roms) == 2
     ), f"Two DS18 temperature sensors expected, but got {len(roms)}!"
 
-    temperatures_c = mcu.dut.mp_remote.read_list("temperatures_c")
+    temperatures_c = values["temperatures_c"]
     print(f"temperatures_c: {temperatures_c}")
+
+    if capture is not None:
+        # ds.scan(): reset, presence and SEARCH ROM
+        from testbed_showcase.util_daq_decode import decode_onewire_capture
+
+        transfers = decode_onewire_capture(daq_capture.results[-1], mcu_config)
+        assert len(transfers) > 0
+        assert transfers[0].presence
+        assert transfers[0].data[:1] == b"\xf0"
@@ -0,0 +1,104 @@
+"""
+Emulates 'tentacle.dut.mp_remote' for the unit tests:
+The programs run in python instead of micropython.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import importlib.abc
+import importlib.machinery
+import io
+import pathlib
+import sys
+import typing
+from collections.abc import Iterator
+
+from testbed_showcase.util_mp_remote import render
+from testbed_showcase.util_mpy import MpyCompiler, PAYLOAD_MODULE
+
+MPY_HEADER = b"M\x06\x00\x1f"
+
+
+class _FakeMpyFinder(importlib.abc.MetaPathFinder, importlib.abc.Loader):
+    """
+    Imports '<cwd>/octoprobe_payload_*.mpy' written by 'FakeMpyCompiler':
+    The header followed by python source.
+    """
+
+    def find_spec(
+        self, fullname: str, path: typing.Any, target: typing.Any = None
+    ) -> importlib.machinery.ModuleSpec | None:
+        if not fullname.startswith(PAYLOAD_MODULE):
+            return None
+        if not pathlib.Path(f"{fullname}.mpy").is_file():
+            return None
+        return importlib.machinery.ModuleSpec(fullname, self)
+
+    def create_module(self, spec: importlib.machinery.ModuleSpec) -> None:
+        return None
+
+    def exec_module(self, module: typing.Any) -> None:
+        mpy = pathlib.Path(f"{module.__name__}.mpy").read_bytes()
+        assert mpy.startswith(MPY_HEADER)
+        exec(mpy[len(MPY_HEADER) :].decode(), module.__dict__)  # pylint: disable=exec-used
+
+
+@contextlib.contextmanager
+def _fake_mpy_import() -> Iterator[None]:
+    finder = _FakeMpyFinder()
+    sys.meta_path.insert(0, finder)
+    try:
+        yield
+    finally:
+        sys.meta_path.remove(finder)
+
+
+class FakeMpyCompiler(MpyCompiler):
+    """
+    'Compiles' into the header followed by the source: See '_FakeMpyFinder'.
+    """
+
+    def _compile(
+        self, source: str, bytecode_version: int, filename: pathlib.Path
+    ) -> bytes | None:
+        return MPY_HEADER + source.encode()
+
+
+class EmulatedRawRepl:
+    """
+    Every call is one round trip. The programs run in the current directory.
+    'bytecode_version': Reported as 'sys.implementation._mpy'.
+    'run_mpy': Runs the bytecode of 'FakeMpyCompiler'.
+    Else bytecode can not be imported: Raises an exception.
+    """
+
+    def __init__(self, bytecode_version: int = 0, run_mpy: bool = False) -> None:
+        self.bytecode_version = bytecode_version
+        self.run_mpy = run_mpy
+        self.round_trips = 0
+        self.programs: list[str] = []
+        self.namespace: dict[str, typing.Any] = {}
+
+    def exec_raw(self, cmd: str) -> str:
+        self.round_trips += 1
+        self.programs.append(cmd)
+        if (f"import {PAYLOAD_MODULE}" in cmd) and not self.run_mpy:
+            raise ValueError("ImportError: incompatible .mpy file")
+        if "sys.implementation" in cmd:
+            return f"__octoprobe_fetch__ [{self.bytecode_version}]\r\n"
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout), _fake_mpy_import():
+            exec(cmd, self.namespace)  # pylint: disable=exec-used
+        return stdout.getvalue()
+
+    def exec_render(self, micropython_code: str, **kwargs: typing.Any) -> str:
+        return self.exec_raw(render(micropython_code, **kwargs))
+
+    def read_list(self, cmd: str) -> list[typing.Any]:
+        self.round_trips += 1
+        return list(self.namespace[cmd])
+
+    def read_bytes(self, cmd: str) -> bytes:
+        self.round_trips += 1
+        return bytes(self.namespace[cmd])
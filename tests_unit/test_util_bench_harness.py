@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import ast
+import dataclasses
+import pathlib
+
+import pytest
+
+from testbed_showcase.util_bench_harness import (
+    BenchLimits,
+    BenchResult,
+    generate_tests,
+    run_scales,
+    write_test_directory,
+)
+
+
+def _result(collect_s: float = 1.0, fixture_ms: float = 5.0) -> BenchResult:
+    return BenchResult(
+        tentacles=100,
+        test_functions=50,
+        items=10_000,
+        items_run=200,
+        sessionstart_s=0.5,
+        collect_s=collect_s,
+        fixture_ms=fixture_ms,
+        maxrss_mb=120.0,
+    )
+
+
+def test_generate_tests() -> None:
+    module = ast.parse(generate_tests(test_functions=10, i2c_every=5))
+    functions = [n for n in module.body if isinstance(n, ast.FunctionDef)]
+    assert [f.name for f in functions] == [
+        "test_mcu_0",
+        "test_mcu_1",
+        "test_mcu_2",
+        "test_mcu_3",
+        "test_i2c_4",
+        "test_mcu_5",
+        "test_mcu_6",
+        "test_mcu_7",
+        "test_mcu_8",
+        "test_i2c_9",
+    ]
+    assert [a.arg for a in functions[4].args.args] == [
+        "mcu",
+        "device_potpourry",
+        "daq_saleae",
+    ]
+
+
+def test_write_test_directory(tmp_path: pathlib.Path) -> None:
+    filename_conftest = tmp_path / "conftest_source.py"
+    filename_conftest.write_text("# conftest\n")
+    directory = tmp_path / "bench"
+    write_test_directory(
+        directory=directory, filename_conftest=filename_conftest, test_functions=3
+    )
+    assert (directory / "conftest.py").read_text() == "# conftest\n"
+    assert "required_futs" in (directory / "pytest.ini").read_text()
+    assert "def test_mcu_2(" in (directory / "test_generated.py").read_text()
+
+
+def test_result_json(tmp_path: pathlib.Path) -> None:
+    filename = tmp_path / "bench.json"
+    BenchResult.write(filename, [_result()])
+    assert BenchResult.read(filename) == [_result()]
+    assert _result().collect_us_per_item == 100.0
+    assert len(_result().text.split()) == len(BenchResult.header().split())
+
+
+def test_limits() -> None:
+    assert BenchLimits().violations([_result()]) == []
+    assert (
+        BenchLimits(collect_us_per_item=100.0, fixture_ms=5.0).violations([_result()])
+        == []
+    )
+
+    violations = BenchLimits(fixture_ms=4.0, maxrss_mb=100.0).violations([_result()])
+    assert len(violations) == 2
+    assert violations[0].startswith("tentacles=100 tests=50: fixture_ms=5.00")
+
+
+def test_limits_baseline() -> None:
+    limits = BenchLimits(baseline=[_result()], tolerance=1.5)
+    assert limits.violations([_result(collect_s=1.4, fixture_ms=7.0)]) == []
+    violations = limits.violations([_result(collect_s=1.6, fixture_ms=7.0)])
+    assert violations == ["tentacles=100 tests=50: collect_s=1.60 exceeds 1.50"]
+    # Another scale: No baseline
+    other = dataclasses.replace(_result(collect_s=10.0), tentacles=10)
+    assert limits.violations([other]) == []
+
+
+def test_simulation_api() -> None:
+    pytest.importorskip("octoprobe")
+    from testbed_showcase import (  # pylint: disable=import-outside-toplevel
+        util_simulation,
+    )
+
+    assert util_simulation.api_mismatches() == []
+
+
+def test_run_scales_smoke(tmp_path: pathlib.Path) -> None:
+    """
+    One tiny scale: 'run_single()' on the real tests/conftest.py, in a subprocess.
+    """
+    pytest.importorskip("octoprobe")
+    (result,) = run_scales(directory=tmp_path, scales=[(4, 5)], run_limit=3)
+    assert (result.tentacles, result.test_functions) == (4, 5)
+    # 2 MCUs: At least every MCU test runs on both
+    assert result.items >= 2 * 4
+    assert result.items_run == 3
+    assert result.collect_s > 0.0
+    assert result.maxrss_mb > 0.0
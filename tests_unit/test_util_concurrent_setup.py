@@ -0,0 +1,83 @@
+"""
+These tests do not require any hardware.
+The tentacles are faked: They just sleep.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import time
+
+import pytest
+
+from testbed_showcase.util_concurrent_setup import (
+    SetupTentaclesException,
+    setup_concurrent,
+)
+
+SETUP_DURATION_S = 0.3
+
+
+@dataclasses.dataclass
+class FakeTentacle:
+    label_short: str
+    fail: bool = False
+    done: bool = False
+
+    def setup(self) -> None:
+        time.sleep(SETUP_DURATION_S)
+        if self.fail:
+            raise ValueError(f"{self.label_short} failed")
+        self.done = True
+
+
+def _tentacles(*fail: bool) -> list[FakeTentacle]:
+    return [FakeTentacle(label_short=f"t{i}", fail=f) for i, f in enumerate(fail)]
+
+
+def test_setup_concurrent_speedup() -> None:
+    tentacles = _tentacles(False, False, False)
+
+    begin_s = time.monotonic()
+    for tentacle in tentacles:
+        tentacle.setup()
+    duration_sequential_s = time.monotonic() - begin_s
+
+    tentacles = _tentacles(False, False, False)
+    begin_s = time.monotonic()
+    setup_concurrent(
+        tentacles=tentacles,
+        setup_tentacle=FakeTentacle.setup,
+        label=lambda t: t.label_short,
+    )
+    duration_concurrent_s = time.monotonic() - begin_s
+
+    print(f"sequential {duration_sequential_s:0.2f}s")
+    print(f"concurrent {duration_concurrent_s:0.2f}s")
+    assert all(t.done for t in tentacles)
+    assert duration_sequential_s >= 3 * SETUP_DURATION_S
+    assert duration_concurrent_s < 2 * SETUP_DURATION_S
+
+
+def test_setup_concurrent_errors() -> None:
+    tentacles = _tentacles(True, False, True)
+
+    with pytest.raises(SetupTentaclesException) as excinfo:
+        setup_concurrent(
+            tentacles=tentacles,
+            setup_tentacle=FakeTentacle.setup,
+            label=lambda t: t.label_short,
+        )
+
+    # Every failing tentacle is reported, the others completed
+    assert [e.label for e in excinfo.value.errors] == ["t0", "t2"]
+    assert "t0: ValueError('t0 failed')" in str(excinfo.value)
+    assert tentacles[1].done
+
+
+def test_setup_concurrent_empty() -> None:
+    setup_concurrent(
+        tentacles=[],
+        setup_tentacle=FakeTentacle.setup,
+        label=lambda t: t.label_short,
+    )
@@ -0,0 +1,268 @@
+from __future__ import annotations
+
+import pathlib
+import threading
+
+import pytest
+
+from testbed_showcase.util_daq_capture import (
+    Capture,
+    DAQ_CHANNEL_TRIG1,
+    DAQ_CHANNEL_TRIG2,
+    DaqCapture,
+    ReplaySource,
+    SampleRing,
+    Trigger,
+    daq_source_factory,
+    find_edge,
+)
+
+SAMPLERATE_HZ = 1_000_000
+TRIG1 = 1 << DAQ_CHANNEL_TRIG1
+TRIG2 = 1 << DAQ_CHANNEL_TRIG2
+
+
+def _samples(trigger_at: int, total: int) -> bytes:
+    """
+    trig2 toggles every 10 samples, trig1 rises at 'trigger_at'.
+    The value of every sample encodes its position in the upper bits.
+    """
+    return bytes(
+        ((i // 10) % 2) * TRIG2 | (TRIG1 if i >= trigger_at else 0) | ((i % 16) << 4)
+        for i in range(total)
+    )
+
+
+def _replay(tmp_path: pathlib.Path, samples: bytes) -> ReplaySource:
+    filename = tmp_path / "recorded.bin"
+    filename.write_bytes(samples)
+    return ReplaySource(filename=filename, samplerate_hz=SAMPLERATE_HZ)
+
+
+def test_find_edge() -> None:
+    data = bytes([0, 0, TRIG1, TRIG1, 0])
+    assert find_edge(data, channel=DAQ_CHANNEL_TRIG1) == 2
+    assert find_edge(data, channel=DAQ_CHANNEL_TRIG1, rising=False) == 4
+    assert find_edge(data, channel=DAQ_CHANNEL_TRIG2) is None
+    # The edge at the chunk boundary
+    assert find_edge(bytes([TRIG1]), channel=DAQ_CHANNEL_TRIG1, previous=0) == 0
+    assert find_edge(bytes([TRIG1]), channel=DAQ_CHANNEL_TRIG1, previous=TRIG1) is None
+
+
+def test_ring_wraps(tmp_path: pathlib.Path) -> None:
+    ring = SampleRing(filename=tmp_path / "ring.bin", capacity=100)
+    samples = bytes(i % 256 for i in range(250))
+    for position in range(0, len(samples), 30):
+        ring.write(samples[position : position + 30])
+    assert (ring.oldest, ring.written) == (150, 250)
+    assert ring.read(150, 250) == samples[150:250]
+    assert ring.read(190, 210) == samples[190:210]
+    with pytest.raises(ValueError):
+        ring.read(149, 160)
+
+    # More than the capacity in one write
+    ring.write(bytes(range(256)) * 2)
+    assert ring.read(ring.oldest, ring.written) == (bytes(range(256)) * 2)[-100:]
+
+    ring.write_to(tmp_path / "window.bin", start=700, stop=762, chunk_size=7)
+    assert (tmp_path / "window.bin").read_bytes() == ring.read(700, 762)
+    ring.close()
+    assert not ring.filename.exists()
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 4096, 100_000])
+def test_capture_window(tmp_path: pathlib.Path, chunk_size: int) -> None:
+    samples = _samples(trigger_at=5000, total=20000)
+    capture = Capture(
+        source=_replay(tmp_path, samples),
+        ring=SampleRing(filename=tmp_path / "ring.bin", capacity=2000),
+        trigger=Trigger(pre_samples=300, post_samples=1000),
+        chunk_size=chunk_size,
+    )
+    result = capture.run()
+    assert result.trigger_sample == 5000
+    assert (result.start, result.stop) == (4700, 6000)
+    # The capture stops after the window: The rest of the file is not read
+    assert capture.ring.written == 6000
+    assert capture.ring.read(result.start, result.stop) == samples[4700:6000]
+    capture.ring.close()
+
+
+def test_capture_not_triggered(tmp_path: pathlib.Path) -> None:
+    samples = _samples(trigger_at=10**9, total=5000)
+    capture = Capture(
+        source=_replay(tmp_path, samples),
+        ring=SampleRing(filename=tmp_path / "ring.bin", capacity=2000),
+        trigger=Trigger(pre_samples=300, post_samples=1000),
+    )
+    result = capture.run()
+    assert result.trigger_sample is None
+    assert (result.start, result.stop) == (3000, 5000)
+    assert "not triggered" in result.text
+    capture.ring.close()
+
+
+def test_trigger_window_exceeds_ring(tmp_path: pathlib.Path) -> None:
+    source = _replay(tmp_path, b"")
+    ring = SampleRing(filename=tmp_path / "ring.bin", capacity=100)
+    with pytest.raises(ValueError):
+        Capture(
+            source=source,
+            ring=ring,
+            trigger=Trigger(pre_samples=50, post_samples=51),
+        )
+    source.close()
+    ring.close()
+
+
+def test_daq_capture(tmp_path: pathlib.Path) -> None:
+    samples = _samples(trigger_at=500, total=3000)
+    filename = tmp_path / "recorded.bin"
+    filename.write_bytes(samples)
+    daq_capture = DaqCapture(
+        source_factory=daq_source_factory(str(filename)),
+        directory=tmp_path / "results",
+        capacity=1000,
+    )
+    trigger = Trigger(pre_samples=100, post_samples=200)
+    with daq_capture.capture("i2c", trigger=trigger) as capture:
+        assert capture is not None
+
+    (result,) = daq_capture.results
+    assert result.trigger_sample == 500
+    assert result.filename == tmp_path / "results" / "daq_i2c.bin"
+    assert result.filename.read_bytes() == samples[400:700]
+    assert sorted(p.name for p in (tmp_path / "results").iterdir()) == ["daq_i2c.bin"]
+
+
+class _SlowSource(ReplaySource):
+    """
+    Like the logic analyser: The first samples arrive after 'started' is set.
+    'abort()' unblocks 'read()' like a terminated sigrok-cli.
+    Records the thread which closes the source.
+    """
+
+    def __init__(self, filename: pathlib.Path) -> None:
+        super().__init__(filename=filename, samplerate_hz=SAMPLERATE_HZ)
+        self.started = threading.Event()
+        self.aborted = False
+        self.closed_by: str | None = None
+
+    def read(self, size: int) -> bytes:
+        self.started.wait()
+        if self.aborted:
+            return b""
+        return super().read(size)
+
+    def abort(self) -> None:
+        self.aborted = True
+        self.started.set()
+
+    def close(self) -> None:
+        if self.closed_by is None:
+            self.closed_by = threading.current_thread().name
+        super().close()
+
+
+def test_capture_start_stop(tmp_path: pathlib.Path) -> None:
+    filename = tmp_path / "recorded.bin"
+    filename.write_bytes(_samples(trigger_at=500, total=3000))
+    source = _SlowSource(filename)
+    capture = Capture(
+        source=source,
+        ring=SampleRing(filename=tmp_path / "ring.bin", capacity=1000),
+        trigger=Trigger(pre_samples=100, post_samples=200),
+        chunk_size=64,
+    )
+    threading.Timer(0.2, source.started.set).start()
+    capture.start()
+    # Armed: The first chunk is in the ring
+    assert capture.ring.written > 0
+    result = capture.stop()
+    assert (result.trigger_sample, result.start, result.stop) == (500, 400, 700)
+    assert source.closed_by == "daq_capture"
+    capture.ring.close()
+
+
+def test_capture_start_timeout(tmp_path: pathlib.Path) -> None:
+    filename = tmp_path / "recorded.bin"
+    filename.write_bytes(_samples(trigger_at=500, total=3000))
+    source = _SlowSource(filename)
+    capture = Capture(
+        source=source,
+        ring=SampleRing(filename=tmp_path / "ring.bin", capacity=1000),
+        trigger=Trigger(pre_samples=100, post_samples=200),
+    )
+    with pytest.raises(TimeoutError):
+        capture.start(timeout_s=0.1)
+    # The source has been aborted: The capture thread stopped and closed it
+    assert not capture.running
+    assert source.closed_by == "daq_capture"
+    capture.ring.close()
+
+
+def test_daq_capture_start_timeout(tmp_path: pathlib.Path) -> None:
+    """
+    The analyser stays silent: One TimeoutError, no window is written.
+    """
+    filename = tmp_path / "recorded.bin"
+    filename.write_bytes(_samples(trigger_at=500, total=3000))
+    sources: list[_SlowSource] = []
+
+    def source_factory() -> _SlowSource:
+        sources.append(_SlowSource(filename))
+        return sources[-1]
+
+    daq_capture = DaqCapture(
+        source_factory=source_factory,
+        directory=tmp_path / "results",
+        capacity=1000,
+        arm_timeout_s=0.1,
+    )
+    with pytest.raises(TimeoutError, match="No samples"):
+        with daq_capture.capture("i2c"):
+            raise AssertionError("Not reached")
+    (source,) = sources
+    assert source.closed_by == "daq_capture"
+    assert daq_capture.results == []
+    assert list((tmp_path / "results").iterdir()) == []
+
+
+def test_daq_capture_disabled(tmp_path: pathlib.Path) -> None:
+    daq_capture = DaqCapture(source_factory=None, directory=tmp_path)
+    with daq_capture.capture("i2c") as capture:
+        assert capture is None
+    assert daq_capture.results == []
+
+
+def test_daq_source_factory(tmp_path: pathlib.Path) -> None:
+    assert daq_source_factory(None) is None
+    assert daq_source_factory("sigrok") is not None
+    with pytest.raises(ValueError):
+        daq_source_factory(str(tmp_path / "missing.bin"))
+
+
+@pytest.mark.slow
+def test_capture_seconds(tmp_path: pathlib.Path) -> None:
+    """
+    3s at 24 MHz: 72 MBytes streamed through a 16 MBytes ring.
+    """
+    samplerate_hz = 24_000_000
+    trigger_at = 2 * samplerate_hz
+    filename = tmp_path / "recorded.bin"
+    with filename.open("wb") as f:
+        second = bytes(samplerate_hz)
+        f.write(second)
+        f.write(second)
+        f.write(bytes([TRIG1]) * samplerate_hz)
+    capture = Capture(
+        source=ReplaySource(filename=filename, samplerate_hz=samplerate_hz),
+        ring=SampleRing(filename=tmp_path / "ring.bin", capacity=1 << 24),
+        trigger=Trigger(),
+    )
+    result = capture.run()
+    assert result.trigger_sample == trigger_at
+    assert result.samples == Trigger().pre_samples + Trigger().post_samples
+    window = capture.ring.read(result.start, result.stop)
+    assert window.count(TRIG1) == Trigger().post_samples
+    capture.ring.close()
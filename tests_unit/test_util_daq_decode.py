@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import dataclasses
+import pathlib
+import time
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+# pylint: disable=wrong-import-position
+from testbed_showcase.util_daq_capture import (  # noqa: E402
+    CaptureResult,
+    DAQ_CHANNEL_DATA1,
+    DAQ_CHANNEL_DATA2,
+    DAQ_CHANNEL_TRIG1,
+)
+from testbed_showcase.util_daq_decode import (  # noqa: E402
+    daq_channel,
+    decode_i2c,
+    decode_i2c_capture,
+    decode_onewire,
+    decode_uart,
+    i2c_channels,
+    measure_pwm,
+    onewire_channel,
+    scl_frequency_hz,
+)
+from testbed_showcase.util_daq_synth import (  # noqa: E402
+    decode_i2c_reference,
+    synth_i2c,
+    synth_onewire,
+    synth_pwm,
+    synth_uart,
+)
+
+SAMPLERATE_HZ = 24_000_000
+SCL, SDA = DAQ_CHANNEL_DATA1, DAQ_CHANNEL_DATA2
+TRANSFERS = [
+    (0x50, True, b"\xff" * 10),
+    (0x3C, False, b"\x00\x12\xa5"),
+    (0x50, True, b"\x01"),
+]
+
+
+@dataclasses.dataclass(frozen=True)
+class _McuConfig:
+    """
+    The pins of 'tentacle_specs.MCU_RPI_PICO'
+    """
+
+    trig1: str = "GP20"
+    trig2: str = "GP21"
+    data1: str = "GP19"
+    data2: str = "GP18"
+    onewire: str = "GP14"
+
+
+def test_decode_i2c() -> None:
+    samples = synth_i2c(TRANSFERS, scl=SCL, sda=SDA, samplerate_hz=SAMPLERATE_HZ)
+    transfers = decode_i2c(samples, scl=SCL, sda=SDA)
+    assert [(t.address, t.read, t.data) for t in transfers] == TRANSFERS
+    # The last byte of a read is not acknowledged
+    assert transfers[0].acks == (True,) * 10 + (False,)
+    assert transfers[1].acks == (True,) * 4
+    assert transfers[0].text == f"I2C 0x50 read {b'\xff' * 10!r}"
+    assert decode_i2c_reference(samples.tobytes(), scl=SCL, sda=SDA) == transfers
+
+    frequency_hz = scl_frequency_hz(samples, scl=SCL, samplerate_hz=SAMPLERATE_HZ)
+    assert frequency_hz == pytest.approx(100_000, rel=0.01)
+
+
+def test_decode_i2c_truncated() -> None:
+    samples = synth_i2c(TRANSFERS[:1], scl=SCL, sda=SDA, samplerate_hz=SAMPLERATE_HZ)
+    # The capture ends in the middle of the 4th data byte
+    (transfer,) = decode_i2c(samples[: len(samples) // 3], scl=SCL, sda=SDA)
+    assert transfer.data == b"\xff" * 2
+    assert decode_i2c(samples[:0], scl=SCL, sda=SDA) == []
+
+
+@pytest.mark.parametrize("baudrate", [9600, 115200, 1_000_000])
+def test_decode_uart(baudrate: int) -> None:
+    data = bytes(range(256))
+    samples = synth_uart(
+        data, channel=DAQ_CHANNEL_TRIG1, baudrate=baudrate, samplerate_hz=SAMPLERATE_HZ
+    )
+    uart_bytes = decode_uart(
+        samples,
+        channel=DAQ_CHANNEL_TRIG1,
+        baudrate=baudrate,
+        samplerate_hz=SAMPLERATE_HZ,
+    )
+    assert bytes(b.value for b in uart_bytes) == data
+    assert not any(b.framing_error for b in uart_bytes)
+
+
+def test_decode_uart_framing_error() -> None:
+    samples = synth_uart(
+        b"\x55", channel=0, baudrate=115200, samplerate_hz=SAMPLERATE_HZ
+    )
+    # Pull the stop bit low
+    samples[-3 * SAMPLERATE_HZ // 115200 :] = 0
+    (uart_byte,) = decode_uart(
+        samples, channel=0, baudrate=115200, samplerate_hz=SAMPLERATE_HZ
+    )
+    assert uart_byte.value == 0x55
+    assert uart_byte.framing_error
+
+
+def test_decode_onewire() -> None:
+    transfers = [b"\xcc\x44", b"\xcc\xbe\x50\x05"]
+    samples = synth_onewire(
+        transfers, channel=DAQ_CHANNEL_DATA1, samplerate_hz=SAMPLERATE_HZ
+    )
+    decoded = decode_onewire(
+        samples, channel=DAQ_CHANNEL_DATA1, samplerate_hz=SAMPLERATE_HZ
+    )
+    assert [t.data for t in decoded] == transfers
+    assert all(t.presence for t in decoded)
+
+
+@pytest.mark.parametrize("duty", [0.1, 0.2, 0.3, 0.4])
+def test_measure_pwm(duty: float) -> None:
+    samples = synth_pwm(
+        channel=DAQ_CHANNEL_TRIG1,
+        frequency_hz=100,
+        duty=duty,
+        periods=5,
+        samplerate_hz=SAMPLERATE_HZ,
+    )
+    pwm = measure_pwm(samples, channel=DAQ_CHANNEL_TRIG1, samplerate_hz=SAMPLERATE_HZ)
+    assert pwm is not None
+    assert pwm.frequency_hz == pytest.approx(100.0)
+    assert pwm.duty == pytest.approx(duty)
+    assert pwm.periods == 4
+    assert measure_pwm(samples[:0], channel=0, samplerate_hz=SAMPLERATE_HZ) is None
+
+
+def test_channels() -> None:
+    mcu_config = _McuConfig()
+    assert daq_channel(mcu_config, "GP20") == DAQ_CHANNEL_TRIG1  # type: ignore[arg-type]
+    assert i2c_channels(mcu_config) == (SCL, SDA)  # type: ignore[arg-type]
+    # GP14 is not connected to the DAQ: The relays route the bus to data1
+    assert onewire_channel(mcu_config) == DAQ_CHANNEL_DATA1  # type: ignore[arg-type]
+    with pytest.raises(ValueError):
+        daq_channel(mcu_config, "GP0")  # type: ignore[arg-type]
+
+
+def test_decode_i2c_capture(tmp_path: pathlib.Path) -> None:
+    samples = synth_i2c(TRANSFERS, scl=SCL, sda=SDA, samplerate_hz=SAMPLERATE_HZ)
+    filename = tmp_path / "daq_i2c.bin"
+    filename.write_bytes(samples.tobytes())
+    result = CaptureResult(
+        samplerate_hz=SAMPLERATE_HZ,
+        trigger_sample=0,
+        start=0,
+        stop=len(samples),
+        filename=filename,
+    )
+    transfers = decode_i2c_capture(result, _McuConfig())  # type: ignore[arg-type]
+    assert [(t.address, t.read, t.data) for t in transfers] == TRANSFERS
+
+
+@pytest.mark.slow
+def test_benchmark_decode_i2c() -> None:
+    """
+    The vectorized decoder is at least 10 times faster than the python loop.
+    """
+    transfers = TRANSFERS * 100
+    samples = synth_i2c(transfers, scl=SCL, sda=SDA, samplerate_hz=SAMPLERATE_HZ)
+    samples_bytes = samples.tobytes()
+
+    begin_s = time.perf_counter()
+    decoded = decode_i2c(samples, scl=SCL, sda=SDA)
+    vectorized_s = time.perf_counter() - begin_s
+
+    begin_s = time.perf_counter()
+    reference = decode_i2c_reference(samples_bytes, scl=SCL, sda=SDA)
+    reference_s = time.perf_counter() - begin_s
+
+    assert decoded == reference
+    assert len(decoded) == len(transfers)
+    msamples_per_s = len(samples) / vectorized_s / 1e6
+    print(
+        f"{len(samples)} samples: vectorized {vectorized_s * 1e3:0.1f}ms ({msamples_per_s:0.0f} Msamples/s), python loop {reference_s * 1e3:0.1f}ms"
+    )
+    assert msamples_per_s > 1.0
+    assert reference_s > 10 * vectorized_s
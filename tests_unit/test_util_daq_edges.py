@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import pathlib
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+# pylint: disable=wrong-import-position
+from testbed_showcase.util_daq_capture import (  # noqa: E402
+    DAQ_CHANNEL_DATA1,
+    DAQ_CHANNEL_DATA2,
+    DAQ_CHANNEL_TRIG1,
+    DAQ_CHANNEL_TRIG2,
+    DaqCapture,
+    Trigger,
+    daq_source_factory,
+)
+from testbed_showcase.util_daq_decode import decode_i2c, decode_i2c_capture  # noqa: E402
+from testbed_showcase.util_daq_edges import (  # noqa: E402
+    EdgeList,
+    Samples,
+    trigger_windows,
+)
+from testbed_showcase.util_daq_synth import synth_i2c, synth_pwm  # noqa: E402
+
+SAMPLERATE_HZ = 24_000_000
+
+
+def _i2c_pattern(periods: int) -> Samples:
+    """
+    The PWM signals of 'test_i2c_pattern': 100 Hz, duty 10%..40%.
+    """
+    return (
+        synth_pwm(DAQ_CHANNEL_TRIG1, 100, 0.1, periods, SAMPLERATE_HZ)
+        | synth_pwm(DAQ_CHANNEL_TRIG2, 100, 0.2, periods, SAMPLERATE_HZ)
+        | synth_pwm(DAQ_CHANNEL_DATA1, 100, 0.3, periods, SAMPLERATE_HZ)
+        | synth_pwm(DAQ_CHANNEL_DATA2, 100, 0.4, periods, SAMPLERATE_HZ)
+    )
+
+
+def test_roundtrip() -> None:
+    samples = np.array([5, 5, 5, 7, 7, 0, 5, 5], dtype=np.uint8)
+    edge_list = EdgeList.from_dense(samples, samplerate_hz=SAMPLERATE_HZ, start=100)
+    assert edge_list.timestamps.tolist() == [100, 103, 105, 106]
+    assert edge_list.states.tolist() == [5, 7, 0, 5]
+    assert (edge_list.start, edge_list.stop) == (100, 108)
+    assert np.array_equal(edge_list.to_dense(), samples)
+    assert np.array_equal(edge_list.to_dense(start=104, stop=107), samples[4:7])
+    assert edge_list.state_at(104) == 7
+    with pytest.raises(ValueError):
+        edge_list.to_dense(start=99, stop=101)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 1000])
+def test_from_chunks(chunk_size: int) -> None:
+    samples = _i2c_pattern(periods=2)[::1000].copy()
+    chunks = [
+        samples[i : i + chunk_size].tobytes()
+        for i in range(0, len(samples), chunk_size)
+    ]
+    edge_list = EdgeList.from_chunks(chunks, samplerate_hz=SAMPLERATE_HZ)
+    assert edge_list == EdgeList.from_dense(samples, samplerate_hz=SAMPLERATE_HZ)
+    assert np.array_equal(edge_list.to_dense(), samples)
+    with pytest.raises(ValueError):
+        EdgeList.from_chunks([], samplerate_hz=SAMPLERATE_HZ)
+
+
+def test_compact(tmp_path: pathlib.Path) -> None:
+    """
+    100ms of 'test_i2c_pattern': 2.4 MBytes dense, some hundred bytes as edges.
+    """
+    samples = _i2c_pattern(periods=10)
+    edge_list = EdgeList.from_dense(samples, samplerate_hz=SAMPLERATE_HZ)
+    # Every period: The 4 channels rise together and fall one after the other
+    assert len(edge_list.timestamps) == 1 + 10 * 5
+    assert samples.nbytes > 1000 * edge_list.nbytes
+
+    filename = tmp_path / "daq_i2c_pattern.npz"
+    edge_list.write(filename)
+    assert samples.nbytes > 1000 * filename.stat().st_size
+    assert EdgeList.read(filename) == edge_list
+
+
+def test_edges() -> None:
+    samples = _i2c_pattern(periods=3)
+    edge_list = EdgeList.from_dense(samples, samplerate_hz=SAMPLERATE_HZ)
+    period = SAMPLERATE_HZ // 100
+    rising = edge_list.edges(DAQ_CHANNEL_TRIG1)
+    falling = edge_list.edges(DAQ_CHANNEL_TRIG1, rising=False)
+    assert np.diff(rising).tolist() == [period, period]
+    assert (falling - rising).tolist() == [period // 10] * 3
+
+
+def test_retain_trigger_windows() -> None:
+    i2c = synth_i2c(
+        [(0x50, True, b"\xff" * 10)],
+        scl=DAQ_CHANNEL_DATA1,
+        sda=DAQ_CHANNEL_DATA2,
+        samplerate_hz=SAMPLERATE_HZ,
+    )
+    trig1 = np.uint8(1 << DAQ_CHANNEL_TRIG1)
+    idle = np.full(SAMPLERATE_HZ // 100, 0x0F & ~trig1, dtype=np.uint8)
+    # trig1 is high during the transfer, followed by noise on data1
+    noise = np.tile(
+        np.array([0x0E, 0x0A], dtype=np.uint8).repeat(100), SAMPLERATE_HZ // 2000
+    )
+    samples = np.concatenate([idle, i2c | trig1, idle, noise])
+    edge_list = EdgeList.from_dense(samples, samplerate_hz=SAMPLERATE_HZ)
+
+    windows = trigger_windows(edge_list, pre_samples=1000, post_samples=len(i2c))
+    assert windows == [(len(idle) - 1000, len(idle) + 2 * len(i2c))]
+    retained = edge_list.retain(windows)
+    assert retained.windows == tuple(windows)
+    # The noise has been dropped
+    assert len(retained.timestamps) < len(edge_list.timestamps) // 10
+    (transfer,) = decode_i2c(
+        retained.to_dense(*windows[0]), scl=DAQ_CHANNEL_DATA1, sda=DAQ_CHANNEL_DATA2
+    )
+    assert transfer.data == b"\xff" * 10
+    # Outside the windows the signals are flat
+    assert len(np.unique(retained.to_dense(start=windows[0][1]))) == 1
+
+    with pytest.raises(ValueError):
+        edge_list.retain([(len(samples), len(samples) + 10)])
+
+
+def test_daq_capture_edges(tmp_path: pathlib.Path) -> None:
+    scl, sda = DAQ_CHANNEL_DATA1, DAQ_CHANNEL_DATA2
+    i2c = synth_i2c(
+        [(0x50, True, b"\xff" * 10)], scl=scl, sda=sda, samplerate_hz=SAMPLERATE_HZ
+    )
+    trig1 = np.uint8(1 << DAQ_CHANNEL_TRIG1)
+    samples = np.concatenate([i2c[:1000], i2c | trig1])
+    filename = tmp_path / "recorded.bin"
+    filename.write_bytes(samples.tobytes())
+
+    daq_capture = DaqCapture(
+        source_factory=daq_source_factory(str(filename)),
+        directory=tmp_path / "results",
+        capacity=len(samples),
+        edges=True,
+    )
+    trigger = Trigger(pre_samples=100, post_samples=len(i2c))
+    with daq_capture.capture("i2c", trigger=trigger):
+        pass
+    (result,) = daq_capture.results
+    assert result.filename == tmp_path / "results" / "daq_i2c.npz"
+
+    class _McuConfig:
+        trig1, trig2, data1, data2 = "GP20", "GP21", "GP19", "GP18"
+
+    (transfer,) = decode_i2c_capture(result, _McuConfig())  # type: ignore[arg-type]
+    assert transfer.data == b"\xff" * 10
+
+
+def test_daq_capture_retain(tmp_path: pathlib.Path) -> None:
+    scl, sda = DAQ_CHANNEL_DATA1, DAQ_CHANNEL_DATA2
+    i2c = synth_i2c(
+        [(0x50, True, b"\xff" * 10)], scl=scl, sda=sda, samplerate_hz=SAMPLERATE_HZ
+    )
+    trig1 = np.uint8(1 << DAQ_CHANNEL_TRIG1)
+    # Noise on data1 after the transfer
+    noise = np.tile(np.array([0x0E, 0x0A], dtype=np.uint8).repeat(100), 1000)
+    samples = np.concatenate([i2c[:1000], i2c | trig1, noise])
+    filename = tmp_path / "recorded.bin"
+    filename.write_bytes(samples.tobytes())
+
+    daq_capture = DaqCapture(
+        source_factory=daq_source_factory(str(filename)),
+        directory=tmp_path / "results",
+        capacity=len(samples),
+        edges=True,
+        retain_samples=len(i2c),
+    )
+    trigger = Trigger(pre_samples=100, post_samples=len(i2c) + len(noise))
+    with daq_capture.capture("i2c", trigger=trigger):
+        pass
+    (result,) = daq_capture.results
+    edge_list = EdgeList.read(result.filename)
+    assert len(edge_list.windows) == 1
+    assert len(edge_list.timestamps) < len(noise) // 100
+
+    class _McuConfig:
+        trig1, trig2, data1, data2 = "GP20", "GP21", "GP19", "GP18"
+
+    (transfer,) = decode_i2c_capture(result, _McuConfig())  # type: ignore[arg-type]
+    assert transfer.data == b"\xff" * 10
@@ -0,0 +1,215 @@
+from __future__ import annotations
+
+import http.server
+import json
+import pathlib
+import struct
+import threading
+import zlib
+from collections.abc import Iterator
+
+import pytest
+
+from testbed_showcase.util_download_cache import (
+    Download,
+    DownloadCache,
+    UF2_MAGIC_END,
+    UF2_MAGIC_START0,
+    UF2_MAGIC_START1,
+    fetch_firmwares,
+    sha256_file,
+    verify_dfu,
+    verify_uf2,
+)
+
+
+def _uf2(num_blocks: int) -> bytes:
+    blocks = []
+    for block_no in range(num_blocks):
+        header = struct.pack(
+            "<8I",
+            UF2_MAGIC_START0,
+            UF2_MAGIC_START1,
+            0,
+            0x10000000 + 256 * block_no,
+            256,
+            block_no,
+            num_blocks,
+            0xE48BFF59,
+        )
+        payload = bytes([block_no & 0xFF]) * 476
+        blocks.append(header + payload + struct.pack("<I", UF2_MAGIC_END))
+    return b"".join(blocks)
+
+
+def _dfu(payload: bytes) -> bytes:
+    data = b"DfuSe" + payload + struct.pack("<HHHH", 0xFFFF, 0xDF11, 0x0483, 0x011A)
+    data += b"UFD" + bytes([16])
+    return data + struct.pack("<I", zlib.crc32(data) ^ 0xFFFFFFFF)
+
+
+FILES = {
+    "RPI_PICO2-v1.24.0.uf2": _uf2(200),
+    "PYBV11-v1.24.0.dfu": _dfu(bytes(range(256)) * 100),
+    "BROKEN-v1.24.0.uf2": _uf2(3)[:-1] + b"x",
+}
+
+
+class _Upstream:
+    """
+    Stands in for https://micropython.org/resources/firmware.
+    """
+
+    def __init__(self) -> None:
+        self.requests: list[tuple[str, str | None]] = []
+        self.abort_after: int | None = None
+        """
+        Drop the connection after this many bytes, once
+        """
+        self.support_range = True
+        self.url = ""
+
+
+@pytest.fixture
+def upstream() -> Iterator[_Upstream]:
+    _upstream = _Upstream()
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            name = self.path.lstrip("/")
+            _range = self.headers.get("Range")
+            _upstream.requests.append((name, _range))
+            content = FILES.get(name)
+            if content is None:
+                self.send_error(404)
+                return
+            offset = 0
+            if (_range is not None) and _upstream.support_range:
+                offset = int(_range.removeprefix("bytes=").removesuffix("-"))
+                if offset >= len(content):
+                    self.send_error(416)
+                    return
+                self.send_response(206)
+                self.send_header(
+                    "Content-Range",
+                    f"bytes {offset}-{len(content) - 1}/{len(content)}",
+                )
+            else:
+                self.send_response(200)
+            body = content[offset:]
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if _upstream.abort_after is not None:
+                body = body[: _upstream.abort_after]
+                _upstream.abort_after = None
+            self.wfile.write(body)
+
+        def log_message(self, *args: object) -> None:
+            pass
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    _upstream.url = f"http://127.0.0.1:{server.server_port}"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield _upstream
+    server.shutdown()
+    server.server_close()
+
+
+def test_verify() -> None:
+    verify_uf2(FILES["RPI_PICO2-v1.24.0.uf2"])
+    verify_dfu(FILES["PYBV11-v1.24.0.dfu"])
+    for data in (b"", FILES["BROKEN-v1.24.0.uf2"], FILES["RPI_PICO2-v1.24.0.uf2"][1:]):
+        with pytest.raises(ValueError):
+            verify_uf2(data)
+    corrupt = bytearray(FILES["PYBV11-v1.24.0.dfu"])
+    corrupt[100] ^= 1
+    with pytest.raises(ValueError, match="crc"):
+        verify_dfu(bytes(corrupt))
+    with pytest.raises(ValueError):
+        verify_dfu(FILES["RPI_PICO2-v1.24.0.uf2"])
+
+
+def test_fetch_cached(tmp_path: pathlib.Path, upstream: _Upstream) -> None:
+    cache = DownloadCache(directory=tmp_path)
+    download = Download(url=f"{upstream.url}/RPI_PICO2-v1.24.0.uf2")
+    entry = cache.fetch(download)
+    assert entry.filename.read_bytes() == FILES["RPI_PICO2-v1.24.0.uf2"]
+    assert entry.filename == tmp_path / "objects" / entry.sha256[:2] / (
+        entry.sha256 + ".uf2"
+    )
+    assert sha256_file(entry.filename) == entry.sha256
+
+    # A second cache instance on the same directory: No download
+    cache2 = DownloadCache(directory=tmp_path)
+    assert cache2.fetch(download) == entry
+    assert (cache.downloads, cache2.downloads) == (1, 0)
+    assert len(upstream.requests) == 1
+
+
+def test_fetch_all(tmp_path: pathlib.Path, upstream: _Upstream) -> None:
+    cache = DownloadCache(directory=tmp_path, max_workers=3)
+    names = ["RPI_PICO2-v1.24.0.uf2", "PYBV11-v1.24.0.dfu", "RPI_PICO2-v1.24.0.uf2"]
+    entries = cache.fetch_all([Download(url=f"{upstream.url}/{n}") for n in names])
+    assert [e.filename.read_bytes() for e in entries] == [FILES[n] for n in names]
+    # The duplicate url is only fetched once
+    assert cache.downloads == 2
+
+
+def test_resume(tmp_path: pathlib.Path, upstream: _Upstream) -> None:
+    upstream.abort_after = 10_000
+    cache = DownloadCache(directory=tmp_path)
+    entry = cache.fetch(Download(url=f"{upstream.url}/RPI_PICO2-v1.24.0.uf2"))
+    assert entry.filename.read_bytes() == FILES["RPI_PICO2-v1.24.0.uf2"]
+    assert upstream.requests == [
+        ("RPI_PICO2-v1.24.0.uf2", None),
+        ("RPI_PICO2-v1.24.0.uf2", "bytes=10000-"),
+    ]
+    assert cache.resumed == 1
+    assert list((tmp_path / "partial").iterdir()) == []
+
+
+def test_resume_not_supported(tmp_path: pathlib.Path, upstream: _Upstream) -> None:
+    upstream.abort_after = 10_000
+    upstream.support_range = False
+    cache = DownloadCache(directory=tmp_path)
+    entry = cache.fetch(Download(url=f"{upstream.url}/PYBV11-v1.24.0.dfu"))
+    assert entry.filename.read_bytes() == FILES["PYBV11-v1.24.0.dfu"]
+    assert cache.resumed == 0
+
+
+def test_verification_failed(tmp_path: pathlib.Path, upstream: _Upstream) -> None:
+    cache = DownloadCache(directory=tmp_path)
+    with pytest.raises(ValueError, match="Invalid magic"):
+        cache.fetch(Download(url=f"{upstream.url}/BROKEN-v1.24.0.uf2"))
+    with pytest.raises(ValueError, match="sha256"):
+        cache.fetch(Download(url=f"{upstream.url}/PYBV11-v1.24.0.dfu", sha256="00"))
+    # Nothing may be handed to flashing
+    assert not (tmp_path / "objects").exists()
+    assert list((tmp_path / "partial").iterdir()) == []
+
+
+def test_fetch_firmwares(tmp_path: pathlib.Path, upstream: _Upstream) -> None:
+    filenames = []
+    for variant, name in (
+        ("RPI_PICO2", "RPI_PICO2-v1.24.0.uf2"),
+        ("PYBV11", "PYBV11-v1.24.0.dfu"),
+    ):
+        filename = tmp_path / f"pytest_args_firmware_{variant}_v1.24.0.json"
+        filename.write_text(
+            json.dumps(
+                {
+                    "board_variant": variant,
+                    "url": f"{upstream.url}/{name}",
+                    "micropython_full_version_text": f"MicroPython v1.24.0;{variant}",
+                }
+            )
+        )
+        filenames.append(filename)
+    downloads = fetch_firmwares(
+        cache=DownloadCache(directory=tmp_path / "cache"), filenames=filenames
+    )
+    assert sorted(downloads) == ["PYBV11", "RPI_PICO2"]
+    download = downloads["PYBV11"]
+    assert download.spec.micropython_full_version_text == "MicroPython v1.24.0;PYBV11"
+    assert download.entry.filename.read_bytes() == FILES["PYBV11-v1.24.0.dfu"]
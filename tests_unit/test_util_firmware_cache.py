@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import os
+import pathlib
+import subprocess
+
+import pytest
+
+from testbed_showcase.util_firmware_cache import (
+    FirmwareCache,
+    FirmwareCacheKey,
+    resolve_git_commit,
+    split_git_ref,
+)
+
+COMMIT_A = "a" * 40
+COMMIT_B = "b" * 40
+VERSION_TEXT = "3.4.0; MicroPython v1.24.0 on 2024-10-25;Raspberry Pi Pico2 with RP2350"
+
+
+def _firmware(tmp_path: pathlib.Path, name: str, size: int) -> pathlib.Path:
+    filename = tmp_path / name
+    filename.write_bytes(b"x" * size)
+    return filename
+
+
+def test_firmware_cache_hit_miss(tmp_path: pathlib.Path) -> None:
+    cache = FirmwareCache(directory=tmp_path / "cache", max_bytes=10_000)
+    key = FirmwareCacheKey(git_commit=COMMIT_A, board_variant="RPI_PICO2")
+
+    assert cache.lookup(key=key) is None
+
+    cache.store(
+        key=key,
+        filename=_firmware(tmp_path, "build.uf2", 100),
+        micropython_full_version_text=VERSION_TEXT,
+    )
+
+    # A new session: A new instance of the cache
+    cache = FirmwareCache(directory=tmp_path / "cache", max_bytes=10_000)
+    entry = cache.lookup(key=key)
+    assert entry is not None
+    assert entry.filename.suffix == ".uf2"
+    assert entry.filename.read_bytes() == b"x" * 100
+    assert entry.micropython_full_version_text == VERSION_TEXT
+
+    for other_key in (
+        FirmwareCacheKey(git_commit=COMMIT_B, board_variant="RPI_PICO2"),
+        FirmwareCacheKey(git_commit=COMMIT_A, board_variant="RPI_PICO2-RISCV"),
+    ):
+        assert cache.lookup(key=other_key) is None
+
+
+def test_firmware_cache_lru_eviction(tmp_path: pathlib.Path) -> None:
+    cache = FirmwareCache(directory=tmp_path / "cache", max_bytes=3_000)
+    keys = [
+        FirmwareCacheKey(git_commit=COMMIT_A, board_variant=variant)
+        for variant in ("PYBV11", "PYBV11-DP", "RPI_PICO2")
+    ]
+    for i, key in enumerate(keys[:2]):
+        cache.store(
+            key=key,
+            filename=_firmware(tmp_path, "build.dfu", 1_000),
+            micropython_full_version_text=VERSION_TEXT,
+        )
+        # Make sure, the mtime differs
+        filename_json = next((tmp_path / "cache").glob(f"{key.digest}/*.json"))
+        os.utime(filename_json, (1_000 + i, 1_000 + i))
+
+    # Use 'PYBV11': Now 'PYBV11-DP' is the least recently used
+    assert cache.lookup(key=keys[0]) is not None
+
+    cache.store(
+        key=keys[2],
+        filename=_firmware(tmp_path, "build.uf2", 1_000),
+        micropython_full_version_text=VERSION_TEXT,
+    )
+
+    assert cache.lookup(key=keys[0]) is not None
+    assert cache.lookup(key=keys[1]) is None
+    assert cache.lookup(key=keys[2]) is not None
+
+
+@pytest.mark.parametrize(
+    "firmware_build,expected",
+    [
+        (
+            "https://github.com/micropython/micropython.git@master",
+            ("https://github.com/micropython/micropython.git", "master"),
+        ),
+        (
+            "https://github.com/micropython/micropython.git",
+            ("https://github.com/micropython/micropython.git", None),
+        ),
+        (
+            "git@github.com:micropython/micropython.git@v1.24.0",
+            ("git@github.com:micropython/micropython.git", "v1.24.0"),
+        ),
+    ],
+)
+def test_split_git_ref(firmware_build: str, expected: tuple[str, str | None]) -> None:
+    assert split_git_ref(firmware_build) == expected
+
+
+def test_resolve_git_commit(tmp_path: pathlib.Path) -> None:
+    def git(*args: str) -> str:
+        return subprocess.run(
+            ["git", "-C", str(tmp_path), *args],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+
+    git("init", "-q", "-b", "master")
+    (tmp_path / "README").write_text("micropython")
+    git("add", "README")
+    git("-c", "user.name=x", "-c", "user.email=x@x", "commit", "-q", "-m", "x")
+    commit = git("rev-parse", "HEAD")
+
+    assert resolve_git_commit(str(tmp_path)) == commit
+    assert resolve_git_commit(f"file://{tmp_path}@master") == commit
+    assert resolve_git_commit(f"file://{tmp_path}@{COMMIT_B}") == COMMIT_B
+
+    # Annotated tag: The commit, not the tag object
+    git("-c", "user.name=x", "-c", "user.email=x@x", "tag", "-a", "-m", "x", "v1.24.0")
+    assert git("rev-parse", "v1.24.0") != commit
+    assert resolve_git_commit(f"file://{tmp_path}@v1.24.0") == commit
+
+    # Uncommitted changes: The firmware may not be cached
+    (tmp_path / "README").write_text("changed")
+    assert resolve_git_commit(str(tmp_path)) is None
@@ -0,0 +1,90 @@
+"""
+The builder is mocked: It just sleeps.
+"""
+
+from __future__ import annotations
+
+import concurrent.futures
+import functools
+import threading
+import time
+
+import pytest
+
+from testbed_showcase.util_firmware_prebuild import FirmwarePrebuild
+
+BUILD_DURATION_S = 0.4
+POWERCYCLE_DURATION_S = 0.4
+VARIANTS = ["PYBV11", "PYBV11-DP", "RPI_PICO2", "RPI_PICO2-RISCV"]
+
+
+def _build(variant: str, duration_s: float) -> str:
+    time.sleep(duration_s)
+    if variant == "FAIL":
+        raise ValueError("Build failed")
+    return f"firmware-{variant}.uf2"
+
+
+def _prebuild(max_workers: int) -> FirmwarePrebuild[str]:
+    return FirmwarePrebuild(
+        executor=concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+    )
+
+
+def test_prebuild_overlaps_with_powercycle() -> None:
+    """
+    Wired like 'pytest_sessionstart()': The builds of the tentacles of the
+    usb topology snapshot are submitted in a thread while the main thread
+    powercycles. One worker, the builds share one source tree and lock.
+    """
+    lock_build = threading.Lock()
+
+    def build(variant: str) -> str:
+        with lock_build:
+            return _build(variant, BUILD_DURATION_S)
+
+    begin_s = time.monotonic()
+    prebuild = _prebuild(max_workers=1)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        future_setup = executor.submit(
+            lambda: [prebuild.submit(v, functools.partial(build, v)) for v in VARIANTS]
+        )
+        # This simulates 'get_testbed()' which powercycles the tentacles
+        time.sleep(POWERCYCLE_DURATION_S)
+        future_setup.result()
+
+    assert prebuild.wait("RPI_PICO2") == "firmware-RPI_PICO2.uf2"
+    duration_s = time.monotonic() - begin_s
+    prebuild.shutdown()
+
+    # Sequential: powercycle + 3 builds
+    assert duration_s < POWERCYCLE_DURATION_S + 3 * BUILD_DURATION_S
+    assert prebuild.variants == sorted(VARIANTS)
+
+
+def test_prebuild_wait_only_for_required_variant() -> None:
+    prebuild = _prebuild(max_workers=2)
+    prebuild.submit("RPI_PICO2", lambda: _build("RPI_PICO2", 0.0))
+    prebuild.submit("PYBV11", lambda: _build("PYBV11", 2.0))
+
+    begin_s = time.monotonic()
+    assert prebuild.wait("RPI_PICO2") == "firmware-RPI_PICO2.uf2"
+    assert time.monotonic() - begin_s < 1.0
+
+    prebuild.shutdown()
+
+
+def test_prebuild_submit_twice() -> None:
+    prebuild = _prebuild(max_workers=1)
+    prebuild.submit("PYBV11", lambda: _build("PYBV11", 0.0))
+    prebuild.submit("PYBV11", lambda: _build("FAIL", 0.0))
+    assert prebuild.wait("PYBV11") == "firmware-PYBV11.uf2"
+    prebuild.shutdown()
+
+
+def test_prebuild_failure() -> None:
+    prebuild = _prebuild(max_workers=1)
+    prebuild.submit("FAIL", lambda: _build("FAIL", 0.0))
+    with pytest.raises(ValueError, match="Build failed"):
+        prebuild.wait("FAIL")
+    prebuild.shutdown()
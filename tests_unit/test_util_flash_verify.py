@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import hashlib
+import pathlib
+
+import pytest
+
+from testbed_showcase.util_flash_verify import (
+    FILENAME_DUT_FIRMWARE_SHA256,
+    FirmwareIdentity,
+    MP_PROGRAM_DELETE_SHA256,
+    MP_PROGRAM_READ_IDENTITY,
+    decide_flash,
+    firmware_sha256,
+    mp_program_write_sha256,
+)
+
+VERSION_TEXT = "3.4.0; MicroPython v1.24.0 on 2024-10-25;Raspberry Pi Pico2 with RP2350"
+SHA256_A = "a" * 64
+SHA256_B = "b" * 64
+
+EXPECTED = FirmwareIdentity(micropython_full_version_text=VERSION_TEXT, sha256=SHA256_A)
+
+
+@pytest.mark.parametrize(
+    "running,flash",
+    [
+        (None, True),
+        (FirmwareIdentity(micropython_full_version_text=VERSION_TEXT, sha256=""), True),
+        (EXPECTED, False),
+        (
+            FirmwareIdentity(
+                micropython_full_version_text=VERSION_TEXT, sha256=SHA256_B
+            ),
+            True,
+        ),
+        (
+            FirmwareIdentity(
+                micropython_full_version_text=VERSION_TEXT.replace("1.24", "1.23"),
+                sha256=SHA256_A,
+            ),
+            True,
+        ),
+    ],
+)
+def test_decide_flash(running: FirmwareIdentity | None, flash: bool) -> None:
+    decision = decide_flash(expected=EXPECTED, running=running)
+    assert decision.flash == flash, decision.text
+
+
+def test_firmware_sha256(tmp_path: pathlib.Path) -> None:
+    filename = tmp_path / "firmware.uf2"
+    filename.write_bytes(b"x" * 200_000)
+    assert firmware_sha256(filename) == hashlib.sha256(b"x" * 200_000).hexdigest()
+
+
+def test_dut_programs(tmp_path: pathlib.Path) -> None:
+    """
+    The micropython programs are plain python: Run them in cpython.
+    """
+    filename = tmp_path / "sha256.txt"
+
+    def run(program: str) -> dict[str, object]:
+        program = program.replace(FILENAME_DUT_FIRMWARE_SHA256, str(filename))
+        program = program.replace("sys.implementation._machine", "'cpython'")
+        namespace: dict[str, object] = {}
+        exec(program, namespace)
+        return namespace
+
+    values = run(MP_PROGRAM_READ_IDENTITY)["firmware_identity"]
+    assert isinstance(values, list)
+    assert FirmwareIdentity.factory(values).sha256 == ""
+
+    run(mp_program_write_sha256(sha256=SHA256_A))
+    values = run(MP_PROGRAM_READ_IDENTITY)["firmware_identity"]
+    assert isinstance(values, list)
+    assert FirmwareIdentity.factory(values).sha256 == SHA256_A
+
+    # A flash without a known hash removes the hash of the previous firmware
+    run(MP_PROGRAM_DELETE_SHA256)
+    run(MP_PROGRAM_DELETE_SHA256)
+    values = run(MP_PROGRAM_READ_IDENTITY)["firmware_identity"]
+    assert isinstance(values, list)
+    assert FirmwareIdentity.factory(values).sha256 == ""
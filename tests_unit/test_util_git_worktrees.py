@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import concurrent.futures
+import os
+import pathlib
+import subprocess
+from collections.abc import Iterator
+
+import pytest
+
+from testbed_showcase.util_git_worktrees import GitWorktrees, is_git_url
+
+
+def _git(directory: pathlib.Path, *args: str) -> str:
+    return subprocess.run(
+        ["git", "-C", str(directory), *args],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout.strip()
+
+
+@pytest.fixture
+def upstream(tmp_path: pathlib.Path) -> tuple[str, list[str]]:
+    """
+    Stands in for https://github.com/micropython/micropython.git.
+    Returns the url and the commits, the oldest first.
+    """
+    directory = tmp_path / "upstream"
+    directory.mkdir()
+    _git(directory, "init", "-q", "-b", "master")
+    # Like github: Support partial clones
+    _git(directory, "config", "uploadpack.allowFilter", "true")
+    commits = []
+    for version in ("v1.22.0", "v1.23.0", "v1.24.0"):
+        (directory / "VERSION").write_text(version)
+        _git(directory, "add", "VERSION")
+        _git(
+            directory,
+            *("-c", "user.name=x", "-c", "user.email=x@x"),
+            *("commit", "-q", "-m", version),
+        )
+        _git(directory, "tag", version)
+        commits.append(_git(directory, "rev-parse", "HEAD"))
+    return f"file://{directory}", commits
+
+
+@pytest.mark.parametrize(
+    "firmware_build,expected",
+    [
+        ("https://github.com/micropython/micropython.git@master", True),
+        ("git@github.com:micropython/micropython.git@v1.24.0", True),
+        ("file:///tmp/micropython@master", True),
+        ("~/micropython", False),
+        ("pytest_args_firmware_RPI_PICO2_v1.24.0.json", False),
+        ("MOCK", False),
+    ],
+)
+def test_is_git_url(firmware_build: str, expected: bool) -> None:
+    assert is_git_url(firmware_build) == expected
+
+
+@pytest.fixture
+def git_worktrees(tmp_path: pathlib.Path) -> Iterator[GitWorktrees]:
+    _git_worktrees = GitWorktrees(directory=tmp_path / "git_cache")
+    yield _git_worktrees
+    _git_worktrees.close()
+
+
+def test_checkout(
+    tmp_path: pathlib.Path,
+    upstream: tuple[str, list[str]],
+    git_worktrees: GitWorktrees,
+) -> None:
+    url, commits = upstream
+
+    directory = git_worktrees.checkout(f"{url}@master")
+    assert directory == tmp_path / "git_cache" / "worktrees" / commits[-1]
+    assert (directory / "VERSION").read_text() == "v1.24.0"
+    assert _git(directory, "rev-parse", "HEAD") == commits[-1]
+    # micropython's version: The tags are available
+    assert _git(directory, "describe", "--tags", "--match", "v[1-9].*") == "v1.24.0"
+    # Partial: The blobs of the other commits have not been fetched
+    missing = _git(
+        git_worktrees.directory_objects,
+        *("rev-list", "--objects", "--missing=print", "--all"),
+    )
+    assert len([line for line in missing.splitlines() if line.startswith("?")]) == 2
+
+    # The same commit again: No fetch, the worktree is reused
+    (directory / "build-RPI_PICO2").mkdir()
+    assert git_worktrees.checkout(f"{url}@{commits[-1]}") == directory
+    assert (directory / "build-RPI_PICO2").is_dir()
+    assert git_worktrees.fetches == 1
+
+    directory = git_worktrees.checkout(f"{url}@v1.22.0")
+    assert (directory / "VERSION").read_text() == "v1.22.0"
+    assert git_worktrees.commits == [commits[0], commits[-1]]
+
+    # The history is in the object store: No fetch
+    directory = git_worktrees.checkout(f"{url}@{commits[1]}")
+    assert (directory / "VERSION").read_text() == "v1.23.0"
+    assert git_worktrees.fetches == 2
+
+    # A commit which is not in the object store, for example of a PR
+    directory_upstream = pathlib.Path(url.removeprefix("file://"))
+    _git(directory_upstream, "checkout", "-q", "-b", "pr", commits[0])
+    (directory_upstream / "VERSION").write_text("v1.22.0-pr")
+    _git(
+        directory_upstream,
+        *("-c", "user.name=x", "-c", "user.email=x@x"),
+        *("commit", "-q", "-a", "-m", "pr"),
+    )
+    commit_pr = _git(directory_upstream, "rev-parse", "HEAD")
+    directory = git_worktrees.checkout(f"{url}@{commit_pr}")
+    assert (directory / "VERSION").read_text() == "v1.22.0-pr"
+    assert git_worktrees.fetches == 3
+
+
+def test_lru(tmp_path: pathlib.Path, upstream: tuple[str, list[str]]) -> None:
+    url, commits = upstream
+    for i, version in enumerate(["v1.22.0", "v1.23.0", "v1.22.0", "v1.24.0"]):
+        # Every checkout is a session: The worktree is in use till 'close()'
+        git_worktrees = GitWorktrees(directory=tmp_path / "git_cache", max_worktrees=2)
+        directory = git_worktrees.checkout(f"{url}@{version}")
+        git_worktrees.close()
+        # Distinct mtimes, also on file systems with a coarse clock
+        os.utime(directory.with_name(directory.name + ".last_used"), ns=(i, i))
+
+    # 'v1.23.0' was the least recently used
+    assert git_worktrees.commits == [commits[2], commits[0]]
+    assert not (tmp_path / "git_cache" / "worktrees" / commits[1]).exists()
+    worktrees = _git(git_worktrees.directory_objects, "worktree", "list")
+    assert commits[1][:7] not in worktrees
+
+
+def test_in_use_not_evicted(
+    tmp_path: pathlib.Path, upstream: tuple[str, list[str]]
+) -> None:
+    """
+    Two sessions, for example two shard workers, share the cache.
+    """
+    url, commits = upstream
+    session_a = GitWorktrees(directory=tmp_path / "git_cache", max_worktrees=1)
+    session_b = GitWorktrees(directory=tmp_path / "git_cache", max_worktrees=1)
+    directory_a = session_a.checkout(f"{url}@v1.22.0")
+    directory_b = session_b.checkout(f"{url}@v1.24.0")
+    # Session a still builds in its worktree
+    assert directory_a.is_dir() and directory_b.is_dir()
+
+    session_a.close()
+    session_b.checkout(f"{url}@v1.24.0")
+    assert not directory_a.exists()
+    assert session_b.commits == [commits[-1]]
+    session_b.close()
+
+
+def test_concurrent_checkout(
+    tmp_path: pathlib.Path, upstream: tuple[str, list[str]]
+) -> None:
+    url, _ = upstream
+    sessions = [GitWorktrees(directory=tmp_path / "git_cache") for _ in range(4)]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(sessions)) as executor:
+        directories = list(
+            executor.map(
+                lambda s: s[0].checkout(f"{url}@{s[1]}"),
+                zip(sessions, ["master", "v1.22.0", "master", "v1.22.0"], strict=True),
+            )
+        )
+    assert directories[0] == directories[2]
+    assert directories[1] == directories[3]
+    assert (directories[0] / "VERSION").read_text() == "v1.24.0"
+    assert (directories[1] / "VERSION").read_text() == "v1.22.0"
+    for session in sessions:
+        session.close()
@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+import gzip
+import logging
+import pathlib
+import threading
+import time
+import typing
+
+import pytest
+
+from testbed_showcase import util_log_sink
+from testbed_showcase.util_log_sink import (
+    AsyncLogs,
+    COMPRESSION_GZIP,
+    COMPRESSION_NONE,
+    COMPRESSION_ZSTD,
+    FILENAMES,
+    open_log,
+)
+
+FILENAME_DEBUG = FILENAMES[logging.DEBUG]
+FILENAME_INFO = FILENAMES[logging.INFO]
+
+
+@pytest.fixture
+def logger_root() -> logging.Logger:
+    _logger = logging.getLogger("test_util_log_sink")
+    _logger.setLevel(logging.DEBUG)
+    _logger.propagate = False
+    return _logger
+
+
+def _read(filename: pathlib.Path) -> list[str]:
+    if filename.suffix == ".gz":
+        return gzip.decompress(filename.read_bytes()).decode().splitlines()
+    return filename.read_text().splitlines()
+
+
+def test_levels(tmp_path: pathlib.Path, logger_root: logging.Logger) -> None:
+    with AsyncLogs(tmp_path, logger_root=logger_root) as logs:
+        logger_root.debug("serial: >>> exec(...)")
+        logger_root.info("TEST BEGIN")
+    logger_root.info("after the test")
+    logs.join()
+
+    debug = _read(tmp_path / FILENAME_DEBUG)
+    info = _read(tmp_path / FILENAME_INFO)
+    assert [line.split(": ", 1)[1] for line in debug] == [
+        "serial: >>> exec(...)",
+        "TEST BEGIN",
+    ]
+    assert [line.split(": ", 1)[1] for line in info] == ["TEST BEGIN"]
+
+
+def test_gzip(tmp_path: pathlib.Path, logger_root: logging.Logger) -> None:
+    with AsyncLogs(
+        tmp_path, compression=COMPRESSION_GZIP, logger_root=logger_root
+    ) as logs:
+        for i in range(1000):
+            logger_root.debug(f"line {i}")
+    logs.join()
+    lines = _read(tmp_path / (FILENAME_DEBUG + ".gz"))
+    assert len(lines) == 1000
+    assert lines[-1].endswith("line 999")
+
+
+def test_zstd(tmp_path: pathlib.Path) -> None:
+    try:
+        import zstandard  # noqa: F401
+    except ImportError:
+        with pytest.raises(ValueError, match="zstandard"):
+            open_log(tmp_path / FILENAME_DEBUG, COMPRESSION_ZSTD)
+        return
+    with open_log(tmp_path / FILENAME_DEBUG, COMPRESSION_ZSTD) as f:
+        f.write("hello\n")
+    assert (tmp_path / (FILENAME_DEBUG + ".zst")).is_file()
+
+
+def test_bounded_queue_drops(
+    tmp_path: pathlib.Path, logger_root: logging.Logger
+) -> None:
+    """
+    A blocked writer: The logging thread drops the records instead of blocking.
+    """
+    logs = AsyncLogs(tmp_path, max_records=10, logger_root=logger_root)
+    with logs:
+        assert logs._listener is not None
+        handler = logs._listener.handlers[0]
+        release = threading.Event()
+        handler_handle = handler.handle
+
+        def handle_blocked(record: logging.LogRecord) -> bool:
+            release.wait(timeout=10.0)
+            return handler_handle(record)
+
+        handler.handle = handle_blocked  # type: ignore[method-assign]
+
+        begin_s = time.monotonic()
+        for i in range(100):
+            logger_root.debug(f"line {i}")
+        assert time.monotonic() - begin_s < 1.0
+        release.set()
+    logs.join()
+    assert 80 <= logs.dropped < 100
+    assert len(_read(tmp_path / FILENAME_DEBUG)) == 100 - logs.dropped
+
+
+class SlowDiskStream:
+    """
+    Simulates a slow disk, for example a SD card:
+    Every 64kBytes written stall for 20ms.
+    """
+
+    def __init__(self, stream: typing.TextIO) -> None:
+        self.stream = stream
+        self.written = 0
+
+    def write(self, text: str) -> int:
+        self.written += len(text)
+        if self.written >= 65536:
+            self.written = 0
+            time.sleep(0.02)
+        return self.stream.write(text)
+
+    def flush(self) -> None:
+        self.stream.flush()
+
+    def close(self) -> None:
+        self.stream.close()
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize("slow_disk", [False, True], ids=["fast_disk", "slow_disk"])
+@pytest.mark.parametrize("compression", [COMPRESSION_NONE, COMPRESSION_GZIP])
+def test_benchmark(
+    tmp_path: pathlib.Path,
+    logger_root: logging.Logger,
+    monkeypatch: pytest.MonkeyPatch,
+    compression: str,
+    slow_disk: bool,
+) -> None:
+    """
+    Logging overhead on the test thread: 10 tests with 5,000 records each.
+    Compared with synchronous file handlers as 'util_logging.Logs' uses.
+    """
+    tests = 10
+    records = 5_000
+    line = "serial: " + "x" * 100
+
+    def _open_log(filename: pathlib.Path, compression: str) -> typing.TextIO:
+        stream = open_log(filename, compression)
+        if slow_disk:
+            return typing.cast(typing.TextIO, SlowDiskStream(stream))
+        return stream
+
+    monkeypatch.setattr(util_log_sink, "open_log", _open_log)
+
+    def run_sync(directory: pathlib.Path) -> None:
+        directory.mkdir()
+        handlers: list[logging.StreamHandler[typing.TextIO]] = []
+        for level, filename in FILENAMES.items():
+            handler = logging.StreamHandler(
+                _open_log(directory / filename, compression)
+            )
+            handler.setLevel(level)
+            handler.setFormatter(logging.Formatter(util_log_sink.FORMAT))
+            handlers.append(handler)
+            logger_root.addHandler(handler)
+        for i in range(records):
+            logger_root.debug(f"{line} {i}")
+        for handler in handlers:
+            logger_root.removeHandler(handler)
+            handler.close()
+            handler.stream.close()
+
+    def run_async(directory: pathlib.Path) -> AsyncLogs:
+        with AsyncLogs(
+            directory, compression=compression, logger_root=logger_root
+        ) as logs:
+            for i in range(records):
+                logger_root.debug(f"{line} {i}")
+        return logs
+
+    duration_sync_s = 0.0
+    duration_async_s = 0.0
+    for test in range(tests):
+        begin_s = time.perf_counter()
+        run_sync(tmp_path / f"sync_{test}")
+        duration_sync_s += time.perf_counter() - begin_s
+
+        begin_s = time.perf_counter()
+        logs = run_async(tmp_path / f"async_{test}")
+        duration_async_s += time.perf_counter() - begin_s
+        logs.join()
+        assert logs.dropped == 0
+
+    print(
+        f"\n{compression}, {'slow' if slow_disk else 'fast'} disk:"
+        f" per test with {records} records:"
+        f" sync {1000 * duration_sync_s / tests:0.1f}ms,"
+        f" async {1000 * duration_async_s / tests:0.1f}ms on the test thread"
+    )
+    if slow_disk:
+        assert duration_async_s < duration_sync_s
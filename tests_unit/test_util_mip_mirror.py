@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import functools
+import http.server
+import json
+import pathlib
+import threading
+from collections.abc import Iterator
+
+import pytest
+
+from emulated_repl import EmulatedRawRepl
+from testbed_showcase.util_mip_mirror import (
+    MipFile,
+    MipMirror,
+    MipPackage,
+    mip_install,
+    short_hash,
+)
+
+FILES = {
+    "aiohttp/__init__.py": b"from .aiohttp_ws import *\n",
+    "aiohttp/aiohttp_ws.py": b"import base64\n",
+    "base64.py": b"import binascii\n",
+}
+
+
+def _publish(directory: pathlib.Path, relative: str, content: bytes) -> None:
+    filename = directory / relative
+    filename.parent.mkdir(parents=True, exist_ok=True)
+    filename.write_bytes(content)
+
+
+def _publish_package(
+    directory: pathlib.Path,
+    name: str,
+    version: str,
+    paths: list[str],
+    deps: list[list[str]],
+) -> None:
+    hashes = []
+    for path in paths:
+        h = short_hash(FILES[path])
+        hashes.append([path, h])
+        _publish(directory, f"file/{h[:2]}/{h}", FILES[path])
+    package = {"hashes": hashes, "deps": deps, "version": version}
+    _publish(
+        directory, f"package/py/{name}/{version}.json", json.dumps(package).encode()
+    )
+
+
+@pytest.fixture
+def upstream(tmp_path: pathlib.Path) -> Iterator[tuple[str, list[str]]]:
+    """
+    Stands in for https://micropython.org/pi/v2.
+    Returns the url and the requested paths.
+    """
+    directory = tmp_path / "upstream"
+    _publish(directory, "index.json", b'{"v": 2, "packages": []}')
+    _publish_package(
+        directory,
+        "aiohttp",
+        "0.0.3",
+        paths=["aiohttp/__init__.py", "aiohttp/aiohttp_ws.py"],
+        deps=[["base64", "latest"]],
+    )
+    _publish_package(directory, "base64", "latest", paths=["base64.py"], deps=[])
+
+    requests: list[str] = []
+
+    class Handler(http.server.SimpleHTTPRequestHandler):
+        def do_GET(self) -> None:
+            requests.append(self.path)
+            super().do_GET()
+
+        def log_message(self, format: str, *args: object) -> None:  # noqa: A002
+            pass
+
+    server = http.server.ThreadingHTTPServer(
+        ("127.0.0.1", 0), functools.partial(Handler, directory=str(directory))
+    )
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}", requests
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_resolve_once(tmp_path: pathlib.Path, upstream: tuple[str, list[str]]) -> None:
+    url, requests = upstream
+    mirror = MipMirror(directory=tmp_path / "mirror", index_url=url)
+    files = mirror.resolve("aiohttp@0.0.3")
+    assert sorted(f.path for f, _ in files) == sorted(FILES)
+    assert mirror.downloads == 2 + 3
+    assert mirror.index()["v"] == 2
+
+    # Next session: From the disk, no network
+    requests.clear()
+    mirror = MipMirror(directory=tmp_path / "mirror", index_url=url, offline=True)
+    assert mirror.resolve("aiohttp@0.0.3") == files
+    assert mirror.downloads == 0
+    assert requests == []
+
+
+def test_offline(tmp_path: pathlib.Path, upstream: tuple[str, list[str]]) -> None:
+    url, requests = upstream
+    mirror = MipMirror(directory=tmp_path / "mirror", index_url=url, offline=True)
+    with pytest.raises(ValueError, match="not mirrored"):
+        mirror.resolve("aiohttp@0.0.3")
+    assert requests == []
+
+
+def test_hash_mismatch(tmp_path: pathlib.Path, upstream: tuple[str, list[str]]) -> None:
+    url, _requests = upstream
+    mirror = MipMirror(directory=tmp_path / "mirror", index_url=url)
+    h = short_hash(FILES["base64.py"])
+    _publish(tmp_path / "mirror", f"file/{h[:2]}/{h}", b"corrupted")
+    with pytest.raises(ValueError, match="Expected hash"):
+        mirror.file(MipFile(path="base64.py", short_hash=h))
+    # Removed from the mirror: Downloaded again
+    assert mirror.file(MipFile(path="base64.py", short_hash=h)) == FILES["base64.py"]
+
+
+def test_parse_spec() -> None:
+    assert MipPackage.parse_spec("aiohttp@0.0.3") == ("aiohttp", "0.0.3")
+    assert MipPackage.parse_spec("aiohttp") == ("aiohttp", "latest")
+    with pytest.raises(ValueError, match="not urls"):
+        MipPackage.parse_spec("github:micropython/micropython-lib/pprint.py")
+
+
+def test_mip_install(
+    tmp_path: pathlib.Path,
+    upstream: tuple[str, list[str]],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    url, _requests = upstream
+    mirror = MipMirror(directory=tmp_path / "mirror", index_url=url)
+    dut = tmp_path / "dut"
+    dut.mkdir()
+    monkeypatch.chdir(dut)
+
+    repl = EmulatedRawRepl()
+    paths = mip_install(repl, mirror, package="aiohttp@0.0.3")
+    assert repl.round_trips == 3
+    assert sorted(paths) == sorted(f"lib/{p}" for p in FILES)
+    for path, content in FILES.items():
+        assert (dut / "lib" / path).read_bytes() == content
@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+import dataclasses
+import time
+import types
+
+import jinja2
+import pytest
+
+from emulated_repl import EmulatedRawRepl
+from testbed_showcase import util_mp_remote
+from testbed_showcase.util_mp_remote import (
+    decode_fetch,
+    exec_fetch,
+    exec_render,
+    mp_program_fetch,
+    mp_programs,
+    prerender,
+    render,
+)
+
+MCU_CONFIG = {"trig1": "GP20", "onewire": "GP14"}
+
+MP_PROGRAM_ONEWIRE = """
+pin_trigger_1 = '{{mcu_config.trig1}}'
+print('scanning', '{{mcu_config.onewire}}')
+roms = [bytearray(b'(\\xff\\x01'), bytearray(b'(\\xff\\x02')]
+temperatures_c = [21.5, 22.0]
+"""
+
+
+def test_round_trips() -> None:
+    """
+    As 'test_onewire' did before: exec_render() and read_list() twice.
+    """
+    repl = EmulatedRawRepl()
+    repl.exec_render(MP_PROGRAM_ONEWIRE, mcu_config=MCU_CONFIG)
+    repl.read_list("roms")
+    repl.read_list("temperatures_c")
+    assert repl.round_trips == 3
+
+    repl = EmulatedRawRepl()
+    values = exec_fetch(
+        repl,
+        MP_PROGRAM_ONEWIRE,
+        names=["roms", "temperatures_c"],
+        mcu_config=MCU_CONFIG,
+    )
+    assert repl.round_trips == 1
+    assert values == {
+        "roms": [b"(\xff\x01", b"(\xff\x02"],
+        "temperatures_c": [21.5, 22.0],
+    }
+    assert repl.namespace["pin_trigger_1"] == "GP20"
+
+
+def test_bytes() -> None:
+    """
+    As 'test_i2c' did before: exec_render() and read_bytes().
+    """
+    mp_program = "i2c_data = b'\\xff' * 10"
+    repl = EmulatedRawRepl()
+    repl.exec_render(mp_program)
+    assert repl.read_bytes("i2c_data") == b"\xff" * 10
+    assert repl.round_trips == 2
+
+    repl = EmulatedRawRepl()
+    values = exec_fetch(repl, mp_program, names=["i2c_data"])
+    assert values == {"i2c_data": b"\xff" * 10}
+    assert repl.round_trips == 1
+
+
+def test_decode_errors() -> None:
+    with pytest.raises(ValueError, match="No values returned"):
+        decode_fetch("Traceback...\n", names=["roms"])
+    with pytest.raises(ValueError, match="not python literals"):
+        decode_fetch("__octoprobe_fetch__ [<Pin GP14>]\n", names=["pin"])
+    with pytest.raises(ValueError, match="Expected 2 values"):
+        decode_fetch("__octoprobe_fetch__ [1]\n", names=["a", "b"])
+    # The last line wins
+    assert decode_fetch(
+        "__octoprobe_fetch__ [1]\r\n__octoprobe_fetch__ [2]\r\n", names=["a"]
+    ) == {"a": 2}
+
+
+def test_program_fetch() -> None:
+    assert "repr([roms, temperatures_c])" in mp_program_fetch(
+        ["roms", "temperatures_c"]
+    )
+    with pytest.raises(AssertionError):
+        mp_program_fetch(["roms; import os"])
+
+
+@dataclasses.dataclass(frozen=True)
+class McuConfig:
+    trig1: str
+    onewire: str
+
+
+MCU_CONFIG_PICO = McuConfig(trig1="GP20", onewire="GP14")
+MCU_CONFIG_PYBOARD = McuConfig(trig1="Y2", onewire="Y9")
+
+
+@pytest.fixture(autouse=True)
+def render_cache_clear() -> None:
+    util_mp_remote._render.cache_clear()
+    util_mp_remote._template.cache_clear()
+
+
+def test_render_cached() -> None:
+    program = "pin = '{{mcu_config.trig1}}'"
+    assert render(program, mcu_config=MCU_CONFIG_PICO) == "pin = 'GP20'"
+    assert render(program, mcu_config=MCU_CONFIG_PYBOARD) == "pin = 'Y2'"
+    # An equal config of another tentacle of the same spec
+    assert render(program, mcu_config=McuConfig(trig1="GP20", onewire="GP14")) == (
+        "pin = 'GP20'"
+    )
+    info = util_mp_remote._render.cache_info()
+    assert (info.hits, info.misses) == (1, 2)
+    assert util_mp_remote._template.cache_info().misses == 1
+
+
+def test_render_unhashable() -> None:
+    """
+    Not cached, but rendered
+    """
+    program = "pin = '{{mcu_config.trig1}}'"
+    assert render(program, mcu_config={"trig1": "GP20"}) == "pin = 'GP20'"
+    assert util_mp_remote._render.cache_info().currsize == 0
+
+
+def test_prerender() -> None:
+    module = types.ModuleType("test_module")
+    module.MP_PROGRAM_TRIG = "pin = '{{mcu_config.trig1}}'"  # type: ignore[attr-defined]
+    module.MP_PROGRAM_ONEWIRE = "pin = '{{mcu_config.onewire}}'"  # type: ignore[attr-defined]
+    module.MP_PROGRAM_COUNT = 5  # type: ignore[attr-defined]
+    module.OTHER_PROGRAM = "x = 1"  # type: ignore[attr-defined]
+    templates = mp_programs(module)
+    assert len(templates) == 2
+
+    count = prerender(templates, [MCU_CONFIG_PICO, MCU_CONFIG_PYBOARD])
+    assert count == 4
+
+    repl = EmulatedRawRepl()
+    exec_render(repl, module.MP_PROGRAM_ONEWIRE, mcu_config=MCU_CONFIG_PYBOARD)  # type: ignore[attr-defined]
+    assert repl.namespace["pin"] == "Y9"
+    info = util_mp_remote._render.cache_info()
+    assert (info.hits, info.misses) == (1, 4)
+
+
+@pytest.mark.slow
+def test_benchmark_render() -> None:
+    """
+    A parametrized suite: 4 templates, 3 specs, 100 tests each.
+    """
+    templates = [MP_PROGRAM_ONEWIRE + f"\nvariant = {i}" for i in range(4)]
+    configs = [McuConfig(trig1=f"GP{i}", onewire="GP14") for i in range(3)]
+    repetitions = 100
+
+    begin_s = time.perf_counter()
+    for _ in range(repetitions):
+        for template in templates:
+            for mcu_config in configs:
+                jinja2.Template(template).render(mcu_config=mcu_config)
+    duration_uncached_s = time.perf_counter() - begin_s
+
+    begin_s = time.perf_counter()
+    prerender(templates, configs)
+    for _ in range(repetitions):
+        for template in templates:
+            for mcu_config in configs:
+                render(template, mcu_config=mcu_config)
+    duration_cached_s = time.perf_counter() - begin_s
+
+    print(
+        f"\n{repetitions * len(templates) * len(configs)} renders:"
+        f" uncached {duration_uncached_s:0.3f}s, cached {duration_cached_s:0.3f}s"
+    )
+    assert duration_cached_s < duration_uncached_s / 10
@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+import pathlib
+import sys
+
+import pytest
+
+from emulated_repl import EmulatedRawRepl, FakeMpyCompiler, MPY_HEADER
+from testbed_showcase.util_mp_remote import render
+from testbed_showcase.util_mpy import (
+    MpyCompiler,
+    MpyPayloads,
+    PAYLOAD_MODULE,
+    UPLOAD_CHUNK_SIZE,
+    mp_program_run_mpy,
+    mp_programs_upload_mpy,
+    mpy_bytecode_version,
+    mpy_cross_command,
+    mpy_module,
+)
+
+MP_PROGRAM = """
+pin = '{{mcu_config.trig1}}'
+roms = [b'(\\xff\\x01']
+"""
+MCU_CONFIG = {"trig1": "GP20"}
+
+
+@pytest.fixture
+def command() -> list[str]:
+    _command = mpy_cross_command()
+    if _command is None:
+        pytest.skip("mpy-cross is not installed")
+    return _command
+
+
+def test_compile(tmp_path: pathlib.Path, command: list[str]) -> None:
+    source = render(MP_PROGRAM, mcu_config=MCU_CONFIG)
+    compiler = MpyCompiler(directory=tmp_path, command=command)
+    mpy = compiler.compile(source=source, bytecode_version=6)
+    assert mpy is not None
+    assert mpy_bytecode_version(mpy) == 6
+    assert compiler.filename(bytecode_version=6, source=source).read_bytes() == mpy
+
+    # Another session: From the disk cache without mpy-cross
+    compiler = MpyCompiler(directory=tmp_path, command=None)
+    assert compiler.compile(source=source, bytecode_version=6) == mpy
+    assert compiler.compile(source=source + "\n", bytecode_version=6) is None
+
+
+def test_compile_bytecode_version(tmp_path: pathlib.Path, command: list[str]) -> None:
+    compiler = MpyCompiler(directory=tmp_path, command=command)
+    if command[-2:] == ["-m", "mpy_cross"]:
+        mpy = compiler.compile(source="x = 1\n", bytecode_version=5)
+        assert (mpy is not None) and (mpy_bytecode_version(mpy) == 5)
+    # Not supported by mpy-cross
+    assert compiler.compile(source="x = 1\n", bytecode_version=99) is None
+
+
+def test_compile_error(tmp_path: pathlib.Path, command: list[str]) -> None:
+    compiler = MpyCompiler(directory=tmp_path, command=command)
+    assert compiler.compile(source="x = (\n", bytecode_version=6) is None
+
+
+def test_mpy_bytecode_version() -> None:
+    assert mpy_bytecode_version(b"M\x06\x00\x1f\x04") == 6
+    assert mpy_bytecode_version(b"print(1)") is None
+    assert mpy_bytecode_version(b"M") is None
+
+
+def test_mp_programs_upload_mpy(
+    tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.chdir(tmp_path)
+    mpy = MPY_HEADER + bytes(range(256)) * 5
+    module = mpy_module(mpy)
+    assert module.startswith(f"{PAYLOAD_MODULE}_")
+    programs = mp_programs_upload_mpy(mpy=mpy, module=module)
+    # 3 chunks and the rename
+    assert len(programs) == 3 + 1
+    assert all(len(p) < 5 * UPLOAD_CHUNK_SIZE for p in programs)
+    repl = EmulatedRawRepl()
+    for program in programs[:-1]:
+        repl.exec_raw(program)
+    # Interrupted: Not importable
+    assert not (tmp_path / f"{module}.mpy").exists()
+    repl.exec_raw(programs[-1])
+    assert (tmp_path / f"{module}.mpy").read_bytes() == mpy
+    compile(mp_program_run_mpy(module), "program", "exec")
+
+
+def test_run_mpy(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """
+    The bytecode is uploaded once, then only imported.
+    """
+    monkeypatch.chdir(tmp_path)
+    repl = EmulatedRawRepl(bytecode_version=6, run_mpy=True)
+    payloads = MpyPayloads(compiler=FakeMpyCompiler(directory=tmp_path, command=None))
+    for i in range(3):
+        values = payloads.exec_fetch(
+            repl,
+            MP_PROGRAM,
+            names=["pin", "roms"],
+            serial="1831",
+            mcu_config={"trig1": f"GP{i}"},
+        )
+        assert values == {"pin": f"GP{i}", "roms": [b"(\xff\x01"]}
+    values = payloads.exec_fetch(
+        repl, MP_PROGRAM, names=["pin"], serial="1831", mcu_config={"trig1": "GP0"}
+    )
+    assert values == {"pin": "GP0"}
+    # The probe and 3 programs
+    assert payloads.uploads == 1 + 3
+    # The program runs again, the module is not kept
+    assert "pin" in repl.namespace
+    assert not any(m.startswith(PAYLOAD_MODULE) for m in sys.modules)
+    # Version, probe (upload, rename, run), 3 * (upload, rename, run), run
+    assert repl.round_trips == 1 + 3 + 3 * 3 + 1
+    assert "_f.write" not in repl.programs[-1]
+
+    # Flashed: Uploaded again
+    payloads.invalidate(serial="1831")
+    payloads.exec_fetch(
+        repl, MP_PROGRAM, names=["pin"], serial="1831", mcu_config={"trig1": "GP0"}
+    )
+    assert payloads.uploads == 4 + 2
+
+
+def test_run_mpy_program_fails(
+    tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """
+    The program itself fails, for example an I2C error:
+    Passed on, not run again in source mode.
+    """
+    monkeypatch.chdir(tmp_path)
+    repl = EmulatedRawRepl(bytecode_version=6, run_mpy=True)
+    payloads = MpyPayloads(compiler=FakeMpyCompiler(directory=tmp_path, command=None))
+    with pytest.raises(OSError):
+        payloads.exec_fetch(repl, "raise OSError(5)\n", names=["x"], serial="1831")
+    # The probe and the program, no source mode
+    assert sum(f"import {PAYLOAD_MODULE}_" in p for p in repl.programs) == 2
+    assert not any(p.lstrip().startswith("raise OSError") for p in repl.programs)
+    assert payloads.bytecode_version(repl, serial="1831") == 6
+
+
+def test_source_mode() -> None:
+    repl = EmulatedRawRepl()
+    payloads = MpyPayloads(compiler=None)
+    values = payloads.exec_fetch(
+        repl, MP_PROGRAM, names=["pin", "roms"], serial="1831", mcu_config=MCU_CONFIG
+    )
+    assert values == {"pin": "GP20", "roms": [b"(\xff\x01"]}
+    assert repl.round_trips == 1
+
+
+def test_no_bytecode_version(tmp_path: pathlib.Path) -> None:
+    """
+    An old firmware without 'sys.implementation._mpy': Asked once, then source mode.
+    """
+    repl = EmulatedRawRepl(bytecode_version=0)
+    payloads = MpyPayloads(compiler=MpyCompiler(directory=tmp_path, command=None))
+    for _ in range(3):
+        values = payloads.exec_fetch(
+            repl, MP_PROGRAM, names=["pin"], serial="1831", mcu_config=MCU_CONFIG
+        )
+        assert values == {"pin": "GP20"}
+    assert repl.round_trips == 1 + 3
+
+
+def test_bytecode_fails(
+    tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch, command: list[str]
+) -> None:
+    """
+    The DUT fails to import the probe: Source mode from now on.
+    """
+    monkeypatch.chdir(tmp_path)
+    repl = EmulatedRawRepl(bytecode_version=6)
+    payloads = MpyPayloads(compiler=MpyCompiler(directory=tmp_path, command=command))
+    values = payloads.exec_fetch(
+        repl, MP_PROGRAM, names=["pin"], serial="1831", mcu_config=MCU_CONFIG
+    )
+    assert values == {"pin": "GP20"}
+    # Version, probe (one chunk, rename, import), source
+    assert repl.round_trips == 5
+    assert payloads.bytecode_version(repl, serial="1831") is None
+
+    # Flashed: The version is read and probed again
+    payloads.invalidate(serial="1831")
+    assert payloads.bytecode_version(repl, serial="1831") is None
+    assert repl.round_trips == 5 + 4
@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import pathlib
+import subprocess
+import sys
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from testbed_showcase.util_bench_harness import write_test_directory
+from testbed_showcase.util_relays import (
+    RELAY_NUMBERS,
+    RelaysChange,
+    RelaysState,
+    relays_for_futs,
+)
+
+FILENAME_CONFTEST = pathlib.Path(__file__).parents[1] / "tests" / "conftest.py"
+
+# Keys as EnumFut, see tentacle_specs.MCU_PYBV11
+RELAYS_CLOSED = {
+    "fut_mcu_only": [],
+    "fut_i2c": [2, 3, 4, 5],
+    "fut_onewire": [2, 3, 4],
+}
+
+
+def _switch(state: RelaysState, serial: str, futs: list[str]) -> RelaysChange:
+    change = state.change(
+        serial=serial,
+        relays_closed=relays_for_futs(relays_closed=RELAYS_CLOSED, futs=futs),
+    )
+    state.applied(serial=serial, change=change)
+    return change
+
+
+def test_relays_for_futs() -> None:
+    assert relays_for_futs(RELAYS_CLOSED, ["fut_mcu_only"]) == []
+    assert relays_for_futs(RELAYS_CLOSED, ["fut_uart"]) == []
+    assert relays_for_futs(RELAYS_CLOSED, ["fut_onewire", "fut_i2c"]) == [2, 3, 4, 5]
+
+
+def test_unknown_state_sets_all_relays() -> None:
+    state = RelaysState()
+    change = _switch(state, "1831", ["fut_i2c"])
+    assert change.close == (2, 3, 4, 5)
+    assert change.open == (1, 6, 7)
+    assert change.toggled == len(RELAY_NUMBERS)
+    assert state.closed("1831") == {2, 3, 4, 5}
+
+
+def test_consecutive_tests_switch_nothing() -> None:
+    state = RelaysState()
+    _switch(state, "1831", ["fut_i2c"])
+    state.reset_counter()
+
+    for _ in range(3):
+        assert _switch(state, "1831", ["fut_i2c"]).is_empty
+    assert state.reset_counter() == 0
+
+
+def test_only_difference_is_switched() -> None:
+    state = RelaysState()
+    _switch(state, "1831", ["fut_i2c"])
+    state.reset_counter()
+
+    change = _switch(state, "1831", ["fut_onewire"])
+    assert change == RelaysChange(close=(), open=(5,))
+    change = _switch(state, "1831", ["fut_mcu_only"])
+    assert change == RelaysChange(close=(), open=(2, 3, 4))
+    assert state.reset_counter() == 4
+    assert state.closed("1831") == frozenset()
+
+
+def test_invalidate() -> None:
+    state = RelaysState()
+    _switch(state, "1831", ["fut_i2c"])
+    _switch(state, "1331", ["fut_i2c"])
+
+    state.invalidate(serial="1831")
+    assert state.closed("1831") is None
+    assert state.closed("1331") == {2, 3, 4, 5}
+    assert _switch(state, "1831", ["fut_i2c"]).toggled == len(RELAY_NUMBERS)
+
+    state.invalidate()
+    assert state.closed("1331") is None
+
+
+def test_consecutive_i2c_tests(tmp_path: pathlib.Path) -> None:
+    """
+    The real tests/conftest.py on simulated tentacles, see 'util_simulation':
+    'setup_tentacles()', 'setup_relays()' and 'function_teardown()' run
+    for two FUT_I2C tests. The simulated infra setup and teardown open
+    all relays, like octoprobe.
+    """
+    pytest.importorskip("octoprobe")
+    directory_tests = tmp_path / "tests"
+    write_test_directory(
+        directory=directory_tests,
+        filename_conftest=FILENAME_CONFTEST,
+        test_functions=2,
+        i2c_every=1,
+    )
+    filename_junit = tmp_path / "junit.xml"
+    # 3 tentacles: PYBV11, DEVICE_POTPOURRY, DAQ_SALEAE
+    subprocess.run(
+        [
+            sys.executable,
+            *("-m", "testbed_showcase.cli_bench_harness", "--simulate"),
+            *("--tentacles", "3", "--directory", str(tmp_path), "--"),
+            str(directory_tests),
+            *("-c", str(directory_tests / "pytest.ini")),
+            f"--rootdir={directory_tests}",
+            "--firmware=MOCK",
+            "--keep-test-order",
+            f"--junitxml={filename_junit}",
+        ],
+        check=True,
+        capture_output=True,
+    )
+    toggled = [
+        int(prop.attrib["value"])
+        for prop in ET.parse(filename_junit).iter("property")
+        if prop.attrib["name"] == "relays_toggled"
+    ]
+    # The first test sets all 7 relays of the 3 tentacles
+    assert len(toggled) >= 2
+    assert toggled[0] == 3 * len(RELAY_NUMBERS)
+    assert toggled[1:] == [0] * (len(toggled) - 1)
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import pathlib
+
+from testbed_showcase.util_repl_pool import DeviceIdentity, ReplPool
+
+FIRMWARE = "FirmwareBuildSpec:RPI_PICO2"
+
+
+def _tty(tmp_path: pathlib.Path) -> pathlib.Path:
+    # A regular file stands in for the device node
+    tty = tmp_path / "ttyACM0"
+    tty.write_bytes(b"")
+    return tty
+
+
+def _reenumerate(tty: pathlib.Path) -> None:
+    # udev removes and creates the device node: Another inode
+    tty_new = tty.with_name(tty.name + ".new")
+    tty_new.write_bytes(b"")
+    tty_new.replace(tty)
+
+
+def test_device_identity(tmp_path: pathlib.Path) -> None:
+    tty = _tty(tmp_path)
+    identity = DeviceIdentity.factory(str(tty))
+    assert identity is not None
+    assert DeviceIdentity.factory(str(tty)) == identity
+    _reenumerate(tty)
+    assert DeviceIdentity.factory(str(tty)) != identity
+    assert DeviceIdentity.factory(str(tmp_path / "missing")) is None
+
+
+def test_reuse(tmp_path: pathlib.Path) -> None:
+    tty = _tty(tmp_path)
+    pool = ReplPool()
+    assert not pool.reuse(serial="1831", firmware=FIRMWARE)
+    pool.checkin(serial="1831", tty=str(tty), firmware=FIRMWARE)
+    for _ in range(3):
+        assert pool.reuse(serial="1831", firmware=FIRMWARE)
+    assert not pool.reuse(serial="2d2d", firmware=FIRMWARE)
+    assert (pool.connects, pool.reuses) == (1, 3)
+    assert pool.text == "REPL connections: 1 connected, 3 reused"
+
+
+def test_other_firmware_reconnects(tmp_path: pathlib.Path) -> None:
+    tty = _tty(tmp_path)
+    pool = ReplPool()
+    pool.checkin(serial="1831", tty=str(tty), firmware=FIRMWARE)
+    assert not pool.reuse(serial="1831", firmware="FirmwareBuildSpec:RPI_PICO2-RISCV")
+    # The entry is dropped: Even the previous firmware reconnects
+    assert not pool.reuse(serial="1831", firmware=FIRMWARE)
+
+
+def test_reset_reconnects(tmp_path: pathlib.Path) -> None:
+    tty = _tty(tmp_path)
+    pool = ReplPool()
+    pool.checkin(serial="1831", tty=str(tty), firmware=FIRMWARE)
+    _reenumerate(tty)
+    assert not pool.reuse(serial="1831", firmware=FIRMWARE)
+
+    pool.checkin(serial="1831", tty=str(tty), firmware=FIRMWARE)
+    tty.unlink()
+    assert not pool.reuse(serial="1831", firmware=FIRMWARE)
+
+
+def test_probe(tmp_path: pathlib.Path) -> None:
+    tty = _tty(tmp_path)
+    pool = ReplPool()
+    pool.checkin(serial="1831", tty=str(tty), firmware=FIRMWARE)
+    assert pool.reuse(serial="1831", firmware=FIRMWARE, probe=lambda: True)
+    # A hung DUT: The entry is dropped
+    assert not pool.reuse(serial="1831", firmware=FIRMWARE, probe=lambda: False)
+    assert not pool.reuse(serial="1831", firmware=FIRMWARE, probe=lambda: True)
+    assert pool.reuses == 1
+
+
+def test_invalidate(tmp_path: pathlib.Path) -> None:
+    tty = _tty(tmp_path)
+    pool = ReplPool()
+    pool.checkin(serial="1831", tty=str(tty), firmware=FIRMWARE)
+    pool.checkin(serial="2d2d", tty=str(tty), firmware=FIRMWARE)
+    pool.invalidate(serial="1831")
+    assert not pool.reuse(serial="1831", firmware=FIRMWARE)
+    assert pool.reuse(serial="2d2d", firmware=FIRMWARE)
+    pool.invalidate()
+    assert not pool.reuse(serial="2d2d", firmware=FIRMWARE)
+
+
+def test_unknown_tty_is_not_pooled(tmp_path: pathlib.Path) -> None:
+    pool = ReplPool()
+    pool.checkin(serial="1831", tty=None, firmware=FIRMWARE)
+    pool.checkin(serial="2d2d", tty=str(tmp_path / "missing"), firmware=FIRMWARE)
+    assert not pool.reuse(serial="1831", firmware=FIRMWARE)
+    assert not pool.reuse(serial="2d2d", firmware=FIRMWARE)
+    assert pool.connects == 2
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import datetime
+import pathlib
+
+from testbed_showcase.util_results_rotation import (
+    ResultsRetention,
+    prune,
+    rotate,
+    rotate_and_prune,
+    rotated_directories,
+)
+
+NOW = datetime.datetime(2025, 3, 7, 14, 5, 33)
+
+
+def _run(directory: pathlib.Path, size: int) -> None:
+    (directory / "mpbuild").mkdir(parents=True)
+    (directory / "mpbuild" / "firmware.uf2").write_bytes(b"x" * size)
+
+
+def test_rotate(tmp_path: pathlib.Path) -> None:
+    results = tmp_path / "results"
+    assert rotate(results, now=NOW) is None
+
+    _run(results, size=10)
+    rotated = rotate(results, now=NOW)
+    assert rotated == tmp_path / "results_2025-03-07_14-05-33"
+    assert not results.exists()
+    assert (rotated / "mpbuild" / "firmware.uf2").is_file()
+
+    # Same second
+    _run(results, size=10)
+    assert rotate(results, now=NOW) == tmp_path / "results_2025-03-07_14-05-33-1"
+
+
+def test_prune_keep_runs(tmp_path: pathlib.Path) -> None:
+    results = tmp_path / "results"
+    for minute in range(5):
+        _run(results, size=10)
+        rotate(results, now=NOW.replace(minute=minute))
+    (tmp_path / "results_sharded").mkdir()
+
+    deleted = prune(results, ResultsRetention(keep_runs=2))
+    assert [d.name for d in deleted] == [
+        "results_2025-03-07_14-02-33",
+        "results_2025-03-07_14-01-33",
+        "results_2025-03-07_14-00-33",
+    ]
+    assert [d.name for d in rotated_directories(results)] == [
+        "results_2025-03-07_14-04-33",
+        "results_2025-03-07_14-03-33",
+    ]
+    assert (tmp_path / "results_sharded").is_dir()
+
+
+def test_prune_keep_bytes(tmp_path: pathlib.Path) -> None:
+    results = tmp_path / "results"
+    for minute, size in enumerate((1_000, 300, 500)):
+        _run(results, size=size)
+        rotate(results, now=NOW.replace(minute=minute))
+
+    prune(results, ResultsRetention(keep_runs=10, keep_bytes=900))
+    assert [d.name for d in rotated_directories(results)] == [
+        "results_2025-03-07_14-02-33",
+        "results_2025-03-07_14-01-33",
+    ]
+
+
+def test_rotate_and_prune(tmp_path: pathlib.Path) -> None:
+    results = tmp_path / "results"
+    _run(results, size=10)
+    thread = rotate_and_prune(results, ResultsRetention(keep_runs=0))
+    # The session may start immediately
+    results.mkdir()
+    thread.join(timeout=10.0)
+    assert rotated_directories(results) == []
+    assert results.is_dir()
@@ -0,0 +1,185 @@
+"""
+The workers are local subprocesses simulating a testbed instance:
+They behave like 'pytest --shard-collect/--shard-select' on the tentacles
+of TESTBED_INSTANCES.
+
+'test_run_sharded_conftest()' runs the real tests/conftest.py
+on simulated tentacles, see 'util_simulation'.
+"""
+
+from __future__ import annotations
+
+import json
+import pathlib
+import sys
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from testbed_showcase.util_bench_harness import write_test_directory
+from testbed_showcase.util_shard import (
+    FILENAME_COLLECT,
+    FILENAME_JUNIT,
+    SUBDIR_TESTRESULTS,
+    ShardWorker,
+    assign_shards,
+    durations_from_junit,
+    run_sharded,
+    shard_key,
+)
+
+TESTS = ["tests/test_simple.py::test_i2c", "tests/test_simple.py::test_onewire"]
+FILENAME_CONFTEST = pathlib.Path(__file__).parents[1] / "tests" / "conftest.py"
+TESTBED_INSTANCES = {
+    "ch_hans_1": ["MCU_PYBV11(PYBV11)", "MCU_RPI_PICO2(RPI_PICO2)"],
+    "ch_hans_2": ["MCU_RPI_PICO2(RPI_PICO2)"],
+    "au_damien_1": ["MCU_RPI_PICO2(RPI_PICO2)"],
+}
+
+WORKER = """
+import json, pathlib, sys
+tests, mcus = json.loads(sys.argv[1])
+args = dict(a.split("=", 1) for a in sys.argv[2:] if a.startswith("--") and "=" in a)
+keys = [f"{t}|mcu={m}" for t in tests for m in mcus]
+if "--collect-only" in sys.argv:
+    pathlib.Path(args["--shard-collect"]).write_text(json.dumps(keys))
+    sys.exit(0)
+selected = json.loads(pathlib.Path(args["--shard-select"]).read_text())
+cases = "".join(
+    f'<testcase name="{k}" time="1.5"><properties>'
+    f'<property name="shard_key" value="{k}"/></properties></testcase>'
+    for k in selected
+)
+pathlib.Path(args["--junitxml"]).write_text(
+    f'<testsuites><testsuite name="pytest" tests="{len(selected)}" errors="0" '
+    f'failures="0" skipped="0" time="{1.5 * len(selected)}">{cases}</testsuite></testsuites>'
+)
+print("ran", len(selected))
+"""
+
+
+def test_shard_key() -> None:
+    assert (
+        shard_key(
+            nodeid="tests/test_simple.py::test_i2c[1831pico2(RPI_PICO2)-3f31potpourry]",
+            tentacles={"mcu": "MCU_RPI_PICO2(RPI_PICO2)", "device_potpourry": "DP"},
+        )
+        == "tests/test_simple.py::test_i2c|device_potpourry=DP,mcu=MCU_RPI_PICO2(RPI_PICO2)"
+    )
+
+
+def test_assign_shards_balanced() -> None:
+    candidates = {
+        "ch_hans_1": ["pyb_a", "pyb_b", "pico_a", "pico_b", "pico_c", "pico_d"],
+        "ch_hans_2": ["pico_a", "pico_b", "pico_c", "pico_d"],
+    }
+    durations = {"pyb_a": 100.0, "pyb_b": 100.0}
+    shards = assign_shards(candidates=candidates, durations=durations)
+
+    # Every key runs exactly once
+    assigned = sorted(k for keys in shards.values() for k in keys)
+    assert assigned == sorted(set(candidates["ch_hans_1"]))
+    # PYBV11 only exists on ch_hans_1: All pico tests go to ch_hans_2
+    assert sorted(shards["ch_hans_1"]) == ["pyb_a", "pyb_b"]
+
+
+def test_run_sharded(tmp_path: pathlib.Path) -> None:
+    filename_worker = tmp_path / "worker.py"
+    filename_worker.write_text(WORKER)
+    workers = [
+        ShardWorker(
+            testbed_instance=instance,
+            command=[sys.executable, str(filename_worker), json.dumps([TESTS, mcus])],
+        )
+        for instance, mcus in TESTBED_INSTANCES.items()
+    ]
+    directory_results = tmp_path / "results"
+
+    rc = run_sharded(
+        workers=workers,
+        directory_results=directory_results,
+        pytest_args=[],
+        durations={},
+    )
+    assert rc == 0
+
+    merged = ET.parse(directory_results / FILENAME_JUNIT).getroot()
+    # 2 tests on PYBV11 + 2 tests on RPI_PICO2: Each runs once
+    assert merged.get("tests") == "4"
+    assert sorted(s.get("name", "") for s in merged.iter("testsuite")) == [
+        "au_damien_1",
+        "ch_hans_1",
+        "ch_hans_2",
+    ]
+    durations = durations_from_junit(directory_results / FILENAME_JUNIT)
+    assert len(durations) == 4
+    assert set(durations.values()) == {1.5}
+    for instance in TESTBED_INSTANCES:
+        assert "ran" in (directory_results / instance / "stdout.txt").read_text()
+
+
+def test_run_sharded_conftest(tmp_path: pathlib.Path) -> None:
+    pytest.importorskip("octoprobe")
+    directory_tests = tmp_path / "tests"
+    write_test_directory(
+        directory=directory_tests, filename_conftest=FILENAME_CONFTEST, test_functions=3
+    )
+    # 4 tentacles: PYBV11, RPI_PICO. 6 tentacles: PYBV11, RPI_PICO, RPI_PICO_W, RPI_PICO2
+    workers = [
+        ShardWorker(
+            testbed_instance=instance,
+            command=[
+                sys.executable,
+                *("-m", "testbed_showcase.cli_bench_harness", "--simulate"),
+                *("--tentacles", str(tentacles)),
+                *("--directory", str(tmp_path / instance)),
+                "--",
+            ],
+        )
+        for instance, tentacles in (("ch_hans_1", 4), ("ch_hans_2", 6))
+    ]
+    directory_results = tmp_path / "results_sharded"
+
+    rc = run_sharded(
+        workers=workers,
+        directory_results=directory_results,
+        pytest_args=[
+            str(directory_tests),
+            *("-p", "no:cacheprovider"),
+            f"--rootdir={directory_tests}",
+            *("-c", str(directory_tests / "pytest.ini")),
+            "--firmware=MOCK",
+        ],
+        durations={},
+    )
+    stdout = {
+        w.testbed_instance: (directory_results / w.testbed_instance / "stdout.txt")
+        for w in workers
+    }
+    assert rc == 0, "\n".join(f.read_text() for f in stdout.values())
+
+    keys = {
+        w.testbed_instance: json.loads(
+            (directory_results / w.testbed_instance / FILENAME_COLLECT).read_text()
+        )
+        for w in workers
+    }
+    assert len(keys["ch_hans_1"]) == 3 * 2
+    assert len(keys["ch_hans_2"]) == 3 * 4
+    assert set(keys["ch_hans_1"]) < set(keys["ch_hans_2"])
+
+    # Every test ran exactly once
+    merged = ET.parse(directory_results / FILENAME_JUNIT).getroot()
+    assert merged.get("tests") == str(3 * 4)
+    assert merged.get("failures") == "0"
+    assert sorted(durations_from_junit(directory_results / FILENAME_JUNIT)) == sorted(
+        keys["ch_hans_2"]
+    )
+
+    # The logs of the workers are in the results tree, not in the worker's 'results'
+    for worker in workers:
+        directory_testresults = (
+            directory_results / worker.testbed_instance / SUBDIR_TESTRESULTS
+        )
+        assert len(list(directory_testresults.iterdir())) > 0
+        assert not (tmp_path / worker.testbed_instance / "results").exists()
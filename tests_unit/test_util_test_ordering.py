@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import dataclasses
+import itertools
+
+from testbed_showcase.util_test_ordering import (
+    COST_FLASH,
+    COST_RELAYS,
+    SetupKey,
+    SetupState,
+    count_transitions,
+    order_items,
+)
+
+
+@dataclasses.dataclass(frozen=True)
+class SyntheticItem:
+    name: str
+    variant: str
+    futs: tuple[str, ...]
+
+    @property
+    def setup_key(self) -> SetupKey:
+        return SetupKey.factory(
+            firmwares={"1831": self.variant},
+            tentacles=["1831", "3f31", "1331"],
+            futs=list(self.futs),
+        )
+
+
+def _items() -> list[SyntheticItem]:
+    """
+    This corresponds to the collection order of pytest:
+    test function by test function, each with all firmware variants.
+    """
+    return [
+        SyntheticItem(name=f"{test}[{variant}]", variant=variant, futs=futs)
+        for test, futs in (
+            ("test_i2c_pattern", ("fut_i2c",)),
+            ("test_i2c", ("fut_i2c",)),
+            ("test_onewire", ("fut_onewire",)),
+            ("test_mip", ("fut_mcu_only",)),
+        )
+        for variant in ("RPI_PICO2", "RPI_PICO2-RISCV")
+    ]
+
+
+def test_order_items() -> None:
+    items = _items()
+    ordered, report = order_items(items=items, setup_key=lambda i: i.setup_key)
+    print(report.text)
+
+    assert sorted(ordered, key=lambda i: i.name) == sorted(items, key=lambda i: i.name)
+    assert report.before.flashes == 8
+    assert report.after.flashes == 2
+
+    def cost(state: SetupState) -> int:
+        return state.flashes * COST_FLASH + state.relay_changes * COST_RELAYS
+
+    # Fewer flashes may require more relay changes, but the total cost drops
+    assert cost(report.after) < cost(report.before)
+    # By default, every test flashes: The saving is only potential
+    assert "potentially saved 6 flashes with --flash-verify" in report.text
+
+    # Within a group, the collection order is preserved
+    names = [i.name for i in ordered]
+    assert names.index("test_i2c_pattern[RPI_PICO2]") < names.index(
+        "test_i2c[RPI_PICO2]"
+    )
+    # All tests of one variant run in one block
+    variants = [variant for variant, _ in itertools.groupby(i.variant for i in ordered)]
+    assert variants == ["RPI_PICO2", "RPI_PICO2-RISCV"]
+
+
+def test_order_items_report_options() -> None:
+    items = _items()
+    _ordered, report = order_items(
+        items=items,
+        setup_key=lambda i: i.setup_key,
+        flashes_skipped=True,
+        relays_kept=False,
+    )
+    assert "(saved 6 flashes, potentially " in report.text
+    assert "relay changes without --relays-reset)" in report.text
+
+
+def test_order_items_never_worse() -> None:
+    items = _items()
+    for permutation in itertools.islice(itertools.permutations(items), 0, 2000, 97):
+        keys = [i.setup_key for i in permutation]
+        _ordered, report = order_items(
+            items=list(permutation), setup_key=lambda i: i.setup_key
+        )
+        assert report.before == count_transitions(keys)
+        assert report.after.flashes <= report.before.flashes
+
+
+def test_order_items_empty() -> None:
+    ordered, report = order_items(items=[], setup_key=lambda i: SetupKey())
+    assert ordered == []
+    assert report.after.flashes == 0
@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import pathlib
+
+import pytest
+
+from testbed_showcase.util_test_plan import (
+    KIND_BUILD,
+    KIND_NO_FLASHING,
+    PlanFirmware,
+    PlanTest,
+    TestPlan,
+)
+
+PICO = "e46340474b174429"
+PYBV11 = "3f31b1c33b3e5c07"
+DAQ = "e46340474b4c1331"
+
+
+def _test(name: str, mcu: str, variant: str, futs: list[str]) -> PlanTest:
+    return PlanTest(
+        nodeid=f"tests/test_simple.py::{name}[{mcu}({variant})]",
+        tentacles={"mcu": mcu, "daq_saleae": DAQ},
+        firmwares={mcu: variant},
+        futs=futs,
+    )
+
+
+PLAN = TestPlan(
+    firmwares=[
+        PlanFirmware(board_variant="RPI_PICO", kind=KIND_BUILD),
+        PlanFirmware(board_variant="PYBV11", kind=KIND_BUILD),
+        PlanFirmware(board_variant="PYBV11-DP", kind=KIND_BUILD),
+    ],
+    tests=[
+        _test("test_i2c", PICO, "RPI_PICO", ["fut_i2c"]),
+        _test("test_onewire", PICO, "RPI_PICO", ["fut_onewire"]),
+        _test("test_i2c", PYBV11, "PYBV11", ["fut_i2c"]),
+        _test("test_i2c", PYBV11, "PYBV11-DP", ["fut_i2c"]),
+    ],
+)
+
+
+def test_estimate() -> None:
+    estimate = PLAN.estimate()
+    assert estimate.tests == 4
+    assert estimate.builds == 3
+    assert estimate.flashes == 3
+    # PICO+DAQ, PICO+DAQ (onewire), PYBV11+DAQ: DAQ changes too
+    assert estimate.relay_changes == 2 + 2 + 2 + 0
+    assert estimate.text == (
+        "Test plan: 4 tests, 3 firmware builds, 3 flashes, 6 relay changes"
+    )
+
+
+def test_estimate_no_flashing() -> None:
+    plan = TestPlan(
+        firmwares=[PlanFirmware(board_variant="", kind=KIND_NO_FLASHING)],
+        tests=[_test("test_i2c", PICO, "", ["fut_i2c"])],
+    )
+    estimate = plan.estimate()
+    assert (estimate.builds, estimate.flashes) == (0, 0)
+
+
+def test_write_read(tmp_path: pathlib.Path) -> None:
+    filename = tmp_path / "plan.json"
+    PLAN.write(filename)
+    assert TestPlan.read(filename) == PLAN
+
+
+def test_read_wrong_version(tmp_path: pathlib.Path) -> None:
+    filename = tmp_path / "plan.json"
+    filename.write_text('{"version": 0, "firmwares": [], "tests": []}')
+    with pytest.raises(ValueError, match="Expected version"):
+        TestPlan.read(filename)
+
+
+def test_order_items() -> None:
+    nodeids = [t.nodeid for t in PLAN.tests]
+    collected = [*reversed(nodeids[1:]), "tests/test_mip.py::test_mip"]
+    selected, deselected = PLAN.order_items(items=collected, nodeid=lambda n: n)
+    # The first planned test was not collected
+    assert selected == nodeids[1:]
+    assert deselected == ["tests/test_mip.py::test_mip"]
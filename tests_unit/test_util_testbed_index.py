@@ -0,0 +1,186 @@
+"""
+Synthetic tentacles: Just the attributes used by the index.
+
+The reference implementation is the linear scan as in
+'EnumTentacleType.get_tentacles_for_type()' and 'filter(firmware_spec.match_board, ...)'.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import random
+import time
+
+import pytest
+
+from testbed_showcase.util_testbed_index import TestbedIndex
+
+TYPE_MCU = "mcu"
+TYPE_POTPOURRY = "potourry"
+TYPE_DAQ = "daq_saleae"
+TYPES = (TYPE_MCU, TYPE_POTPOURRY, TYPE_DAQ)
+FUTS = ("fut_mcu_only", "fut_i2c", "fut_uart", "fut_onewire", "fut_timer")
+BOARDS = ("RPI_PICO", "RPI_PICO2", "PYBV11", "ESP32_GENERIC", "ESP8266_GENERIC")
+
+
+@dataclasses.dataclass(frozen=True)
+class FakeSpec:
+    tentacle_type: str
+    tentacle_tag: str
+    futs: list[str]
+    board: str
+
+
+@dataclasses.dataclass(frozen=True)
+class FakeTentacle:
+    tentacle_serial_number: str
+    tentacle_spec: FakeSpec
+
+
+@dataclasses.dataclass(frozen=True)
+class FakeBoardVariant:
+    name_normalized: str
+
+
+@dataclasses.dataclass
+class FakeFirmwareSpec:
+    board_variant: FakeBoardVariant
+    calls: int = 0
+
+    def match_board(self, tentacle: FakeTentacle) -> bool:
+        self.calls += 1
+        return tentacle.tentacle_spec.board == self.board_variant.name_normalized
+
+
+def _inventory(count: int, seed: int = 42) -> list[FakeTentacle]:
+    rnd = random.Random(seed)
+    specs = [
+        FakeSpec(
+            tentacle_type=TYPES[i % len(TYPES)],
+            tentacle_tag=f"TAG_{i}",
+            futs=rnd.sample(FUTS, rnd.randint(1, len(FUTS))),
+            board=rnd.choice(BOARDS),
+        )
+        for i in range(30)
+    ]
+    return [
+        FakeTentacle(tentacle_serial_number=f"{i:04x}", tentacle_spec=rnd.choice(specs))
+        for i in range(count)
+    ]
+
+
+def _linear_tentacles_for_type(
+    tentacles: list[FakeTentacle], tentacle_type: str, required_futs: list[str]
+) -> list[FakeTentacle]:
+    def has_required_futs(t: FakeTentacle) -> bool:
+        if t.tentacle_spec.tentacle_type == tentacle_type:
+            for required_fut in required_futs:
+                if required_fut in t.tentacle_spec.futs:
+                    return True
+        return False
+
+    return [t for t in tentacles if has_required_futs(t)]
+
+
+def _test_functions(count: int, seed: int = 43) -> list[list[str]]:
+    rnd = random.Random(seed)
+    return [rnd.sample(FUTS, rnd.randint(1, 2)) for _ in range(count)]
+
+
+FIRMWARE_SPECS = [FakeFirmwareSpec(FakeBoardVariant(board)) for board in BOARDS[:3]]
+
+
+def _generate_linear(
+    tentacles: list[FakeTentacle], functions: list[list[str]]
+) -> list[list[str]]:
+    results: list[list[str]] = []
+    for required_futs in functions:
+        for firmware_spec in FIRMWARE_SPECS:
+            mcus = _linear_tentacles_for_type(tentacles, TYPE_MCU, required_futs)
+            mcus = list(filter(firmware_spec.match_board, mcus))
+            results.append([t.tentacle_serial_number for t in mcus])
+        for tentacle_type in (TYPE_POTPOURRY, TYPE_DAQ):
+            others = _linear_tentacles_for_type(tentacles, tentacle_type, required_futs)
+            results.append([t.tentacle_serial_number for t in others])
+    return results
+
+
+def _generate_index(index: TestbedIndex, functions: list[list[str]]) -> list[list[str]]:
+    results: list[list[str]] = []
+    for required_futs in functions:
+        for firmware_spec in FIRMWARE_SPECS:
+            mcus = index.get_tentacles_for_type(
+                TYPE_MCU,
+                required_futs,
+                firmware_spec=firmware_spec,  # type: ignore[arg-type]
+            )
+            results.append([t.tentacle_serial_number for t in mcus])
+        for tentacle_type in (TYPE_POTPOURRY, TYPE_DAQ):
+            others = index.get_tentacles_for_type(tentacle_type, required_futs)
+            results.append([t.tentacle_serial_number for t in others])
+    return results
+
+
+def test_same_result_as_linear_scan() -> None:
+    tentacles = _inventory(count=200)
+    functions = _test_functions(count=200)
+    index = TestbedIndex(tentacles)  # type: ignore[arg-type]
+    assert _generate_index(index, functions) == _generate_linear(tentacles, functions)
+
+
+def test_unknown_fut_matches_nothing() -> None:
+    index = TestbedIndex(_inventory(count=20))  # type: ignore[arg-type]
+    assert index.get_tentacles_for_type(TYPE_MCU, ["fut_unknown"]) == []
+    assert index.get_tentacles_for_type(TYPE_MCU, []) == []
+
+
+def test_get_tentacles() -> None:
+    tentacles = _inventory(count=20)
+    index = TestbedIndex(tentacles)  # type: ignore[arg-type]
+    tentacle = tentacles[7]
+    serial = tentacle.tentacle_serial_number
+    assert index.get_tentacles(serial=serial) == [tentacle]
+    assert index.get_tentacles(
+        tentacle_type=tentacle.tentacle_spec.tentacle_type, serial=serial
+    ) == [tentacle]
+    other_type = next(t for t in TYPES if t != tentacle.tentacle_spec.tentacle_type)
+    assert index.get_tentacles(tentacle_type=other_type, serial=serial) == []
+    assert index.get_tentacles(serial="ffff") == []
+    assert index.get_tentacles(tentacle_type=TYPE_DAQ) == [
+        t for t in tentacles if t.tentacle_spec.tentacle_type == TYPE_DAQ
+    ]
+
+
+def test_match_board_is_memoized() -> None:
+    tentacles = _inventory(count=500)
+    index = TestbedIndex(tentacles)  # type: ignore[arg-type]
+    firmware_spec = FakeFirmwareSpec(FakeBoardVariant("RPI_PICO2"))
+    for _ in range(3):
+        index.match_board(firmware_spec, tentacles)  # type: ignore[arg-type]
+    tags = {t.tentacle_spec.tentacle_tag for t in tentacles}
+    assert firmware_spec.calls == len(tags)
+
+
+@pytest.mark.slow
+def test_benchmark() -> None:
+    """
+    1,000 tentacles, 10,000 test functions.
+    """
+    tentacles = _inventory(count=1_000)
+    functions = _test_functions(count=10_000)
+
+    begin_s = time.perf_counter()
+    results_linear = _generate_linear(tentacles, functions)
+    duration_linear_s = time.perf_counter() - begin_s
+
+    begin_s = time.perf_counter()
+    index = TestbedIndex(tentacles)  # type: ignore[arg-type]
+    results_index = _generate_index(index, functions)
+    duration_index_s = time.perf_counter() - begin_s
+
+    print(
+        f"\nlinear: {duration_linear_s:0.2f}s, index: {duration_index_s:0.2f}s,"
+        f" speedup {duration_linear_s / duration_index_s:0.0f}x"
+    )
+    assert results_index == results_linear
+    assert duration_index_s < duration_linear_s
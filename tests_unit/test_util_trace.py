@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import json
+import pathlib
+import threading
+import time
+
+import pytest
+
+from testbed_showcase.util_trace import (
+    CATEGORY_TEST,
+    PHASE_BUILD,
+    PHASE_FLASH,
+    PHASE_TEST_BODY,
+    Tracer,
+)
+
+PICO = "e46340474b4e-1831"
+PYBV11 = "e46340474b17-4429"
+
+
+def _run_test(tracer: Tracer) -> None:
+    def setup_tentacle(serial: str, flash_s: float) -> None:
+        with tracer.span(PHASE_BUILD, tentacle=serial):
+            pass
+        with tracer.span(PHASE_FLASH, tentacle=serial):
+            time.sleep(flash_s)
+
+    with tracer.span("tests/test_simple.py::test_i2c", category=CATEGORY_TEST):
+        threads = [
+            threading.Thread(target=setup_tentacle, args=(PICO, 0.02)),
+            threading.Thread(target=setup_tentacle, args=(PYBV11, 0.05)),
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        with tracer.span(PHASE_TEST_BODY, tentacles=f"{PICO},{PYBV11}"):
+            pass
+
+
+def test_summary() -> None:
+    tracer = Tracer()
+    _run_test(tracer)
+
+    summary = tracer.summary()
+    assert [s.name for s in summary][0] == PHASE_FLASH
+    flash = summary[0]
+    assert flash.count == 2
+    assert flash.max_attributes == {"tentacle": PYBV11}
+    assert flash.max_s >= 0.05
+    # The test span is not a phase
+    assert {s.name for s in summary} == {PHASE_BUILD, PHASE_FLASH, PHASE_TEST_BODY}
+
+    text = tracer.summary_text()
+    assert text.splitlines()[1].startswith("flash")
+    assert f"tentacle={PYBV11}" in text
+
+
+def test_exception_closes_span() -> None:
+    tracer = Tracer()
+    with pytest.raises(ValueError):
+        with tracer.span(PHASE_FLASH, tentacle=PICO):
+            raise ValueError("flashing failed")
+    assert len(tracer.spans) == 1
+    assert tracer.spans[0].end_s is not None
+
+
+def test_chrome_trace(tmp_path: pathlib.Path) -> None:
+    tracer = Tracer()
+    _run_test(tracer)
+    filename_trace = tmp_path / "trace.json"
+    tracer.write(filename_trace, tmp_path / "trace_summary.txt")
+
+    events = json.loads(filename_trace.read_text())["traceEvents"]
+    threads = [e for e in events if e["ph"] == "M"]
+    spans = [e for e in events if e["ph"] == "X"]
+    assert len(threads) == 3
+    assert len(spans) == 1 + 2 * 2 + 1
+
+    test = spans[0]
+    assert test["cat"] == CATEGORY_TEST
+    for span in spans[1:]:
+        # Nested in the test span
+        assert test["ts"] <= span["ts"]
+        assert span["ts"] + span["dur"] <= test["ts"] + test["dur"]
+    flashes = [e for e in spans if e["name"] == PHASE_FLASH]
+    assert {e["args"]["tentacle"] for e in flashes} == {PICO, PYBV11}
+    # Concurrent setup: Every tentacle on its own thread
+    assert len({e["tid"] for e in flashes}) == 2
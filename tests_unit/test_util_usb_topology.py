@@ -0,0 +1,128 @@
+"""
+The sysfs and /dev trees are faked in a temporary directory.
+"""
+
+from __future__ import annotations
+
+import pathlib
+import shutil
+import time
+
+from testbed_showcase.util_usb_topology import (
+    TopologyEntry,
+    TopologySnapshot,
+    USB_VENDOR_RP2,
+    scan_sysfs,
+)
+
+PYBV11 = "e46340474b17-4429"
+PICO2 = "e46340474b4e-1831"
+DAQ = "e46340474b4c-1331"
+
+
+class FakeSysfs:
+    def __init__(self, directory: pathlib.Path) -> None:
+        self.sysfs = directory / "sys"
+        self.dev = directory / "dev"
+        self.sysfs.mkdir()
+        self.dev.mkdir()
+
+    def add(
+        self,
+        usb_port: str,
+        serial: str,
+        tty: str | None,
+        vendor: str = USB_VENDOR_RP2,
+    ) -> None:
+        device = self.sysfs / usb_port
+        device.mkdir()
+        (device / "idVendor").write_text(vendor + "\n")
+        (device / "serial").write_text(serial + "\n")
+        if tty is not None:
+            (device / f"{usb_port}:1.0" / "tty" / tty).mkdir(parents=True)
+            (self.dev / tty).touch()
+
+    def snapshot(self, serials_delimited: list[str]) -> TopologySnapshot:
+        return TopologySnapshot.factory(
+            serials_delimited=serials_delimited,
+            sysfs=self.sysfs,
+            directory_dev=self.dev,
+        )
+
+    def differences(
+        self, snapshot: TopologySnapshot, serials_inventory: list[str]
+    ) -> list[str]:
+        return snapshot.differences(
+            serials_inventory=serials_inventory,
+            sysfs=self.sysfs,
+            directory_dev=self.dev,
+        )
+
+
+def _bench(tmp_path: pathlib.Path) -> FakeSysfs:
+    sysfs = FakeSysfs(tmp_path)
+    sysfs.add("1-4.1.1", PYBV11.replace("-", ""), "ttyACM0")
+    sysfs.add("1-4.1.2", PICO2.replace("-", ""), "ttyACM1")
+    # A usb hub: not a RP2
+    sysfs.add("1-4", "0000000000000000", None, vendor="0424")
+    return sysfs
+
+
+def test_scan_sysfs(tmp_path: pathlib.Path) -> None:
+    sysfs = _bench(tmp_path)
+    devices = scan_sysfs(sysfs=sysfs.sysfs, directory_dev=sysfs.dev)
+    assert devices == {
+        "e46340474b174429": ("1-4.1.1", str(sysfs.dev / "ttyACM0")),
+        "e46340474b4e1831": ("1-4.1.2", str(sysfs.dev / "ttyACM1")),
+    }
+
+
+def test_unchanged(tmp_path: pathlib.Path) -> None:
+    sysfs = _bench(tmp_path)
+    snapshot = sysfs.snapshot([PYBV11, PICO2])
+    assert snapshot.entries[0] == TopologyEntry(
+        PYBV11, "1-4.1.1", str(sysfs.dev / "ttyACM0")
+    )
+
+    filename = tmp_path / "topology.json"
+    snapshot.write(filename)
+    snapshot_read = TopologySnapshot.read(filename)
+    assert snapshot_read == snapshot
+
+    begin_s = time.perf_counter()
+    assert sysfs.differences(snapshot_read, [PYBV11, PICO2, DAQ]) == []
+    assert time.perf_counter() - begin_s < 1.0
+
+
+def test_changed(tmp_path: pathlib.Path) -> None:
+    sysfs = _bench(tmp_path)
+    snapshot = sysfs.snapshot([PYBV11, PICO2])
+
+    # The DAQ is connected, PICO2 moves to another port, ttyACM0 vanished
+    sysfs.add("1-4.1.3", DAQ.replace("-", ""), "ttyACM2")
+    shutil.rmtree(sysfs.sysfs / "1-4.1.2")
+    sysfs.add("1-4.1.4", PICO2.replace("-", ""), "ttyACM1")
+    (sysfs.dev / "ttyACM0").unlink()
+
+    differences = sysfs.differences(snapshot, [PYBV11, PICO2, DAQ])
+    assert differences == [
+        f"{PYBV11}: {sysfs.dev / 'ttyACM0'} does not exist",
+        f"{PICO2}: moved from port 1-4.1.2 to 1-4.1.4",
+        f"{DAQ}: connected",
+    ]
+
+
+def test_disconnected(tmp_path: pathlib.Path) -> None:
+    sysfs = _bench(tmp_path)
+    snapshot = sysfs.snapshot([PYBV11, PICO2])
+    shutil.rmtree(sysfs.sysfs / "1-4.1.1")
+    assert sysfs.differences(snapshot, [PYBV11, PICO2]) == [f"{PYBV11}: disconnected"]
+
+
+def test_read_invalid(tmp_path: pathlib.Path) -> None:
+    filename = tmp_path / "topology.json"
+    assert TopologySnapshot.read(filename) is None
+    filename.write_text("{")
+    assert TopologySnapshot.read(filename) is None
+    filename.write_text('{"version": 0, "entries": []}')
+    assert TopologySnapshot.read(filename) is None